@@ -29,7 +29,6 @@ from fastapi import WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import aiohttp
-import shutil
 from pathlib import Path
 
 # 添加项目根目录到Python路径
@@ -38,6 +37,11 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # 工具调用模块（仅用于流式接口）
 from .message_manager import message_manager  # 导入统一的消息管理器
 from .prompt_logger import prompt_logger  # 导入prompt日志记录器
+from .sse_relay import iter_content_batches, iter_content_deltas, sse_frame  # SSE流式中继
+from .ws_hub import WebSocketHub  # WebSocket广播中心
+from .document_store import DocumentStore, UploadTooLargeError, ALLOWED_EXTENSIONS  # 上传文档存储
+from .document_catalog import DocumentCatalog, SORT_FIELDS as DOCUMENT_SORT_FIELDS  # 上传文档目录
+from .document_pipeline import DocumentPipeline, OPERATIONS as DOCUMENT_OPERATIONS  # 长文档分块处理
 
 # 导入配置系统
 try:
@@ -48,35 +52,18 @@ except ImportError:
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from config import config, AI_NAME  # 使用新的配置系统
 from ui.response_utils import extract_message  # 导入消息提取工具
+from llm_rate_limiter import get_rate_limiter, Priority  # LLM全局限流
 from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX  # handoff提示词
 
 # 全局NagaAgent实例 - 延迟导入避免循环依赖
 naga_agent = None
 
-# WebSocket连接管理
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                # 移除断开的连接
-                self.active_connections.remove(connection)
-
-manager = ConnectionManager()
+# WebSocket连接管理（每个连接独立发送队列，慢客户端不拖累广播）
+manager = WebSocketHub(
+    queue_size=config.api_server.ws_queue_size,
+    policy=config.api_server.ws_slow_consumer_policy,
+    send_timeout=config.api_server.ws_send_timeout
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -88,7 +75,10 @@ async def lifespan(app: FastAPI):
         from conversation_core import NagaConversation
         naga_agent = NagaConversation()  # 第四次初始化：API服务器启动时创建
         print("[SUCCESS] NagaAgent初始化完成")
+        # 文档目录与上传目录对账（后台线程，不阻塞启动）
+        reconcile_task = asyncio.create_task(asyncio.to_thread(document_catalog.reconcile))
         yield
+        reconcile_task.cancel()
     except Exception as e:
         print(f"[ERROR] NagaAgent初始化失败: {e}")
         traceback.print_exc()
@@ -118,6 +108,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 上传文档存储与目录
+document_catalog = DocumentCatalog("uploaded_documents")
+document_store = DocumentStore(document_catalog, max_bytes=config.api_server.max_upload_mb * 1024 * 1024)
+
+async def _document_llm(prompt: str) -> str:
+    """文档流水线的LLM调用；get_response出错时返回错误文本，这里转为异常，避免错误结果进入缓存"""
+    result = await naga_agent.get_response(prompt)
+    if isinstance(result, str) and result.startswith("API调用出错"):
+        raise RuntimeError(result)
+    return result
+
+document_pipeline = DocumentPipeline(
+    _document_llm,
+    chunk_tokens=config.api_server.doc_chunk_tokens,
+    max_concurrency=config.api_server.doc_max_concurrency
+)
+
+@app.middleware("http")
+async def upload_size_guard(request: Request, call_next):
+    """声明的请求体超出上传上限时直接拒绝，不等表单解析把整个文件收下来"""
+    if request.url.path == "/upload/document":
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > document_store.max_bytes + 64 * 1024:  # 预留multipart包装开销
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"文件大小超出限制 {config.api_server.max_upload_mb}MB"}
+            )
+    return await call_next(request)
+
 # 挂载静态文件
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
@@ -150,6 +169,8 @@ class FileUploadResponse(BaseModel):
     file_size: int
     file_type: str
     upload_time: str
+    content_hash: Optional[str] = None
+    deduplicated: bool = False
     status: str = "success"
     message: str = "文件上传成功"
 
@@ -193,6 +214,11 @@ async def websocket_endpoint(websocket: WebSocket):
         print(f"WebSocket错误: {e}")
         manager.disconnect(websocket)
 
+@app.get("/ws/stats")
+async def websocket_stats():
+    """WebSocket各连接的积压与滞后统计"""
+    return manager.stats()
+
 # API路由
 @app.get("/", response_model=Dict[str, str])
 async def root():
@@ -289,45 +315,35 @@ async def chat(request: ChatRequest):
         
         # 调用LLM API - 流式模式
         async with aiohttp.ClientSession() as session:
-            # 保存prompt日志
-            prompt_logger.log_prompt(session_id, messages, api_status="sending")
+            # 保存prompt日志（后台写入）
+            prompt_logger.log_prompt_background(session_id, messages, api_status="sending")
             
-            async with session.post(
-                f"{config.api.base_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {config.api.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": config.api.model,
-                    "messages": messages,
-                    "temperature": config.api.temperature,
-                    "max_tokens": config.api.max_tokens,
-                    "stream": True
-                }
-            ) as resp:
-                if resp.status != 200:
-                    # 保存失败的prompt日志
-                    prompt_logger.log_prompt(session_id, messages, api_status="failed")
-                    raise HTTPException(status_code=resp.status, detail="LLM API调用失败")
-                
-                # 处理流式响应
-                async for line in resp.content:
-                    line_str = line.decode('utf-8').strip()
-                    if line_str.startswith('data: '):
-                        data_str = line_str[6:]
-                        if data_str == '[DONE]':
-                            break
-                        try:
-                            data = json.loads(data_str)
-                            if 'choices' in data and len(data['choices']) > 0:
-                                delta = data['choices'][0].get('delta', {})
-                                if 'content' in delta:
-                                    content = delta['content']
-                                    # 使用流式工具调用提取器处理内容
-                                    await tool_extractor.process_text_chunk(content)
-                        except json.JSONDecodeError:
-                            continue
+            async with get_rate_limiter().limit(config.api.base_url, Priority.INTERACTIVE) as slot:
+                resp = await session.post(
+                    f"{config.api.base_url}/chat/completions",
+                    headers={
+                        "Authorization": f"Bearer {config.api.api_key}",
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "model": config.api.model,
+                        "messages": messages,
+                        "temperature": config.api.temperature,
+                        "max_tokens": config.api.max_tokens,
+                        "stream": True
+                    }
+                )
+                slot.report_response(resp.status, resp.headers)
+                async with resp:
+                    if resp.status != 200:
+                        # 保存失败的prompt日志
+                        prompt_logger.log_prompt_background(session_id, messages, api_status="failed")
+                        raise HTTPException(status_code=resp.status, detail="LLM API调用失败")
+                    
+                    # 处理流式响应（读完流后才归还并发名额）
+                    async for content in iter_content_deltas(resp.content):
+                        # 使用流式工具调用提取器处理内容
+                        await tool_extractor.process_text_chunk(content)
         
         # 完成处理
         await tool_extractor.finish_processing()
@@ -337,7 +353,7 @@ async def chat(request: ChatRequest):
         message_manager.add_message(session_id, "assistant", pure_text_content)
         
         # 保存成功的prompt日志
-        prompt_logger.log_prompt(session_id, messages, {"content": pure_text_content}, api_status="success")
+        prompt_logger.log_prompt_background(session_id, messages, {"content": pure_text_content}, api_status="success")
         
         return ChatResponse(
             response=extract_message(pure_text_content) if pure_text_content else pure_text_content,
@@ -358,13 +374,13 @@ async def chat_stream(request: ChatRequest):
     if not request.message.strip():
         raise HTTPException(status_code=400, detail="消息内容不能为空")
     
-    async def generate_response() -> AsyncGenerator[str, None]:
+    async def generate_response() -> AsyncGenerator[bytes, None]:
         try:
             # 获取或创建会话ID
             session_id = message_manager.create_session(request.session_id)
             
             # 发送会话ID信息
-            yield f"data: session_id: {session_id}\n\n"
+            yield sse_frame(f"session_id: {session_id}")
             
             # 构建系统提示词
             available_services = naga_agent.mcp.get_available_services_filtered()
@@ -383,7 +399,7 @@ async def chat_stream(request: ChatRequest):
             tool_extractor = StreamingToolCallExtractor(naga_agent.mcp)
             
             # 用于累积纯文本内容（不包含工具调用）
-            pure_text_content = ""
+            pure_text_parts: List[str] = []
             
             # 初始化语音集成（如果启用）
             voice_integration = None
@@ -395,130 +411,118 @@ async def chat_stream(request: ChatRequest):
                     print(f"语音集成初始化失败: {e}")
             
             # 设置回调函数
-            def on_text_chunk(text: str, chunk_type: str):
-                """处理文本块 - 发送到前端并累积纯文本"""
-                if chunk_type == "chunk":
-                    nonlocal pure_text_content
-                    pure_text_content += text
-                    return f"data: {text}\n\n"
-                return None
+            def on_text_delta(text: str, delta_type: str):
+                """处理文本增量 - 收到即下发，不等整句，并累积纯文本"""
+                pure_text_parts.append(text)
+                return sse_frame(text)
             
             def on_sentence(sentence: str, sentence_type: str):
                 """处理完整句子"""
                 if sentence_type == "sentence":
-                    return f"data: [SENTENCE] {sentence}\n\n"
+                    return sse_frame(f"[SENTENCE] {sentence}")
                 return None
             
             def on_tool_call(tool_call: str, tool_type: str):
                 """处理工具调用 - 不累积到纯文本"""
                 if tool_type == "tool_call":
-                    return f"data: [TOOL_CALL] 正在执行工具调用...\n\n"
+                    return sse_frame("[TOOL_CALL] 正在执行工具调用...")
                 return None
             
             def on_tool_result(result: str, result_type: str):
                 """处理工具结果 - 不累积到纯文本"""
                 if result_type == "tool_result":
-                    return f"data: [TOOL_RESULT] {result}\n\n"
+                    return sse_frame(f"[TOOL_RESULT] {result}")
                 elif result_type == "tool_error":
-                    return f"data: [TOOL_ERROR] {result}\n\n"
+                    return sse_frame(f"[TOOL_ERROR] {result}")
                 return None
             
-            # 设置回调
+            # 设置回调（整句仍用于语音，客户端直接收增量）
             tool_extractor.set_callbacks(
-                on_text_chunk=on_text_chunk,
+                on_text_delta=on_text_delta,
                 on_sentence=on_sentence,
                 on_tool_call=on_tool_call,
                 on_tool_result=on_tool_result,
                 voice_integration=voice_integration
             )
             
+            def frames(results) -> bytes:
+                """合并提取器产出的SSE帧（界面用的其他结果不下发）"""
+                return b"".join(result for result in results or () if isinstance(result, bytes))
+            
             # 定义LLM调用函数 - 支持真正的流式输出
-            async def call_llm_stream(messages: List[Dict]) -> AsyncGenerator[str, None]:
-                """调用LLM API - 流式模式"""
+            async def call_llm_stream(messages: List[Dict]) -> AsyncGenerator[bytes, None]:
+                """调用LLM API - 流式模式，每次网络读取产出的帧合并为一次写出"""
                 async with aiohttp.ClientSession() as session:
-                    # 保存prompt日志
-                    prompt_logger.log_prompt(session_id, messages, api_status="sending")
+                    # 保存prompt日志（后台写入，不阻塞首字）
+                    prompt_logger.log_prompt_background(session_id, messages, api_status="sending")
                     
-                    async with session.post(
-                        f"{config.api.base_url}/chat/completions",
-                        headers={
-                            "Authorization": f"Bearer {config.api.api_key}",
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "model": config.api.model,
-                            "messages": messages,
-                            "temperature": config.api.temperature,
-                            "max_tokens": config.api.max_tokens,
-                            "stream": True  # 启用真正的流式输出
-                        }
-                    ) as resp:
-                        if resp.status != 200:
-                            # 保存失败的prompt日志
-                            prompt_logger.log_prompt(session_id, messages, api_status="failed")
-                            raise HTTPException(status_code=resp.status, detail="LLM API调用失败")
-                        
-                        # 处理流式响应
-                        async for line in resp.content:
-                            line_str = line.decode('utf-8').strip()
-                            if line_str.startswith('data: '):
-                                data_str = line_str[6:]
-                                if data_str == '[DONE]':
-                                    break
-                                try:
-                                    data = json.loads(data_str)
-                                    if 'choices' in data and len(data['choices']) > 0:
-                                        delta = data['choices'][0].get('delta', {})
-                                        if 'content' in delta:
-                                            content = delta['content']
-                                            # 使用流式工具调用提取器处理内容
-                                            results = await tool_extractor.process_text_chunk(content)
-                                            if results:
-                                                for result in results:
-                                                    yield result
-                                            
-                                except json.JSONDecodeError:
-                                    continue
+                    async with get_rate_limiter().limit(config.api.base_url, Priority.INTERACTIVE) as slot:
+                        resp = await session.post(
+                            f"{config.api.base_url}/chat/completions",
+                            headers={
+                                "Authorization": f"Bearer {config.api.api_key}",
+                                "Content-Type": "application/json"
+                            },
+                            json={
+                                "model": config.api.model,
+                                "messages": messages,
+                                "temperature": config.api.temperature,
+                                "max_tokens": config.api.max_tokens,
+                                "stream": True  # 启用真正的流式输出
+                            }
+                        )
+                        slot.report_response(resp.status, resp.headers)
+                        async with resp:
+                            if resp.status != 200:
+                                # 保存失败的prompt日志
+                                prompt_logger.log_prompt_background(session_id, messages, api_status="failed")
+                                raise HTTPException(status_code=resp.status, detail="LLM API调用失败")
+                            
+                            # 处理流式响应：字节级增量解析SSE，内容增量交给工具调用提取器（读完流后才归还并发名额）
+                            async for batch in iter_content_batches(resp.content):
+                                output = []
+                                for content in batch:
+                                    output.append(frames(await tool_extractor.process_text_chunk(content)))
+                                data = b"".join(output)
+                                if data:
+                                    yield data
             
             # 处理流式响应
             async for chunk in call_llm_stream(messages):
                 yield chunk
             
-            # 完成处理
+            # 完成处理（剩余文本已作为增量下发，这里只需收尾断句和语音）
             await tool_extractor.finish_processing()
             
             # 完成语音处理
             if voice_integration:
                 try:
-                    import threading
-                    threading.Thread(
-                        target=voice_integration.finish_processing,
-                        daemon=True
-                    ).start()
+                    voice_integration.finish_processing()  # 只入分发队列，立即返回
                 except Exception as e:
                     print(f"语音集成完成处理错误: {e}")
             
             # 保存对话历史到消息管理器（使用纯文本内容）
+            pure_text_content = "".join(pure_text_parts)
             message_manager.add_message(session_id, "user", request.message)
             message_manager.add_message(session_id, "assistant", pure_text_content)
             
             # 保存成功的prompt日志
-            prompt_logger.log_prompt(session_id, messages, {"content": pure_text_content}, api_status="success")
+            prompt_logger.log_prompt_background(session_id, messages, {"content": pure_text_content}, api_status="success")
             
-            yield "data: [DONE]\n\n"
+            yield sse_frame("[DONE]")
             
         except Exception as e:
             print(f"流式对话处理错误: {e}")
             traceback.print_exc()
-            yield f"data: 错误: {str(e)}\n\n"
+            yield sse_frame(f"错误: {str(e)}")
     
     return StreamingResponse(
         generate_response(),
-        media_type="text/plain",
+        media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
-            "Content-Type": "text/event-stream"
+            "X-Accel-Buffering": "no"  # 禁止反向代理缓冲，每帧即时送达
         }
     )
 
@@ -694,6 +698,19 @@ async def get_memory_stats():
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"获取记忆统计失败: {str(e)}")
 
+@app.get("/llm/rate_limit")
+async def get_rate_limit_stats():
+    """获取LLM全局限流器实时指标"""
+    try:
+        return {
+            "status": "success",
+            "rate_limit": get_rate_limiter().get_metrics()
+        }
+    except Exception as e:
+        print(f"获取限流指标错误: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"获取限流指标失败: {str(e)}")
+
 @app.get("/sessions")
 async def get_sessions():
     """获取所有会话信息"""
@@ -775,45 +792,36 @@ async def upload_document(
     file: UploadFile = File(...),
     description: str = Form(None)
 ):
-    """上传文档文件"""
+    """上传文档文件（分块异步写盘，同时计算哈希，相同内容去重）"""
     try:
-        # 创建上传目录
-        upload_dir = Path("uploaded_documents")
-        upload_dir.mkdir(exist_ok=True)
-        
         # 检查文件类型
-        allowed_extensions = {".docx", ".doc", ".txt", ".pdf", ".md"}
         file_extension = Path(file.filename).suffix.lower()
         
-        if file_extension not in allowed_extensions:
+        if file_extension not in ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=400, 
-                detail=f"不支持的文件类型: {file_extension}。支持的类型: {', '.join(allowed_extensions)}"
+                detail=f"不支持的文件类型: {file_extension}。支持的类型: {', '.join(ALLOWED_EXTENSIONS)}"
             )
         
-        # 生成唯一文件名
-        import time
-        timestamp = str(int(time.time()))
-        safe_filename = f"{timestamp}_{file.filename}"
-        file_path = upload_dir / safe_filename
-        
         # 保存文件
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # 获取文件信息
-        file_size = file_path.stat().st_size
+        stored = await document_store.save_upload(file)
         upload_time = time.strftime("%Y-%m-%d %H:%M:%S")
         
         return FileUploadResponse(
             filename=file.filename,
-            file_path=str(file_path),
-            file_size=file_size,
+            file_path=str(stored.path),
+            file_size=stored.size,
             file_type=file_extension,
             upload_time=upload_time,
-            message=f"文件 '{file.filename}' 上传成功"
+            content_hash=stored.content_hash,
+            deduplicated=stored.deduplicated,
+            message=f"文件 '{file.filename}' 已存在，复用已上传的副本" if stored.deduplicated else f"文件 '{file.filename}' 上传成功"
         )
         
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文件上传失败: {str(e)}")
 
@@ -823,130 +831,106 @@ async def process_document(request: DocumentProcessRequest):
     if not naga_agent:
         raise HTTPException(status_code=503, detail="NagaAgent未初始化")
     
+    if request.action not in ("read",) + DOCUMENT_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"不支持的操作: {request.action}")
+    
     try:
         file_path = Path(request.file_path)
         
-        if not file_path.exists():
+        if not await asyncio.to_thread(file_path.exists):
             raise HTTPException(status_code=404, detail=f"文件不存在: {request.file_path}")
         
-        # 根据文件类型和操作类型处理文档
-        if file_path.suffix.lower() == ".docx":
-            # 使用Word MCP服务处理
-            mcp_request = {
-                "service_name": "office_word_mcp",
-                "task": {
-                    "tool_name": "get_document_text",
-                    "filename": str(file_path)
-                }
+        # 提取文档文本
+        content = await _extract_document_text(file_path)
+        
+        if request.action == "read":
+            return {
+                "status": "success",
+                "action": "read",
+                "file_path": request.file_path,
+                "content": content,
+                "message": "文档内容读取成功"
             }
-            
-            # 调用MCP服务
-            result = await naga_agent.mcp.handoff(mcp_request["service_name"], mcp_request["task"])
-            
-            if request.action == "read":
-                return {
-                    "status": "success",
-                    "action": "read",
-                    "file_path": request.file_path,
-                    "content": result,
-                    "message": "文档内容读取成功"
-                }
-            elif request.action == "analyze":
-                # 让NAGA分析文档内容
-                analysis_prompt = f"请分析以下文档内容，提供结构化的分析报告：\n\n{result}"
-                analysis_result = await naga_agent.get_response(analysis_prompt)
-                
-                return {
-                    "status": "success",
-                    "action": "analyze",
-                    "file_path": request.file_path,
-                    "analysis": analysis_result,
-                    "message": "文档分析完成"
-                }
-            elif request.action == "summarize":
-                # 让NAGA总结文档内容
-                summary_prompt = f"请总结以下文档内容，提供简洁的摘要：\n\n{result}"
-                summary_result = await naga_agent.get_response(summary_prompt)
-                
-                return {
-                    "status": "success",
-                    "action": "summarize",
-                    "file_path": request.file_path,
-                    "summary": summary_result,
-                    "message": "文档总结完成"
-                }
-        else:
-            # 处理其他文件类型
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            if request.action == "read":
-                return {
-                    "status": "success",
-                    "action": "read",
-                    "file_path": request.file_path,
-                    "content": content,
-                    "message": "文档内容读取成功"
-                }
-            elif request.action == "analyze":
-                analysis_prompt = f"请分析以下文档内容，提供结构化的分析报告：\n\n{content}"
-                analysis_result = await naga_agent.get_response(analysis_prompt)
-                
-                return {
-                    "status": "success",
-                    "action": "analyze",
-                    "file_path": request.file_path,
-                    "analysis": analysis_result,
-                    "message": "文档分析完成"
-                }
-            elif request.action == "summarize":
-                summary_prompt = f"请总结以下文档内容，提供简洁的摘要：\n\n{content}"
-                summary_result = await naga_agent.get_response(summary_prompt)
-                
-                return {
-                    "status": "success",
-                    "action": "summarize",
-                    "file_path": request.file_path,
-                    "summary": summary_result,
-                    "message": "文档总结完成"
-                }
         
+        # 分块并发处理后归并，分块结果和最终结果按内容哈希缓存
+        await asyncio.to_thread(document_catalog.set_status, request.file_path, "processing", request.action)
+        try:
+            outcome = await document_pipeline.run(content, request.action)
+        except Exception as e:
+            await asyncio.to_thread(document_catalog.set_status, request.file_path, "failed", request.action, str(e))
+            raise
+        await asyncio.to_thread(document_catalog.set_status, request.file_path, "processed", request.action)
+        result_key, message = ("analysis", "文档分析完成") if request.action == "analyze" else ("summary", "文档总结完成")
+        return {
+            "status": "success",
+            "action": request.action,
+            "file_path": request.file_path,
+            result_key: outcome["result"],
+            "chunks": outcome["chunks"],
+            "cached": outcome["cached"],
+            "message": message
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"文档处理错误: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"文档处理失败: {str(e)}")
 
+async def _extract_document_text(file_path: Path) -> str:
+    """提取文档文本：Word文档交给Word MCP服务，其他文件在线程中读取"""
+    if file_path.suffix.lower() == ".docx":
+        result = await naga_agent.mcp.handoff("office_word_mcp", {
+            "tool_name": "get_document_text",
+            "filename": str(file_path)
+        })
+        return result if isinstance(result, str) else str(result)
+    return await asyncio.to_thread(file_path.read_text, encoding="utf-8")
+
+def _document_info(record: Dict) -> Dict:
+    """目录记录转为接口返回格式"""
+    return {
+        "id": record["id"],
+        "filename": record["filename"],
+        "original_name": record["original_name"],
+        "file_path": record["file_path"],
+        "file_size": record["file_size"],
+        "file_type": record["file_type"],
+        "content_hash": record["content_hash"],
+        "upload_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["upload_time"])),
+        "status": record["status"],
+        "last_action": record["last_action"],
+        "error": record["error"]
+    }
+
 @app.get("/documents/list")
-async def list_uploaded_documents():
-    """获取已上传的文档列表"""
+async def list_uploaded_documents(
+    page: int = 1,
+    page_size: int = 50,
+    sort_by: str = "upload_time",
+    order: str = "desc",
+    file_type: Optional[str] = None,
+    status: Optional[str] = None,
+    keyword: Optional[str] = None
+):
+    """获取已上传的文档列表（查询文档目录，支持分页、排序和筛选）"""
+    if sort_by not in DOCUMENT_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"不支持的排序字段: {sort_by}。支持: {', '.join(DOCUMENT_SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order只能为asc或desc")
+    page = max(1, page)
+    page_size = min(max(1, page_size), 500)
     try:
-        upload_dir = Path("uploaded_documents")
-        if not upload_dir.exists():
-            return {
-                "status": "success",
-                "documents": [],
-                "total": 0
-            }
-        
-        documents = []
-        for file_path in upload_dir.iterdir():
-            if file_path.is_file():
-                stat = file_path.stat()
-                documents.append({
-                    "filename": file_path.name,
-                    "file_path": str(file_path),
-                    "file_size": stat.st_size,
-                    "file_type": file_path.suffix.lower(),
-                    "upload_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stat.st_mtime))
-                })
-        
-        # 按上传时间排序
-        documents.sort(key=lambda x: x["upload_time"], reverse=True)
-        
+        records, total = await asyncio.to_thread(
+            document_catalog.list, page, page_size, sort_by, order == "desc", file_type, status, keyword
+        )
         return {
             "status": "success",
-            "documents": documents,
-            "total": len(documents)
+            "documents": [_document_info(record) for record in records],
+            "total": total,
+            "page": page,
+            "page_size": page_size
         }
         
     except Exception as e:
@@ -954,6 +938,23 @@ async def list_uploaded_documents():
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"获取文档列表失败: {str(e)}")
 
+@app.delete("/documents/{document_id}")
+async def delete_document(document_id: int):
+    """删除已上传的文档（文件与目录记录）"""
+    record = await asyncio.to_thread(document_catalog.remove, document_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"文档不存在: {document_id}")
+    try:
+        await asyncio.to_thread(Path(record["file_path"]).unlink, missing_ok=True)
+    except Exception as e:
+        print(f"删除文档文件失败: {e}")
+        raise HTTPException(status_code=500, detail=f"删除文档失败: {str(e)}")
+    return {
+        "status": "success",
+        "document": _document_info(record),
+        "message": f"文档 '{record['original_name']}' 已删除"
+    }
+
 if __name__ == "__main__":
     import argparse
     
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传文档目录（SQLite）
+上传、删除、处理时更新，启动时与上传目录对账；列表查询走索引，不再扫描目录
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("DocumentCatalog")
+
+DEFAULT_CATALOG_NAME = ".catalog.db"  # 放在上传目录内，以.开头，对账时跳过
+SORT_FIELDS = ("upload_time", "filename", "file_size", "file_type", "status")
+STATUSES = ("uploaded", "processing", "processed", "failed")
+PART_PREFIX = ".upload_"  # DocumentStore写入中的临时文件前缀（中断遗留的由对账清理）
+_STALE_PART_SECONDS = 3600  # 超过此时间未改名的临时文件视为中断遗留
+_COLUMNS = ("id", "filename", "original_name", "file_path", "file_size", "content_hash", "file_type",
+            "upload_time", "status", "last_action", "processed_at", "error")
+
+
+def file_hash(path: Path) -> str:
+    """计算文件内容哈希"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class DocumentCatalog:
+    """上传文档目录"""
+
+    def __init__(self, upload_dir: str = "uploaded_documents", db_path: Optional[str] = None):
+        self.upload_dir = Path(upload_dir)
+        self.db_path = db_path or str(self.upload_dir / DEFAULT_CATALOG_NAME)
+        self._lock = threading.Lock()  # sqlite连接跨线程共享，需串行化
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        """打开数据库并建表"""
+        with self._lock:
+            if self._conn is not None:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT NOT NULL UNIQUE,
+                    original_name TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    file_size INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    file_type TEXT NOT NULL,
+                    upload_time REAL NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'uploaded',
+                    last_action TEXT,
+                    processed_at REAL,
+                    error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(content_hash)")
+            for field in SORT_FIELDS:
+                if field != "filename":  # filename已有UNIQUE索引
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{field} ON documents({field})")
+            self._conn = conn
+            logger.info(f"文档目录已打开: {self.db_path}")
+
+    def close(self):
+        """关闭数据库"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---------- 写入 ----------
+
+    def add(self, path: Path, original_name: str, file_size: int, content_hash: str,
+            upload_time: Optional[float] = None) -> Dict:
+        """登记新文件（同名文件已登记时覆盖）"""
+        self.open()
+        with self._lock:
+            self._insert_locked("INSERT OR REPLACE", path, original_name, file_size, content_hash, upload_time)
+            return self._get_locked("filename = ?", (path.name,))
+
+    def _insert_locked(self, verb: str, path: Path, original_name: str, file_size: int, content_hash: str,
+                       upload_time: Optional[float] = None) -> bool:
+        """插入一条记录，返回是否写入"""
+        cursor = self._conn.execute(
+            f"{verb} INTO documents "
+            "(filename, original_name, file_path, file_size, content_hash, file_type, upload_time, status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 'uploaded')",
+            (path.name, original_name, str(path), file_size, content_hash, path.suffix.lower(),
+             upload_time if upload_time is not None else time.time())
+        )
+        return cursor.rowcount > 0
+
+    def remove(self, document_id: int) -> Optional[Dict]:
+        """删除登记，返回被删除的记录"""
+        self.open()
+        with self._lock:
+            row = self._get_locked("id = ?", (document_id,))
+            if row is not None:
+                self._conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+            return row
+
+    def set_status(self, file_path: str, status: str, action: Optional[str] = None, error: Optional[str] = None):
+        """更新处理状态"""
+        self.open()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE documents SET status = ?, last_action = COALESCE(?, last_action), error = ?, "
+                "processed_at = CASE WHEN ? IN ('processed', 'failed') THEN ? ELSE processed_at END "
+                "WHERE filename = ?",
+                (status, action, error, status, time.time(), Path(file_path).name)
+            )
+
+    # ---------- 查询 ----------
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict]:
+        """按内容哈希查找（去重用）"""
+        self.open()
+        with self._lock:
+            return self._get_locked("content_hash = ? ORDER BY id LIMIT 1", (content_hash,))
+
+    def get(self, document_id: int) -> Optional[Dict]:
+        self.open()
+        with self._lock:
+            return self._get_locked("id = ?", (document_id,))
+
+    def list(self, page: int = 1, page_size: int = 50, sort_by: str = "upload_time", descending: bool = True,
+             file_type: Optional[str] = None, status: Optional[str] = None,
+             keyword: Optional[str] = None) -> Tuple[List[Dict], int]:
+        """分页查询，返回(当前页记录, 总数)"""
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"不支持的排序字段: {sort_by}")
+        conditions, params = [], []
+        if file_type:
+            conditions.append("file_type = ?")
+            params.append(file_type.lower() if file_type.startswith(".") else f".{file_type.lower()}")
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if keyword:
+            conditions.append("(original_name LIKE ? ESCAPE '\\' OR filename LIKE ? ESCAPE '\\')")
+            pattern = "%" + keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            params.extend([pattern, pattern])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "DESC" if descending else "ASC"
+        self.open()
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM documents {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM documents {where} ORDER BY {sort_by} {order}, id {order} LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows], total
+
+    def _get_locked(self, condition: str, params: tuple) -> Optional[Dict]:
+        row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM documents WHERE {condition}", params).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    # ---------- 对账 ----------
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        与上传目录对账（启动时在后台线程执行）
+        目录中有而目录表中没有的文件补登记；文件已不存在的记录删除；大小变化的重新计算哈希
+        扫描期间可能有上传同时登记，补登记只插入仍不存在的记录，不覆盖上传写入的记录
+        """
+        self.open()
+        if not self.upload_dir.exists():
+            return {"added": 0, "removed": 0, "updated": 0}
+        with self._lock:
+            known = {name: (doc_id, size) for doc_id, name, size in
+                     self._conn.execute("SELECT id, filename, file_size FROM documents")}
+        added = updated = 0
+        present = set()
+        now = time.time()
+        for path in self.upload_dir.iterdir():
+            if not path.is_file() or path.name.startswith("."):
+                if path.name.startswith(PART_PREFIX) and now - path.stat().st_mtime > _STALE_PART_SECONDS:
+                    path.unlink(missing_ok=True)  # 上传中断遗留的临时文件
+                continue
+            present.add(path.name)
+            stat = path.stat()
+            entry = known.get(path.name)
+            if entry is None:
+                content_hash = file_hash(path)
+                with self._lock:
+                    if self._insert_locked("INSERT OR IGNORE", path, path.name, stat.st_size, content_hash,
+                                           upload_time=stat.st_mtime):
+                        added += 1
+            elif entry[1] != stat.st_size:
+                content_hash = file_hash(path)
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE documents SET file_size = ?, content_hash = ? WHERE id = ?",
+                        (stat.st_size, content_hash, entry[0])
+                    )
+                updated += 1
+        missing = [doc_id for name, (doc_id, _) in known.items() if name not in present]
+        with self._lock:
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in missing])
+            # 中断在processing状态的记录恢复为可处理
+            self._conn.execute("UPDATE documents SET status = 'uploaded' WHERE status = 'processing'")
+        result = {"added": added, "removed": len(missing), "updated": updated}
+        if any(result.values()):
+            logger.info(f"文档目录对账完成: {result}")
+        return result
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档处理流水线
+文本按token上限切块，分块并发总结/分析后逐层归并；分块结果和最终结果按内容哈希与操作缓存
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("DocumentPipeline")
+
+_CJK = re.compile(r"[⺀-鿿가-힯＀-￯]")
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;.\n])")
+_PROMPT_VERSION = "1"  # 提示词变化时递增，旧缓存自然失效
+_RETRY = object()  # 共享调用的发起者被取消，等待者需重新发起
+
+# 单段提示词（文档不超过一块时与原来一致）
+_PROMPTS = {
+    "analyze": "请分析以下文档内容，提供结构化的分析报告：\n\n{text}",
+    "summarize": "请总结以下文档内容，提供简洁的摘要：\n\n{text}",
+}
+# 分块提示词
+_MAP_PROMPTS = {
+    "analyze": "以下是一份长文档的第{index}/{total}部分。请提取这一部分的要点、关键信息和值得注意的问题，供后续汇总成完整的分析报告：\n\n{text}",
+    "summarize": "以下是一份长文档的第{index}/{total}部分。请简洁地总结这一部分的内容：\n\n{text}",
+}
+# 归并提示词
+_REDUCE_PROMPTS = {
+    "analyze": "以下是同一份文档各部分的分析要点（按原文顺序）。请据此给出对整份文档的结构化分析报告：\n\n{text}",
+    "summarize": "以下是同一份文档各部分的摘要（按原文顺序）。请据此写出整份文档简洁的摘要：\n\n{text}",
+}
+# 中间层归并提示词（部分结果太多、一次放不下时）
+_MERGE_PROMPTS = {
+    "analyze": "以下是一份文档中连续若干部分的分析要点（按原文顺序）。请合并成一份更精炼的要点，保留关键信息：\n\n{text}",
+    "summarize": "以下是一份文档中连续若干部分的摘要（按原文顺序）。请合并成一份更精炼的摘要：\n\n{text}",
+}
+OPERATIONS = tuple(_PROMPTS)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符约1个token，其余约4个字符1个token"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """按段落切块，每块不超过max_tokens；超长段落再按句子切，超长句子按长度硬切"""
+    pieces: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            while estimate_tokens(sentence) > max_tokens:
+                cut = max(1, len(sentence) * max_tokens // estimate_tokens(sentence))
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:]
+            if sentence.strip():
+                pieces.append(sentence)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """结果缓存：内存 + 磁盘JSON（按key分文件，重启后仍可命中）"""
+
+    def __init__(self, cache_dir: str = "logs/document_cache", max_memory_items: int = 512):
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_items = max_memory_items
+        self._memory: Dict[str, str] = {}
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    async def get(self, key: str) -> Optional[str]:
+        if key in self._memory:
+            return self._memory[key]
+        value = await asyncio.to_thread(self._read, self._path(key))
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    async def set(self, key: str, value: str):
+        self._remember(key, value)
+        await asyncio.to_thread(self._write, self._path(key), value)
+
+    def _remember(self, key: str, value: str):
+        if len(self._memory) >= self.max_memory_items:
+            self._memory.pop(next(iter(self._memory)))
+        self._memory[key] = value
+
+    @staticmethod
+    def _read(path: Path) -> Optional[str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["result"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"读取文档缓存失败 {path.name}: {e}")
+            return None
+
+    @staticmethod
+    def _write(path: Path, value: str):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"result": value}, f, ensure_ascii=False)
+            tmp.replace(path)
+        except Exception as e:
+            logger.warning(f"写入文档缓存失败 {path.name}: {e}")
+
+
+class DocumentPipeline:
+    """
+    长文档map-reduce处理
+    文档不超过一块时直接单次调用；否则各块并发处理（受并发上限约束），
+    部分结果按顺序拼接后归并，拼接结果仍超过一块时分组逐层归并
+    """
+
+    def __init__(self, llm: Callable[[str], Awaitable[str]], chunk_tokens: int = 3000,
+                 max_concurrency: int = 4, cache: Optional[ResultCache] = None):
+        self.llm = llm  # 调用失败时应抛出异常，失败结果不会进入缓存
+        self.chunk_tokens = chunk_tokens
+        self.max_concurrency = max_concurrency
+        self.cache = cache or ResultCache()
+        self._inflight: Dict[str, asyncio.Future] = {}  # 相同请求并发时只算一次
+
+    async def run(self, text: str, operation: str) -> Dict:
+        """
+        处理文档
+        :return: {"result": 结果, "chunks": 分块数, "cached": 是否直接命中最终结果缓存}
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"不支持的操作: {operation}")
+        key = self._key("final", operation, content_hash(text))
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return {"result": cached, "chunks": None, "cached": True}
+
+        chunks = await asyncio.to_thread(split_into_chunks, text, self.chunk_tokens)
+        if len(chunks) <= 1:
+            result = await self._call(key, _PROMPTS[operation].format(text=text.strip()))
+        else:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            partials = await asyncio.gather(*[
+                self._map(semaphore, operation, chunk, index, len(chunks))
+                for index, chunk in enumerate(chunks, 1)
+            ])
+            result = await self._reduce(semaphore, operation, list(partials))
+            await self.cache.set(key, result)
+        return {"result": result, "chunks": len(chunks), "cached": False}
+
+    async def _map(self, semaphore: asyncio.Semaphore, operation: str, chunk: str, index: int, total: int) -> str:
+        key = self._key("map", operation, content_hash(f"{index}/{total}\n{chunk}"))
+        async with semaphore:
+            return await self._call(key, _MAP_PROMPTS[operation].format(index=index, total=total, text=chunk))
+
+    async def _reduce(self, semaphore: asyncio.Semaphore, operation: str, partials: List[str]) -> str:
+        """逐层归并，直到一次调用能容纳所有部分结果"""
+        while True:
+            groups = self._group(partials)
+            if len(groups) == 1:
+                text = "\n\n".join(f"【第{i}部分】\n{p}" for i, p in enumerate(groups[0], 1))
+                return await self._call(self._key("reduce", operation, content_hash(text)),
+                                        _REDUCE_PROMPTS[operation].format(text=text))
+
+            async def reduce_group(group: List[str]) -> str:
+                text = "\n\n".join(f"【第{i}部分】\n{p}" for i, p in enumerate(group, 1))
+                async with semaphore:
+                    return await self._call(self._key("merge", operation, content_hash(text)),
+                                            _MERGE_PROMPTS[operation].format(text=text))
+
+            partials = list(await asyncio.gather(*[reduce_group(group) for group in groups]))
+
+    def _group(self, partials: List[str]) -> List[List[str]]:
+        """把部分结果按token上限分组（保持顺序，每组至少两项以保证收敛）"""
+        groups: List[List[str]] = []
+        current: List[str] = []
+        tokens = 0
+        for partial in partials:
+            size = estimate_tokens(partial)
+            if len(current) >= 2 and tokens + size > self.chunk_tokens:
+                groups.append(current)
+                current, tokens = [], 0
+            current.append(partial)
+            tokens += size
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _call(self, key: str, prompt: str) -> str:
+        """带缓存的LLM调用；相同key的并发请求共享同一次调用，发起者被取消时由等待者重新发起"""
+        while True:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            result = await asyncio.shield(future)
+            if result is not _RETRY:
+                return result
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self.llm(prompt)
+            await self.cache.set(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.set_result(_RETRY)  # 只取消发起者自己，等待者不受影响
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 没有其他等待者时不报未取回的异常
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _key(stage: str, operation: str, digest: str) -> str:
+        return hashlib.sha256(f"{_PROMPT_VERSION}:{stage}:{operation}:{digest}".encode("utf-8")).hexdigest()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传文档存储
+分块异步写盘并同时计算内容哈希，超限即停，写完后原子改名；相同内容只保存一份
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from .document_catalog import PART_PREFIX, DocumentCatalog
+
+logger = logging.getLogger("DocumentStore")
+
+ALLOWED_EXTENSIONS = {".docx", ".doc", ".txt", ".pdf", ".md"}
+CHUNK_SIZE = 1024 * 1024  # 每次读取/写入1MB
+
+
+class UploadTooLargeError(Exception):
+    """上传文件超出大小限制"""
+
+
+@dataclass
+class StoredDocument:
+    """保存结果"""
+    path: Path
+    size: int
+    content_hash: str
+    deduplicated: bool = False  # 是否复用了已有的相同文件
+    record: Optional[Dict] = None  # 目录中的记录
+
+
+class DocumentStore:
+    """上传目录管理"""
+
+    def __init__(self, catalog: DocumentCatalog, max_bytes: int = 50 * 1024 * 1024):
+        self.catalog = catalog
+        self.upload_dir = catalog.upload_dir
+        self.max_bytes = max_bytes
+        self._lock = asyncio.Lock()  # 串行化落盘与去重判断
+
+    @staticmethod
+    def safe_filename(filename: str) -> str:
+        """去掉路径部分，防止写出上传目录"""
+        name = Path(filename or "").name.strip()
+        return name or "document"
+
+    async def save_upload(self, upload) -> StoredDocument:
+        """
+        保存上传文件（fastapi.UploadFile）
+        :raises UploadTooLargeError: 超出大小限制（已写入的临时文件会被删除）
+        """
+        declared = getattr(upload, "size", None)  # 表单解析时已知的大小（旧版starlette没有此属性）
+        if declared is not None and declared > self.max_bytes:
+            raise UploadTooLargeError(f"文件大小 {declared} 字节超出限制 {self.max_bytes} 字节")
+        await asyncio.to_thread(self.upload_dir.mkdir, parents=True, exist_ok=True)
+
+        fd, part_name = tempfile.mkstemp(prefix=PART_PREFIX, suffix=".part", dir=self.upload_dir)
+        part_path = Path(part_name)
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                while True:
+                    chunk = await upload.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLargeError(f"文件大小超出限制 {self.max_bytes} 字节")
+                    # 写盘和哈希都放到线程里（大块数据的sha256会释放GIL）
+                    await asyncio.to_thread(self._write_chunk, buffer, hasher, chunk)
+                await asyncio.to_thread(self._sync, buffer)
+            return await self._commit(part_path, upload.filename, size, hasher.hexdigest())
+        except BaseException:
+            await asyncio.to_thread(self._remove, part_path)
+            raise
+
+    @staticmethod
+    def _write_chunk(buffer, hasher, chunk: bytes):
+        buffer.write(chunk)
+        hasher.update(chunk)
+
+    @staticmethod
+    def _sync(buffer):
+        buffer.flush()
+        os.fsync(buffer.fileno())
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    async def _commit(self, part_path: Path, filename: str, size: int, content_hash: str) -> StoredDocument:
+        """去重或原子改名为正式文件，并登记到文档目录"""
+        async with self._lock:
+            existing = await asyncio.to_thread(self.catalog.find_by_hash, content_hash)
+            if existing is not None and await asyncio.to_thread(os.path.exists, existing["file_path"]):
+                await asyncio.to_thread(self._remove, part_path)
+                logger.info(f"上传内容与已有文件相同，复用: {existing['filename']}")
+                return StoredDocument(Path(existing["file_path"]), size, content_hash, deduplicated=True, record=existing)
+
+            final_path = self._unique_path(f"{int(time.time())}_{self.safe_filename(filename)}")
+            await asyncio.to_thread(os.replace, part_path, final_path)
+            record = await asyncio.to_thread(self.catalog.add, final_path, self.safe_filename(filename), size, content_hash)
+            return StoredDocument(final_path, size, content_hash, record=record)
+
+    def _unique_path(self, name: str) -> Path:
+        """同一秒内上传同名的不同内容时追加序号，避免覆盖"""
+        path = self.upload_dir / name
+        counter = 1
+        while path.exists():
+            path = self.upload_dir / f"{Path(name).stem}_{counter}{Path(name).suffix}"
+            counter += 1
+        return path
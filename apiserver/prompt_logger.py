@@ -6,6 +6,8 @@ Prompt保存工具类
 import json
 import os
 import datetime
+import queue
+import threading
 from typing import List, Dict, Optional
 import logging
 
@@ -18,6 +20,9 @@ class PromptLogger:
     def __init__(self):
         self.logs_dir = "logs/prompts"
         self._ensure_directory()
+        self._queue: "queue.Queue" = queue.Queue()  # 后台写入队列
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
     
     def _ensure_directory(self):
         """确保日志目录存在"""
@@ -92,6 +97,29 @@ class PromptLogger:
         except Exception as e:
             logger.error(f"保存prompt日志失败: {e}")
     
+    def log_prompt_background(self,
+                              session_id: str,
+                              messages: List[Dict],
+                              api_response: Optional[Dict] = None,
+                              api_status: str = "unknown") -> None:
+        """
+        在后台线程记录prompt日志，立即返回
+        日志文件整读整写，放在流式请求的事件循环里会拖慢首字和每个片段；
+        单个写入线程按提交顺序写入，同一请求的sending/success记录不会乱序
+        """
+        self._queue.put((session_id, list(messages), api_response, api_status))
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="PromptLogger", daemon=True)
+                    self._writer.start()
+    
+    def _write_loop(self):
+        """后台写入线程"""
+        while True:
+            session_id, messages, api_response, api_status = self._queue.get()
+            self.log_prompt(session_id, messages, api_response, api_status)
+    
     def get_today_logs(self) -> List[Dict]:
         """获取今天的prompt日志"""
         file_path = self._get_today_file()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSE流式中继
+增量解析上游LLM的SSE字节流，提取内容增量，并编码下发给客户端的SSE帧
+"""
+
+import json
+import logging
+from typing import AsyncIterator, List, Optional
+
+try:
+    import orjson  # 更快的JSON解析（可选）
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger("SSERelay")
+
+_DONE = b"[DONE]"
+
+
+def loads(data: bytes):
+    """解析JSON（优先orjson，直接处理bytes，无需先解码为str）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class SSEDecoder:
+    """
+    增量SSE解析器
+    直接在字节缓冲区上按行切分，只有凑成完整事件时才产出data；
+    网络分包可能在任意位置切断行或UTF-8字符，残余部分留到下次feed
+    """
+
+    def __init__(self):
+        self._buffer = b""  # 未凑成完整行的字节
+        self._data: List[bytes] = []  # 当前事件的data行
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """输入一段字节，返回已完整的事件data（多行data以\\n连接）"""
+        lines = (self._buffer + chunk).split(b"\n") if self._buffer else chunk.split(b"\n")
+        self._buffer = lines.pop()  # 最后一段尚未遇到换行
+        events = []
+        for line in lines:
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            if not line:
+                # 空行：事件结束
+                if self._data:
+                    events.append(self._data[0] if len(self._data) == 1 else b"\n".join(self._data))
+                    self._data = []
+            elif line.startswith(b"data:"):
+                self._data.append(line[6:] if line.startswith(b"data: ") else line[5:])
+            # 注释行（以:开头）和event/id/retry字段对中继无用，忽略
+        return events
+
+    def flush(self) -> List[bytes]:
+        """流结束：上游没有以空行结束最后一个事件时也交出"""
+        events = self.feed(b"\n") if self._buffer else []  # 残余的\r会在这里凑成空行，结束一个事件
+        if self._data:
+            events.append(b"\n".join(self._data))
+            self._data = []
+        return events
+
+
+def _delta_content(event: bytes) -> Optional[str]:
+    """从OpenAI兼容的chunk事件中取出choices[0].delta.content"""
+    if b'"content"' not in event:
+        return None  # 角色声明、finish_reason等不含内容的事件不必解析
+    try:
+        data = loads(event)
+    except ValueError:
+        logger.debug(f"跳过无法解析的SSE事件: {event[:100]!r}")
+        return None
+    choices = data.get("choices") if isinstance(data, dict) else None
+    if not choices:
+        return None
+    delta = choices[0].get("delta") or {}
+    return delta.get("content") or None
+
+
+async def iter_content_batches(stream) -> AsyncIterator[List[str]]:
+    """
+    按网络读取批次产出内容增量：同一次读取到的多个事件作为一批，
+    调用方可以把一批对应的输出合并成一次写出（显式的刷新点）
+    :param stream: aiohttp的resp.content，按网络到达的分块读取，不等待整行
+    """
+    decoder = SSEDecoder()
+    done = False
+    async for chunk in stream.iter_any():
+        batch = []
+        for event in decoder.feed(chunk):
+            if event == _DONE:
+                done = True
+                break
+            content = _delta_content(event)
+            if content:
+                batch.append(content)
+        if batch:
+            yield batch
+        if done:
+            return
+    batch = [content for content in map(_delta_content, decoder.flush()) if content]
+    if batch:
+        yield batch
+
+
+async def iter_content_deltas(stream) -> AsyncIterator[str]:
+    """逐个产出上游流中的内容增量"""
+    async for batch in iter_content_batches(stream):
+        for content in batch:
+            yield content
+
+
+def sse_frame(text: str) -> bytes:
+    """编码一个下发给客户端的SSE帧（保持原有 data: 文本 的格式）"""
+    return b"data: " + text.encode("utf-8") + b"\n\n"
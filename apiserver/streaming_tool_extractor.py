@@ -24,9 +24,12 @@ except ImportError:
     from config import config, AI_NAME
 
 from .tool_call_utils import parse_tool_calls, execute_tool_calls
+from voice.output.handle_text import SpeechSegmenter
 
 logger = logging.getLogger("StreamingToolCallExtractor")
 
+_BRACE_SPLIT = re.compile(r"([{｛}｝])")  # 工具调用括号（中英文）
+
 class CallbackManager:
     """回调函数管理器 - 统一处理同步/异步回调"""
     
@@ -68,8 +71,7 @@ class StreamingToolCallExtractor:
         self.is_in_tool_call = False  # 是否在工具调用中
         self.brace_count = 0  # 括号计数
         self.mcp_manager = mcp_manager
-        self.text_buffer = ""  # 普通文本缓冲区
-        self.sentence_endings = r"[。？！；\.\?\!\;]"  # 断句标点
+        self.segmenter = SpeechSegmenter()  # 增量断句（普通文本缓冲区）
         
         # 使用回调管理器
         self.callback_manager = CallbackManager()
@@ -83,7 +85,9 @@ class StreamingToolCallExtractor:
     def set_callbacks(self, 
                      on_text_chunk: Optional[Callable] = None,
                      on_sentence: Optional[Callable] = None,
+                     on_tool_call: Optional[Callable] = None,
                      on_tool_result: Optional[Callable] = None,
+                     on_text_delta: Optional[Callable] = None,
                      voice_integration=None,
                      tool_calls_queue=None,
                      tool_call_detected_signal=None):
@@ -91,7 +95,9 @@ class StreamingToolCallExtractor:
         # 注册回调函数
         self.callback_manager.register_callback("text_chunk", on_text_chunk)
         self.callback_manager.register_callback("sentence", on_sentence)
+        self.callback_manager.register_callback("tool_call", on_tool_call)
         self.callback_manager.register_callback("tool_result", on_tool_result)
+        self.callback_manager.register_callback("text_delta", on_text_delta)  # 工具调用之外的原始增量，不等断句
         
         self.voice_integration = voice_integration
         self.tool_calls_queue = tool_calls_queue
@@ -104,26 +110,29 @@ class StreamingToolCallExtractor:
             
         results = []
         
-        for char in text_chunk:
-            if char in '{｛':  # 检测到开始括号
+        # 按括号切分：括号之间的普通文本整段交给断句器，不再逐字符拼接和匹配
+        for piece in _BRACE_SPLIT.split(text_chunk):
+            if not piece:
+                continue
+            if piece in '{｛':  # 检测到开始括号
                 if not self.is_in_tool_call:
                     # 开始工具调用，先处理累积的普通文本
-                    if self.text_buffer:
+                    if self.segmenter.buffer:
                         result = await self._flush_text_buffer()
                         if result:
                             results.append(result)
                     
                     self.is_in_tool_call = True
-                    self.tool_call_buffer = char
+                    self.tool_call_buffer = piece
                     self.brace_count = 1
                 else:
                     # 嵌套括号
-                    self.tool_call_buffer += char
+                    self.tool_call_buffer += piece
                     self.brace_count += 1
                     
-            elif char in '}｝':  # 检测到结束括号
+            elif piece in '}｝':  # 检测到结束括号
                 if self.is_in_tool_call:
-                    self.tool_call_buffer += char
+                    self.tool_call_buffer += piece
                     self.brace_count -= 1
                     
                     if self.brace_count == 0:  # 工具调用结束
@@ -133,58 +142,57 @@ class StreamingToolCallExtractor:
                         self.is_in_tool_call = False
                         
                         # 处理工具调用 - 只提取，不执行
-                        result = await self._extract_tool_call(tool_call)
-                        if result:
-                            results.append(result)
+                        extracted = await self._extract_tool_call(tool_call)
+                        if extracted:
+                            # 确实解析出工具调用才回调（流式接口据此下发提示），普通花括号文本不触发
+                            result = await self.callback_manager.call_callback(
+                                "tool_call", tool_call, "tool_call"
+                            )
+                            if result:
+                                results.append(result)
+                            results.append(extracted)
                         
-            else:  # 普通字符
-                if self.is_in_tool_call:
-                    self.tool_call_buffer += char
-                else:
-                    # 普通文本，累积到缓冲区
-                    self.text_buffer += char
+            elif self.is_in_tool_call:
+                self.tool_call_buffer += piece
+            else:
+                # 普通文本增量原样转发（流式接口据此即时下发，不等整句）
+                if self.callback_manager.callbacks.get("text_delta"):
+                    result = await self.callback_manager.call_callback("text_delta", piece, "delta")
+                    if result:
+                        results.append(result)
+                
+                # 切出已完整的句子
+                for complete_sentence in self.segmenter.feed(piece):
+                    # 发送文本块回调（用于前端显示）
+                    result = await self.callback_manager.call_callback(
+                        "text_chunk", complete_sentence, "chunk"
+                    )
+                    if result:
+                        results.append(result)
+                    
+                    # 发送句子回调（用于其他处理）
+                    await self.callback_manager.call_callback(
+                        "sentence", complete_sentence, "sentence"
+                    )
                     
-                    # 检查是否形成完整句子
-                    if re.search(self.sentence_endings, char):
-                        # 提取完整句子
-                        sentences = re.split(self.sentence_endings, self.text_buffer)
-                        if len(sentences) > 1:
-                            complete_sentence = sentences[0] + char  # 包含标点
-                            if complete_sentence.strip():
-                                # 发送文本块回调（用于前端显示）
-                                result = await self.callback_manager.call_callback(
-                                    "text_chunk", complete_sentence, "chunk"
-                                )
-                                if result:
-                                    results.append(result)
-                                
-                                # 发送句子回调（用于其他处理）
-                                await self.callback_manager.call_callback(
-                                    "sentence", complete_sentence, "sentence"
-                                )
-                                
-                                # 发送到语音集成（普通文本，非工具调用）
-                                await self._send_to_voice_integration(complete_sentence)
-                            
-                            # 更新缓冲区，过滤空字符串
-                            remaining_sentences = [s for s in sentences[1:] if s.strip()]
-                            self.text_buffer = "".join(remaining_sentences)
+                    # 发送到语音集成（普通文本，非工具调用）
+                    await self._send_to_voice_integration(complete_sentence)
         
         # 返回所有结果
         return results
     
     async def _flush_text_buffer(self):
         """刷新文本缓冲区"""
-        if self.text_buffer:
+        text = self.segmenter.flush()
+        if text:
             # 发送文本块
             result = await self.callback_manager.call_callback(
-                "text_chunk", self.text_buffer, "chunk"
+                "text_chunk", text, "chunk"
             )
             
             # 发送到语音集成（普通文本，非工具调用）
-            await self._send_to_voice_integration(self.text_buffer)
+            await self._send_to_voice_integration(text)
             
-            self.text_buffer = ""
             return result
         return None
     
@@ -192,12 +200,7 @@ class StreamingToolCallExtractor:
         """发送文本到语音集成"""
         if self.voice_integration:
             try:
-                import threading
-                threading.Thread(
-                    target=self.voice_integration.receive_text_chunk,
-                    args=(text,),
-                    daemon=True
-                ).start()
+                self.voice_integration.receive_text_chunk(text)  # 只入分发队列，不在流式热路径上创建线程
             except Exception as e:
                 logger.error(f"语音集成错误: {e}")
     
@@ -241,7 +244,7 @@ class StreamingToolCallExtractor:
         results = []
         
         # 处理剩余的文本
-        if self.text_buffer:
+        if self.segmenter.buffer:
             result = await self._flush_text_buffer()
             if result:
                 results.append(result)
@@ -258,7 +261,7 @@ class StreamingToolCallExtractor:
         self.tool_call_buffer = ""
         self.is_in_tool_call = False
         self.brace_count = 0
-        self.text_buffer = ""
+        self.segmenter.reset()
 
 class StreamingResponseProcessor:
     """流式响应处理器 - 集成工具调用提取和文本处理"""
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebSocket广播中心
+每条消息只序列化一次；每个连接有独立的有界发送队列和写协程，慢客户端不影响其他连接
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+logger = logging.getLogger("WebSocketHub")
+
+# 慢客户端处理策略（发送队列满时）
+DROP_OLDEST = "drop_oldest"  # 丢弃最旧的待发消息
+DISCONNECT = "disconnect"  # 断开该连接
+SLOW_CONSUMER_POLICIES = (DROP_OLDEST, DISCONNECT)
+
+
+class _Connection:
+    """单个连接的发送队列、写协程和统计"""
+
+    def __init__(self, websocket: WebSocket, connection_id: int):
+        self.websocket = websocket
+        self.id = connection_id
+        self.queue: Deque[Tuple[int, str, float]] = deque()  # (序号, 内容, 入队时间)
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.connected_at = time.time()
+
+        # 统计
+        self.sent = 0  # 已发送条数
+        self.dropped = 0  # 丢弃条数
+        self.last_sent_seq = 0  # 最近发送的广播序号
+        self.last_delay = 0.0  # 最近一条从入队到发出的耗时（秒）
+        self.max_delay = 0.0  # 最大耗时（秒）
+
+
+class WebSocketHub:
+    """
+    WebSocket连接管理与广播
+    broadcast只做一次序列化并放入各连接的队列后立即返回；每个连接由自己的写协程按序发送，
+    发送超时视为卡死并断开。队列满时按策略处理：丢弃最旧或断开
+    """
+
+    def __init__(self, queue_size: int = 64, policy: str = DROP_OLDEST, send_timeout: float = 10.0):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"未知的慢客户端策略: {policy}")
+        self.queue_size = queue_size  # 每个连接的待发上限
+        self.policy = policy
+        self.send_timeout = send_timeout  # 单条发送超时（秒）
+        self._connections: Dict[WebSocket, _Connection] = {}
+        self._seq = 0  # 广播序号
+        self._next_id = 0
+        self.disconnected_slow = 0  # 因过慢被断开的连接数
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self._connections)
+
+    async def connect(self, websocket: WebSocket):
+        """接受连接并启动写协程"""
+        await websocket.accept()
+        self._next_id += 1
+        connection = _Connection(websocket, self._next_id)
+        connection.last_sent_seq = self._seq  # 连接之前的广播不计入滞后
+        connection.task = asyncio.create_task(self._writer(connection))
+        self._connections[websocket] = connection
+
+    def disconnect(self, websocket: WebSocket):
+        """移除连接（可重复调用）"""
+        connection = self._connections.pop(websocket, None)
+        if connection is None:
+            return
+        connection.closed = True
+        connection.queue.clear()
+        if connection.task and connection.task is not asyncio.current_task():
+            connection.task.cancel()
+
+    @staticmethod
+    def _serialize(message: Union[str, Dict[str, Any]]) -> str:
+        if isinstance(message, str):
+            return message
+        return json.dumps(message, ensure_ascii=False)
+
+    async def send_personal_message(self, message: Union[str, Dict[str, Any]], websocket: WebSocket):
+        """发给单个连接（与广播共用该连接的队列，保持顺序）"""
+        connection = self._connections.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, 0, self._serialize(message))
+
+    async def broadcast(self, message: Union[str, Dict[str, Any]]):
+        """广播消息，只序列化一次，入队后立即返回"""
+        self.publish(message)
+
+    def publish(self, message: Union[str, Dict[str, Any]]) -> int:
+        """broadcast的同步版本（须在事件循环线程调用），返回广播序号"""
+        payload = self._serialize(message)
+        self._seq += 1
+        for connection in list(self._connections.values()):
+            self._enqueue(connection, self._seq, payload)
+        return self._seq
+
+    def _enqueue(self, connection: _Connection, seq: int, payload: str):
+        queue = connection.queue
+        if len(queue) >= self.queue_size:
+            if self.policy == DISCONNECT:
+                self._drop_connection(connection, "发送队列已满")
+                return
+            queue.popleft()
+            connection.dropped += 1
+        queue.append((seq, payload, time.monotonic()))
+        connection.wakeup.set()
+
+    def _drop_connection(self, connection: _Connection, reason: str):
+        """断开过慢或卡死的连接"""
+        if connection.closed:
+            return
+        logger.warning(f"断开WebSocket连接#{connection.id}: {reason}，积压{len(connection.queue)}条")
+        self.disconnected_slow += 1
+        self.disconnect(connection.websocket)
+        asyncio.create_task(self._close(connection.websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=1008)
+        except Exception:
+            pass
+
+    async def _writer(self, connection: _Connection):
+        """连接的写协程：按序发送队列中的消息"""
+        try:
+            while not connection.closed:
+                if not connection.queue:
+                    connection.wakeup.clear()
+                    await connection.wakeup.wait()
+                    continue
+                seq, payload, enqueued_at = connection.queue.popleft()
+                try:
+                    await asyncio.wait_for(connection.websocket.send_text(payload), self.send_timeout)
+                except asyncio.TimeoutError:
+                    self._drop_connection(connection, f"发送超时{self.send_timeout}秒")
+                    return
+                except Exception as e:
+                    logger.debug(f"WebSocket连接#{connection.id}发送失败: {e}")
+                    self.disconnect(connection.websocket)
+                    return
+                connection.sent += 1
+                if seq:
+                    connection.last_sent_seq = seq
+                connection.last_delay = time.monotonic() - enqueued_at
+                connection.max_delay = max(connection.max_delay, connection.last_delay)
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """各连接的积压和滞后情况"""
+        now = time.monotonic()
+        connections = []
+        for connection in self._connections.values():
+            oldest = connection.queue[0][2] if connection.queue else None
+            connections.append({
+                "id": connection.id,
+                "connected_at": connection.connected_at,
+                "pending": len(connection.queue),
+                "lag_messages": self._seq - connection.last_sent_seq,  # 落后的广播条数
+                "lag_seconds": round(now - oldest, 3) if oldest is not None else 0.0,  # 最旧待发消息已等待的时间
+                "last_delay": round(connection.last_delay, 3),
+                "max_delay": round(connection.max_delay, 3),
+                "sent": connection.sent,
+                "dropped": connection.dropped,
+            })
+        return {
+            "policy": self.policy,
+            "queue_size": self.queue_size,
+            "broadcasts": self._seq,
+            "disconnected_slow": self.disconnected_slow,
+            "connections": connections,
+        }
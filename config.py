@@ -6,7 +6,7 @@ NagaAgent 配置系统 - 基于Pydantic实现类型安全和验证
 import os
 import json
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Callable
+from typing import Optional, List, Dict, Any, Callable, Literal
 from pydantic import BaseModel, Field, field_validator
 
 # AI名称常量 - 写死避免异步加载问题
@@ -86,6 +86,23 @@ class APIServerConfig(BaseModel):
     port: int = Field(default=8000, ge=1, le=65535, description="API服务器端口")
     auto_start: bool = Field(default=True, description="启动时自动启动API服务器")
     docs_enabled: bool = Field(default=True, description="是否启用API文档")
+    ws_queue_size: int = Field(default=64, ge=1, le=10000, description="WebSocket每个连接的待发消息上限")
+    ws_slow_consumer_policy: Literal["drop_oldest", "disconnect"] = Field(default="drop_oldest", description="WebSocket发送队列满时的处理策略")
+    ws_send_timeout: float = Field(default=10.0, gt=0.0, le=300.0, description="WebSocket单条消息发送超时（秒），超时断开")
+    max_upload_mb: int = Field(default=50, ge=1, le=2048, description="上传文档大小上限（MB）")
+    doc_chunk_tokens: int = Field(default=3000, ge=200, le=100000, description="文档分块处理时每块的token上限")
+    doc_max_concurrency: int = Field(default=4, ge=1, le=32, description="文档分块并发处理数")
+
+class RateLimitConfig(BaseModel):
+    """LLM调用全局限流配置"""
+    enabled: bool = Field(default=True, description="是否启用LLM调用全局限流")
+    requests_per_second: float = Field(default=3.0, gt=0.0, le=1000.0, description="每个接口的平均请求速率（次/秒）")
+    burst: float = Field(default=6.0, ge=1.0, le=1000.0, description="令牌桶容量（允许的突发请求数）")
+    max_concurrent: int = Field(default=6, ge=1, le=256, description="每个接口的最大并发请求数")
+    endpoints: Dict[str, Dict[str, float]] = Field(
+        default_factory=dict,
+        description="按接口(host:port)覆盖的限流参数，如 {\"api.deepseek.com\": {\"requests_per_second\": 5}}"
+    )
 
 class GRAGConfig(BaseModel):
     """GRAG知识图谱记忆系统配置"""
@@ -100,6 +117,15 @@ class GRAGConfig(BaseModel):
     extraction_timeout: int = Field(default=12, ge=1, le=60, description="知识提取超时时间（秒）")
     extraction_retries: int = Field(default=2, ge=0, le=5, description="知识提取重试次数")
     base_timeout: int = Field(default=15, ge=5, le=120, description="基础操作超时时间（秒）")
+    max_workers: int = Field(default=3, ge=1, le=16, description="五元组提取最大并发工作协程数")
+    min_workers: int = Field(default=1, ge=1, le=16, description="五元组提取最小工作协程数")
+    max_queue_size: int = Field(default=1000, ge=1, le=100000, description="持久化提取队列最大积压任务数")
+    task_timeout: int = Field(default=30, ge=5, le=600, description="单个提取任务超时时间（秒）")
+    auto_cleanup_hours: int = Field(default=24, ge=1, le=720, description="已完成任务保留时长（小时）")
+    queue_db_path: str = Field(default="logs/knowledge_graph/extraction_queue.db", description="持久化提取队列数据库路径")
+    queue_drain_target: float = Field(default=30.0, ge=1.0, le=3600.0, description="期望消化积压的时间（秒），用于自动调整工作协程数")
+    graph_view_max_nodes: int = Field(default=2000, ge=0, le=200000, description="心智云图最多展示的节点数（0为不裁剪）")
+    graph_view_prune_by: str = Field(default="degree", description="心智云图裁剪方式：degree按度数，recency按新近度")
 
 class HandoffConfig(BaseModel):
     """工具调用循环配置"""
@@ -134,6 +160,12 @@ class TTSConfig(BaseModel):
     remove_filter: bool = Field(default=False, description="是否移除过滤")
     expand_api: bool = Field(default=True, description="是否扩展API")
     require_api_key: bool = Field(default=False, description="是否需要API密钥")
+    engine_timeout: float = Field(default=30.0, gt=0, description="合成引擎等待下一音频块的超时（秒）")
+    transcoder_prewarm: bool = Field(default=True, description="启动时为默认格式预热一个ffmpeg转码进程")
+    cache_enabled: bool = Field(default=True, description="是否缓存合成音频（按文本/音色/语速/格式寻址）")
+    cache_memory_mb: int = Field(default=32, ge=0, description="内存缓存上限MB")
+    cache_disk_mb: int = Field(default=512, ge=0, description="磁盘缓存上限MB")
+    cache_dir: str = Field(default="logs/tts_cache", description="磁盘缓存目录")
 
 class ASRConfig(BaseModel):
     """ASR输入服务配置"""
@@ -144,9 +176,17 @@ class ASRConfig(BaseModel):
     resample_to: int = Field(default=16000, description="重采样目标采样率")
     vad_threshold: float = Field(default=0.7, ge=0.0, le=1.0, description="VAD阈值")
     silence_ms: int = Field(default=420, description="静音结束阈值ms")
+    vad_speech_pad_ms: int = Field(default=300, ge=0, description="语音段前后填充ms")
+    vad_min_speech_ms: int = Field(default=250, ge=0, description="短于该时长的语音段丢弃ms")
+    vad_batch_size: int = Field(default=32, ge=1, description="跨连接VAD批量推理上限")
+    vad_batch_wait_ms: float = Field(default=5.0, ge=0, description="VAD批量收集等待ms")
     noise_reduce: bool = Field(default=True, description="是否降噪")
     engine: str = Field(default="local_funasr", description="ASR引擎，仅支持local_funasr")
     local_model_path: str = Field(default="./utilss/models/SenseVoiceSmall", description="本地FunASR模型路径")
+    engine_workers: int = Field(default=2, ge=1, le=8, description="常驻识别worker数，每个worker持有一份模型")
+    engine_queue_size: int = Field(default=8, ge=1, description="识别请求排队上限，超出时拒绝（背压）")
+    engine_timeout: float = Field(default=30.0, gt=0, description="单次识别等待超时（秒）")
+    engine_warmup: bool = Field(default=True, description="模型加载后是否预热")
     vad_model_path: str = Field(default="silero_vad.onnx", description="VAD模型路径")
     api_key_required: bool = Field(default=False, description="是否需要API密钥")
     callback_url: str | None = Field(default=None, description="识别结果回调地址")
@@ -332,6 +372,7 @@ class NagaConfig(BaseModel):
     system: SystemConfig = Field(default_factory=SystemConfig)
     api: APIConfig = Field(default_factory=APIConfig)
     api_server: APIServerConfig = Field(default_factory=APIServerConfig)
+    rate_limit: RateLimitConfig = Field(default_factory=RateLimitConfig)
     grag: GRAGConfig = Field(default_factory=GRAGConfig)
     handoff: HandoffConfig = Field(default_factory=HandoffConfig)
     browser: BrowserConfig = Field(default_factory=BrowserConfig)
@@ -16,6 +16,7 @@ from openai import AsyncOpenAI
 # 本地模块导入
 from apiserver.tool_call_utils import tool_call_loop
 from config import config, AI_NAME
+from llm_rate_limiter import get_rate_limiter, Priority
 from mcpserver.mcp_manager import get_mcp_manager
 from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
 # from thinking import TreeThinkingEngine
@@ -507,12 +508,11 @@ class NagaConversation: # 对话主类
 
             print(f"GTP请求发送：{now()}")  # AI请求前
             
-            # 禁用非线性思考判断
-            # thinking_task = None
-            # if hasattr(self, 'tree_thinking') and self.tree_thinking and getattr(self.tree_thinking, 'is_enabled', False):
-            #     # 启动异步思考判断任务
-            #     import asyncio
-            #     thinking_task = asyncio.create_task(self._async_thinking_judgment(u))
+            # 非线性思考判断（树状思考系统默认未初始化，此时不启动）
+            thinking_task = None
+            if self.tree_thinking and getattr(self.tree_thinking, 'is_enabled', False):
+                # 启动异步思考判断任务，与正常回复并行
+                thinking_task = asyncio.create_task(self._async_thinking_judgment(u))
             
             # 流式处理：实时检测工具调用，使用统一的工具调用循环
             try:
@@ -558,40 +558,23 @@ class NagaConversation: # 对话主类
                     tool_calls_queue=tool_calls_queue
                 )
                 
-                # 调用LLM API - 流式模式
-                resp = await self.async_client.chat.completions.create(
-                    model=config.api.model,
-                    messages=msgs,
-                    temperature=config.api.temperature,
-                    max_tokens=config.api.max_tokens,
-                    stream=True
-                )
-                
-                # 处理流式响应
-                async for chunk in resp:
-                    # 安全检查：确保chunk.choices不为空且有内容
-                    if (chunk.choices and 
-                        len(chunk.choices) > 0 and 
-                        hasattr(chunk.choices[0], 'delta') and 
-                        chunk.choices[0].delta.content):
-                        content = chunk.choices[0].delta.content
-                        # 使用流式工具调用提取器处理内容
-                        results = await tool_extractor.process_text_chunk(content)
-                        if results:
-                            for result in results:
-                                if isinstance(result, tuple) and len(result) == 2:
-                                    yield result
-                                elif isinstance(result, str):
-                                    yield (AI_NAME, result)
+                # 调用LLM API - 流式模式（交互优先级，优先于后台提取任务）
+                async with get_rate_limiter().limit(config.api.base_url, Priority.INTERACTIVE):
+                    resp = await self.async_client.chat.completions.create(
+                        model=config.api.model,
+                        messages=msgs,
+                        temperature=config.api.temperature,
+                        max_tokens=config.api.max_tokens,
+                        stream=True
+                    )
+                    
+                    # 处理流式响应（读完流后才归还并发名额）
+                    async for result in self._relay_through_extractor(self._completion_deltas(resp), tool_extractor):
+                        yield result
                 
                 # 完成处理
-                final_results = await tool_extractor.finish_processing()
-                if final_results:
-                    for result in final_results:
-                        if isinstance(result, tuple) and len(result) == 2:
-                            yield result
-                        elif isinstance(result, str):
-                            yield (AI_NAME, result)
+                for result in self._speaker_results(await tool_extractor.finish_processing()):
+                    yield result
                 
                 # 检查是否有工具调用需要处理
                 if not tool_calls_queue.empty():
@@ -618,43 +601,48 @@ class NagaConversation: # 对话主类
                         
                         # 调用LLM继续处理工具结果
                         try:
-                            resp2 = await self.async_client.chat.completions.create(
-                                model=config.api.model,
-                                messages=tool_messages,
-                                temperature=config.api.temperature,
-                                max_tokens=config.api.max_tokens,
-                                stream=True
-                            )
-                            
-                            # 处理LLM的继续响应 - 也需要通过流式工具调用提取器处理
-                            async for chunk in resp2:
-                                # 安全检查：确保chunk.choices不为空且有内容
-                                if (chunk.choices and 
-                                    len(chunk.choices) > 0 and 
-                                    hasattr(chunk.choices[0], 'delta') and 
-                                    chunk.choices[0].delta.content):
-                                    content = chunk.choices[0].delta.content
-                                    # 使用流式工具调用提取器处理内容
-                                    results = await tool_extractor.process_text_chunk(content)
-                                    if results:
-                                        for result in results:
-                                            if isinstance(result, tuple) and len(result) == 2:
-                                                yield result
-                                            elif isinstance(result, str):
-                                                yield (AI_NAME, result)
-                                    
-                                    # 注意：文本内容通过 on_text_chunk 回调函数已经累积到 display_text 中
+                            async with get_rate_limiter().limit(config.api.base_url, Priority.INTERACTIVE):
+                                resp2 = await self.async_client.chat.completions.create(
+                                    model=config.api.model,
+                                    messages=tool_messages,
+                                    temperature=config.api.temperature,
+                                    max_tokens=config.api.max_tokens,
+                                    stream=True
+                                )
+                                
+                                # 处理LLM的继续响应 - 也需要通过流式工具调用提取器处理
+                                # 注意：文本内容通过 on_text_chunk 回调函数已经累积到 display_text 中
+                                async for result in self._relay_through_extractor(self._completion_deltas(resp2), tool_extractor):
+                                    yield result
                         except Exception as e:
                             print(f"LLM继续处理工具结果失败: {e}")
                 
                 # 完成所有处理，获取最终的纯文本内容
-                final_results = await tool_extractor.finish_processing()
-                if final_results:
-                    for result in final_results:
-                        if isinstance(result, tuple) and len(result) == 2:
+                for result in self._speaker_results(await tool_extractor.finish_processing()):
+                    yield result
+                
+                # 思考判断认为问题较复杂时，追加深度思考的答案（同样经提取器流式下发）
+                if thinking_task is not None:
+                    should_think = False
+                    try:
+                        # 等待思考判断完成（最多等待3秒）
+                        should_think = await asyncio.wait_for(thinking_task, timeout=3.0)
+                    except asyncio.TimeoutError:
+                        # 超时取消任务（wait_for已取消）
+                        pass
+                    except Exception as e:
+                        logger.debug(f"思考判断任务异常: {e}")
+                    if should_think:
+                        yield (AI_NAME, "\n💡 这个问题较为复杂，下面我会更详细地解释这个流程...\n")
+                        display_text += "\n\n"
+                        try:
+                            async for result in self._stream_deep_thinking(u, tool_extractor):
+                                yield result
+                        except Exception as e:
+                            logger.error(f"深度思考处理失败: {e}")
+                            yield (AI_NAME, f"🌳 深度思考系统出错: {str(e)}")
+                        for result in self._speaker_results(await tool_extractor.finish_processing()):
                             yield result
-                        elif isinstance(result, str):
-                            yield (AI_NAME, result)
                 
                 # 保存对话历史（使用前端显示的纯文本）
                 print(f"[DEBUG] 最终display_text长度: {len(display_text)}")
@@ -670,41 +658,9 @@ class NagaConversation: # 对话主类
                     except Exception as e:
                         logger.error(f"GRAG记忆存储失败: {e}")
                 
-                # 禁用异步思考判断结果检查
-                # if thinking_task and not thinking_task.done():
-                #     # 等待思考判断完成（最多等待3秒）
-                #     try:
-                #         await asyncio.wait_for(thinking_task, timeout=3.0)
-                #         if thinking_task.result():
-                #             yield ("娜迦", "\n💡 这个问题较为复杂，下面我会更详细地解释这个流程...")
-                #             # 启动深度思考
-                #             try:
-                #                 thinking_result = await self.tree_thinking.think_deeply(u)
-                #                 if thinking_result and "answer" in thinking_result:
-                #                     # 直接使用thinking系统的结果，避免重复处理
-                #                     yield ("娜迦", f"\n{thinking_result['answer']}")
-                #                     
-                #                     # 更新对话历史
-                #                     final_thinking_answer = thinking_result['answer']
-                #                     self.messages[-1] = {"role": "assistant", "content": final_content + "\n\n" + final_thinking_answer}
-                #                     self.save_log(u, final_content + "\n\n" + final_thinking_answer)
-                #                     
-                #                     # GRAG记忆存储（开发者模式不写入）
-                #                     if self.memory_manager and not self.dev_mode:
-                #                         try:
-                #                             await self.memory_manager.add_conversation_memory(u, final_content + "\n\n" + final_thinking_answer)
-                #                         except Exception as e:
-                #                             logger.error(f"GRAG记忆存储失败: {e}")
-                #             except Exception as e:
-                #                 logger.error(f"深度思考处理失败: {e}")
-                #                 yield ("娜迦", f"🌳 深度思考系统出错: {str(e)}")
-                #     except asyncio.TimeoutError:
-                #         # 超时取消任务
-                #         thinking_task.cancel()
-                #     except Exception as e:
-                #         logger.debug(f"思考判断任务异常: {e}")
-                
             except Exception as e:
+                if thinking_task is not None:
+                    thinking_task.cancel()
                 print(f"工具调用循环失败: {e}")
                 yield (AI_NAME, f"[MCP异常]: {e}")
                 return
@@ -717,27 +673,70 @@ class NagaConversation: # 对话主类
             yield (AI_NAME, f"[MCP异常]: {e}")
             return
 
+    @staticmethod
+    async def _completion_deltas(resp):
+        """从OpenAI流式响应中取出内容增量"""
+        async for chunk in resp:
+            # 安全检查：确保chunk.choices不为空且有内容
+            if (chunk.choices and 
+                len(chunk.choices) > 0 and 
+                hasattr(chunk.choices[0], 'delta') and 
+                chunk.choices[0].delta.content):
+                yield chunk.choices[0].delta.content
+
+    @staticmethod
+    def _speaker_results(results):
+        """把提取器返回的结果统一为(说话人, 文本)"""
+        for result in results or ():
+            if isinstance(result, tuple) and len(result) == 2:
+                yield result
+            elif isinstance(result, str):
+                yield (AI_NAME, result)
+
+    async def _relay_through_extractor(self, deltas, tool_extractor):
+        """把内容增量交给流式工具调用提取器，产出前端显示的(说话人, 文本)"""
+        async for content in deltas:
+            for result in self._speaker_results(await tool_extractor.process_text_chunk(content)):
+                yield result
+
+    async def _stream_deep_thinking(self, question: str, tool_extractor):
+        """
+        树状深度思考，流式产出
+        阶段事件以(PHASE_SPEAKER, 事件)产出供前端显示进度；最终答案的增量与正常回复一样经过提取器
+        """
+        from thinking.tree_thinking import PHASE_SPEAKER
+
+        async for event in self.tree_thinking.think_deeply_stream(question):
+            if event["type"] == "phase":
+                yield (PHASE_SPEAKER, event)
+            elif event["type"] == "delta":
+                for result in self._speaker_results(await tool_extractor.process_text_chunk(event["content"])):
+                    yield result
+
     async def get_response(self, prompt: str, temperature: float = 0.7) -> str:
         """为树状思考系统等提供API调用接口""" # 统一接口
+        limiter = get_rate_limiter()
         try:
-            response = await self.async_client.chat.completions.create(
-                model=config.api.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=temperature,
-                max_tokens=config.api.max_tokens
-            )
-            return response.choices[0].message.content
-        except RuntimeError as e:
-            if "handler is closed" in str(e):
-                logger.debug(f"忽略连接关闭异常，重新创建客户端: {e}")
-                # 重新创建客户端并重试
-                self.async_client = AsyncOpenAI(api_key=config.api.api_key, base_url=config.api.base_url.rstrip('/') + '/')
+            async with limiter.limit(config.api.base_url, Priority.NORMAL):
                 response = await self.async_client.chat.completions.create(
                     model=config.api.model,
                     messages=[{"role": "user", "content": prompt}],
                     temperature=temperature,
                     max_tokens=config.api.max_tokens
                 )
+            return response.choices[0].message.content
+        except RuntimeError as e:
+            if "handler is closed" in str(e):
+                logger.debug(f"忽略连接关闭异常，重新创建客户端: {e}")
+                # 重新创建客户端并重试
+                self.async_client = AsyncOpenAI(api_key=config.api.api_key, base_url=config.api.base_url.rstrip('/') + '/')
+                async with limiter.limit(config.api.base_url, Priority.NORMAL):
+                    response = await self.async_client.chat.completions.create(
+                        model=config.api.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature,
+                        max_tokens=config.api.max_tokens
+                    )
                 return response.choices[0].message.content
             else:
                 logger.error(f"API调用失败: {e}")
@@ -746,33 +745,49 @@ class NagaConversation: # 对话主类
             logger.error(f"API调用失败: {e}")
             return f"API调用出错: {str(e)}"
 
-    # async def _async_thinking_judgment(self, question: str) -> bool:
-    #     """异步判断问题是否需要深度思考
+    async def get_response_stream(self, prompt: str, temperature: float = 0.7):
+        """
+        流式API调用接口，逐段产出内容增量（树状思考的最终答案等面向用户的输出）
+        出错时抛出异常，由调用方决定如何降级
+        """
+        async with get_rate_limiter().limit(config.api.base_url, Priority.INTERACTIVE):
+            resp = await self.async_client.chat.completions.create(
+                model=config.api.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=config.api.max_tokens,
+                stream=True
+            )
+            async for content in self._completion_deltas(resp):
+                yield content
+
+    async def _async_thinking_judgment(self, question: str) -> bool:
+        """异步判断问题是否需要深度思考
         
-    #     Args:
-    #         question: 用户问题
+        Args:
+            question: 用户问题
             
-    #     Returns:
-    #         bool: 是否需要深度思考
-    #     """
-    #     try:
-    #         if not self.tree_thinking:
-    #             return False
+        Returns:
+            bool: 是否需要深度思考
+        """
+        try:
+            if not self.tree_thinking:
+                return False
             
-    #         # 使用thinking文件夹中现成的难度判断器
-    #         difficulty_assessment = await self.tree_thinking.difficulty_judge.assess_difficulty(question)
-    #         difficulty = difficulty_assessment.get("difficulty", 3)
+            # 使用thinking文件夹中现成的难度判断器
+            difficulty_assessment = await self.tree_thinking.difficulty_judge.assess_difficulty(question)
+            difficulty = difficulty_assessment.get("difficulty", 3)
             
-    #         # 根据难度判断是否需要深度思考
-    #         # 难度4-5（复杂/极难）建议深度思考
-    #         should_think_deeply = difficulty >= 4
+            # 根据难度判断是否需要深度思考
+            # 难度4-5（复杂/极难）建议深度思考
+            should_think_deeply = difficulty >= 4
             
-    #         logger.info(f"难度判断：{difficulty}/5，建议深度思考：{should_think_deeply}")
-    #         return should_think_deeply
+            logger.info(f"难度判断：{difficulty}/5，建议深度思考：{should_think_deeply}")
+            return should_think_deeply
                    
-    #     except Exception as e:
-    #         logger.debug(f"异步思考判断失败: {e}")
-    #         return False
+        except Exception as e:
+            logger.debug(f"异步思考判断失败: {e}")
+            return False
 
 async def process_user_message(s,msg):
     if config.system.voice_enabled and not msg: #无文本输入时启动语音识别
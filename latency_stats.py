@@ -0,0 +1,19 @@
+"""
+耗时统计
+语音识别、语音合成、界面帧调度等实时指标共用的分位数摘要
+"""
+
+from typing import Dict, Iterable
+
+
+def summarize(values: Iterable[float]) -> Dict[str, float]:
+    """平均值、p50、p95和最大值（保留3位小数），没有样本时全为0"""
+    ordered = sorted(values)
+    if not ordered:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "avg": round(sum(ordered) / len(ordered), 3),
+        "p50": round(ordered[len(ordered) // 2], 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "max": round(ordered[-1], 3),
+    }
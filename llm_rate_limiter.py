@@ -0,0 +1,336 @@
+"""
+LLM调用全局限流器
+进程内所有LLM流量（主对话、五元组提取、RAG关键词、Agent调用、快速模型等）共享的令牌桶，
+按接口地址分桶，支持优先级、429/Retry-After退避和实时指标
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+from config import config
+
+logger = logging.getLogger("LLMRateLimiter")
+
+MAX_POLL_INTERVAL = 0.05  # 等待令牌时的最长轮询间隔（秒），保证高优先级请求能及时插队
+MAX_BACKOFF = 60.0  # 429退避的最长时间（秒）
+
+
+class Priority(IntEnum):
+    """请求优先级，数值越小越优先"""
+    INTERACTIVE = 0  # 用户正在等待的对话
+    NORMAL = 1  # 思考、Agent、快速模型、记忆检索
+    BACKGROUND = 2  # 五元组提取等后台任务
+
+
+def endpoint_key(base_url: Optional[str] = None) -> str:
+    """根据接口地址生成分桶键（host:port）"""
+    url = base_url or config.api.base_url
+    parsed = urlparse(url)
+    return parsed.netloc or url
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After头（秒数或HTTP日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _rate_limit_info(exc: BaseException):
+    """从异常中识别429并提取Retry-After，兼容openai/aiohttp/requests的异常类型"""
+    response = getattr(exc, "response", None)
+    status = (
+        getattr(exc, "status_code", None)
+        or getattr(exc, "status", None)
+        or getattr(response, "status_code", None)
+        or getattr(response, "status", None)
+    )
+    if status != 429:
+        return False, None
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None) or {}
+    try:
+        retry_after = parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+    except Exception:
+        retry_after = None
+    return True, retry_after
+
+
+class EndpointBucket:
+    """单个接口的令牌桶
+
+    状态由线程锁保护，可被多个线程/事件循环共享；
+    等待者按(优先级, 到达顺序)排队，只有队首能取走令牌。
+    """
+
+    def __init__(self, key: str, rate: float, burst: float, max_concurrent: int):
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._rate_factor = 1.0  # 429后乘性下调，成功后缓慢恢复
+        self._blocked_until = 0.0
+        self._consecutive_429 = 0
+        self._inflight = 0
+        self._waiters = []  # 堆: (priority, seq)
+        self._abandoned = set()
+        self._seq = itertools.count()
+
+        # 指标
+        self.requests = {p.name: 0 for p in Priority}
+        self.wait_total = {p.name: 0.0 for p in Priority}
+        self.wait_max = {p.name: 0.0 for p in Priority}
+        self.rate_limited = 0
+        self.errors = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate * self._rate_factor)
+            self._updated = now
+
+    def _enqueue(self, priority: Priority):
+        ticket = (int(priority), next(self._seq))
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _abandon(self, ticket):
+        with self._lock:
+            self._abandoned.add(ticket)
+            self._drop_abandoned()
+
+    def _drop_abandoned(self):
+        while self._waiters and self._waiters[0] in self._abandoned:
+            self._abandoned.discard(heapq.heappop(self._waiters))
+
+    def _try_acquire(self, ticket) -> float:
+        """尝试取令牌：成功返回0，否则返回建议等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            self._drop_abandoned()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if not self._waiters or self._waiters[0] != ticket:
+                return MAX_POLL_INTERVAL
+            if self._inflight >= self.max_concurrent:
+                return MAX_POLL_INTERVAL
+            if self._tokens < 1.0:
+                return (1.0 - self._tokens) / (self.rate * self._rate_factor)
+            heapq.heappop(self._waiters)
+            self._tokens -= 1.0
+            self._inflight += 1
+            return 0.0
+
+    def _record_wait(self, priority: Priority, waited: float):
+        with self._lock:
+            self.requests[priority.name] += 1
+            self.wait_total[priority.name] += waited
+            self.wait_max[priority.name] = max(self.wait_max[priority.name], waited)
+
+    async def acquire(self, priority: Priority):
+        """异步等待令牌"""
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, MAX_POLL_INTERVAL))
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        self._record_wait(priority, time.monotonic() - started)
+
+    def acquire_sync(self, priority: Priority):
+        """同步等待令牌（用于线程中的requests/同步客户端调用）"""
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket)
+                if wait <= 0:
+                    break
+                time.sleep(min(wait, MAX_POLL_INTERVAL))
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        self._record_wait(priority, time.monotonic() - started)
+
+    def release(self, rate_limited: bool = False, retry_after: Optional[float] = None, error: bool = False):
+        """归还并发名额，并根据结果调整速率"""
+        with self._lock:
+            self._inflight = max(0, self._inflight - 1)
+            if rate_limited:
+                self.rate_limited += 1
+                self._consecutive_429 += 1
+                backoff = retry_after if retry_after is not None else min(MAX_BACKOFF, 2 ** self._consecutive_429)
+                self._blocked_until = max(self._blocked_until, time.monotonic() + backoff)
+                self._rate_factor = max(0.1, self._rate_factor * 0.5)
+                self._tokens = 0.0
+                logger.warning(f"[{self.key}] 触发限流(429)，暂停 {backoff:.1f}s，速率降至 {self.rate * self._rate_factor:.2f}/s")
+            elif error:
+                self.errors += 1
+            else:
+                self._consecutive_429 = 0
+                self._rate_factor = min(1.0, self._rate_factor * 1.05)
+
+    def metrics(self) -> Dict[str, Any]:
+        """实时指标"""
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            queued = {p.name: 0 for p in Priority}
+            for priority, seq in self._waiters:
+                if (priority, seq) not in self._abandoned:
+                    queued[Priority(priority).name] += 1
+            return {
+                "rate": self.rate,
+                "effective_rate": round(self.rate * self._rate_factor, 3),
+                "burst": self.burst,
+                "tokens": round(self._tokens, 2),
+                "inflight": self._inflight,
+                "max_concurrent": self.max_concurrent,
+                "queued": queued,
+                "blocked_for": round(max(0.0, self._blocked_until - now), 2),
+                "requests": dict(self.requests),
+                "avg_wait": {
+                    name: round(self.wait_total[name] / count, 3) if count else 0.0
+                    for name, count in self.requests.items()
+                },
+                "max_wait": {name: round(v, 3) for name, v in self.wait_max.items()},
+                "rate_limited": self.rate_limited,
+                "errors": self.errors,
+            }
+
+
+class _Slot:
+    """一次被放行的调用，用于上报HTTP响应状态"""
+
+    def __init__(self):
+        self.rate_limited = False
+        self.retry_after: Optional[float] = None
+
+    def report_response(self, status: int, headers: Optional[Mapping[str, str]] = None):
+        """上报HTTP状态码（非异常方式返回429的客户端需手动调用）"""
+        if status == 429:
+            self.rate_limited = True
+            if headers:
+                self.retry_after = parse_retry_after(headers.get("Retry-After") or headers.get("retry-after"))
+
+
+class LLMRateLimiter:
+    """进程级LLM限流器，按接口分桶"""
+
+    def __init__(self):
+        self._buckets: Dict[str, EndpointBucket] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return config.rate_limit.enabled
+
+    def bucket(self, endpoint: Optional[str] = None) -> EndpointBucket:
+        key = endpoint_key(endpoint)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                settings = config.rate_limit
+                override = settings.endpoints.get(key, {})
+                bucket = EndpointBucket(
+                    key,
+                    rate=float(override.get("requests_per_second", settings.requests_per_second)),
+                    burst=float(override.get("burst", settings.burst)),
+                    max_concurrent=int(override.get("max_concurrent", settings.max_concurrent)),
+                )
+                self._buckets[key] = bucket
+            return bucket
+
+    @staticmethod
+    def _release_on_error(bucket: EndpointBucket, slot: _Slot, exc: BaseException):
+        """调用以异常结束时归还名额"""
+        limited, retry_after = _rate_limit_info(exc)
+        if slot.rate_limited:  # 已上报429，随后因状态码抛出的异常不再计为普通错误
+            limited, retry_after = True, retry_after if retry_after is not None else slot.retry_after
+        aborted = isinstance(exc, (asyncio.CancelledError, GeneratorExit))  # 调用方取消或提前关闭流
+        bucket.release(rate_limited=limited, retry_after=retry_after, error=not (limited or aborted))
+
+    @asynccontextmanager
+    async def limit(self, endpoint: Optional[str] = None, priority: Priority = Priority.NORMAL):
+        """异步上下文：等待令牌后放行，退出时根据结果/异常更新限流状态
+
+        流式响应须在上下文内读完，并发名额才覆盖整个流
+        """
+        slot = _Slot()
+        if not self.enabled:
+            yield slot
+            return
+        bucket = self.bucket(endpoint)
+        await bucket.acquire(priority)
+        try:
+            yield slot
+        except BaseException as e:
+            self._release_on_error(bucket, slot, e)
+            raise
+        else:
+            bucket.release(rate_limited=slot.rate_limited, retry_after=slot.retry_after)
+
+    @contextmanager
+    def limit_sync(self, endpoint: Optional[str] = None, priority: Priority = Priority.NORMAL):
+        """同步上下文，语义同limit"""
+        slot = _Slot()
+        if not self.enabled:
+            yield slot
+            return
+        bucket = self.bucket(endpoint)
+        bucket.acquire_sync(priority)
+        try:
+            yield slot
+        except BaseException as e:
+            self._release_on_error(bucket, slot, e)
+            raise
+        else:
+            bucket.release(rate_limited=slot.rate_limited, retry_after=slot.retry_after)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """所有接口的实时指标"""
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return {
+            "enabled": self.enabled,
+            "endpoints": {bucket.key: bucket.metrics() for bucket in buckets},
+        }
+
+
+_rate_limiter: Optional[LLMRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> LLMRateLimiter:
+    """获取全局限流器实例"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = LLMRateLimiter()
+    return _rate_limiter
@@ -70,12 +70,13 @@ class LogContextParser:
         
         return None
     
-    def parse_log_file(self, log_file_path: str) -> List[Dict]:
+    def parse_log_file(self, log_file_path: str, max_bytes: Optional[int] = None) -> List[Dict]:
         """
         解析单个日志文件，提取对话内容
         
         Args:
             log_file_path: 日志文件路径
+            max_bytes: 只解析文件开头的这么多字节（之后追加的内容忽略），None表示整个文件
             
         Returns:
             List[Dict]: 对话消息列表，格式为[{"role": "user/assistant", "content": "内容"}]
@@ -84,7 +85,8 @@ class LogContextParser:
         
         try:
             with open(log_file_path, 'r', encoding='utf-8') as f:
-                for line in f:
+                lines = f if max_bytes is None else f.buffer.read(max_bytes).decode('utf-8', errors='ignore').splitlines()
+                for line in lines:
                     result = self._parse_log_line(line)
                     if result:
                         role, content = result
@@ -366,6 +366,7 @@ class AgentManager:
         try:
             # 使用新版本的OpenAI API
             from openai import AsyncOpenAI
+            from llm_rate_limiter import get_rate_limiter, Priority
             
             # 记录调试信息
             if self.debug_mode:
@@ -403,8 +404,9 @@ class AgentManager:
             if self.debug_mode:
                 logger.debug(f"API调用参数: {api_params}")
             
-            # 调用API
-            response = await client.chat.completions.create(**api_params)
+            # 调用API（经全局限流器，与主对话共享接口配额）
+            async with get_rate_limiter().limit(agent_config.api_base_url or "https://api.deepseek.com/v1", Priority.NORMAL):
+                response = await client.chat.completions.create(**api_params)
             
             # 提取响应内容
             assistant_content = response.choices[0].message.content
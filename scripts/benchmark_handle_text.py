@@ -0,0 +1,137 @@
+"""
+语音文本处理基准测试与等价性检查
+单次扫描清洗 vs 旧的逐条正则替换链；增量断句 vs 旧的逐字符断句
+用法: python scripts/benchmark_handle_text.py（存在不一致时退出码为1）
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 项目根目录
+
+import emoji
+
+from voice.output.handle_text import SpeechSegmenter, prepare_tts_input_with_context
+
+
+def legacy_prepare(text):
+    """旧的逐条正则替换链"""
+    text = emoji.replace_emoji(text, replace='')
+
+    def header_replacer(match):
+        level = len(match.group(1))
+        header_text = match.group(2).strip()
+        if level == 1:
+            return f"Title — {header_text}\n"
+        elif level == 2:
+            return f"Section — {header_text}\n"
+        return f"Subsection — {header_text}\n"
+
+    text = re.sub(r"^(#{1,6})\s+(.*)", header_replacer, text, flags=re.MULTILINE)
+    text = re.sub(r"\[([^\]]+)\]\([^\)]+\)", r"\1", text)
+    text = re.sub(r"```([\s\S]+?)```", r"(code block omitted)", text)
+    text = re.sub(r"`([^`]+)`", r"code snippet: \1", text)
+    text = re.sub(r"(\*\*|__|\*|_)", '', text)
+    text = re.sub(r"!\[([^\]]*)\]\([^\)]+\)", r"Image: \1", text)
+    text = re.sub(r"</?[^>]+(>|$)", '', text)
+    text = re.sub(r"\n{2,}", '\n\n', text)
+    text = re.sub(r" {2,}", ' ', text)
+    return text.strip()
+
+
+def legacy_segment(chunks):
+    """旧 StreamingToolCallExtractor 的逐字符断句"""
+    endings = r"[。？！；\.\?\!\;]"
+    buffer, out = "", []
+    for chunk in chunks:
+        for char in chunk:
+            buffer += char
+            if re.search(endings, char):
+                parts = re.split(endings, buffer)
+                if len(parts) > 1:
+                    out.append(parts[0] + char)
+                    buffer = "".join(p for p in parts[1:] if p.strip())
+    return out, buffer
+
+
+CORPUS = [
+    "好的！😊 我来帮你整理一下今天的安排。\n\n## 上午\n- **9点**：团队例会\n- *10点半*：评审 [需求文档](https://example.com/doc)\n\n## 下午\n1. 写代码 💻\n2. 跑测试",
+    "# 快速排序\n\n快速排序的核心思想是**分治**。下面是一个示例：\n\n```python\ndef quick_sort(arr):\n    if len(arr) <= 1:\n        return arr\n    pivot = arr[0]\n    return quick_sort([x for x in arr[1:] if x < pivot]) + [pivot]\n```\n\n时间复杂度平均为 `O(n log n)`，最坏情况为 `O(n^2)`。",
+    "Sure! Here's what I found 🔍:\n\n### Summary\nThe `config.json` file controls the __voice__ settings. See [the docs](http://a.b/c_d) for details.\n\nLet me know if you need anything else 👍🏽",
+    "抱歉，我没能连接到天气服务 😢。请稍后再试，或者检查一下网络设置～",
+    "<b>注意</b>：这个操作不可撤销！<br/>请确认后再继续。\n\n\n\n谢谢理解 🙏",
+    "你好呀 👋！我是你的助手，有什么可以帮你的吗？",
+    "| 名称 | 数量 |\n|------|------|\n| 苹果 | 3 |\n| 香蕉 | 5 |\n\n以上就是统计结果 ✅",
+    "步骤如下：\n\n1. 打开 **设置**\n2. 进入 *隐私* → `权限管理`\n3. 勾选 麦克风\n\n完成后重启应用 🔄，就可以使用语音输入啦！",
+    "#### 小结\n\n- 记忆系统：使用 *GRAG* 知识图谱\n- 思考系统：多路线并行，遗传剪枝\n- 语音系统：Edge‑TTS + FunASR 🎤\n\n> 提示：以上功能都可以在配置中开关",
+    "👨‍👩‍👧 家庭模式已开启。1️⃣ 先选择成员，#️⃣ 再设置权限。",
+]
+
+
+def main():
+    rng = random.Random(5)
+    corpus = list(CORPUS)
+    corpus += ["\n\n".join(rng.sample(corpus, 4)) for _ in range(30)]
+
+    mismatches = [t for t in corpus if prepare_tts_input_with_context(t) != legacy_prepare(t)]
+
+    rounds = 20
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for t in corpus:
+            legacy_prepare(t)
+    legacy_time = (time.perf_counter() - start) / rounds / len(corpus)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for t in corpus:
+            prepare_tts_input_with_context(t)
+    single_time = (time.perf_counter() - start) / rounds / len(corpus)
+
+    # 流式断句：随机切成小片段逐段喂入
+    segment_mismatches = 0
+    streams = []
+    for t in corpus:
+        chunks, i = [], 0
+        while i < len(t):
+            n = rng.randint(1, 8)
+            chunks.append(t[i:i + n])
+            i += n
+        streams.append(chunks)
+    for chunks in streams:
+        segmenter = SpeechSegmenter()
+        new = [s for c in chunks for s in segmenter.feed(c)]
+        if (new, segmenter.buffer) != legacy_segment(chunks):
+            segment_mismatches += 1
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for chunks in streams:
+            legacy_segment(chunks)
+    legacy_seg_time = (time.perf_counter() - start) / rounds / len(streams)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for chunks in streams:
+            segmenter = SpeechSegmenter()
+            for c in chunks:
+                segmenter.feed(c)
+    seg_time = (time.perf_counter() - start) / rounds / len(streams)
+
+    print(f"语料: {len(corpus)} 条回复，平均 {sum(map(len, corpus)) // len(corpus)} 字符")
+    print(f"文本清洗  旧替换链: {legacy_time * 1e6:.1f} µs/条   单次扫描: {single_time * 1e6:.1f} µs/条   不一致: {len(mismatches)}")
+    print(f"流式断句  旧逐字符: {legacy_seg_time * 1e6:.1f} µs/条   增量断句: {seg_time * 1e6:.1f} µs/条   不一致: {segment_mismatches}")
+
+    # 有意修正的旧行为
+    for sample in ["如果 a < b，就交换两者。后面的内容不应被吞掉。", "![架构图](arch.png)", "圆周率约为3.14，版本v2.0已发布。"]:
+        segmenter = SpeechSegmenter()
+        print(f"\n输入: {sample!r}")
+        print(f"  旧清洗: {legacy_prepare(sample)!r}\n  新清洗: {prepare_tts_input_with_context(sample)!r}")
+        sentences = segmenter.feed(sample)
+        rest = segmenter.flush()
+        print(f"  旧断句: {legacy_segment([sample])[0]}\n  新断句: {sentences + [rest] if rest else sentences}")
+    return 1 if mismatches or segment_mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,510 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KG_DIR = "logs/knowledge_graph"
+QUINTUPLES_FILE = os.path.join(KG_DIR, "quintuples.json")
+LAYOUT_FILE = os.path.join(KG_DIR, "graph_layout.json")  # 增量布局缓存
+VIEW_DATA_FILE = os.path.join(KG_DIR, "graph_data.js")  # 查看器数据（裁剪后）
+VIEW_HTML_FILE = os.path.join(KG_DIR, "graph.html")  # 静态查看器页面
+
+LAYOUT_VERSION = 1
+SPRING_LENGTH = 120.0  # 相邻节点的理想距离
+RELAX_ITERATIONS = 12  # 新节点的局部松弛迭代次数
+BULK_RELAX_ITERATIONS = 4  # 首次全量布局等大批量新增时的迭代次数
+BULK_THRESHOLD = 2000
+MAX_REPULSION_SAMPLES = 24  # 每次斥力计算最多参考的邻近节点数
+
+# 不同实体类型的颜色
+TYPE_COLORS = {
+    '人物': '#FF6B6B',
+    '地点': '#4ECDC4',
+    '组织': '#45B7D1',
+    '物品': '#96CEB4',
+    '概念': '#FFEAA7',
+    '时间': '#DDA0DD',
+    '事件': '#F4A460',
+    '活动': '#FFB347'
+}
+DEFAULT_COLOR = '#CCCCCC'
+
+# 静态查看器：节点坐标已预先计算，关闭物理引擎，打开即渲染
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>心智云图</title>
+<script src="https://unpkg.com/vis-network@9.1.2/standalone/umd/vis-network.min.js"></script>
+<style>
+  html, body { margin: 0; height: 100%; background: #1e1e1e; color: #ddd; font-family: sans-serif; }
+  #graph { width: 100%; height: 100%; }
+  #info { position: absolute; top: 8px; left: 12px; font-size: 13px; opacity: 0.8; }
+</style>
+</head>
+<body>
+<div id="info"></div>
+<div id="graph"></div>
+<script src="graph_data.js"></script>
+<script>
+  var d = window.GRAPH_DATA;
+  var nodes = d.nodes.map(function (n, i) {
+    return {
+      id: i, label: n[0] + "\\n(" + d.types[n[1]] + ")", x: n[2], y: n[3],
+      color: d.colors[n[1]], value: n[4], font: {size: 18, color: "#eee"}
+    };
+  });
+  var edges = d.edges.map(function (e) {
+    return {from: e[0], to: e[1], label: d.rels[e[2]], font: {size: 14, color: "#aaa", strokeWidth: 0}};
+  });
+  document.getElementById("info").textContent =
+    "节点 " + d.stats.shown_nodes + "/" + d.stats.total_nodes +
+    "  关系 " + d.stats.shown_edges + "/" + d.stats.total_edges +
+    "  裁剪方式: " + d.stats.prune_by + "  生成于 " + d.stats.generated_at;
+  new vis.Network(document.getElementById("graph"),
+    {nodes: new vis.DataSet(nodes), edges: new vis.DataSet(edges)},
+    {
+      physics: false,
+      layout: {improvedLayout: false},
+      nodes: {shape: "dot", scaling: {min: 8, max: 40}},
+      edges: {arrows: "to", smooth: false},
+      interaction: {hideEdgesOnDrag: true, tooltipDelay: 200}
+    });
+</script>
+</body>
+</html>
+"""
+
+
+def _stable_angle(name: str) -> float:
+    """根据节点名得到稳定的角度，保证同一节点每次布局位置一致"""
+    digest = hashlib.md5(name.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'little') / 0xFFFFFFFF * 2 * math.pi
+
+
+class GraphLayoutCache:
+    """知识图谱增量布局缓存
+
+    只为自上次渲染以来新增的节点和边计算布局，已有节点坐标保持不变；
+    导出时按度数或新近度在服务端裁剪，生成紧凑的JSON数据和静态查看器页面。
+    """
+
+    def __init__(self, source_file: str = QUINTUPLES_FILE, layout_file: str = LAYOUT_FILE):
+        self.source_file = source_file
+        self.layout_file = layout_file
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.source_signature: Optional[Tuple[float, int]] = None
+        self.nodes: Dict[str, Dict] = {}  # name -> {type, x, y, degree, seq}
+        self.edges: Dict[Tuple[str, str, str], int] = {}  # (head, rel, tail) -> seq
+        self.adjacency: Dict[str, set] = {}
+        self.grid: Dict[Tuple[int, int], set] = {}  # 空间网格，用于局部斥力计算
+        self.seq = 0
+        self.unrelaxed: set = set()  # 已放置但松弛被取消、尚未完成的节点
+        self.exported_signature: Optional[Tuple] = None
+
+        self._refresh_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- 持久化 ----------
+
+    def _load(self):
+        """加载布局缓存文件"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.layout_file):
+            return
+        try:
+            with open(self.layout_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != LAYOUT_VERSION:
+                logger.info("布局缓存版本不匹配，将重新计算布局")
+                return
+            self.seq = data.get("seq", 0)
+            sig = data.get("source_signature")
+            self.source_signature = tuple(sig) if sig else None
+            for name, node_type, x, y, seq in data.get("nodes", []):
+                self.nodes[name] = {"type": node_type, "x": x, "y": y, "degree": 0, "seq": seq}
+                self.adjacency.setdefault(name, set())
+                self.grid.setdefault(self._cell(x, y), set()).add(name)
+            for head, rel, tail, seq in data.get("edges", []):
+                self._link(head, rel, tail, seq)
+            self.unrelaxed = {name for name in data.get("unrelaxed", []) if name in self.nodes}
+            logger.info(f"已加载布局缓存: {len(self.nodes)} 个节点, {len(self.edges)} 条边")
+        except Exception as e:
+            logger.warning(f"加载布局缓存失败，将重新计算: {e}")
+            self.nodes.clear()
+            self.edges.clear()
+            self.adjacency.clear()
+            self.grid.clear()
+            self.unrelaxed.clear()
+            self.seq = 0
+            self.source_signature = None
+
+    def _save(self):
+        """原子写入布局缓存文件"""
+        data = {
+            "version": LAYOUT_VERSION,
+            "seq": self.seq,
+            "source_signature": list(self.source_signature) if self.source_signature else None,
+            "nodes": [[name, n["type"], round(n["x"], 1), round(n["y"], 1), n["seq"]] for name, n in self.nodes.items()],
+            "edges": [[head, rel, tail, seq] for (head, rel, tail), seq in self.edges.items()],
+            "unrelaxed": sorted(self.unrelaxed),
+        }
+        _atomic_write(self.layout_file, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+    # ---------- 增量更新 ----------
+
+    def _source_signature(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(self.source_file)
+            return (stat.st_mtime, stat.st_size)
+        except OSError:
+            return None
+
+    def is_stale(self) -> bool:
+        """五元组文件自上次更新后是否有变化，或上次布局计算被取消尚未完成"""
+        with self._lock:
+            self._load()
+            return self._source_signature() != self.source_signature or bool(self.unrelaxed)
+
+    def view_is_current(self, max_nodes: int = 2000, prune_by: str = "degree") -> bool:
+        """已导出的查看器是否仍对应当前五元组文件
+
+        不加锁、不加载缓存文件，只读几个属性并stat文件，可以在界面线程中调用；
+        后台正在计算或上次计算被取消时返回False
+        """
+        if not self._loaded or self.unrelaxed:
+            return False
+        signature = self._source_signature()
+        return (signature is not None
+                and signature == self.source_signature
+                and (signature, max_nodes, prune_by) == self.exported_signature
+                and os.path.exists(VIEW_HTML_FILE)
+                and os.path.exists(VIEW_DATA_FILE))
+
+    def refresh(self, progress: Optional[Callable[[int, str], None]] = None,
+                cancelled: Optional[Callable[[], bool]] = None) -> int:
+        """读取五元组文件，只为新增的节点和边计算布局，返回新增边数
+        文件中已不存在的边会被删除，随之不再有任何边的节点一并移除
+
+        progress(百分比, 阶段)用于汇报进度；cancelled()返回True时提前结束松弛迭代，
+        已放置的节点坐标照常保存，未完成松弛的节点记入unrelaxed，下次refresh时继续
+        """
+        with self._lock:
+            self._load()
+            signature = self._source_signature()
+            if signature is None:
+                return 0
+            if signature == self.source_signature:
+                if self.unrelaxed:
+                    self._relax_pending([], progress, cancelled)
+                    self._save()
+                return 0
+
+            if progress:
+                progress(10, "读取五元组")
+            try:
+                with open(self.source_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.error(f"读取五元组文件失败: {e}")
+                return 0
+
+            new_nodes: List[str] = []
+            added = 0
+            current = set()  # 文件中现有的边
+            for item in data:
+                if not (isinstance(item, (list, tuple)) and len(item) == 5):
+                    continue
+                if not all(isinstance(x, str) and x.strip() for x in item):
+                    continue
+                head, head_type, rel, tail, tail_type = item
+                current.add((head, rel, tail))
+                if (head, rel, tail) in self.edges:
+                    continue
+                self.seq += 1
+                for name, node_type in ((head, head_type), (tail, tail_type)):
+                    if name not in self.nodes:
+                        self.nodes[name] = {"type": node_type, "x": None, "y": None, "degree": 0, "seq": self.seq}
+                        self.adjacency[name] = set()
+                        new_nodes.append(name)
+                    else:
+                        self.nodes[name]["seq"] = self.seq
+                self._link(head, rel, tail, self.seq)
+                added += 1
+
+            removed_edges, removed_nodes = self._remove_missing(current)
+
+            self._relax_pending(new_nodes, progress, cancelled)
+            self.source_signature = signature
+            self._save()
+            logger.info(f"布局缓存已更新: 新增 {len(new_nodes)} 个节点, {added} 条边; "
+                        f"删除 {removed_nodes} 个节点, {removed_edges} 条边 (共 {len(self.nodes)} 节点)")
+            return added
+
+    def _remove_missing(self, current: set) -> Tuple[int, int]:
+        """删除文件中已不存在的边，重算度数和邻接关系，并移除不再有边的节点；返回(删除边数, 删除节点数)"""
+        missing = [key for key in self.edges if key not in current]
+        if not missing:
+            return 0, 0
+        for key in missing:
+            del self.edges[key]
+
+        # 同一对节点之间可能还有其他关系，按剩余的边重建度数和邻接
+        for name, node in self.nodes.items():
+            node["degree"] = 0
+        self.adjacency = {name: set() for name in self.nodes}
+        for head, rel, tail in self.edges:
+            for name in (head, tail):
+                if name in self.nodes:
+                    self.nodes[name]["degree"] += 1
+            self.adjacency.setdefault(head, set()).add(tail)
+            self.adjacency.setdefault(tail, set()).add(head)
+
+        orphans = [name for name, node in self.nodes.items() if node["degree"] == 0]
+        for name in orphans:
+            node = self.nodes.pop(name)
+            self.adjacency.pop(name, None)
+            self.unrelaxed.discard(name)
+            if node["x"] is not None:
+                cell = self.grid.get(self._cell(node["x"], node["y"]))
+                if cell is not None:
+                    cell.discard(name)
+        return len(missing), len(orphans)
+
+    def _relax_pending(self, new_nodes: List[str], progress: Optional[Callable[[int, str], None]] = None,
+                       cancelled: Optional[Callable[[], bool]] = None):
+        """为新节点和上次未完成松弛的节点计算布局；再次被取消时记下仍未完成的节点"""
+        pending = new_nodes + [name for name in self.unrelaxed if name not in set(new_nodes)]
+        if not pending:
+            return
+        if self._place_nodes(pending, progress, cancelled):
+            self.unrelaxed.clear()
+        else:
+            self.unrelaxed = set(pending)
+            logger.info(f"布局计算被取消，{len(pending)} 个节点将在下次更新时继续松弛")
+
+    def _link(self, head: str, rel: str, tail: str, seq: int):
+        self.edges[(head, rel, tail)] = seq
+        for name in (head, tail):
+            if name in self.nodes:
+                self.nodes[name]["degree"] += 1
+        self.adjacency.setdefault(head, set()).add(tail)
+        self.adjacency.setdefault(tail, set()).add(head)
+
+    # ---------- 布局 ----------
+
+    @staticmethod
+    def _cell(x: float, y: float) -> Tuple[int, int]:
+        size = SPRING_LENGTH * 2
+        return (int(x // size), int(y // size))
+
+    def _neighbours_in_grid(self, x: float, y: float) -> List[str]:
+        cx, cy = self._cell(x, y)
+        found = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for name in self.grid.get((cx + dx, cy + dy), ()):
+                    found.append(name)
+                    if len(found) >= MAX_REPULSION_SAMPLES:
+                        return found
+        return found
+
+    def _place_nodes(self, new_nodes: List[str], progress: Optional[Callable[[int, str], None]] = None,
+                     cancelled: Optional[Callable[[], bool]] = None) -> bool:
+        """为新节点计算坐标：先靠近已布局的邻居放置，再做局部力导向松弛；松弛被取消时返回False"""
+        unplaced = [name for name in new_nodes if self.nodes[name]["x"] is None]  # 上次已放置的节点只需继续松弛
+        placed_count = len(self.nodes) - len(unplaced)
+        for name in unplaced:
+            node = self.nodes[name]
+            anchors = [self.nodes[n] for n in self.adjacency.get(name, ()) if self.nodes[n]["x"] is not None]
+            angle = _stable_angle(name)
+            if anchors:
+                ax = sum(a["x"] for a in anchors) / len(anchors)
+                ay = sum(a["y"] for a in anchors) / len(anchors)
+                node["x"] = ax + SPRING_LENGTH * math.cos(angle)
+                node["y"] = ay + SPRING_LENGTH * math.sin(angle)
+            else:
+                # 孤立的新簇按向日葵螺旋排布在外围，避免与已有区域重叠
+                placed_count += 1
+                radius = SPRING_LENGTH * 1.5 * math.sqrt(placed_count)
+                theta = placed_count * 2.39996323  # 黄金角
+                node["x"] = radius * math.cos(theta)
+                node["y"] = radius * math.sin(theta)
+            self.grid.setdefault(self._cell(node["x"], node["y"]), set()).add(name)
+
+        # 局部松弛：只移动新节点，已有节点保持稳定
+        iterations = RELAX_ITERATIONS if len(new_nodes) < BULK_THRESHOLD else BULK_RELAX_ITERATIONS
+        for iteration in range(iterations):
+            if cancelled and cancelled():
+                return False
+            if progress:
+                progress(20 + 70 * iteration // iterations, "计算布局")
+            for name in new_nodes:
+                node = self.nodes[name]
+                fx = fy = 0.0
+                for other in self.adjacency.get(name, ()):
+                    o = self.nodes[other]
+                    dx, dy = o["x"] - node["x"], o["y"] - node["y"]
+                    dist = math.hypot(dx, dy) or 0.01
+                    pull = (dist - SPRING_LENGTH) / dist * 0.1
+                    fx += dx * pull
+                    fy += dy * pull
+                for other in self._neighbours_in_grid(node["x"], node["y"]):
+                    if other == name:
+                        continue
+                    o = self.nodes[other]
+                    dx, dy = node["x"] - o["x"], node["y"] - o["y"]
+                    dist_sq = dx * dx + dy * dy or 0.01
+                    push = SPRING_LENGTH * SPRING_LENGTH / dist_sq * 0.05
+                    fx += dx * push
+                    fy += dy * push
+                step = math.hypot(fx, fy)
+                if step > SPRING_LENGTH:
+                    fx, fy = fx / step * SPRING_LENGTH, fy / step * SPRING_LENGTH
+                old_cell = self._cell(node["x"], node["y"])
+                node["x"] += fx
+                node["y"] += fy
+                new_cell = self._cell(node["x"], node["y"])
+                if new_cell != old_cell:
+                    self.grid[old_cell].discard(name)
+                    self.grid.setdefault(new_cell, set()).add(name)
+        return True
+
+    # ---------- 导出 ----------
+
+    def export_view(self, max_nodes: int = 2000, prune_by: str = "degree") -> str:
+        """按度数或新近度裁剪后导出查看器数据，返回HTML文件路径"""
+        with self._lock:
+            self._load()
+            signature = (self.source_signature, max_nodes, prune_by)
+            if signature == self.exported_signature and os.path.exists(VIEW_DATA_FILE):
+                return VIEW_HTML_FILE
+
+            if prune_by == "recency":
+                ranked = sorted(self.nodes, key=lambda n: self.nodes[n]["seq"], reverse=True)
+            else:
+                ranked = sorted(self.nodes, key=lambda n: self.nodes[n]["degree"], reverse=True)
+            kept = ranked[:max_nodes] if max_nodes and max_nodes > 0 else ranked
+            index = {name: i for i, name in enumerate(kept)}
+
+            types: Dict[str, int] = {}
+            rels: Dict[str, int] = {}
+            nodes_out = []
+            for name in kept:
+                node = self.nodes[name]
+                type_idx = types.setdefault(node["type"], len(types))
+                nodes_out.append([name, type_idx, round(node["x"]), round(node["y"]), node["degree"]])
+            edges_out = []
+            for (head, rel, tail) in self.edges:
+                if head in index and tail in index:
+                    edges_out.append([index[head], index[tail], rels.setdefault(rel, len(rels))])
+
+            type_names = list(types)
+            payload = {
+                "types": type_names,
+                "colors": [TYPE_COLORS.get(t, DEFAULT_COLOR) for t in type_names],
+                "rels": list(rels),
+                "nodes": nodes_out,
+                "edges": edges_out,
+                "stats": {
+                    "total_nodes": len(self.nodes),
+                    "total_edges": len(self.edges),
+                    "shown_nodes": len(nodes_out),
+                    "shown_edges": len(edges_out),
+                    "prune_by": prune_by,
+                    "generated_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+                },
+            }
+            _atomic_write(
+                VIEW_DATA_FILE,
+                "window.GRAPH_DATA=" + json.dumps(payload, ensure_ascii=False, separators=(',', ':')) + ";"
+            )
+            self._ensure_viewer()
+            self.exported_signature = signature
+            logger.info(f"心智云图数据已导出: {len(nodes_out)}/{len(self.nodes)} 个节点, {len(edges_out)} 条边")
+            return VIEW_HTML_FILE
+
+    @staticmethod
+    def _ensure_viewer():
+        """静态查看器页面内容固定，仅在缺失或模板变化时重写"""
+        try:
+            with open(VIEW_HTML_FILE, 'r', encoding='utf-8') as f:
+                if f.read() == VIEWER_HTML:
+                    return
+        except OSError:
+            pass
+        _atomic_write(VIEW_HTML_FILE, VIEWER_HTML)
+
+    def ensure_view(self, max_nodes: int = 2000, prune_by: str = "degree",
+                    progress: Optional[Callable[[int, str], None]] = None,
+                    cancelled: Optional[Callable[[], bool]] = None) -> Optional[str]:
+        """确保查看器数据是最新的（必要时增量更新），返回HTML文件路径；被取消时返回None"""
+        self.refresh(progress, cancelled)
+        if cancelled and cancelled():
+            return None
+        if progress:
+            progress(95, "导出查看器")
+        return self.export_view(max_nodes=max_nodes, prune_by=prune_by)
+
+    # ---------- 后台预计算 ----------
+
+    def request_refresh(self):
+        """通知后台线程尽快更新布局"""
+        self._refresh_event.set()
+
+    def start_background(self, interval: float = 10.0, max_nodes: int = 2000, prune_by: str = "degree"):
+        """启动后台线程，定期检查五元组文件变化并预先计算布局与查看器数据"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    if self.is_stale():
+                        self.ensure_view(max_nodes=max_nodes, prune_by=prune_by)
+                except Exception as e:
+                    logger.error(f"后台布局更新失败: {e}")
+                self._refresh_event.wait(interval)
+                self._refresh_event.clear()
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=run, name="GraphLayoutCache", daemon=True)
+        self._thread.start()
+        logger.info("知识图谱后台布局线程已启动")
+
+    def stop_background(self):
+        """停止后台线程"""
+        self._stop_event.set()
+        self._refresh_event.set()
+
+
+def _atomic_write(path: str, content: str):
+    """先写临时文件再替换，避免查看器读到半截数据"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+_layout_cache: Optional[GraphLayoutCache] = None
+
+
+def get_layout_cache() -> GraphLayoutCache:
+    """获取全局布局缓存实例"""
+    global _layout_cache
+    if _layout_cache is None:
+        _layout_cache = GraphLayoutCache()
+    return _layout_cache
@@ -7,6 +7,7 @@ from .quintuple_extractor import extract_quintuples
 from .quintuple_graph import store_quintuples, query_graph_by_keywords, get_all_quintuples
 from .quintuple_rag_query import query_knowledge, set_context
 from .task_manager import task_manager, start_auto_cleanup, start_task_manager
+from .graph_layout_cache import get_layout_cache
 from config import config, AI_NAME
 
 logger = logging.getLogger(__name__)
@@ -35,9 +36,16 @@ class GRAGMemoryManager:
             # 启动自动清理任务
             start_auto_cleanup()
 
-            # 设置任务完成回调
+            # 后台预计算知识图谱布局，打开心智云图时无需现场生成
+            get_layout_cache().start_background(
+                max_nodes=config.grag.graph_view_max_nodes,
+                prune_by=config.grag.graph_view_prune_by
+            )
+
+            # 设置任务回调（在任务管理器的事件循环中被await，存储成功后任务才会被确认）
             self._weak_ref = weakref.ref(self)
             task_manager.on_task_completed = self._on_task_completed_wrapper
+            task_manager.on_task_failed = self._on_task_failed_wrapper
 
         except Exception as e:
             logger.error(f"GRAG记忆系统初始化失败: {e}")
@@ -62,12 +70,11 @@ class GRAGMemoryManager:
                 try:
                     if not task_manager.is_running:
                         logger.warning("任务管理器未运行，正在启动...")
-                        from .task_manager import start_task_manager
                         await start_task_manager()
-                        await asyncio.sleep(1)  # 等待启动完成
 
                     logger.info(f"任务管理器状态: running={task_manager.is_running}, workers={len(task_manager.worker_tasks)}")
 
+                    # 只写入持久化队列，不等待提取
                     task_id = await task_manager.add_task(conversation_text)
                     self.active_tasks.add(task_id)
                     logger.info(f"已提交五元组提取任务: {task_id}")
@@ -84,36 +91,45 @@ class GRAGMemoryManager:
 
 
     def _on_task_completed_wrapper(self, task_id: str, quintuples: List):
-        """包装回调方法，处理实例可能被销毁的情况"""
+        """包装回调方法，处理实例可能被销毁的情况；返回协程由任务管理器在其事件循环中await"""
         instance = self._weak_ref()
         if instance:
-            asyncio.run_coroutine_threadsafe(
-                instance._on_task_completed(task_id, quintuples),
-                loop=asyncio.get_event_loop()
-            )
+            return instance._on_task_completed(task_id, quintuples)
+        return None
 
-    async def _on_task_completed(self, task_id: str, quintuples: List) -> None:
+    def _on_task_failed_wrapper(self, task_id: str, error: str):
+        """包装失败回调"""
+        instance = self._weak_ref()
+        if instance:
+            return instance._on_task_failed(task_id, error)
+        return None
+
+    async def _on_task_completed(self, task_id: str, quintuples: List) -> bool:
+        """任务完成回调，返回False时任务管理器会重试该任务"""
         try:
-            self.active_tasks.discard(task_id)
             logger.info(f"任务完成回调: {task_id}, 提取到 {len(quintuples)} 个五元组")
 
-            # 确保在事件循环线程中执行
             if not quintuples:
                 logger.warning(f"任务 {task_id} 未提取到五元组")
-                return
+                self.active_tasks.discard(task_id)
+                return True
 
             logger.debug(f"准备存储五元组: {quintuples[:2]}...")
 
-            # 直接调用同步存储函数（避免线程切换）
-            store_success = store_quintuples(quintuples)
+            # 存储涉及文件与Neo4j IO，放到线程中执行避免阻塞事件循环
+            store_success = await asyncio.to_thread(store_quintuples, quintuples)
 
             if store_success:
+                self.active_tasks.discard(task_id)
+                get_layout_cache().request_refresh()
                 logger.info(f"任务 {task_id} 的五元组存储成功")
             else:
                 logger.error(f"任务 {task_id} 的五元组存储失败")
+            return store_success
 
         except Exception as e:
             logger.error(f"任务完成回调处理失败: {e}")
+            return False
 
     async def _on_task_failed(self, task_id: str, error: str) -> None:
         """任务失败回调"""
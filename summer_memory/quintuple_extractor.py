@@ -13,6 +13,7 @@ from pydantic import BaseModel
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from config import config
+from llm_rate_limiter import get_rate_limiter, Priority
 from openai import OpenAI, AsyncOpenAI
 
 # 初始化OpenAI客户端
@@ -74,17 +75,18 @@ async def _extract_quintuples_async_structured(text):
 
         try:
             # 尝试使用结构化输出
-            completion = await async_client.beta.chat.completions.parse(
-                model=config.api.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"请从以下文本中提取五元组：\n\n{text}"}
-                ],
-                response_format=QuintupleResponse,
-                max_tokens=config.api.max_tokens,
-                temperature=0.3,
-                timeout=600 + (attempt * 20)
-            )
+            async with get_rate_limiter().limit(config.api.base_url, Priority.BACKGROUND):
+                completion = await async_client.beta.chat.completions.parse(
+                    model=config.api.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": f"请从以下文本中提取五元组：\n\n{text}"}
+                    ],
+                    response_format=QuintupleResponse,
+                    max_tokens=config.api.max_tokens,
+                    temperature=0.3,
+                    timeout=600 + (attempt * 20)
+                )
 
             # 解析结果
             result = completion.choices[0].message.parsed
@@ -131,13 +133,14 @@ async def _extract_quintuples_async_fallback(text):
 
     for attempt in range(max_retries + 1):
         try:
-            response = await async_client.chat.completions.create(
-                model=config.api.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=config.api.max_tokens,
-                temperature=0.3,
-                timeout=600 + (attempt * 20)
-            )
+            async with get_rate_limiter().limit(config.api.base_url, Priority.BACKGROUND):
+                response = await async_client.chat.completions.create(
+                    model=config.api.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=config.api.max_tokens,
+                    temperature=0.3,
+                    timeout=600 + (attempt * 20)
+                )
             
             content = response.choices[0].message.content.strip()
             
@@ -195,17 +198,18 @@ def _extract_quintuples_structured(text):
 
         try:
             # 尝试使用结构化输出
-            completion = client.beta.chat.completions.parse(
-                model=config.api.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"请从以下文本中提取五元组：\n\n{text}"}
-                ],
-                response_format=QuintupleResponse,
-                max_tokens=config.api.max_tokens,
-                temperature=0.3,
-                timeout=600 + (attempt * 20)
-            )
+            with get_rate_limiter().limit_sync(config.api.base_url, Priority.BACKGROUND):
+                completion = client.beta.chat.completions.parse(
+                    model=config.api.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": f"请从以下文本中提取五元组：\n\n{text}"}
+                    ],
+                    response_format=QuintupleResponse,
+                    max_tokens=config.api.max_tokens,
+                    temperature=0.3,
+                    timeout=600 + (attempt * 20)
+                )
 
             # 解析结果
             result = completion.choices[0].message.parsed
@@ -252,13 +256,14 @@ def _extract_quintuples_fallback(text):
 
     for attempt in range(max_retries + 1):
         try:
-            response = client.chat.completions.create(
-                model=config.api.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=config.api.max_tokens,
-                temperature=0.5,
-                timeout=600 + (attempt * 20)
-            )
+            with get_rate_limiter().limit_sync(config.api.base_url, Priority.BACKGROUND):
+                response = client.chat.completions.create(
+                    model=config.api.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=config.api.max_tokens,
+                    temperature=0.5,
+                    timeout=600 + (attempt * 20)
+                )
 
             content = response.choices[0].message.content.strip()
             
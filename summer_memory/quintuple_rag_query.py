@@ -8,6 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from config import config
+from llm_rate_limiter import get_rate_limiter, Priority
 API_URL = f"{config.api.base_url.rstrip('/')}/chat/completions"
 
 # 设置日志
@@ -66,8 +67,9 @@ def query_knowledge(user_question):
         body["messages"] = [{"role": "user", "content": simplified_prompt}]
 
     try:
-        response = requests.post(API_URL, headers=headers, json=body, timeout=20)
-        response.raise_for_status()
+        with get_rate_limiter().limit_sync(config.api.base_url, Priority.NORMAL):
+            response = requests.post(API_URL, headers=headers, json=body, timeout=20)
+            response.raise_for_status()
         content = response.json()
 
         if "choices" not in content or not content["choices"]:
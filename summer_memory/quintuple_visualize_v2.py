@@ -1,8 +1,10 @@
-from pyvis.network import Network
 import webbrowser
 import json
 import os
 import logging
+from typing import Callable, Optional
+
+from summer_memory.graph_layout_cache import get_layout_cache, VIEW_HTML_FILE
 
 logger = logging.getLogger(__name__)
 
@@ -33,106 +35,60 @@ def load_quintuples_from_json():
         print(f"错误：读取文件时发生异常 - {e}")
         return set()
 
-def visualize_quintuples():
+def _view_settings():
+    """读取心智云图裁剪配置"""
+    try:
+        from config import config
+        return config.grag.graph_view_max_nodes, config.grag.graph_view_prune_by
+    except Exception:
+        return 2000, "degree"
+
+
+def current_view_file() -> Optional[str]:
+    """图谱自上次导出后未变化时直接返回已有页面路径，否则返回None（不阻塞，可在界面线程调用）"""
+    max_nodes, prune_by = _view_settings()
+    cache = get_layout_cache()
+    if cache.view_is_current(max_nodes=max_nodes, prune_by=prune_by):
+        return VIEW_HTML_FILE
+    return None
+
+
+def visualize_quintuples(open_browser: bool = True, progress: Optional[Callable[[int, str], None]] = None,
+                         cancelled: Optional[Callable[[], bool]] = None):
     """
-    直接从JSON文件中读取所有五元组，并生成可视化图谱 graph.html
-    解耦版本：不依赖Neo4j数据库，直接从JSON文件读取数据
+    生成知识图谱可视化页面 graph.html，返回页面路径
+    使用增量布局缓存：只为新增的节点和边计算坐标，导出按度数/新近度裁剪后的静态查看器
+    progress/cancelled透传给布局缓存，用于后台任务汇报进度和取消；被取消时返回None
     """
     try:
-        print("开始读取五元组数据...")
-        quintuples = load_quintuples_from_json()
-        print(f"读取到 {len(quintuples)} 条原始数据")
-        
-        if not quintuples:
-            logger.warning("从JSON文件中未获取到任何五元组，无法生成可视化图谱")
+        max_nodes, prune_by = _view_settings()
+        cache = get_layout_cache()
+        if not os.path.exists(cache.source_file):
+            logger.warning("未找到五元组文件，无法生成可视化图谱")
             print("未获取到任何五元组，无法生成图谱。")
-            return
-        
-        logger.info(f"从JSON文件获取到 {len(quintuples)} 条五元组进行可视化")
+            return None
 
-        # 过滤非法五元组
-        print("开始过滤无效五元组...")
-        valid_quintuples = [
-            t for t in quintuples
-            if isinstance(t, tuple) and len(t) == 5 and all(isinstance(x, str) and x.strip() for x in t)
-        ]
-        print(f"过滤后剩余 {len(valid_quintuples)} 条有效五元组")
-        
-        if not valid_quintuples:
+        html_file = cache.ensure_view(max_nodes=max_nodes, prune_by=prune_by, progress=progress, cancelled=cancelled)
+        if html_file is None:
+            logger.info("心智云图生成已取消")
+            return None
+        if not cache.nodes:
             print("错误：没有有效的五元组数据！")
-            return
-        
-        print("开始创建网络图...")
-        net = Network(height='1600px', width='100%', notebook=False)
-        net.use_template = False
-        net.barnes_hut()
-        net.set_options("""
-        var options = {
-          "physics": {
-            "barnesHut": {
-              "gravitationalConstant": -8000,
-              "springLength": 100,
-              "springConstant": 0.04
-            },
-            "minVelocity": 0.75
-          }
-        }
-        """)
-
-        added_nodes = set()
-        # 定义不同实体类型的颜色
-        type_colors = {
-            '人物': '#FF6B6B',
-            '地点': '#4ECDC4', 
-            '组织': '#45B7D1',
-            '物品': '#96CEB4',
-            '概念': '#FFEAA7',
-            '时间': '#DDA0DD',
-            '事件': '#F4A460',
-            '活动': '#FFB347'
-        }
-        default_color = '#CCCCCC'
-        
-        print("开始构建图谱节点和边...")
-        edge_count = 0
-        for head, head_type, rel, tail, tail_type in valid_quintuples:
-            # 添加主体节点
-            if head not in added_nodes:
-                head_color = type_colors.get(head_type, default_color)
-                net.add_node(head, label=f"{head}\n({head_type})", color=head_color, font={'size': 20})
-                added_nodes.add(head)
-            
-            # 添加客体节点
-            if tail not in added_nodes:
-                tail_color = type_colors.get(tail_type, default_color)
-                net.add_node(tail, label=f"{tail}\n({tail_type})", color=tail_color, font={'size': 20})
-                added_nodes.add(tail)
-            
-            # 添加关系边
-            net.add_edge(head, tail, label=rel, length=120, font={'size': 18})
-            edge_count += 1
-
-        print(f"图谱构建完成：{len(added_nodes)} 个节点，{edge_count} 条边")
-        print("正在生成HTML文件...")
-        # 确保目录存在
-        import os
-        os.makedirs("logs/knowledge_graph", exist_ok=True)
-        
-        html_file = "logs/knowledge_graph/graph.html"
-        net.write_html(html_file)
-        print(f"HTML文件生成完成：{html_file}")
+            return None
+        print(f"HTML文件已就绪：{html_file}")
 
-        try:
-            print("尝试打开浏览器...")
-            # 获取正确的绝对路径
-            abs_html_path = os.path.abspath(html_file)
-            webbrowser.open("file:///" + abs_html_path)
-            print("浏览器打开成功！")
-        except Exception as e:
-            print(f"无法自动打开浏览器：{e}")
+        if open_browser:
+            try:
+                print("尝试打开浏览器...")
+                # 获取正确的绝对路径
+                abs_html_path = os.path.abspath(html_file)
+                webbrowser.open("file:///" + abs_html_path)
+                print("浏览器打开成功！")
+            except Exception as e:
+                print(f"无法自动打开浏览器：{e}")
 
-        print("知识图谱已生成：graph.html，请手动打开查看。")
         logger.info("知识图谱可视化完成，文件 graph.html 已生成")
+        return html_file
 
     except Exception as e:
         print(f"发生异常：{type(e).__name__}: {e}")
@@ -140,6 +96,7 @@ def visualize_quintuples():
         traceback.print_exc()
         logger.error(f"可视化五元组失败: {e}")
         print(f"生成知识图谱失败: {e}")
+        return None
 
 
 # 添加主函数用于测试
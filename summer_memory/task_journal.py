@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认队列数据库位置，与五元组数据放在一起
+DEFAULT_JOURNAL_PATH = "logs/knowledge_graph/extraction_queue.db"
+
+
+class ExtractionJournal:
+    """五元组提取任务持久化队列（SQLite WAL）
+
+    所有待处理任务先落盘再调度，工作协程通过租约领取任务，
+    处理完成后确认(ack)；进程崩溃时未确认的任务会在下次启动时重新入队，
+    实现至少一次(at-least-once)投递。
+    """
+
+    def __init__(self, db_path: str = DEFAULT_JOURNAL_PATH, lease_seconds: float = 120.0):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()  # sqlite连接跨线程共享，需串行化
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        """打开数据库并建表"""
+        with self._lock:
+            if self._conn is not None:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_tasks (
+                    task_id TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease_until REAL,
+                    completed_at REAL,
+                    retry_count INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tasks_status ON extraction_tasks(status, available_at, created_at)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_hash ON extraction_tasks(text_hash, status)")
+            self._conn = conn
+            logger.info(f"提取任务队列已打开: {self.db_path}")
+
+    def close(self):
+        """关闭数据库"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def enqueue(self, task_id: str, text: str, text_hash: str) -> Tuple[str, bool]:
+        """写入新任务，返回(任务ID, 是否新建)；相同文本的未完成任务会被复用"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT task_id FROM extraction_tasks WHERE text_hash = ? AND status IN ('pending', 'running') LIMIT 1",
+                (text_hash,)
+            ).fetchone()
+            if row:
+                return row[0], False
+            self._conn.execute(
+                "INSERT INTO extraction_tasks (task_id, text, text_hash, status, created_at, available_at) "
+                "VALUES (?, ?, ?, 'pending', ?, ?)",
+                (task_id, text, text_hash, now, now)
+            )
+            return task_id, True
+
+    def claim(self) -> Optional[Dict]:
+        """以租约方式领取一个可执行任务，没有时返回None"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT task_id, text, text_hash, created_at, retry_count FROM extraction_tasks "
+                    "WHERE (status = 'pending' AND available_at <= ?) OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE extraction_tasks SET status = 'running', lease_until = ? WHERE task_id = ?",
+                    (now + self.lease_seconds, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {
+            "task_id": row[0],
+            "text": row[1],
+            "text_hash": row[2],
+            "created_at": row[3],
+            "retry_count": row[4],
+        }
+
+    def ack(self, task_id: str, result: List):
+        """确认任务完成"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE extraction_tasks SET status = 'completed', completed_at = ?, lease_until = NULL, result = ? "
+                "WHERE task_id = ?",
+                (time.time(), json.dumps(result, ensure_ascii=False), task_id)
+            )
+
+    def retry(self, task_id: str, error: str, delay: float):
+        """任务失败但可重试：延迟后重新入队"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE extraction_tasks SET status = 'pending', available_at = ?, lease_until = NULL, "
+                "retry_count = retry_count + 1, error = ? WHERE task_id = ?",
+                (now + delay, error, task_id)
+            )
+
+    def fail(self, task_id: str, error: str, status: str = "failed"):
+        """标记任务最终失败或取消"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE extraction_tasks SET status = ?, completed_at = ?, lease_until = NULL, error = ? "
+                "WHERE task_id = ?",
+                (status, time.time(), error, task_id)
+            )
+
+    def recover(self) -> int:
+        """启动时恢复：上次进程遗留的running任务全部回到pending"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE extraction_tasks SET status = 'pending', lease_until = NULL, available_at = ? "
+                "WHERE status = 'running'",
+                (time.time(),)
+            )
+            return cursor.rowcount
+
+    def shed_overflow(self, max_pending: int) -> List[str]:
+        """积压超过上限时丢弃最旧的待处理任务（记录为cancelled，不会静默丢失），返回被丢弃的任务ID"""
+        with self._lock:
+            pending = self._conn.execute(
+                "SELECT COUNT(*) FROM extraction_tasks WHERE status = 'pending'"
+            ).fetchone()[0]
+            overflow = pending - max_pending
+            if overflow <= 0:
+                return []
+            dropped = [row[0] for row in self._conn.execute(
+                "SELECT task_id FROM extraction_tasks WHERE status = 'pending' ORDER BY created_at LIMIT ?",
+                (overflow,)
+            ).fetchall()]
+            self._conn.executemany(
+                "UPDATE extraction_tasks SET status = 'cancelled', completed_at = ?, error = '队列溢出' "
+                "WHERE task_id = ?",
+                [(time.time(), task_id) for task_id in dropped]
+            )
+            return dropped
+
+    def purge(self, older_than: float) -> int:
+        """删除早于指定时间的已结束任务"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM extraction_tasks WHERE status IN ('completed', 'failed', 'cancelled') "
+                "AND completed_at IS NOT NULL AND completed_at < ?",
+                (older_than,)
+            )
+            return cursor.rowcount
+
+    def pending_tasks(self) -> List[Dict]:
+        """列出所有未完成任务"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, text, text_hash, created_at, retry_count FROM extraction_tasks "
+                "WHERE status IN ('pending', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [
+            {"task_id": r[0], "text": r[1], "text_hash": r[2], "created_at": r[3], "retry_count": r[4]}
+            for r in rows
+        ]
+
+    def counts(self) -> Dict[str, int]:
+        """按状态统计任务数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM extraction_tasks GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
@@ -6,6 +6,8 @@ from typing import Dict, List, Optional, Callable, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import hashlib
+import inspect
+import math
 import traceback
 import os
 import sys
@@ -18,6 +20,8 @@ except ImportError:
     logger = logging.getLogger(__name__)
     logger.warning("无法导入 config 模块，使用默认设置")
 
+from .task_journal import ExtractionJournal, DEFAULT_JOURNAL_PATH
+
 logger = logging.getLogger(__name__)
 
 
@@ -48,44 +52,63 @@ class ExtractionTask:
 
 
 class QuintupleTaskManager:
-    """五元组提取任务管理器 - 重构版"""
+    """五元组提取任务管理器 - 持久化队列版
+
+    任务先写入磁盘队列(ExtractionJournal)再由工作协程领取，
+    add_task只做一次本地写入，不会因为队列积压而阻塞对话流程；
+    工作协程数量根据观测到的LLM耗时和积压量自动伸缩。
+    """
 
-    def __init__(self, max_workers: int = 3, max_queue_size: int = 100):
+    def __init__(self, max_workers: int = None, max_queue_size: int = None, min_workers: int = None):
         # 从配置文件读取设置或使用默认值
         try:
             self.max_workers = max_workers or config.grag.max_workers
+            self.min_workers = min_workers or config.grag.min_workers
             self.max_queue_size = max_queue_size or config.grag.max_queue_size
             self.task_timeout = config.grag.task_timeout
             self.auto_cleanup_hours = config.grag.auto_cleanup_hours
+            self.queue_db_path = config.grag.queue_db_path
+            self.drain_target_seconds = config.grag.queue_drain_target
             self.enabled = True
         except Exception:
             self.max_workers = max_workers or 3
-            self.max_queue_size = max_queue_size or 100
+            self.min_workers = min_workers or 1
+            self.max_queue_size = max_queue_size or 1000
             self.task_timeout = 30
             self.auto_cleanup_hours = 24
+            self.queue_db_path = DEFAULT_JOURNAL_PATH
+            self.drain_target_seconds = 30.0
             self.enabled = True
+        self.min_workers = max(1, min(self.min_workers, self.max_workers))
 
-        # 任务存储
+        # 任务存储：内存中只保留状态索引，待处理任务以磁盘队列为准
         self.tasks: Dict[str, ExtractionTask] = {}
-        self.task_queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.journal = ExtractionJournal(self.queue_db_path, lease_seconds=max(self.task_timeout * 4, 60))
 
         # 工作协程管理
-        self.worker_tasks: List[asyncio.Task] = []
+        self.worker_tasks: Dict[str, asyncio.Task] = {}
+        self.target_workers = self.min_workers
         self.is_running = False
         self.lock = asyncio.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None  # 工作协程所在的事件循环
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker_seq = 0
 
         # 统计信息
         self.completed_tasks = 0
         self.failed_tasks = 0
+        self.dropped_tasks = 0
+        self.latency_ewma: Optional[float] = None  # 单任务耗时的指数滑动平均（秒）
 
-        # 回调函数
+        # 回调函数（可返回协程，返回False表示处理失败需要重试）
         self.on_task_completed: Optional[Callable] = None
         self.on_task_failed: Optional[Callable] = None
 
-        # 自动清理任务
+        # 自动清理与伸缩任务
         self.cleanup_task: Optional[asyncio.Task] = None
+        self.autoscale_task: Optional[asyncio.Task] = None
 
-        logger.info(f"任务管理器初始化完成: workers={self.max_workers}, queue_size={self.max_queue_size}")
+        logger.info(f"任务管理器初始化完成: workers={self.min_workers}-{self.max_workers}, queue_size={self.max_queue_size}")
 
     async def start(self):
         if self.is_running:
@@ -97,31 +120,38 @@ class QuintupleTaskManager:
 
         try:
             # 确保在事件循环中运行
-            loop = asyncio.get_running_loop()
+            self.loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+
+            # 打开磁盘队列并恢复上次未完成的任务
+            await asyncio.to_thread(self.journal.open)
+            recovered = await asyncio.to_thread(self.journal.recover)
+            pending = await asyncio.to_thread(self.journal.pending_tasks)
+            async with self.lock:
+                for row in pending:
+                    self._ensure_task(row)
+            if recovered or pending:
+                logger.info(f"从持久化队列恢复 {len(pending)} 个待处理任务（其中 {recovered} 个为中断任务）")
 
             # 创建工作协程
-            for i in range(self.max_workers):
-                worker_task = loop.create_task(  # 使用当前循环创建任务
-                    self._worker_loop(f"worker-{i + 1}"),
-                    name=f"task_worker_{i}"
-                )
-                self.worker_tasks.append(worker_task)
-
-            # 添加工作协程状态检查
-            await asyncio.sleep(0.5)  # 短暂等待协程启动
-            active_workers = sum(1 for t in self.worker_tasks if not t.done())
+            self.target_workers = self._desired_workers(len(pending))
+            for _ in range(self.target_workers):
+                self._spawn_worker()
+
+            active_workers = sum(1 for t in self.worker_tasks.values() if not t.done())
             logger.info(f"活跃工作协程: {active_workers}/{self.max_workers}")
 
-            # 启动自动清理任务 - 添加异常处理
+            # 启动自动清理与伸缩任务 - 添加异常处理
             try:
-                self.cleanup_task = asyncio.create_task(self._auto_cleanup_loop())
+                self.cleanup_task = self.loop.create_task(self._auto_cleanup_loop())
+                self.autoscale_task = self.loop.create_task(self._autoscale_loop())
                 logger.info("自动清理任务已启动")
             except Exception as e:
                 logger.error(f"启动自动清理任务失败: {e}, 但任务管理器将继续运行")
                 # 即使自动清理失败，也不关闭任务管理器
                 self.cleanup_task = None
 
-            logger.info(f"任务管理器已启动，工作线程数: {self.max_workers}")
+            logger.info(f"任务管理器已启动，工作协程数: {self.target_workers}")
         except Exception as e:
             logger.error(f"启动任务管理器失败: {e}")
             self.is_running = False
@@ -132,25 +162,29 @@ class QuintupleTaskManager:
         if not self.is_running:
             return
 
+        logger.warning("任务管理器正在关闭...")
         self.is_running = False
 
-        # 取消所有工作协程
-        for task in self.worker_tasks:
+        # 取消所有工作协程；未确认的任务保留在磁盘队列中，下次启动时恢复
+        workers = list(self.worker_tasks.values())
+        for task in workers:
             task.cancel()
 
         # 等待工作协程完成
-        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        await asyncio.gather(*workers, return_exceptions=True)
+        self.worker_tasks.clear()
 
-        # 取消清理任务
-        if self.cleanup_task:
-            self.cleanup_task.cancel()
-            try:
-                await self.cleanup_task
-            except asyncio.CancelledError:
-                pass
-        logger.warning("任务管理器正在关闭...")
-        logger.warning(f"调用栈: {''.join(traceback.format_stack())}")
+        # 取消清理与伸缩任务
+        for background in (self.cleanup_task, self.autoscale_task):
+            if background:
+                background.cancel()
+                try:
+                    await background
+                except asyncio.CancelledError:
+                    pass
 
+        await asyncio.to_thread(self.journal.recover)
+        await asyncio.to_thread(self.journal.close)
         logger.info("任务管理器已停止")
 
     def _generate_task_id(self, text: str) -> str:
@@ -163,13 +197,42 @@ class QuintupleTaskManager:
         """生成文本哈希值"""
         return hashlib.sha256(text.encode()).hexdigest()
 
+    def _ensure_task(self, row: Dict) -> ExtractionTask:
+        """根据队列记录获取或创建内存中的任务对象（需持有锁）"""
+        task = self.tasks.get(row["task_id"])
+        if task is None:
+            task = ExtractionTask(
+                task_id=row["task_id"],
+                text=row["text"],
+                text_hash=row["text_hash"],
+                status=TaskStatus.PENDING,
+                created_at=row["created_at"],
+                retry_count=row.get("retry_count", 0),
+                future=self.loop.create_future() if self.loop else None
+            )
+            self.tasks[task.task_id] = task
+        return task
+
+    def _notify_workers(self):
+        """唤醒等待中的工作协程（可从任意线程/事件循环调用）"""
+        if not self.loop or not self._wakeup:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._wakeup.set()
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+
     def is_active(self) -> bool:
         """检查任务管理器是否活跃运行"""
-        return self.is_running and any(not t.done() for t in self.worker_tasks)
+        return self.is_running and any(not t.done() for t in self.worker_tasks.values())
 
     async def add_task(self, text: str) -> str:
-        logger.info("add_task被调用")  # 改为INFO级别确保输出
-        """添加新的提取任务"""
+        """添加新的提取任务（只写入磁盘队列，不等待队列空位）"""
+        logger.info("add_task被调用")
         if not self.enabled:
             raise RuntimeError("任务管理器已禁用")
 
@@ -183,43 +246,30 @@ class QuintupleTaskManager:
             logger.warning("任务管理器未运行，尝试启动...")
             await self.start()  # 确保任务管理器已启动
 
-        # 检查重复任务
-        async with self.lock:
-            for task in self.tasks.values():
-                if task.text_hash == text_hash and task.status in [TaskStatus.PENDING, TaskStatus.RUNNING]:
-                    logger.info(f"发现重复任务: {task.task_id}")
-                    return task.task_id
-
-        # 创建新任务
-        task_id = self._generate_task_id(text)
-        task = ExtractionTask(
-            task_id=task_id,
-            text=text,
-            text_hash=text_hash,
-            status=TaskStatus.PENDING,
-            created_at=time.time(),
-            future=asyncio.Future()
+        # 写入磁盘队列，相同文本的未完成任务直接复用
+        task_id, created = await asyncio.to_thread(
+            self.journal.enqueue, self._generate_task_id(text), text, text_hash
         )
+        if not created:
+            logger.info(f"发现重复任务: {task_id}")
+            return task_id
 
-        # 添加到任务字典
+        row = {"task_id": task_id, "text": text, "text_hash": text_hash, "created_at": time.time()}
         async with self.lock:
-            self.tasks[task_id] = task
-
-        logger.info(f"添加新任务: {task_id} (长度={len(text)})")
-
-        # 将任务放入队列
-        try:
-            if self.task_queue.full():
-                logger.warning(f"任务队列已满 ({self.task_queue.qsize()}/{self.max_queue_size})")
+            self._ensure_task(row)
+        logger.info(f"任务已写入持久化队列: {task_id} (长度={len(text)})")
 
-            await self.task_queue.put(task)
-            logger.info(f"任务已加入队列: {task_id}")
-            return task_id
-        except Exception as e:
-            logger.error(f"加入队列失败: {task_id}, 错误: {e}")
+        # 积压超限时丢弃最旧的任务，保证队列有界
+        dropped = await asyncio.to_thread(self.journal.shed_overflow, self.max_queue_size)
+        if dropped:
+            logger.warning(f"任务队列积压超过 {self.max_queue_size}，已丢弃 {len(dropped)} 个最旧任务")
             async with self.lock:
-                del self.tasks[task_id]
-            raise RuntimeError("加入队列失败")
+                for dropped_id in dropped:
+                    self._finish_cancelled(dropped_id, "队列溢出")
+            self.dropped_tasks += len(dropped)
+
+        self._notify_workers()
+        return task_id
 
     async def get_task_result(self, task_id: str, timeout: float = None) -> Tuple[List, str]:
         """获取任务结果，支持超时等待"""
@@ -233,9 +283,12 @@ class QuintupleTaskManager:
             elif task.status in [TaskStatus.FAILED, TaskStatus.CANCELLED]:
                 return None, task.error or "任务失败或被取消"
 
-        # 等待任务完成
+        # 等待任务完成（future属于工作协程所在的事件循环）
         try:
-            await asyncio.wait_for(task.future, timeout=timeout)
+            waiter = task.future
+            if self.loop is not asyncio.get_running_loop():
+                waiter = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._wait_future(task), self.loop))
+            await asyncio.wait_for(waiter, timeout=timeout)
             if task.status == TaskStatus.COMPLETED:
                 return task.result, None
             else:
@@ -244,110 +297,199 @@ class QuintupleTaskManager:
             return None, "任务超时"
         except asyncio.CancelledError:
             return None, "任务被取消"
+        except Exception:
+            return None, task.error or "任务失败"
+
+    @staticmethod
+    async def _wait_future(task: ExtractionTask):
+        return await task.future
+
+    def _desired_workers(self, backlog: int) -> int:
+        """根据积压量和平均耗时计算期望的工作协程数"""
+        if backlog <= 0:
+            return self.min_workers
+        if self.latency_ewma is None:
+            desired = backlog
+        else:
+            # 在drain_target_seconds内消化积压所需的并发数
+            desired = math.ceil(backlog * self.latency_ewma / max(self.drain_target_seconds, 1.0))
+        return max(self.min_workers, min(self.max_workers, desired))
+
+    def _spawn_worker(self):
+        """创建一个新的工作协程"""
+        self._worker_seq += 1
+        worker_id = f"worker-{self._worker_seq}"
+        self.worker_tasks[worker_id] = self.loop.create_task(
+            self._worker_loop(worker_id),
+            name=f"task_worker_{self._worker_seq}"
+        )
+
+    def _record_latency(self, seconds: float):
+        """更新耗时滑动平均"""
+        if self.latency_ewma is None:
+            self.latency_ewma = seconds
+        else:
+            self.latency_ewma = 0.8 * self.latency_ewma + 0.2 * seconds
+
+    def _finish_cancelled(self, task_id: str, error: str):
+        """将内存中的任务标记为取消（需持有锁）"""
+        task = self.tasks.get(task_id)
+        if task and task.status in [TaskStatus.PENDING, TaskStatus.RUNNING]:
+            task.status = TaskStatus.CANCELLED
+            task.error = error
+            task.completed_at = time.time()
+            if task.future and not task.future.done():
+                task.future.cancel()
+
+    async def _invoke_callback(self, callback: Optional[Callable], *args) -> bool:
+        """调用回调，兼容同步函数与协程；返回False表示处理失败"""
+        if not callback:
+            return True
+        outcome = callback(*args)
+        if inspect.isawaitable(outcome):
+            outcome = await outcome
+        return outcome is not False
 
     async def _worker_loop(self, worker_id: str):
         """工作协程主循环"""
         logger.info(f"工作协程启动: {worker_id}")
 
-        # === 添加启动确认日志 ===
-        logger.info(f"✅ {worker_id} 已进入工作循环，状态: running={self.is_running}")
-
-        while self.is_running:
-            try:
-                # === 添加队列状态日志 ===
-                logger.debug(f"{worker_id} 正在等待新任务 (队列大小: {self.task_queue.qsize()})")
+        try:
+            while self.is_running:
+                # 伸缩：超出期望数量的工作协程在空闲时退出
+                if len(self.worker_tasks) > self.target_workers:
+                    logger.info(f"{worker_id} 按负载缩容退出")
+                    break
 
-                # 使用带超时的get，避免永久阻塞
                 try:
-                    task = await asyncio.wait_for(self.task_queue.get(), timeout=1.0)
-                except asyncio.TimeoutError:
-                    # 超时但继续循环检查
+                    row = await asyncio.to_thread(self.journal.claim)
+                except Exception as e:
+                    logger.error(f"{worker_id} 领取任务失败: {e}")
+                    await asyncio.sleep(1)
                     continue
 
-                logger.info(f"{worker_id} 获取到任务: {task.task_id}")
-
-                if task.status != TaskStatus.PENDING:
-                    logger.warning(f"任务状态异常: {task.task_id} ({task.status.value})")
-                    self.task_queue.task_done()
+                if row is None:
+                    # 队列为空，等待新任务通知或定期轮询（处理延迟重试的任务）
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wakeup.clear()
                     continue
 
-                # 更新任务状态
-                task.status = TaskStatus.RUNNING
-                task.started_at = time.time()
+                async with self.lock:
+                    task = self._ensure_task(row)
+                    task.retry_count = row["retry_count"]
+                    if task.status == TaskStatus.CANCELLED:
+                        await asyncio.to_thread(self.journal.fail, task.task_id, task.error or "任务被取消", "cancelled")
+                        continue
+                    task.status = TaskStatus.RUNNING
+                    task.started_at = time.time()
+
                 logger.info(f"{worker_id} 开始处理任务: {task.task_id}")
+                await self._run_task(worker_id, task)
+        except asyncio.CancelledError:
+            logger.info(f"{worker_id} 工作协程被取消")
+        except Exception as e:
+            logger.error(f"{worker_id} 工作协程异常: {str(e)}")
+            logger.error(traceback.format_exc())
+        finally:
+            self.worker_tasks.pop(worker_id, None)
+
+    async def _run_task(self, worker_id: str, task: ExtractionTask):
+        """执行单个任务：提取 -> 回调存储 -> 确认；失败时按退避重试"""
+        result = None
+        error = None
+        try:
+            # 导入提取函数（避免循环导入）
+            from .quintuple_extractor import extract_quintuples_async
+            logger.info(f"{worker_id} 调用五元组提取API: {task.task_id}")
+
+            # 使用超时控制执行任务
+            started = time.monotonic()
+            result = await asyncio.wait_for(
+                extract_quintuples_async(task.text),
+                timeout=self.task_timeout
+            )
+            self._record_latency(time.monotonic() - started)
+            logger.info(f"{worker_id} 提取到 {len(result)} 个五元组: {task.task_id}")
+
+            # 结果处理（存储）成功后才确认任务，保证至少一次投递
+            if not await self._invoke_callback(self.on_task_completed, task.task_id, result):
+                raise RuntimeError("结果存储失败")
+            await asyncio.to_thread(self.journal.ack, task.task_id, result)
 
-                # 执行任务
-                result = None
-                error = None
-                try:
-                    # 导入提取函数（避免循环导入）
-                    from .quintuple_extractor import extract_quintuples_async
-                    logger.info(f"{worker_id} 调用五元组提取API: {task.task_id}")
-
-                    # 使用超时控制执行任务
-                    result = await asyncio.wait_for(
-                        extract_quintuples_async(task.text),
-                        timeout=self.task_timeout
-                    )
-                    logger.info(f"{worker_id} 提取到 {len(result)} 个五元组: {task.text}")
-
-                    # 更新任务状态
-                    async with self.lock:
-                        task.status = TaskStatus.COMPLETED
-                        task.result = result
-                        task.completed_at = time.time()
-                        self.completed_tasks += 1
-
-                except asyncio.TimeoutError:
-                    error = "任务执行超时"
-                    logger.warning(f"{worker_id} 任务超时: {task.task_id}")
-                    async with self.lock:
-                        task.status = TaskStatus.FAILED
-                        task.error = error
-                        task.completed_at = time.time()
-                        self.failed_tasks += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._record_latency(self.task_timeout)
+            error = "任务执行超时"
+            logger.warning(f"{worker_id} 任务超时: {task.task_id}")
+        except Exception as e:
+            error = str(e)
+            logger.error(f"{worker_id} 任务失败: {task.task_id}, 错误: {error}")
+            logger.debug(traceback.format_exc())
 
-                except Exception as e:
-                    error = str(e)
-                    logger.error(f"{worker_id} 任务失败: {task.task_id}, 错误: {error}")
-                    traceback.print_exc()
-                    async with self.lock:
-                        task.status = TaskStatus.FAILED
-                        task.error = error
-                        task.completed_at = time.time()
-                        self.failed_tasks += 1
-
-                # 设置future结果
-                if not task.future.done():
-                    if task.status == TaskStatus.COMPLETED:
-                        task.future.set_result(result)
-                    else:
-                        task.future.set_exception(Exception(error or "任务失败"))
-
-                # 触发回调
-                try:
-                    if task.status == TaskStatus.COMPLETED and self.on_task_completed:
-                        self.on_task_completed(task.task_id, result)
-                    elif task.status == TaskStatus.FAILED and self.on_task_failed:
-                        self.on_task_failed(task.task_id, error)
-                except Exception as e:
-                    logger.error(f"任务回调失败: {task.task_id}, 错误: {str(e)}")
+        async with self.lock:
+            if task.status == TaskStatus.CANCELLED:
+                # 处理过程中被取消，队列记录已由cancel_task更新
+                return
+            if error is None:
+                task.status = TaskStatus.COMPLETED
+                task.result = result
+                task.completed_at = time.time()
+                self.completed_tasks += 1
+            elif task.retry_count < task.max_retries:
+                # 指数退避后重新入队
+                delay = 2 ** task.retry_count
+                task.retry_count += 1
+                task.status = TaskStatus.PENDING
+                task.error = error
+                await asyncio.to_thread(self.journal.retry, task.task_id, error, delay)
+                logger.info(f"任务将在 {delay}s 后重试: {task.task_id} ({task.retry_count}/{task.max_retries})")
+                return
+            else:
+                task.status = TaskStatus.FAILED
+                task.error = error
+                task.completed_at = time.time()
+                self.failed_tasks += 1
+                await asyncio.to_thread(self.journal.fail, task.task_id, error)
 
-                # 标记任务完成
-                self.task_queue.task_done()
-                logger.info(f"{worker_id} 任务处理完成: {task.task_id}")
+        # 设置future结果
+        if task.future and not task.future.done():
+            if task.status == TaskStatus.COMPLETED:
+                task.future.set_result(result)
+            else:
+                task.future.set_exception(Exception(error or "任务失败"))
 
+        if task.status == TaskStatus.FAILED:
+            try:
+                await self._invoke_callback(self.on_task_failed, task.task_id, error)
+            except Exception as e:
+                logger.error(f"任务回调失败: {task.task_id}, 错误: {str(e)}")
 
+        logger.info(f"{worker_id} 任务处理完成: {task.task_id}")
+
+    async def _autoscale_loop(self):
+        """根据积压与LLM耗时调整工作协程数量"""
+        while self.is_running:
+            try:
+                await asyncio.sleep(5)
+                counts = await asyncio.to_thread(self.journal.counts)
+                backlog = counts.get("pending", 0) + counts.get("running", 0)
+                desired = self._desired_workers(backlog)
+                if desired != self.target_workers:
+                    logger.info(
+                        f"调整工作协程数: {self.target_workers} -> {desired} "
+                        f"(积压={backlog}, 平均耗时={self.latency_ewma or 0:.1f}s)"
+                    )
+                    self.target_workers = desired
+                while len(self.worker_tasks) < self.target_workers:
+                    self._spawn_worker()
             except asyncio.CancelledError:
-                logger.info(f"{worker_id} 工作协程被取消")
                 break
-
             except Exception as e:
-                logger.error(f"{worker_id} 工作协程异常: {str(e)}")
-                logger.error(traceback.format_exc())
-                # 防止异常导致循环崩溃
-                await asyncio.sleep(1)
-
+                logger.error(f"工作协程伸缩失败: {e}")
 
     async def clear_completed_tasks(self, max_age_hours: int = None):
         """清理已完成的任务"""
@@ -369,6 +511,9 @@ class QuintupleTaskManager:
                 del self.tasks[task_id]
                 removed_count += 1
 
+        if self.is_running:
+            removed_count += await asyncio.to_thread(self.journal.purge, current_time - max_age_seconds)
+
         if removed_count > 0:
             logger.info(f"清理了 {removed_count} 个过期任务")
 
@@ -415,13 +560,9 @@ class QuintupleTaskManager:
                 return False
 
             if task.status in [TaskStatus.PENDING, TaskStatus.RUNNING]:
-                task.status = TaskStatus.CANCELLED
-                task.completed_at = time.time()
-
-                # 设置future异常
-                if task.future and not task.future.done():
-                    task.future.set_exception(asyncio.CancelledError("任务被取消"))
-
+                self._finish_cancelled(task_id, "任务被取消")
+                if self.is_running:
+                    await asyncio.to_thread(self.journal.fail, task_id, "任务被取消", "cancelled")
                 logger.info(f"任务已取消: {task_id}")
                 return True
 
@@ -451,6 +592,12 @@ class QuintupleTaskManager:
         failed_tasks = self.failed_tasks
         cancelled_tasks = sum(1 for task in self.tasks.values() if task.status == TaskStatus.CANCELLED)
 
+        try:
+            journal_counts = self.journal.counts() if self.is_running else {}
+        except Exception:
+            journal_counts = {}
+        queue_size = journal_counts.get("pending", 0)
+
         return {
             "enabled": self.enabled,
             "total_tasks": total_tasks,
@@ -459,10 +606,15 @@ class QuintupleTaskManager:
             "completed_tasks": completed_tasks,
             "failed_tasks": failed_tasks,
             "cancelled_tasks": cancelled_tasks,
+            "dropped_tasks": self.dropped_tasks,
             "max_workers": self.max_workers,
+            "active_workers": len(self.worker_tasks),
+            "target_workers": self.target_workers,
+            "avg_latency": round(self.latency_ewma, 2) if self.latency_ewma is not None else None,
             "max_queue_size": self.max_queue_size,
-            "queue_size": self.task_queue.qsize(),
-            "queue_usage": f"{self.task_queue.qsize()}/{self.max_queue_size}",
+            "queue_size": queue_size,
+            "queue_usage": f"{queue_size}/{self.max_queue_size}",
+            "journal": journal_counts,
             "task_timeout": self.task_timeout
         }
 
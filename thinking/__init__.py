@@ -3,7 +3,7 @@
 高级推理增强机制，支持多分支并行思考、偏好打分和遗传剪枝
 """
 
-from .tree_thinking import TreeThinkingEngine
+from .tree_thinking import TreeThinkingEngine, PHASE_SPEAKER
 from .thinking_node import ThinkingNode, ThinkingBranch
 from .difficulty_judge import DifficultyJudge
 from .preference_filter import PreferenceFilter, UserPreference
@@ -12,6 +12,7 @@ from .thread_pools import ThreadPoolManager
 
 __all__ = [
     'TreeThinkingEngine',
+    'PHASE_SPEAKER',
     'ThinkingNode', 
     'ThinkingBranch',
     'DifficultyJudge',
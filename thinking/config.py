@@ -17,6 +17,24 @@ TREE_THINKING_CONFIG = {
     "max_concurrent_api": 3,
     "min_api_interval": 0.5,
     
+    # 思考路线竞速调度
+    "route_scheduling": {
+        "enough_good_routes": 4,    # 合格路线达到此数即停止等待其余路线
+        "quality_threshold": 2.0,   # 本地快速评分（0-5）不低于此值视为合格
+        "soft_deadline": 20,        # 秒，过后只要已有可用路线就停止
+        "hard_deadline": 30,        # 秒，过后无论如何停止
+        "adaptive_routes": True,    # 按历史合格率减少发起的路线数
+        "stats_window": 50          # 统计最近多少条路线
+    },
+    
+    # 思考记忆召回（每个问题只召回一次，所有路线共用）
+    "memory_recall": {
+        "ttl": 300,             # 秒，相同问题的召回结果缓存时间
+        "max_entries": 64,      # 最多缓存的问题数
+        "wait_timeout": 5,      # 秒，生成路线前最多等待召回的时间
+        "max_chars": 600        # 提示词中记忆片段的最大长度
+    },
+    
     # 遗传算法配置
     "selection_rate": 0.6,
     "mutation_rate": 0.1,
@@ -58,6 +76,38 @@ COMPLEX_KEYWORDS = [
     "猜想", "证明", "推导", "计算", "建模", "仿真", "预测", "预估"
 ]
 
+# 评分用关键词分类（统一编译为多模式匹配器，一次扫描得到各类命中）
+SCORING_KEYWORDS = {
+    # PreferenceFilter
+    "complexity": ["分析", "评估", "综合", "推导", "验证", "优化"],
+    "reasoning": [
+        "因为", "所以", "由于", "因此", "导致", "基于", "根据",
+        "推导", "证明", "说明", "表明", "可见", "可以得出"
+    ],
+    "memory": [
+        "记得", "回忆", "之前", "以前", "历史", "经验",
+        "学过", "见过", "遇到", "类似", "相关"
+    ],
+    "innovation": [
+        "创新", "新颖", "独特", "原创", "突破", "创造",
+        "不同", "另辟蹊径", "新思路", "改进", "优化"
+    ],
+    "practical": [
+        "实用", "应用", "实践", "操作", "具体", "可行",
+        "方法", "步骤", "实施", "执行", "效果", "结果"
+    ],
+    # GeneticPruning
+    "genetic_innovation": [
+        "创新", "新颖", "独特", "突破", "原创", "改进",
+        "优化", "另类", "不同", "新思路", "创造"
+    ],
+    "unique_phrases": ["另一方面", "换个角度", "从另一个视角", "不妨考虑"],
+    "logical_connectors": ["因为", "所以", "然而", "但是", "因此", "由于"],
+    # DifficultyJudge
+    "complex": COMPLEX_KEYWORDS,
+    "connectives": ["然而", "但是", "因此", "所以", "由于", "如果", "虽然", "尽管"]
+}
+
 # 分支类型定义
 BRANCH_TYPES = {
     "logical": "逻辑分析型",
@@ -65,4 +115,11 @@ BRANCH_TYPES = {
     "analytical": "深度解析型",
     "practical": "实用导向型",
     "philosophical": "哲学思辨型"
-} 
\ No newline at end of file
+} 
+
+# 文本相似度配置（MinHash）
+SIMILARITY_CONFIG = {
+    "num_perm": 64,         # MinHash签名长度（分桶数），越长估计越准
+    "shingle_size": 3,      # 字符shingle长度，对无空格的中文同样有效
+    "signature_cache_size": 2048  # 按文本缓存签名的数量上限
+}
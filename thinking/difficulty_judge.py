@@ -5,8 +5,9 @@
 
 import re
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from .config import TREE_THINKING_CONFIG, COMPLEX_KEYWORDS, BRANCH_TYPES
+from .keyword_matcher import get_keyword_matcher
 
 logger = logging.getLogger("DifficultyJudge")
 
@@ -17,6 +18,7 @@ class DifficultyJudge:
         self.api_client = api_client
         self.config = TREE_THINKING_CONFIG
         self.complex_keywords = COMPLEX_KEYWORDS
+        self.keyword_matcher = get_keyword_matcher()
         
         # 难度评估权重
         self.weights = {
@@ -32,10 +34,11 @@ class DifficultyJudge:
     async def assess_difficulty(self, question: str) -> Dict:
         """评估问题难度"""
         try:
-            # 基础指标计算
+            # 基础指标计算（关键词一次扫描，供关键词和句式分析共用）
+            hits = self.keyword_matcher.scan(question)
             text_metrics = self._analyze_text_metrics(question)
-            keyword_metrics = self._analyze_keywords(question)
-            structure_metrics = self._analyze_structure(question)
+            keyword_metrics = self._analyze_keywords(question, hits)
+            structure_metrics = self._analyze_structure(question, hits)
             
             # AI深度评估（优先使用快速模型）
             ai_metrics = await self._ai_deep_assessment(question)
@@ -92,9 +95,9 @@ class DifficultyJudge:
         else:
             return 5.0  # 很复杂
     
-    def _analyze_keywords(self, question: str) -> float:
+    def _analyze_keywords(self, question: str, hits: Optional[Dict[str, Set[str]]] = None) -> float:
         """分析关键词复杂度"""
-        detected_keywords = self._extract_keywords(question)
+        detected_keywords = self._extract_keywords(question, hits)
         keyword_count = len(detected_keywords)
         
         # 根据关键词数量评分
@@ -109,15 +112,13 @@ class DifficultyJudge:
         else:
             return 5.0
     
-    def _extract_keywords(self, question: str) -> List[str]:
+    def _extract_keywords(self, question: str, hits: Optional[Dict[str, Set[str]]] = None) -> List[str]:
         """提取问题中的复杂关键词"""
-        detected = []
-        for keyword in self.complex_keywords:
-            if keyword in question:
-                detected.append(keyword)
-        return detected
+        if hits is None:
+            hits = self.keyword_matcher.scan(question)
+        return [keyword for keyword in self.complex_keywords if keyword in hits["complex"]]
     
-    def _analyze_structure(self, question: str) -> float:
+    def _analyze_structure(self, question: str, hits: Optional[Dict[str, Set[str]]] = None) -> float:
         """分析句式结构复杂度"""
         # 检查标点符号复杂度
         comma_count = question.count(',') + question.count('，')
@@ -125,8 +126,9 @@ class DifficultyJudge:
         question_marks = question.count('?') + question.count('？')
         
         # 检查连接词
-        connectives = ['然而', '但是', '因此', '所以', '由于', '如果', '虽然', '尽管']
-        connective_count = sum(1 for conn in connectives if conn in question)
+        if hits is None:
+            hits = self.keyword_matcher.scan(question)
+        connective_count = len(hits["connectives"])
         
         # 计算复杂度分数
         complexity = (comma_count * 0.5 + semicolon_count * 1.0 + 
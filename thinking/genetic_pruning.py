@@ -8,6 +8,8 @@ import logging
 from typing import List, Dict, Tuple, Optional
 from .thinking_node import ThinkingNode, ThinkingBranch, ThinkingGeneration
 from .config import TREE_THINKING_CONFIG
+from .similarity import get_similarity_engine
+from .keyword_matcher import get_keyword_matcher
 
 # numpy导入（可选，用于统计计算）
 try:
@@ -36,6 +38,10 @@ class GeneticPruning:
         self.crossover_rate = self.config["crossover_rate"]
         self.max_generations = self.config["max_generations"]
         
+        # 相似度引擎（MinHash签名缓存在节点上）
+        self.similarity = get_similarity_engine()
+        self.keyword_matcher = get_keyword_matcher()
+        
         # 进化历史
         self.generations: List[ThinkingGeneration] = []
         self.current_generation = 0
@@ -117,20 +123,25 @@ class GeneticPruning:
     
     async def _calculate_fitness(self, nodes: List[ThinkingNode]):
         """计算节点适应度"""
-        for node in nodes:
+        # 多样性一次性批量计算，避免逐节点重复分词和O(n²)扫描
+        diversity_scores = self.similarity.diversity_scores(nodes)
+        
+        for node, diversity_fitness in zip(nodes, diversity_scores):
             # 多维度适应度计算
             fitness_score = 0.0
             
+            # 关键词命中一次扫描得到，供内容质量和创新程度共用
+            hits = self.keyword_matcher.counts(node.content)
+            
             # 内容质量 (40%)
-            content_fitness = self._evaluate_content_quality(node.content)
+            content_fitness = self._evaluate_content_quality(node.content, hits)
             fitness_score += content_fitness * 0.4
             
             # 多样性贡献 (30%)
-            diversity_fitness = self._evaluate_diversity(node, nodes)
             fitness_score += diversity_fitness * 0.3
             
             # 创新程度 (20%)
-            innovation_fitness = self._evaluate_innovation(node.content)
+            innovation_fitness = self._evaluate_innovation(node.content, hits)
             fitness_score += innovation_fitness * 0.2
             
             # 偏好匹配 (10%)
@@ -140,7 +151,7 @@ class GeneticPruning:
             # 更新适应度
             node.fitness = round(fitness_score, 3)
     
-    def _evaluate_content_quality(self, content: str) -> float:
+    def _evaluate_content_quality(self, content: str, hits: Optional[Dict[str, int]] = None) -> float:
         """评估内容质量"""
         if not content:
             return 0.0
@@ -164,8 +175,9 @@ class GeneticPruning:
             quality_score += density * 0.3
         
         # 逻辑连贯性
-        logical_connectors = ["因为", "所以", "然而", "但是", "因此", "由于"]
-        connector_count = sum(1 for conn in logical_connectors if conn in content)
+        if hits is None:
+            hits = self.keyword_matcher.counts(content)
+        connector_count = hits["logical_connectors"]
         quality_score += min(connector_count / 3, 0.4)
         
         return min(quality_score, 1.0)
@@ -199,55 +211,16 @@ class GeneticPruning:
         
         return elite_nodes
     
-    def _evaluate_diversity(self, node: ThinkingNode, all_nodes: List[ThinkingNode]) -> float:
-        """评估节点多样性贡献"""
-        if len(all_nodes) <= 1:
-            return 1.0
-        
-        # 计算与其他节点的差异度
-        differences = []
-        node_words = set(node.content.lower().split())
-        
-        for other_node in all_nodes:
-            if other_node.id == node.id:
-                continue
-            
-            other_words = set(other_node.content.lower().split())
-            
-            # Jaccard距离
-            intersection = node_words & other_words
-            union = node_words | other_words
-            
-            if union:
-                jaccard_sim = len(intersection) / len(union)
-                jaccard_dist = 1 - jaccard_sim
-                differences.append(jaccard_dist)
-        
-        if differences:
-            return float(np.mean(differences))
-        else:
-            return 1.0
-    
-    def _evaluate_innovation(self, content: str) -> float:
+    def _evaluate_innovation(self, content: str, hits: Optional[Dict[str, int]] = None) -> float:
         """评估创新程度"""
-        innovation_keywords = [
-            "创新", "新颖", "独特", "突破", "原创", "改进", 
-            "优化", "另类", "不同", "新思路", "创造"
-        ]
-        
-        innovation_score = 0.0
-        content_lower = content.lower()
+        if hits is None:
+            hits = self.keyword_matcher.counts(content)
         
         # 关键词匹配
-        for keyword in innovation_keywords:
-            if keyword in content_lower:
-                innovation_score += 0.1
+        innovation_score = hits["genetic_innovation"] * 0.1
         
         # 独特表达检测
-        unique_phrases = ["另一方面", "换个角度", "从另一个视角", "不妨考虑"]
-        for phrase in unique_phrases:
-            if phrase in content:
-                innovation_score += 0.15
+        innovation_score += hits["unique_phrases"] * 0.15
         
         return min(innovation_score, 1.0)
     
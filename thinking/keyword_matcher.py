@@ -0,0 +1,174 @@
+"""
+多模式关键词匹配器
+将各评分器的关键词表编译为一个Aho-Corasick自动机，一次扫描文本即可得到每个分类命中的关键词，
+替代对同一段文本反复执行的 `keyword in content` 子串查找
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+from .config import SCORING_KEYWORDS
+
+
+class KeywordMatcher:
+    """Aho-Corasick多模式匹配器，支持一个关键词属于多个分类"""
+
+    def __init__(self, categories: Dict[str, Iterable[str]], ignore_case: bool = True):
+        self.ignore_case = ignore_case
+        self.categories: Dict[str, List[str]] = {}
+        self._patterns: List[str] = []
+        self._pattern_index: Dict[str, int] = {}
+        self._pattern_categories: List[List[str]] = []
+
+        for category, keywords in categories.items():
+            normalized = []
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                keyword = keyword.lower() if ignore_case else keyword
+                normalized.append(keyword)
+                index = self._pattern_index.get(keyword)
+                if index is None:
+                    index = len(self._patterns)
+                    self._pattern_index[keyword] = index
+                    self._patterns.append(keyword)
+                    self._pattern_categories.append([])
+                if category not in self._pattern_categories[index]:
+                    self._pattern_categories[index].append(category)
+            self.categories[category] = normalized
+
+        self._build()
+
+    def _build(self):
+        """构建trie、失败指针和输出表"""
+        goto: List[Dict[str, int]] = [{}]
+        output: List[List[int]] = [[]]
+        for index, pattern in enumerate(self._patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    output.append([])
+                state = nxt
+            output[state].append(index)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                output[nxt] = output[nxt] + output[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(o) for o in output]
+        self._alphabet = frozenset(ch for pattern in self._patterns for ch in pattern)
+
+    def find(self, text: str) -> Set[str]:
+        """一次扫描返回文本中出现过的所有关键词"""
+        if not text or not self._patterns:
+            return set()
+        if self.ignore_case:
+            text = text.lower()
+        goto, fail, output, alphabet = self._goto, self._fail, self._output, self._alphabet
+        found = set()
+        state = 0
+        for ch in text:
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+        return {self._patterns[i] for i in found}
+
+    def scan(self, text: str) -> Dict[str, Set[str]]:
+        """一次扫描返回 {分类: 命中的关键词集合}，未命中的分类为空集合"""
+        hits: Dict[str, Set[str]] = {category: set() for category in self.categories}
+        for keyword in self.find(text):
+            for category in self._pattern_categories[self._pattern_index[keyword]]:
+                hits[category].add(keyword)
+        return hits
+
+    def counts(self, text: str) -> Dict[str, int]:
+        """一次扫描返回 {分类: 命中的关键词数}，语义同 sum(1 for k in keywords if k in text)"""
+        found = self.find(text)
+        return {
+            category: sum(1 for keyword in keywords if keyword in found)
+            for category, keywords in self.categories.items()
+        }
+
+
+_keyword_matcher: Optional[KeywordMatcher] = None
+_keyword_matcher_lock = threading.Lock()
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """获取基于SCORING_KEYWORDS的全局匹配器实例"""
+    global _keyword_matcher
+    if _keyword_matcher is None:
+        with _keyword_matcher_lock:
+            if _keyword_matcher is None:
+                _keyword_matcher = KeywordMatcher(SCORING_KEYWORDS)
+    return _keyword_matcher
+
+
+if __name__ == "__main__":
+    # 基准测试：单个节点评分所需的关键词统计，单次扫描 vs 旧的逐关键词子串查找
+    import random
+    import time
+
+    rng = random.Random(3)
+    keywords = sorted({k for ks in SCORING_KEYWORDS.values() for k in ks})
+    filler = "我们需要从系统的角度看待这个问题，并且结合实际情况进行讨论。"
+    texts = []
+    for _ in range(200):
+        parts = [filler[rng.randrange(len(filler)):] for _ in range(6)]
+        parts += rng.sample(keywords, 8)
+        rng.shuffle(parts)
+        texts.append("".join(parts))
+
+    matcher = get_keyword_matcher()
+    rounds = 20
+    pref_keywords = ["深入", "详细", "全面", "深度", "多角度"]
+
+    def legacy_node(text):
+        # 旧路径：PreferenceFilter对每个偏好(5个)重复执行全部评估，GeneticPruning再扫描两类关键词
+        for _ in range(5):
+            [k for k in pref_keywords if k in text]
+            for category in ("complexity", "reasoning", "memory", "innovation", "practical"):
+                sum(1 for k in SCORING_KEYWORDS[category] if k in text)
+        for category in ("genetic_innovation", "unique_phrases", "logical_connectors"):
+            sum(1 for k in SCORING_KEYWORDS[category] if k in text)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            legacy_node(text)
+    naive = (time.perf_counter() - start) / rounds / len(texts)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            matcher.counts(text)
+    single = (time.perf_counter() - start) / rounds / len(texts)
+
+    mismatches = sum(
+        1 for text in texts
+        if matcher.counts(text) != {c: sum(1 for k in ks if k in text) for c, ks in SCORING_KEYWORDS.items()}
+    )
+    print(f"关键词: {len(keywords)}, 分类: {len(SCORING_KEYWORDS)}, 平均文本长度: {sum(map(len, texts)) // len(texts)}")
+    print(f"旧评分路径(逐关键词查找): {naive * 1e6:.1f} µs/节点")
+    print(f"自动机单次扫描:           {single * 1e6:.1f} µs/节点")
+    print(f"结果不一致: {mismatches}")
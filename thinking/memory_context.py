@@ -0,0 +1,115 @@
+"""
+思考记忆上下文
+同一个问题只做一次记忆召回，与难度评估、路线准备并行进行，所有思考路线共用结果；
+召回结果按规范化后的问题短时缓存，追问或重复提问时直接复用
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from .config import TREE_THINKING_CONFIG
+
+logger = logging.getLogger("MemoryContext")
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "?？!！。.~～ "
+
+
+def normalize_question(question: str) -> str:
+    """规范化问题作为缓存key：合并空白、忽略大小写和结尾的标点"""
+    return _WHITESPACE.sub(" ", question).strip().lower().rstrip(_TRAILING_PUNCTUATION)
+
+
+class MemoryRecall:
+    """记忆召回（带TTL缓存，相同问题并发召回时只查询一次）"""
+
+    def __init__(self, memory_manager=None, config: Optional[Dict] = None):
+        self.memory_manager = memory_manager
+        self.config = config or TREE_THINKING_CONFIG["memory_recall"]
+        self._cache: "OrderedDict[str, Tuple[float, asyncio.Task]]" = OrderedDict()  # key -> (过期时间, 召回任务)
+        self.hits = 0
+        self.misses = 0
+
+    def context_for(self, question: str) -> "QuestionContext":
+        """取得问题的上下文，记忆召回立即在后台开始"""
+        return QuestionContext(question, self._recall_task(question) if self.memory_manager else None,
+                               self.config["wait_timeout"])
+
+    def _recall_task(self, question: str) -> asyncio.Task:
+        key = normalize_question(question)
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires_at, task = entry
+            # 失败的召回和其他事件循环中的召回不复用
+            reusable = task.get_loop() is asyncio.get_running_loop() and not (
+                task.done() and (task.cancelled() or task.exception()))
+            if now < expires_at and reusable:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return task
+            del self._cache[key]
+        self.misses += 1
+        task = asyncio.create_task(self._recall(question))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # 无人等待时也取回异常，避免告警
+        self._cache[key] = (now + self.config["ttl"], task)
+        while len(self._cache) > self.config["max_entries"]:
+            self._cache.popitem(last=False)
+        return task
+
+    async def _recall(self, question: str) -> str:
+        """查询记忆并格式化为提示词片段"""
+        start = time.monotonic()
+        manager = self.memory_manager
+        if hasattr(manager, "query_memory"):
+            result = await manager.query_memory(question)
+            text = f"\n相关记忆参考：\n{result[:self.config['max_chars']]}\n" if result else ""
+        else:
+            # 兼容返回记忆列表的记忆管理器
+            related_memories = await asyncio.to_thread(manager.recall_memory, question, k=3)
+            text = ""
+            if related_memories:
+                text = "\n相关记忆参考：\n"
+                for memory in related_memories:
+                    text += f"- {memory.get('text', '')[:100]}...\n"
+        logger.info(f"记忆召回完成，耗时 {time.monotonic() - start:.2f}秒，{'有' if text else '无'}相关记忆")
+        return text
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_stats(self) -> Dict:
+        return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+class QuestionContext:
+    """单个问题的共享上下文，所有思考路线从这里取记忆"""
+
+    def __init__(self, question: str, recall_task: Optional[asyncio.Task] = None, wait_timeout: float = 5.0):
+        self.question = question
+        self._recall_task = recall_task
+        self.wait_timeout = wait_timeout  # 生成路线前最多等待召回的时间
+
+    async def memory_text(self) -> str:
+        """
+        取记忆提示词片段
+        召回超时或失败时返回空串；超时不取消召回，结果仍会进入缓存供后续追问使用
+        """
+        task = self._recall_task
+        if task is None:
+            return ""
+        if not task.done():
+            await asyncio.wait({task}, timeout=self.wait_timeout)
+            if not task.done():
+                logger.warning(f"记忆召回超过 {self.wait_timeout} 秒，本次思考不使用记忆")
+                return ""
+        if task.cancelled():
+            return ""
+        error = task.exception()
+        if error is not None:
+            logger.warning(f"获取相关记忆失败: {error}")
+            return ""
+        return task.result()
@@ -8,7 +8,8 @@ import logging
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from .thinking_node import ThinkingNode
-from .config import TREE_THINKING_CONFIG
+from .config import TREE_THINKING_CONFIG, SCORING_KEYWORDS
+from .keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger("PreferenceFilter")
 
@@ -85,13 +86,38 @@ class PreferenceFilter:
         ]
         
         self.user_preferences = self.default_preferences.copy()
+        
+        # 评估关键词+偏好黑白名单编译成一个匹配器，偏好变化时才重建
+        self._matcher: Optional[KeywordMatcher] = None
+        self._matcher_fingerprint = None
+        self._ensure_matcher()
         print("[TreeThinkingEngine] ⭐ 偏好打分系统初始化完成")
     
     def update_preferences(self, new_preferences: List[UserPreference]):
         """更新用户偏好配置"""
         self.user_preferences = new_preferences
+        self._ensure_matcher()
         logger.info(f"更新用户偏好配置: {len(new_preferences)}个偏好项")
     
+    def _preferences_fingerprint(self) -> tuple:
+        """偏好黑白名单指纹，用于判断匹配器是否需要重建"""
+        return tuple(
+            (tuple(pref.whitelist_keywords), tuple(pref.blacklist_keywords))
+            for pref in self.user_preferences
+        )
+    
+    def _ensure_matcher(self) -> KeywordMatcher:
+        """按需重建关键词匹配器"""
+        fingerprint = self._preferences_fingerprint()
+        if self._matcher is None or fingerprint != self._matcher_fingerprint:
+            categories = dict(SCORING_KEYWORDS)
+            for i, pref in enumerate(self.user_preferences):
+                categories[f"whitelist:{i}"] = pref.whitelist_keywords
+                categories[f"blacklist:{i}"] = pref.blacklist_keywords
+            self._matcher = KeywordMatcher(categories)
+            self._matcher_fingerprint = fingerprint
+        return self._matcher
+    
     async def score_thinking_nodes(self, nodes: List[ThinkingNode]) -> Dict[str, float]:
         """
         对思考节点进行偏好打分
@@ -129,6 +155,10 @@ class PreferenceFilter:
             # 返回默认均等分数
             return {node.id: 3.0 for node in nodes}
     
+    def quick_score(self, node: ThinkingNode) -> float:
+        """本地快速评分（只做关键词评估，不调用LLM），用于路线生成过程中的即时判断"""
+        return self._calculate_base_score(node)
+    
     def _calculate_base_score(self, node: ThinkingNode) -> float:
         """计算节点基础偏好分数"""
         total_score = 0.0
@@ -136,47 +166,52 @@ class PreferenceFilter:
         
         content = node.content.lower()
         
-        for pref in self.user_preferences:
+        # 一次扫描得到所有分类的关键词命中数
+        hits = self._ensure_matcher().counts(content)
+        
+        # 各项评估与具体偏好无关，每个节点只计算一次
+        assessments = {}
+        
+        def assess(name, func):
+            if name not in assessments:
+                assessments[name] = func(content, hits)
+            return assessments[name]
+        
+        for i, pref in enumerate(self.user_preferences):
             if not pref.enabled:
                 continue
             
             pref_score = 0.0
             
             # 黑名单检查（减分）
-            blacklist_penalty = 0
-            for keyword in pref.blacklist_keywords:
-                if keyword.lower() in content:
-                    blacklist_penalty += 0.5
+            blacklist_penalty = hits[f"blacklist:{i}"] * 0.5
             
             # 白名单检查（加分）
-            whitelist_bonus = 0
-            for keyword in pref.whitelist_keywords:
-                if keyword.lower() in content:
-                    whitelist_bonus += 0.5
+            whitelist_bonus = hits[f"whitelist:{i}"] * 0.5
             
             # 复杂度偏好
             if pref.prefer_complex:
-                complexity = self._assess_content_complexity(content)
+                complexity = assess("complexity", self._assess_content_complexity)
                 pref_score += complexity * 0.3
             
             # 推理完善偏好
             if pref.prefer_reasoning:
-                reasoning_quality = self._assess_reasoning_quality(content)
+                reasoning_quality = assess("reasoning", self._assess_reasoning_quality)
                 pref_score += reasoning_quality * 0.3
             
             # 记忆调用偏好
             if pref.prefer_memory:
-                memory_usage = self._assess_memory_usage(content)
+                memory_usage = assess("memory", self._assess_memory_usage)
                 pref_score += memory_usage * 0.2
             
             # 创新性偏好
             if pref.prefer_innovation:
-                innovation_level = self._assess_innovation(content)
+                innovation_level = assess("innovation", self._assess_innovation)
                 pref_score += innovation_level * 0.2
             
             # 实用性偏好
             if pref.prefer_practical:
-                practical_value = self._assess_practical_value(content)
+                practical_value = assess("practical", self._assess_practical_value)
                 pref_score += practical_value * 0.2
             
             # 应用白名单奖励和黑名单惩罚
@@ -197,15 +232,13 @@ class PreferenceFilter:
         
         return round(final_score, 2)
     
-    def _assess_content_complexity(self, content: str) -> float:
+    def _assess_content_complexity(self, content: str, hits: Dict[str, int]) -> float:
         """评估内容复杂度"""
         # 长度因子
         length_factor = min(len(content) / 200, 1.0)
         
         # 词汇复杂度
-        complex_words = ["分析", "评估", "综合", "推导", "验证", "优化"]
-        complexity_count = sum(1 for word in complex_words if word in content)
-        complexity_factor = min(complexity_count / 3, 1.0)
+        complexity_factor = min(hits["complexity"] / 3, 1.0)
         
         # 句式复杂度
         punctuation_count = content.count('，') + content.count('。') + content.count('；')
@@ -213,45 +246,21 @@ class PreferenceFilter:
         
         return (length_factor + complexity_factor + structure_factor) / 3 * 5
     
-    def _assess_reasoning_quality(self, content: str) -> float:
+    def _assess_reasoning_quality(self, content: str, hits: Dict[str, int]) -> float:
         """评估推理质量"""
-        reasoning_indicators = [
-            "因为", "所以", "由于", "因此", "导致", "基于", "根据", 
-            "推导", "证明", "说明", "表明", "可见", "可以得出"
-        ]
-        
-        reasoning_count = sum(1 for indicator in reasoning_indicators if indicator in content)
-        return min(reasoning_count / 3, 1.0) * 5
+        return min(hits["reasoning"] / 3, 1.0) * 5
     
-    def _assess_memory_usage(self, content: str) -> float:
+    def _assess_memory_usage(self, content: str, hits: Dict[str, int]) -> float:
         """评估记忆使用程度"""
-        memory_indicators = [
-            "记得", "回忆", "之前", "以前", "历史", "经验", 
-            "学过", "见过", "遇到", "类似", "相关"
-        ]
-        
-        memory_count = sum(1 for indicator in memory_indicators if indicator in content)
-        return min(memory_count / 2, 1.0) * 5
+        return min(hits["memory"] / 2, 1.0) * 5
     
-    def _assess_innovation(self, content: str) -> float:
+    def _assess_innovation(self, content: str, hits: Dict[str, int]) -> float:
         """评估创新程度"""
-        innovation_indicators = [
-            "创新", "新颖", "独特", "原创", "突破", "创造", 
-            "不同", "另辟蹊径", "新思路", "改进", "优化"
-        ]
-        
-        innovation_count = sum(1 for indicator in innovation_indicators if indicator in content)
-        return min(innovation_count / 2, 1.0) * 5
+        return min(hits["innovation"] / 2, 1.0) * 5
     
-    def _assess_practical_value(self, content: str) -> float:
+    def _assess_practical_value(self, content: str, hits: Dict[str, int]) -> float:
         """评估实用价值"""
-        practical_indicators = [
-            "实用", "应用", "实践", "操作", "具体", "可行", 
-            "方法", "步骤", "实施", "执行", "效果", "结果"
-        ]
-        
-        practical_count = sum(1 for indicator in practical_indicators if indicator in content)
-        return min(practical_count / 3, 1.0) * 5
+        return min(hits["practical"] / 3, 1.0) * 5
     
     async def _ai_batch_scoring(self, nodes: List[ThinkingNode]) -> Dict[str, float]:
         """AI批量评分"""
@@ -10,6 +10,8 @@ import time
 import re
 from typing import Dict, Any, Optional, Union, List
 from openai import AsyncOpenAI
+from llm_rate_limiter import get_rate_limiter, Priority
+from thinking.similarity import get_similarity_engine
 from config import (
     QUICK_MODEL_CONFIG, 
     OUTPUT_FILTER_CONFIG,
@@ -457,18 +459,19 @@ class QuickModelManager:
     async def _call_quick_model(self, prompt: str, system_prompt: str) -> Optional[str]:
         """调用快速模型"""
         try:
-            response = await asyncio.wait_for(
-                self.quick_client.chat.completions.create(
-                    model=self.config["model_name"],
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=self.config["temperature"],
-                    max_tokens=config.api.max_tokens
-                ),
-                timeout=self.config["timeout"]
-            )
+            async with get_rate_limiter().limit(self.config["base_url"], Priority.NORMAL):
+                response = await asyncio.wait_for(
+                    self.quick_client.chat.completions.create(
+                        model=self.config["model_name"],
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=self.config["temperature"],
+                        max_tokens=config.api.max_tokens
+                    ),
+                    timeout=self.config["timeout"]
+                )
             
             return response.choices[0].message.content
             
@@ -489,22 +492,7 @@ class QuickModelManager:
     async def _call_fallback_model(self, prompt: str, system_prompt: str) -> str:
         """调用备用大模型"""
         try:
-            response = await self.fallback_client.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=config.api.max_tokens
-            )
-            
-            return response.choices[0].message.content
-        except RuntimeError as e:
-            if "handler is closed" in str(e):
-                logger.debug(f"忽略连接关闭异常，重新创建客户端: {e}")
-                # 重新创建客户端并重试
-                self.fallback_client = AsyncOpenAI(api_key=API_KEY, base_url=BASE_URL.rstrip('/') + '/')
+            async with get_rate_limiter().limit(BASE_URL, Priority.NORMAL):
                 response = await self.fallback_client.chat.completions.create(
                     model=MODEL,
                     messages=[
@@ -514,6 +502,23 @@ class QuickModelManager:
                     temperature=0.1,
                     max_tokens=config.api.max_tokens
                 )
+            
+            return response.choices[0].message.content
+        except RuntimeError as e:
+            if "handler is closed" in str(e):
+                logger.debug(f"忽略连接关闭异常，重新创建客户端: {e}")
+                # 重新创建客户端并重试
+                self.fallback_client = AsyncOpenAI(api_key=API_KEY, base_url=BASE_URL.rstrip('/') + '/')
+                async with get_rate_limiter().limit(BASE_URL, Priority.NORMAL):
+                    response = await self.fallback_client.chat.completions.create(
+                        model=MODEL,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=0.1,
+                        max_tokens=config.api.max_tokens
+                    )
                 return response.choices[0].message.content
             else:
                 raise
@@ -867,30 +872,13 @@ class QuickModelManager:
         penalty = SCORING_SYSTEM_CONFIG.get("penalty_for_similar", 1)
         
         current_content = current_result.get('content', '')
+        existing_contents = [existing.get('content', '') for existing in existing_results]
         
-        for existing in existing_results:
-            if self._calculate_similarity(current_content, existing.get('content', '')) > threshold:
-                return penalty
+        if get_similarity_engine().max_similarity(current_content, existing_contents) > threshold:
+            return penalty
         
         return 0
     
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """简单的文本相似度计算"""
-        if not text1 or not text2:
-            return 0.0
-        
-        # 简单的词汇重叠相似度
-        words1 = set(text1.split())
-        words2 = set(text2.split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = len(words1.intersection(words2))
-        union = len(words1.union(words2))
-        
-        return intersection / union if union > 0 else 0.0
-    
     def _filter_and_sort_results(self, scored_results: List[Dict]) -> List[Dict]:
         """过滤和排序结果"""
         threshold = SCORING_SYSTEM_CONFIG.get("score_threshold", 2)
@@ -0,0 +1,134 @@
+"""
+思考路线调度器
+多路思考并发发起，完成一条评一条；合格路线够数或到达截止时间即停止，取消仍在生成的路线，
+并记录每条路线的耗时与质量，供后续按历史合格率决定发起的路线数
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from .thinking_node import ThinkingNode
+from .config import TREE_THINKING_CONFIG
+
+logger = logging.getLogger("RouteScheduler")
+
+# 单条路线的结果状态
+GOOD = "good"  # 合格
+POOR = "poor"  # 生成成功但评分不足
+FAILED = "failed"  # 生成失败或内容为空
+CANCELLED = "cancelled"  # 提前结束时被取消
+
+
+class RouteStats:
+    """路线历史统计（最近若干条路线的耗时与质量）"""
+
+    def __init__(self, window: int = 50):
+        self.records: Deque[Dict] = deque(maxlen=window)
+
+    def record(self, records: List[Dict]):
+        self.records.extend(records)
+
+    def good_rate(self) -> Optional[float]:
+        """已完成路线中的合格率，样本不足时返回None"""
+        finished = [r for r in self.records if r["status"] != CANCELLED]
+        if len(finished) < 5:
+            return None
+        return sum(1 for r in finished if r["status"] == GOOD) / len(finished)
+
+    def suggest_routes(self, configured: int, needed: int, minimum: int) -> int:
+        """
+        按历史合格率决定发起的路线数：期望能凑够needed条合格路线即可，不超过难度配置的数量
+        没有足够历史时沿用配置
+        """
+        rate = self.good_rate()
+        if rate is None:
+            return configured
+        suggested = math.ceil(needed / max(rate, 0.1)) + 1  # 多发一条作为余量
+        return max(minimum, min(configured, suggested))
+
+    def summary(self) -> Dict:
+        """统计摘要"""
+        latencies = sorted(r["latency"] for r in self.records if r["status"] != CANCELLED)
+        status_counts = {status: 0 for status in (GOOD, POOR, FAILED, CANCELLED)}
+        for r in self.records:
+            status_counts[r["status"]] += 1
+        return {
+            "routes": len(self.records),
+            "status": status_counts,
+            "good_rate": self.good_rate(),
+            "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+            "latency_p90": latencies[int(len(latencies) * 0.9)] if latencies else None,
+        }
+
+
+class RouteScheduler:
+    """竞速调度：完成即评分，够用即停"""
+
+    def __init__(self, scorer: Callable[[ThinkingNode], float], config: Optional[Dict] = None):
+        self.scorer = scorer  # 本地快速评分（不调用LLM）
+        self.config = config or TREE_THINKING_CONFIG["route_scheduling"]
+        self.stats = RouteStats(self.config["stats_window"])
+
+    def plan_routes(self, configured: int) -> int:
+        """本次发起的路线数"""
+        if not self.config["adaptive_routes"]:
+            return configured
+        needed = min(self.config["enough_good_routes"], configured)
+        return self.stats.suggest_routes(configured, needed, TREE_THINKING_CONFIG["min_thinking_routes"])
+
+    async def race(self, routes: List[Tuple[Dict, Callable[[], Awaitable[ThinkingNode]]]]) -> Tuple[List[ThinkingNode], List[Dict]]:
+        """
+        并发生成各路线
+        :param routes: [(路线信息, 生成协程工厂)]，路线信息含route_index、branch_type、temperature
+        :return: (按发起顺序排列的可用路线, 每条路线的记录)
+        """
+        needed = min(self.config["enough_good_routes"], len(routes))
+        threshold = self.config["quality_threshold"]
+        start = time.monotonic()
+        soft_deadline = start + self.config["soft_deadline"]  # 过后有可用路线即停止
+        hard_deadline = start + self.config["hard_deadline"]  # 过后无论如何停止
+
+        tasks = {asyncio.create_task(factory()): info for info, factory in routes}
+        records: Dict[int, Dict] = {}
+        finished: Dict[int, ThinkingNode] = {}
+        good = 0
+        pending = set(tasks)
+        try:
+            while pending:
+                now = time.monotonic()
+                if good >= needed or now >= hard_deadline or (now >= soft_deadline and finished):
+                    break
+                timeout = (soft_deadline if now < soft_deadline else hard_deadline) - now
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    info = tasks[task]
+                    record = dict(info, latency=round(time.monotonic() - start, 3), score=None)
+                    node = None if task.cancelled() or task.exception() else task.result()
+                    if not isinstance(node, ThinkingNode) or not node.content.strip() or node.metadata.get("error"):
+                        record["status"] = FAILED
+                    else:
+                        record["score"] = self.scorer(node)
+                        record["status"] = GOOD if record["score"] >= threshold else POOR
+                        finished[info["route_index"]] = node
+                        if record["status"] == GOOD:
+                            good += 1
+                    records[info["route_index"]] = record
+        finally:
+            # 取消仍在生成的路线（包括调用方被取消时）
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            elapsed = round(time.monotonic() - start, 3)
+            for task in pending:
+                records[tasks[task]["route_index"]] = dict(tasks[task], latency=elapsed, score=None, status=CANCELLED)
+            ordered = [records[index] for index in sorted(records)]
+            self.stats.record(ordered)
+
+        if pending:
+            logger.info(f"提前结束：合格 {good}/{needed}，已完成 {len(finished)} 条，取消 {len(pending)} 条，耗时 {elapsed}秒")
+        # 不合格的路线也保留，交给后续打分和剪枝决定
+        return [finished[index] for index in sorted(finished)], ordered
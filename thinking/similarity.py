@@ -0,0 +1,350 @@
+"""
+文本相似度引擎
+基于字符shingle的MinHash签名（单次置换分桶），供遗传剪枝的多样性评估和快速模型的相似性惩罚共用。
+每段文本只分词、哈希一次，签名缓存在ThinkingNode上；成对相似度矩阵一次向量化计算。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+from .config import SIMILARITY_CONFIG
+
+# numpy导入（可选，缺失时退化为纯Python实现，结果一致）
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+Signature = Sequence[int]  # numpy可用时为uint64 ndarray，否则为tuple
+
+_HASH_BITS = 32  # shingle哈希位数
+_MASK64 = (1 << 64) - 1
+_EMPTY_HASH = _MASK64  # 空文本的签名值，大于任何真实签名值
+_SHINGLE_BASE = 0x100000001B3  # shingle内逐字符滚动的乘数
+_SHINGLE_MIX = 0x9E3779B97F4A7C15  # 收尾混合，把64位滚动值压成32位哈希（不含随机数，签名跨进程稳定）
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def shingles(text: str, size: int) -> set:
+    """文本归一化后切成字符shingle集合（不依赖空格分词）"""
+    normalized = _normalize(text)
+    if not normalized:
+        return set()
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def _shingle_hashes_py(normalized: str, size: int) -> List[int]:
+    """逐个shingle计算32位哈希（纯Python，与向量化版本结果一致）"""
+    codes = [ord(c) for c in normalized]
+    width = min(size, len(codes))
+    hashes = []
+    for i in range(len(codes) - width + 1):
+        h = 0
+        for code in codes[i:i + width]:
+            h = (h * _SHINGLE_BASE + code) & _MASK64
+        h ^= h >> 29
+        hashes.append(((h * _SHINGLE_MIX) & _MASK64) >> _HASH_BITS)
+    return hashes
+
+
+class SimilarityEngine:
+    """MinHash相似度引擎"""
+
+    def __init__(self, num_perm: int = None, shingle_size: int = None, cache_size: int = None):
+        self.num_perm = num_perm or SIMILARITY_CONFIG["num_perm"]
+        self.shingle_size = shingle_size or SIMILARITY_CONFIG["shingle_size"]
+        self.cache_size = cache_size or SIMILARITY_CONFIG["signature_cache_size"]
+
+        # 单次置换分桶（one permutation hashing）：每个shingle只哈希一次，按哈希值区间落入num_perm个桶，
+        # 每桶取最小值；空桶向右借最近的非空桶，借位距离编码在高位（densification），签名仍可逐位比较
+        if HAS_NUMPY:
+            self._empty = np.full(self.num_perm, _EMPTY_HASH, dtype=np.uint64)
+        else:
+            self._empty = tuple([_EMPTY_HASH] * self.num_perm)
+        self._cache: "OrderedDict[str, Signature]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _shingle_hashes(self, texts: List[str]):
+        """所有文本的shingle哈希一次向量化算出，返回(哈希, 所属文本序号)；文本须非空"""
+        size = self.shingle_size
+        lengths = np.array([len(text) for text in texts])
+        codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        count = max(len(codes) - size + 1, 0)
+        h = codes[:count].copy()
+        for k in range(1, size):
+            h *= np.uint64(_SHINGLE_BASE)
+            h += codes[k:k + count]
+        h ^= h >> np.uint64(29)
+        h *= np.uint64(_SHINGLE_MIX)
+        h >>= np.uint64(_HASH_BITS)
+        # 只保留完全落在单个文本内的窗口
+        owner = np.repeat(np.arange(len(texts), dtype=np.uint64), lengths)[:count]
+        offset = np.arange(count) - np.repeat(np.cumsum(lengths) - lengths, lengths)[:count]
+        valid = offset <= (lengths - size)[owner.astype(np.intp)]
+        hashes, owner = h[valid], owner[valid]
+        # 不足一个shingle长的文本整体作为一个shingle
+        short = [i for i, length in enumerate(lengths) if length < size]
+        if short:
+            hashes = np.concatenate([hashes] + [np.array(_shingle_hashes_py(texts[i], size), dtype=np.uint64) for i in short])
+            owner = np.concatenate([owner, np.array(short, dtype=np.uint64)])
+        return hashes, owner
+
+    def _signature_py(self, hashes: List[int]) -> tuple:
+        """单个文本的签名（纯Python，与向量化版本结果一致）"""
+        k = self.num_perm
+        bins = [None] * k
+        for h in hashes:
+            b = (h * k) >> _HASH_BITS
+            if bins[b] is None or h < bins[b]:
+                bins[b] = h
+        signature = []
+        for j in range(k):
+            for distance in range(k):
+                value = bins[(j + distance) % k]
+                if value is not None:
+                    signature.append(value | (distance << _HASH_BITS))
+                    break
+        return tuple(signature)
+
+    def _compute_signatures(self, texts: Sequence[str]) -> List[Signature]:
+        """批量计算签名：所有文本的shingle哈希拼在一起，一次排序完成分桶取最小"""
+        normalized = [_normalize(text or "") for text in texts]
+        if not HAS_NUMPY:
+            return [self._signature_py(_shingle_hashes_py(text, self.shingle_size)) if text else self._empty
+                    for text in normalized]
+        present = [text for text in normalized if text]
+        if not present:
+            return [self._empty] * len(texts)
+        k = np.uint64(self.num_perm)
+        hashes, owner = self._shingle_hashes(present)
+        # 桶是连续的哈希区间，按(文本, 哈希)排序后每个(文本, 桶)的第一个即最小值
+        keys = np.sort((owner << np.uint64(_HASH_BITS)) | hashes)
+        hashes = keys & np.uint64((1 << _HASH_BITS) - 1)
+        cells = (keys >> np.uint64(_HASH_BITS)) * k + ((hashes * k) >> np.uint64(_HASH_BITS))
+        first = np.empty(len(keys), dtype=bool)
+        first[0] = True
+        np.not_equal(cells[1:], cells[:-1], out=first[1:])
+        table = np.full(len(present) * self.num_perm, _EMPTY_HASH, dtype=np.uint64)
+        table[cells[first].astype(np.intp)] = hashes[first]
+        table = table.reshape(len(present), self.num_perm)
+        # 空桶取右侧（循环）最近的非空桶，借位距离放在高位
+        doubled = np.concatenate([table, table], axis=1)
+        positions = np.arange(2 * self.num_perm)
+        nearest = np.where(doubled != _EMPTY_HASH, positions, 2 * self.num_perm)
+        nearest = np.minimum.accumulate(nearest[:, ::-1], axis=1)[:, ::-1][:, :self.num_perm]
+        distance = (nearest - positions[:self.num_perm]).astype(np.uint64)
+        rows = np.arange(len(present))[:, None]
+        signatures = iter(doubled[rows, nearest] | (distance << np.uint64(_HASH_BITS)))
+        return [next(signatures) if text else self._empty for text in normalized]
+
+    def _compute_signature(self, text: str) -> Signature:
+        """计算文本的MinHash签名"""
+        return self._compute_signatures([text])[0]
+
+    def _is_empty(self, sig) -> bool:
+        return sig[0] == _EMPTY_HASH
+
+    def signature(self, text: str) -> Signature:
+        """获取文本签名（带LRU缓存）"""
+        with self._cache_lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return cached
+        sig = self._compute_signature(text)
+        with self._cache_lock:
+            self._cache[text] = sig
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return sig
+
+    def node_signatures(self, nodes: list) -> List[Signature]:
+        """获取思考节点签名，缓存在节点上，内容变化后自动失效；缺失的签名一次批量计算"""
+        keys = [(len(node.content), hash(node.content)) for node in nodes]
+        missing = [i for i, (node, key) in enumerate(zip(nodes, keys))
+                   if node.similarity_signature is None or node.similarity_key != key]
+        if missing:
+            computed = self._compute_signatures([nodes[i].content for i in missing])
+            for i, sig in zip(missing, computed):
+                nodes[i].similarity_signature = sig
+                nodes[i].similarity_key = keys[i]
+        return [node.similarity_signature for node in nodes]
+
+    def node_signature(self, node) -> Signature:
+        """获取单个思考节点签名"""
+        return self.node_signatures([node])[0]
+
+    def similarity(self, text1: str, text2: str) -> float:
+        """估计两段文本的Jaccard相似度，任一为空返回0"""
+        if not text1 or not text2:
+            return 0.0
+        return self.signature_similarity(self.signature(text1), self.signature(text2))
+
+    def signature_similarity(self, sig1: Signature, sig2: Signature) -> float:
+        """两个签名的相似度（相等位置占比）"""
+        if self._is_empty(sig1) or self._is_empty(sig2):
+            return 0.0
+        if HAS_NUMPY:
+            return np.count_nonzero(sig1 == sig2) / self.num_perm
+        return sum(1 for x, y in zip(sig1, sig2) if x == y) / self.num_perm
+
+    def similarity_matrix(self, signatures: List[Signature]):
+        """成对相似度矩阵，空文本所在的行列为0"""
+        n = len(signatures)
+        if HAS_NUMPY:
+            if n == 0:
+                return np.zeros((0, 0))
+            m = np.stack(signatures)
+            sim = np.count_nonzero(m[:, None, :] == m[None, :, :], axis=2) / self.num_perm
+            empty = m[:, 0] == _EMPTY_HASH
+            sim[empty, :] = 0.0
+            sim[:, empty] = 0.0
+            return sim
+        sim = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            sim[i][i] = 0.0 if self._is_empty(signatures[i]) else 1.0
+            for j in range(i + 1, n):
+                s = self.signature_similarity(signatures[i], signatures[j])
+                sim[i][j] = sim[j][i] = s
+        return sim
+
+    def diversity_scores(self, nodes: list) -> List[float]:
+        """每个节点相对其余节点的平均差异度（1-相似度）
+
+        与旧实现语义一致：跳过自身和双方都为空的节点对，无可比较对象时记为1.0
+        """
+        n = len(nodes)
+        if n <= 1:
+            return [1.0] * n
+        signatures = self.node_signatures(nodes)
+        sim = self.similarity_matrix(signatures)
+        if HAS_NUMPY:
+            empty = np.array([self._is_empty(sig) for sig in signatures])
+            valid = ~(empty[:, None] & empty[None, :])
+            np.fill_diagonal(valid, False)
+            counts = valid.sum(axis=1)
+            totals = np.where(valid, 1.0 - sim, 0.0).sum(axis=1)
+            scores = np.where(counts > 0, totals / np.maximum(counts, 1), 1.0)
+            return [float(s) for s in scores]
+        scores = []
+        for i in range(n):
+            differences = [
+                1.0 - sim[i][j] for j in range(n)
+                if j != i and not (self._is_empty(signatures[i]) and self._is_empty(signatures[j]))
+            ]
+            scores.append(sum(differences) / len(differences) if differences else 1.0)
+        return scores
+
+    def max_similarity(self, text: str, others: Sequence[str]) -> float:
+        """文本与一组文本的最大相似度"""
+        if not text:
+            return 0.0
+        sig = self.signature(text)
+        return max((self.signature_similarity(sig, self.signature(o)) for o in others if o), default=0.0)
+
+
+_similarity_engine: Optional[SimilarityEngine] = None
+_similarity_engine_lock = threading.Lock()
+
+
+def get_similarity_engine() -> SimilarityEngine:
+    """获取全局相似度引擎实例"""
+    global _similarity_engine
+    if _similarity_engine is None:
+        with _similarity_engine_lock:
+            if _similarity_engine is None:
+                _similarity_engine = SimilarityEngine()
+    return _similarity_engine
+
+
+if __name__ == "__main__":
+    # 基准测试：10条思考路线 × 3代，对比旧的逐对分词Jaccard实现
+    import random
+    import time
+    from thinking.thinking_node import ThinkingNode
+
+    def legacy_diversity(node, all_nodes):
+        differences = []
+        node_words = set(node.content.lower().split())
+        for other in all_nodes:
+            if other.id == node.id:
+                continue
+            other_words = set(other.content.lower().split())
+            union = node_words | other_words
+            if union:
+                differences.append(1 - len(node_words & other_words) / len(union))
+        return sum(differences) / len(differences) if differences else 1.0
+
+    def exact_diversity(nodes, size):
+        sets = [shingles(n.content, size) for n in nodes]
+        scores = []
+        for i, a in enumerate(sets):
+            diffs = [1 - len(a & b) / len(a | b) for j, b in enumerate(sets) if j != i and (a | b)]
+            scores.append(sum(diffs) / len(diffs) if diffs else 1.0)
+        return scores
+
+    rng = random.Random(7)
+    vocab = ["因为", "所以", "然而", "系统", "架构", "优化", "用户", "记忆", "推理", "分析",
+             "方案", "性能", "数据", "模型", "创新", "角度", "问题", "需要", "考虑", "结果"]
+    base = "".join(rng.choice(vocab) for _ in range(120))
+
+    def make_route():
+        words = list(base)
+        for _ in range(rng.randint(20, 160)):
+            words[rng.randrange(len(words))] = rng.choice("".join(vocab))
+        return "".join(words)
+
+    engine = SimilarityEngine()
+    routes, generations, rounds = 10, 3, 20
+    populations = []
+    population = [ThinkingNode(content=make_route()) for _ in range(routes)]
+    for _ in range(generations + 1):
+        populations.append(list(population))
+        # 模拟选择+交叉：保留前半，新增融合子代
+        population = population[:routes // 2] + [ThinkingNode(content=make_route()) for _ in range(routes)]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for pop in populations:
+            [legacy_diversity(n, pop) for n in pop]
+    legacy_time = (time.perf_counter() - start) / rounds
+
+    # 实际使用场景：每代评估一次，存活节点复用签名，新子代首次计算签名
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for pop in populations:
+            for n in pop:
+                n.similarity_signature = None
+        for pop in populations:
+            engine.diversity_scores(pop)
+    cold_time = (time.perf_counter() - start) / rounds
+
+    # 同一代内重复评估（签名全部命中缓存）
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for pop in populations:
+            engine.diversity_scores(pop)
+    warm_time = (time.perf_counter() - start) / rounds
+
+    errors = []
+    for pop in populations:
+        approx = engine.diversity_scores(pop)
+        exact = exact_diversity(pop, engine.shingle_size)
+        errors.extend(abs(a - e) for a, e in zip(approx, exact))
+    legacy_scores = [legacy_diversity(n, populations[0]) for n in populations[0]]
+
+    print(f"numpy: {HAS_NUMPY}, 路线: {routes}, 代数: {generations}, 每代节点: {[len(p) for p in populations]}")
+    unique = len({n.id for pop in populations for n in pop})
+    print(f"旧实现(逐对分词):                {legacy_time * 1000:.2f} ms/轮")
+    print(f"MinHash(逐代计算新节点签名):     {cold_time * 1000:.2f} ms/轮 "
+          f"(旧实现的 {cold_time / legacy_time:.1f} 倍，含 {unique} 个签名，每个约 {cold_time / unique * 1000:.2f} ms)")
+    print(f"MinHash(重复评估，签名已缓存):   {warm_time * 1000:.2f} ms/轮")
+    print(f"与精确shingle Jaccard的平均误差: {sum(errors) / len(errors):.4f}, 最大误差: {max(errors):.4f}")
+    print(f"旧实现在中文上的多样性分数: {[round(s, 2) for s in legacy_scores]}")
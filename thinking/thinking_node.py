@@ -36,7 +36,11 @@ class ThinkingNode:
     branch_type: str = "logical"
     thinking_path: List[str] = field(default_factory=list)
     metadata: Dict[str, Any] = field(default_factory=dict)
-    
+
+    # 相似度签名缓存（由SimilarityEngine维护，内容变化后自动重算）
+    similarity_signature: Optional[Any] = field(default=None, repr=False, compare=False)
+    similarity_key: Optional[tuple] = field(default=None, repr=False, compare=False)
+
     def __post_init__(self):
         """初始化后处理"""
         if not self.thinking_path:
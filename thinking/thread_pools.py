@@ -4,6 +4,7 @@
 """
 
 import asyncio
+import threading
 import time
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -33,7 +34,9 @@ class ThreadPoolManager:
         # API限流控制
         self.api_semaphore = asyncio.Semaphore(config["max_concurrent_api"])
         self.last_api_call = 0
+        self.next_api_slot = 0.0  # 下一个可用的调用时间点（monotonic）
         self.min_api_interval = config["min_api_interval"]
+        self._rate_lock = threading.Lock()  # 保护调用时间点的预约，跨事件循环也安全
         
         # 统计信息
         self.stats = {
@@ -92,11 +95,22 @@ class ThreadPoolManager:
                 logger.error(f"API任务执行失败: {e}")
                 raise
     
+    def _reserve_api_slot(self) -> float:
+        """在锁内预约下一个调用时间点，返回需要等待的秒数
+
+        每个调用者拿到互不重叠的时间点，并发调用时也能保证min_api_interval间隔；
+        跨模块的接口配额由llm_rate_limiter在实际LLM调用处统一控制。
+        """
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self.next_api_slot)
+            self.next_api_slot = slot + self.min_api_interval
+            return slot - now
+    
     async def _rate_limit(self):
         """API限流控制"""
-        now = time.time()
-        if now - self.last_api_call < self.min_api_interval:
-            wait_time = self.min_api_interval - (now - self.last_api_call)
+        wait_time = self._reserve_api_slot()
+        if wait_time > 0:
             await asyncio.sleep(wait_time)
         
         self.last_api_call = time.time()
@@ -4,24 +4,37 @@
 """
 
 import asyncio
+import functools
 import logging
 import time
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from .thinking_node import ThinkingNode, ThinkingBranch
 from .difficulty_judge import DifficultyJudge
 from .preference_filter import PreferenceFilter, UserPreference
 from .genetic_pruning import GeneticPruning
-from .thread_pools import ThreadPoolManager, TaskBatch
+from .thread_pools import ThreadPoolManager
+from .route_scheduler import RouteScheduler
+from .memory_context import MemoryRecall, QuestionContext
 from .config import TREE_THINKING_CONFIG
 
 logger = logging.getLogger("TreeThinkingEngine")
 
+# 对话流中阶段事件的说话人标识：(PHASE_SPEAKER, 阶段事件)，界面据此显示进度，不计入回复正文
+PHASE_SPEAKER = "thinking_phase"
+
+
+def _phase(phase: str, message: str, **details) -> Dict[str, Any]:
+    """构造阶段事件"""
+    return {"type": "phase", "phase": phase, "message": message, **details}
+
+
 # 全局子系统实例，避免重复初始化
 _global_subsystems = {
     "difficulty_judge": None,
     "preference_filter": None,
     "genetic_pruning": None,
-    "thread_pool": None
+    "thread_pool": None,
+    "route_scheduler": None
 }
 
 class TreeThinkingEngine:
@@ -41,6 +54,7 @@ class TreeThinkingEngine:
             _global_subsystems["preference_filter"] = PreferenceFilter(api_client)
             _global_subsystems["genetic_pruning"] = GeneticPruning(api_client)
             _global_subsystems["thread_pool"] = ThreadPoolManager()
+            _global_subsystems["route_scheduler"] = RouteScheduler(_global_subsystems["preference_filter"].quick_score)
             print("[TreeThinkingEngine] 🌳 树状思考引擎子系统初始化完成")
             print("[TreeThinkingEngine] 🚀 树状思考引擎初始化完成")
         else:
@@ -52,6 +66,10 @@ class TreeThinkingEngine:
         self.preference_filter = _global_subsystems["preference_filter"]
         self.genetic_pruning = _global_subsystems["genetic_pruning"]
         self.thread_pool = _global_subsystems["thread_pool"]
+        self.route_scheduler = _global_subsystems["route_scheduler"]
+        
+        # 记忆召回（按问题缓存，跨轮次复用）
+        self.memory_recall = MemoryRecall(memory_manager)
         
         # 运行状态
         self.is_enabled = self.config["enabled"]
@@ -60,32 +78,57 @@ class TreeThinkingEngine:
     
     async def think_deeply(self, question: str, user_preferences: Optional[List[UserPreference]] = None) -> Dict[str, Any]:
         """
-        深度思考主入口
+        深度思考主入口（一次性返回完整结果）
+        """
+        result = None
+        async for event in self.think_deeply_stream(question, user_preferences):
+            if event["type"] == "done":
+                result = event["result"]
+        return result
+    
+    async def think_deeply_stream(self, question: str,
+                                  user_preferences: Optional[List[UserPreference]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        深度思考（流式）
+        依次产出事件：
+        {"type": "phase", "phase": 阶段, "message": 说明, ...}  阶段进度，供前端显示
+        {"type": "delta", "content": 文本}  最终答案的增量
+        {"type": "done", "result": 结果}  结果格式与think_deeply相同
         """
         if not self.is_enabled:
             logger.info("树状思考系统未启用，使用基础回答")
-            return await self._basic_response(question)
+            async for event in self._basic_response_stream(question):
+                yield event
+            return
         
+        start_time = time.time()
+        session_id = f"thinking_{int(start_time)}"
+        self.current_session = session_id
+        answer_parts = []  # 已下发的答案增量（开始下发后不能再降级重答）
         try:
-            start_time = time.time()
-            session_id = f"thinking_{int(start_time)}"
-            self.current_session = session_id
-            
             logger.info(f"开始深度思考会话: {session_id}")
             logger.info(f"问题: {question[:100]}...")
             
+            # 记忆召回在后台进行，与难度评估、路线准备并行
+            question_context = self.memory_recall.context_for(question)
+            
             # 1. 问题难度评估
             difficulty_assessment = await self.difficulty_judge.assess_difficulty(question)
             logger.info(f"难度评估: {difficulty_assessment['reasoning']}")
+            yield _phase("difficulty", f"问题难度 {difficulty_assessment['difficulty']}/5，"
+                                       f"将生成 {difficulty_assessment['routes']} 条思考路线",
+                         difficulty=difficulty_assessment['difficulty'], routes=difficulty_assessment['routes'])
             
             # 2. 更新用户偏好
             if user_preferences:
                 self.preference_filter.update_preferences(user_preferences)
             
             # 3. 生成多路思考
-            thinking_routes = await self._generate_thinking_routes(
-                question, difficulty_assessment
+            thinking_routes, route_records = await self._generate_thinking_routes(
+                question, difficulty_assessment, question_context
             )
+            yield _phase("routes_generated", f"已生成 {len(thinking_routes)} 条思考路线", count=len(thinking_routes),
+                         launched=len(route_records))
             
             # 4. 偏好打分
             if thinking_routes:
@@ -102,11 +145,14 @@ class TreeThinkingEngine:
                 logger.info(f"遗传剪枝后保留 {len(optimal_routes)} 条最优路线")
             else:
                 optimal_routes = thinking_routes
+            yield _phase("pruned", f"剪枝完成，保留 {len(optimal_routes)} 条最优路线", count=len(optimal_routes))
             
-            # 6. 综合最终答案
-            final_answer = await self._synthesize_final_answer(
-                question, optimal_routes, difficulty_assessment
-            )
+            # 6. 综合最终答案（边生成边下发）
+            yield _phase("synthesizing", "正在综合最终答案")
+            async for piece in self._synthesize_final_answer(question, optimal_routes, difficulty_assessment):
+                answer_parts.append(piece)
+                yield {"type": "delta", "content": piece}
+            final_answer = "".join(answer_parts).strip()
             
             # 7. 记录思考过程
             thinking_session = {
@@ -116,6 +162,7 @@ class TreeThinkingEngine:
                 "thinking_routes": len(thinking_routes),
                 "optimal_routes": len(optimal_routes),
                 "route_scores": route_scores,
+                "route_records": route_records,
                 "final_answer": final_answer,
                 "processing_time": time.time() - start_time,
                 "timestamp": time.time()
@@ -125,7 +172,7 @@ class TreeThinkingEngine:
             
             logger.info(f"深度思考完成，耗时 {thinking_session['processing_time']:.2f}秒")
             
-            return {
+            yield {"type": "done", "result": {
                 "answer": final_answer,
                 "thinking_process": {
                     "difficulty": difficulty_assessment,
@@ -144,93 +191,84 @@ class TreeThinkingEngine:
                     ]
                 },
                 "session_id": session_id
-            }
+            }}
             
         except Exception as e:
             logger.error(f"深度思考过程出错: {e}")
-            # 降级到基础回答
-            return await self._basic_response(question)
+            if answer_parts:
+                # 答案已部分下发，只能就此结束
+                yield {"type": "done", "result": {
+                    "answer": "".join(answer_parts).strip(),
+                    "thinking_process": {"mode": "error", "note": f"综合答案中断: {e}"},
+                    "session_id": session_id
+                }}
+            else:
+                # 降级到基础回答
+                async for event in self._basic_response_stream(question):
+                    yield event
         
         finally:
             self.current_session = None
     
-    async def _generate_thinking_routes(self, question: str, difficulty_assessment: Dict) -> List[ThinkingNode]:
-        """生成多路思考"""
-        routes_count = difficulty_assessment["routes"]
+    async def _generate_thinking_routes(self, question: str, difficulty_assessment: Dict,
+                                        question_context: Optional[QuestionContext] = None) -> Tuple[List[ThinkingNode], List[Dict]]:
+        """
+        生成多路思考
+        各路线并发生成、完成即评分，合格路线够数或到达截止时间后取消其余路线
+        返回(可用路线, 每条路线的耗时与质量记录)
+        """
+        routes_count = self.route_scheduler.plan_routes(difficulty_assessment["routes"])
         temperatures = self.difficulty_judge.get_temperature_distribution(routes_count)
         branch_types = self.difficulty_judge.get_branch_types(routes_count)
         
-        logger.info(f"生成 {routes_count} 条思考路线，温度范围: {min(temperatures)}-{max(temperatures)}")
+        logger.info(f"生成 {routes_count} 条思考路线（难度建议 {difficulty_assessment['routes']} 条），"
+                    f"温度范围: {min(temperatures)}-{max(temperatures)}")
         
-        # 创建任务批次
-        task_batch = TaskBatch(self.thread_pool)
+        # 所有路线共用同一次记忆召回的结果
+        if question_context is None:
+            question_context = self.memory_recall.context_for(question)
+        memory_context = await question_context.memory_text()
         
-        # 为每个思考路线创建任务
+        # 为每个思考路线准备生成任务
+        routes = []
         for i in range(routes_count):
             temperature = temperatures[i]
             branch_type = branch_types[i]
             
             # 根据分支类型调整提示词
-            thinking_prompt = self._create_thinking_prompt(question, branch_type, i+1, routes_count)
-            
-            # 添加API任务
-            task_batch.add_api_task(
-                self._generate_single_route,
-                thinking_prompt, temperature, branch_type, i
-            )
+            thinking_prompt = self._create_thinking_prompt(question, branch_type, i+1, routes_count, memory_context)
+            
+            # API任务（经线程池限流）
+            routes.append((
+                {"route_index": i, "branch_type": branch_type, "temperature": temperature},
+                functools.partial(self.thread_pool.submit_api_task, self._generate_single_route,
+                                  thinking_prompt, temperature, branch_type, i)
+            ))
         
-        # 并行执行所有思考任务
+        # 竞速执行
         try:
-            thinking_results, api_results = await task_batch.execute_all()
-            
-            # 合并所有结果
-            all_results = (thinking_results or []) + (api_results or [])
-            logger.info(f"原始结果数量: thinking={len(thinking_results or [])}, api={len(api_results or [])}, 总计={len(all_results)}")
-            
-            # 过滤有效结果
-            valid_routes = []
-            for i, result in enumerate(all_results):
-                logger.info(f"结果 {i}: 类型={type(result)}, 是否为ThinkingNode={isinstance(result, ThinkingNode)}")
-                if isinstance(result, ThinkingNode):
-                    logger.info(f"  内容长度: {len(result.content)}, 内容预览: {result.content[:50]}...")
-                    if result.content and result.content.strip():
-                        valid_routes.append(result)
-                    else:
-                        logger.warning(f"  思考节点内容为空")
-                else:
-                    logger.warning(f"  结果不是ThinkingNode类型: {result}")
+            valid_routes, records = await self.route_scheduler.race(routes)
             
             # 建立兄弟关系
             if valid_routes:
                 self._establish_sibling_relationships(valid_routes)
             
             logger.info(f"成功生成 {len(valid_routes)}/{routes_count} 条思考路线")
-            return valid_routes
+            return valid_routes, records
             
         except Exception as e:
             logger.error(f"生成思考路线失败: {e}")
             import traceback
             traceback.print_exc()
-            return []
+            return [], []
     
-    def _create_thinking_prompt(self, question: str, branch_type: str, route_num: int, total_routes: int) -> str:
-        """创建思考提示词"""
+    def _create_thinking_prompt(self, question: str, branch_type: str, route_num: int, total_routes: int,
+                                memory_context: str = "") -> str:
+        """创建思考提示词（memory_context为各路线共用的记忆片段）"""
         from .config import BRANCH_TYPES
         
         branch_description = BRANCH_TYPES.get(branch_type, "综合分析型")
         
-        # 获取相关记忆（如果有记忆管理器）
-        memory_context = ""
-        if self.memory_manager:
-            try:
-                related_memories = self.memory_manager.recall_memory(question, k=3)
-                if related_memories:
-                    memory_context = f"\n相关记忆参考：\n"
-                    for memory in related_memories:
-                        memory_context += f"- {memory.get('text', '')[:100]}...\n"
-            except Exception as e:
-                logger.warning(f"获取相关记忆失败: {e}")
-        
         prompt = f"""
 作为{branch_description}思考者，请深入分析以下问题（第{route_num}/{total_routes}路思考）：
 
@@ -282,26 +320,27 @@ class TreeThinkingEngine:
             logger.error(f"生成思考路线 {route_index} 失败: {e}")
             import traceback
             traceback.print_exc()
-            # 返回空节点
+            # 返回失败节点（调度器据metadata中的error识别）
             return ThinkingNode(
                 content=f"思考路线 {route_index} 生成失败: {str(e)}",
                 temperature=temperature,
-                branch_type=branch_type
+                branch_type=branch_type,
+                metadata={"route_index": route_index, "error": str(e)}
             )
     
     async def _synthesize_final_answer(self, question: str, optimal_routes: List[ThinkingNode], 
-                                     difficulty_assessment: Dict) -> str:
-        """综合最终答案"""
+                                     difficulty_assessment: Dict) -> AsyncIterator[str]:
+        """综合最终答案（流式产出文本增量）"""
         if not optimal_routes:
-            return "抱歉，无法生成有效的思考方案。"
+            yield "抱歉，无法生成有效的思考方案。"
+            return
         
-        try:
-            # 构建综合提示
-            routes_summary = ""
-            for i, route in enumerate(optimal_routes, 1):
-                routes_summary += f"\n思考路线{i}（{route.branch_type}，评分:{route.score:.1f}）：\n{route.content}\n"
-            
-            synthesis_prompt = f"""
+        # 构建综合提示
+        routes_summary = ""
+        for i, route in enumerate(optimal_routes, 1):
+            routes_summary += f"\n思考路线{i}（{route.branch_type}，评分:{route.score:.1f}）：\n{route.content}\n"
+        
+        synthesis_prompt = f"""
 基于以下多路深度思考的结果，请综合生成一个完整、准确的最终答案：
 
 原问题：{question}
@@ -318,43 +357,74 @@ class TreeThinkingEngine:
 
 最终答案：
 """
-            
+        
+        started = False  # 是否已产出非空白内容
+        try:
             # 使用中等温度生成综合答案
-            final_answer = await self.api_client.get_response(
-                synthesis_prompt, 
-                temperature=0.7
-            )
-            
-            return final_answer.strip()
-            
+            async for piece in self._stream_response(synthesis_prompt, temperature=0.7):
+                if not started:
+                    piece = piece.lstrip()
+                    if not piece:
+                        continue
+                    started = True
+                yield piece
         except Exception as e:
+            if started:
+                raise  # 已部分下发，由调用方收尾
             logger.error(f"综合最终答案失败: {e}")
+            started = False
+        
+        if not started:
             # 降级方案：返回最佳思考路线
             best_route = max(optimal_routes, key=lambda x: x.score if x.score > 0 else x.fitness)
-            return f"基于最佳思考路线的回答：\n\n{best_route.content}"
+            yield f"基于最佳思考路线的回答：\n\n{best_route.content}"
+    
+    async def _stream_response(self, prompt: str, temperature: float = 0.7) -> AsyncIterator[str]:
+        """流式调用LLM；api_client没有流式接口时退化为一次性返回"""
+        stream = getattr(self.api_client, "get_response_stream", None)
+        if stream is None:
+            yield await self.api_client.get_response(prompt, temperature=temperature)
+            return
+        async for piece in stream(prompt, temperature=temperature):
+            yield piece
     
     async def _basic_response(self, question: str) -> Dict[str, Any]:
         """基础回答（降级方案）"""
+        result = None
+        async for event in self._basic_response_stream(question):
+            if event["type"] == "done":
+                result = event["result"]
+        return result
+    
+    async def _basic_response_stream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """基础回答（降级方案，流式）"""
+        parts = []
         try:
             if self.api_client:
-                basic_answer = await self.api_client.get_response(question, temperature=0.7)
+                async for piece in self._stream_response(question, temperature=0.7):
+                    parts.append(piece)
+                    yield {"type": "delta", "content": piece}
             else:
-                basic_answer = "抱歉，无法处理这个问题。"
+                parts.append("抱歉，无法处理这个问题。")
+                yield {"type": "delta", "content": parts[0]}
             
-            return {
-                "answer": basic_answer,
+            yield {"type": "done", "result": {
+                "answer": "".join(parts),
                 "thinking_process": {
                     "mode": "basic",
                     "note": "使用基础回答模式"
                 },
                 "session_id": None
-            }
+            }}
         except Exception as e:
-            return {
-                "answer": f"处理问题时出现错误：{str(e)}",
+            error = f"处理问题时出现错误：{str(e)}"
+            if not parts:
+                yield {"type": "delta", "content": error}
+            yield {"type": "done", "result": {
+                "answer": "".join(parts) or error,
                 "thinking_process": {"mode": "error"},
                 "session_id": None
-            }
+            }}
     
     def enable_tree_thinking(self, enabled: bool = True):
         """启用/禁用树状思考"""
@@ -368,12 +438,15 @@ class TreeThinkingEngine:
             "current_session": self.current_session,
             "total_sessions": len(self.thinking_history),
             "thread_pool_status": self.thread_pool.get_pool_status(),
+            "route_stats": self.route_scheduler.stats.summary(),
+            "memory_recall": self.memory_recall.get_stats(),
             "config": self.config,
             "components": {
                 "difficulty_judge": "已初始化",
                 "preference_filter": "已初始化", 
                 "genetic_pruning": "已初始化",
-                "thread_pool": "已初始化"
+                "thread_pool": "已初始化",
+                "route_scheduler": "已初始化"
             }
         }
     
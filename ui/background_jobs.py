@@ -0,0 +1,99 @@
+# background_jobs.py # 界面后台任务：进度汇报、取消、重复请求合并
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class BackgroundJob(QObject):
+    """
+    后台任务句柄（在界面线程创建，信号从工作线程发出后自动排队回界面线程）
+    任务函数接收该句柄，通过report汇报进度、通过is_cancelled检查是否被取消
+    """
+    progress = pyqtSignal(int, str)  # 进度 (百分比, 阶段)
+    succeeded = pyqtSignal(object)  # 完成，携带结果
+    failed = pyqtSignal(str)  # 出错
+    cancelled = pyqtSignal()  # 已取消
+    done = pyqtSignal(str)  # 结束（无论结果），携带key
+
+    def __init__(self, key: str, fn: Callable, parent=None):
+        super().__init__(parent)
+        self.key = key
+        self.fn = fn
+        self._cancel_event = threading.Event()
+
+    def report(self, percent: int, stage: str):
+        """汇报进度（工作线程调用）"""
+        self.progress.emit(percent, stage)
+
+    def cancel(self):
+        """请求取消，任务函数在下一个检查点退出"""
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def _run(self):
+        try:
+            result = self.fn(self)
+            if self.is_cancelled():
+                self.cancelled.emit()
+            else:
+                self.succeeded.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.done.emit(self.key)
+
+
+class BackgroundJobRunner(QObject):
+    """
+    后台任务调度器
+    同一key同时只运行一个任务，任务进行中的重复提交合并到已有任务上
+    """
+
+    def __init__(self, max_workers: int = 2, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="UIJob")
+        self._jobs: Dict[str, BackgroundJob] = {}
+
+    def submit(self, key: str, fn: Callable[[BackgroundJob], object],
+               on_progress: Optional[Callable] = None, on_success: Optional[Callable] = None,
+               on_failure: Optional[Callable] = None, on_cancel: Optional[Callable] = None) -> Tuple[BackgroundJob, bool]:
+        """
+        提交任务（界面线程调用）
+        回调在任务开始执行前连接，任务很快结束时也不会丢失结果；合并到已有任务时不连接
+        :return: (任务句柄, 是否新建)；同key任务仍在进行时返回已有句柄和False
+        """
+        job = self._jobs.get(key)
+        if job is not None:
+            return job, False
+        job = BackgroundJob(key, fn, self)
+        for signal, callback in ((job.progress, on_progress), (job.succeeded, on_success),
+                                 (job.failed, on_failure), (job.cancelled, on_cancel)):
+            if callback is not None:
+                signal.connect(callback)
+        job.done.connect(self._forget)
+        self._jobs[key] = job
+        self._executor.submit(job._run)
+        return job, True
+
+    def is_running(self, key: str) -> bool:
+        return key in self._jobs
+
+    def cancel(self, key: str):
+        """取消指定任务"""
+        job = self._jobs.get(key)
+        if job is not None:
+            job.cancel()
+
+    def cancel_all(self):
+        """取消所有任务"""
+        for job in list(self._jobs.values()):
+            job.cancel()
+
+    def _forget(self, key: str):
+        """任务结束后移除（经信号排队在界面线程执行）"""
+        job = self._jobs.pop(key, None)
+        if job is not None:
+            job.deleteLater()
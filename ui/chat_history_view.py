@@ -0,0 +1,710 @@
+# chat_history_view.py # 虚拟化聊天记录：模型 + 委托 + 只绘制可见行的视图
+import math
+import os
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from PyQt5.QtWidgets import QAbstractItemView, QStyledItemDelegate, QStyleOptionViewItem
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QRectF, QEvent, QTimer
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPainter, QPalette, QRegion, QTextCursor, QTextDocument, QAbstractTextDocumentLayout
+from config import config
+from ui.background_jobs import BackgroundJobRunner
+
+ROW_MARGIN = 5  # 行与行之间的外边距（上下各一半）
+PADDING = 20  # 边框到文字的距离（对话框padding + 布局边距）
+NAME_GAP = 5  # 用户名与正文的间距
+TOOL_BUTTON = 24  # 工具调用展开按钮尺寸
+NESTED_HEIGHT = 200  # 工具调用详情展开后的高度
+DOCUMENT_CACHE_SIZE = 256  # 排版好的文档最多缓存行数
+
+
+def to_html(text: str) -> str:
+    """消息文本转为显示用HTML（字面量\\n与换行都转为<br>）"""
+    return str(text).replace('\\n', '\n').replace('\n', '<br>')
+
+
+class ChatMessage:
+    """一条聊天记录"""
+    __slots__ = ("key", "name", "html", "full_content", "kind", "version", "document",
+                 "nested_title", "nested_content", "expanded")
+
+    def __init__(self, key: int, name: str, html: str, full_content: str, kind: str = "message"):
+        self.key = key  # 唯一且连续的序号，行号 = key - 首行key
+        self.name = name
+        self.html = html
+        self.full_content = full_content
+        self.kind = kind  # message / tool
+        self.version = 0  # 内容版本，变化后重新排版
+        self.document = None  # 流式输出中的文档，增量追加
+        self.nested_title = ""
+        self.nested_content = ""
+        self.expanded = False
+
+
+class LogHistorySource:
+    """
+    按页向前读取日志中的历史对话
+    从最新的日志文件开始逐个解析，只解析到创建时的文件大小，本次会话新写入的记录不会重复出现
+    """
+
+    def __init__(self, parser, days: int):
+        self.parser = parser
+        self._files = [(path, os.path.getsize(path)) for path in parser.get_log_files_by_date(days)]  # 旧 -> 新
+        self._buffer: List[dict] = []
+
+    def has_more(self) -> bool:
+        return bool(self._buffer or self._files)
+
+    def older(self, count: int) -> List[dict]:
+        """返回紧挨在已加载内容之前的最多count条消息（按时间顺序）"""
+        while len(self._buffer) < count and self._files:
+            path, size = self._files.pop()
+            self._buffer[:0] = self.parser.parse_log_file(path, max_bytes=size)
+        page = self._buffer[-count:]
+        del self._buffer[-len(page):]
+        return page
+
+
+class ChatHistoryModel(QAbstractListModel):
+    """聊天记录模型：追加、流式更新、向前分页加载历史"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[ChatMessage] = []
+        self._next_key = 0  # 下一条追加消息的key
+        self._first_key = 0  # 首行key（向前加载时递减）
+        self.history_source: Optional[LogHistorySource] = None
+        self.history_names: Callable[[str], str] = lambda role: role  # 日志角色 -> 显示名
+        self._jobs = BackgroundJobRunner(max_workers=1, parent=self)  # 日志解析放到后台线程
+
+    # ---------- QAbstractListModel ----------
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return message.full_content
+        if role == Qt.UserRole:
+            return message
+        return None
+
+    # ---------- 访问 ----------
+
+    def message(self, row: int) -> ChatMessage:
+        return self._rows[row]
+
+    def row_of(self, key: int) -> int:
+        """key对应的行号，不存在时返回-1"""
+        row = key - self._first_key
+        return row if 0 <= row < len(self._rows) else -1
+
+    def last_key(self, kind: str) -> Optional[int]:
+        """最近一条指定类型消息的key"""
+        for message in reversed(self._rows):
+            if message.kind == kind:
+                return message.key
+        return None
+
+    # ---------- 修改 ----------
+
+    def append_message(self, name: str, html: str, full_content: str, kind: str = "message") -> int:
+        """在末尾追加消息，返回key"""
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        if not self._rows:
+            self._first_key = self._next_key
+        self._rows.append(ChatMessage(self._next_key, name, html, full_content, kind))
+        self._next_key += 1
+        self.endInsertRows()
+        return self._rows[-1].key
+
+    def set_html(self, key: int, html: str, full_content: Optional[str] = None):
+        """整体替换内容（流式结束后的定稿也走这里）"""
+        row = self.row_of(key)
+        if row < 0:
+            return
+        message = self._rows[row]
+        message.html = html
+        if full_content is not None:
+            message.full_content = full_content
+        message.document = None
+        message.version += 1
+        self._changed(row)
+
+    def append_text(self, key: int, text: str):
+        """流式追加纯文本增量：只在文档末尾插入，只重新排版被修改的文本块"""
+        row = self.row_of(key)
+        if row < 0 or not text:
+            return
+        cursor = QTextCursor(self._live_document(self._rows[row]))
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self._changed(row)
+
+    def set_text(self, key: int, text: str):
+        """流式过程中整体替换为纯文本"""
+        row = self.row_of(key)
+        if row < 0:
+            return
+        self._live_document(self._rows[row]).setPlainText(text)
+        self._changed(row)
+
+    def set_nested(self, key: int, title: str, content: str):
+        """设置工具调用详情"""
+        row = self.row_of(key)
+        if row < 0:
+            return
+        message = self._rows[row]
+        message.nested_title = title
+        message.nested_content = content
+        self._changed(row)
+
+    def toggle_expanded(self, row: int):
+        message = self._rows[row]
+        message.expanded = not message.expanded
+        self._changed(row)
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows.clear()
+        self._first_key = self._next_key
+        self.history_source = None  # 清空后不再加载更早的记录
+        self.endResetModel()
+
+    def _live_document(self, message: ChatMessage) -> QTextDocument:
+        if message.document is None:
+            document = QTextDocument()  # 不设父对象，定稿或清空时随引用释放
+            document.setDocumentMargin(0)
+            document.setDefaultFont(ChatMessageDelegate.content_font())
+            if message.html:
+                document.setHtml(message.html)
+            message.document = document
+            message.version += 1
+        return message.document
+
+    def _changed(self, row: int):
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    # ---------- 历史分页 ----------
+
+    def can_load_older(self) -> bool:
+        return (self.history_source is not None and self.history_source.has_more()
+                and not self._jobs.is_running("older"))
+
+    def load_older(self, count: int = 50) -> bool:
+        """在后台读取更早的历史，读完后在开头插入；返回是否发起了读取"""
+        if not self.can_load_older():
+            return False
+        source = self.history_source
+        self._jobs.submit(
+            "older",
+            lambda job: source.older(count),
+            on_success=lambda page: self._insert_older(source, page),
+            on_failure=lambda error: print(f"加载历史记录失败: {error}")
+        )
+        return True
+
+    def _insert_older(self, source: LogHistorySource, page: List[dict]):
+        """在开头插入读取到的历史消息（界面线程）"""
+        if source is not self.history_source or not page:
+            return  # 读取期间记录已被清空
+        self.beginInsertRows(QModelIndex(), 0, len(page) - 1)
+        if not self._rows:
+            self._first_key = self._next_key + len(page)
+            self._next_key = self._first_key
+        older = []
+        for offset, item in enumerate(page):
+            key = self._first_key - len(page) + offset
+            content = item.get("content", "")
+            older.append(ChatMessage(key, self.history_names(item.get("role", "")), to_html(content), content))
+        self._rows[:0] = older
+        self._first_key -= len(page)
+        self.endInsertRows()
+
+
+class ChatMessageDelegate(QStyledItemDelegate):
+    """
+    消息绘制委托
+    排版好的文档按行LRU缓存；高度分精确测量与快速估算两种，视图只对可见行做精确测量
+    """
+
+    _content_font = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._documents: "OrderedDict[int, tuple]" = OrderedDict()  # key -> (version, width, 文档)
+        self.name_font = QFont('Lucida Console', 12)
+        self.nested_font = QFont('Lucida Console', 12)
+        self._name_height = QFontMetrics(self.name_font).height()
+        metrics = QFontMetrics(self.content_font())
+        self._line_height = metrics.lineSpacing()
+        self._ascii_width = max(1, metrics.averageCharWidth())
+        self._wide_width = max(1, metrics.horizontalAdvance('中'))
+
+    @classmethod
+    def content_font(cls) -> QFont:
+        if cls._content_font is None:
+            cls._content_font = QFont('Lucida Console', 16)
+        return cls._content_font
+
+    # ---------- 尺寸 ----------
+
+    def _text_width(self, message: ChatMessage, width: int) -> int:
+        extra = TOOL_BUTTON + 10 if message.kind == "tool" else 0
+        return max(50, width - 2 * PADDING - extra)
+
+    def _chrome_height(self, message: ChatMessage) -> int:
+        """正文以外的高度：外边距、内边距、用户名、展开的详情"""
+        height = ROW_MARGIN * 2 + PADDING * 2
+        if message.kind != "tool":
+            height += self._name_height + NAME_GAP
+        if message.expanded:
+            height += NESTED_HEIGHT + NAME_GAP
+        return height
+
+    def measure(self, message: ChatMessage, width: int) -> int:
+        """精确高度（需要排版文档）"""
+        document = self._document(message, self._text_width(message, width))
+        body = math.ceil(document.size().height())
+        if message.kind == "tool":
+            body = max(body, TOOL_BUTTON)
+        return self._chrome_height(message) + body
+
+    def estimate(self, message: ChatMessage, width: int) -> int:
+        """估算高度（不排版，只按字数和换行粗略计算），用于尚未显示过的行"""
+        if message.document is not None:
+            return self.measure(message, width)
+        text_width = self._text_width(message, width)
+        lines = 0
+        for paragraph in str(message.full_content).replace('\\n', '\n').split('\n'):
+            advance = sum(self._wide_width if ord(ch) > 0x2e7f else self._ascii_width for ch in paragraph)
+            lines += max(1, math.ceil(advance / text_width))
+        return self._chrome_height(message) + lines * self._line_height
+
+    def sizeHint(self, option, index):
+        message = index.data(Qt.UserRole)
+        width = option.rect.width() or 400
+        return QRect(0, 0, width, self.measure(message, width)).size()
+
+    def _document(self, message: ChatMessage, text_width: int) -> QTextDocument:
+        if message.document is not None:
+            if message.document.textWidth() != text_width:
+                message.document.setTextWidth(text_width)
+            return message.document
+        cached = self._documents.get(message.key)
+        if cached is not None and cached[0] == message.version:
+            self._documents.move_to_end(message.key)
+            document = cached[2]
+            if cached[1] != text_width:
+                document.setTextWidth(text_width)
+                self._documents[message.key] = (message.version, text_width, document)
+            return document
+        document = QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultFont(self.content_font())
+        document.setHtml(message.html)
+        document.setTextWidth(text_width)
+        self._documents[message.key] = (message.version, text_width, document)
+        if len(self._documents) > DOCUMENT_CACHE_SIZE:
+            self._documents.popitem(last=False)
+        return document
+
+    def forget(self):
+        """清空文档缓存（模型重置时）"""
+        self._documents.clear()
+
+    # ---------- 绘制 ----------
+
+    def _button_rect(self, frame: QRect) -> QRect:
+        return QRect(frame.right() - PADDING - TOOL_BUTTON + 1, frame.top() + PADDING, TOOL_BUTTON, TOOL_BUTTON)
+
+    def paint(self, painter: QPainter, option, index):
+        message = index.data(Qt.UserRole)
+        frame = option.rect.adjusted(0, ROW_MARGIN, 0, -ROW_MARGIN)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        painter.setPen(QColor(255, 255, 255, 50))
+        painter.setBrush(QColor(17, 17, 17, int(config.ui.bg_alpha * 255)))
+        painter.drawRect(frame.adjusted(0, 0, -1, -1))
+
+        is_tool = message.kind == "tool"
+        text_color = QColor("#888") if is_tool else QColor("#fff")
+        top = frame.top() + PADDING
+        if not is_tool:
+            painter.setFont(self.name_font)
+            painter.setPen(QColor("#fff"))
+            painter.drawText(QRect(frame.left() + PADDING, top, frame.width() - 2 * PADDING, self._name_height),
+                             Qt.AlignLeft | Qt.AlignVCenter, message.name)
+            top += self._name_height + NAME_GAP
+
+        text_width = self._text_width(message, option.rect.width())
+        document = self._document(message, text_width)
+        painter.translate(frame.left() + PADDING, top)
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette.setColor(QPalette.Text, text_color)
+        # 只排绘与裁剪区域相交的文本块，超长消息也只画可见部分
+        clip = QRectF(option.rect.intersected(option.widget.viewport().rect() if option.widget else option.rect))
+        clip.translate(-(frame.left() + PADDING), -top)
+        context.clip = clip
+        document.documentLayout().draw(painter, context)
+        painter.translate(-(frame.left() + PADDING), -top)
+
+        if is_tool:
+            button = self._button_rect(frame)
+            painter.setRenderHint(QPainter.Antialiasing, True)
+            painter.setPen(QColor(255, 255, 255, 30))
+            painter.setBrush(QColor(100, 100, 100, 100))
+            painter.drawEllipse(button)
+            painter.setPen(QColor("#888"))
+            painter.setFont(self.nested_font)
+            painter.drawText(button, Qt.AlignCenter, "▼" if message.expanded else "▶")
+            if message.expanded:
+                nested = QRect(frame.left() + PADDING, frame.bottom() - PADDING - NESTED_HEIGHT + 1,
+                               frame.width() - 2 * PADDING, NESTED_HEIGHT)
+                painter.setPen(QColor(255, 255, 255, 30))
+                painter.setBrush(QColor(25, 25, 25, 150))
+                painter.drawRoundedRect(nested, 5, 5)
+                inner = nested.adjusted(10, 10, -10, -10)
+                painter.setPen(QColor("#aaa"))
+                painter.drawText(inner, Qt.AlignLeft | Qt.AlignTop, message.nested_title)
+                painter.setPen(QColor("#888"))
+                painter.drawText(inner.adjusted(0, self._name_height + NAME_GAP, 0, 0),
+                                 Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap, message.nested_content)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        """点击工具调用的展开按钮"""
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            message = index.data(Qt.UserRole)
+            if message.kind == "tool":
+                frame = option.rect.adjusted(0, ROW_MARGIN, 0, -ROW_MARGIN)
+                if self._button_rect(frame).contains(event.pos()):
+                    model.toggle_expanded(index.row())
+                    return True
+        return False
+
+
+class _HeightIndex:
+    """行高前缀和（树状数组）：按行更新高度、按y坐标找行都是O(log n)"""
+
+    def __init__(self, heights: List[int]):
+        self.heights = list(heights)
+        self._rebuild()
+
+    def _rebuild(self):
+        n = len(self.heights)
+        tree = [0] * (n + 1)
+        for i, h in enumerate(self.heights, 1):
+            tree[i] += h
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def __len__(self):
+        return len(self.heights)
+
+    def set(self, row: int, height: int) -> int:
+        """更新行高，返回变化量"""
+        delta = height - self.heights[row]
+        if delta:
+            self.heights[row] = height
+            i = row + 1
+            while i < len(self._tree):
+                self._tree[i] += delta
+                i += i & -i
+        return delta
+
+    def append(self, height: int):
+        self.heights.append(height)
+        n = len(self.heights)
+        self._tree.append(0)
+        # 新节点覆盖区间 (n - lowbit(n), n]
+        total = self.prefix(n - 1) - self.prefix(n - (n & -n))
+        self._tree[n] = total + height
+
+    def insert(self, row: int, heights: List[int]):
+        self.heights[row:row] = heights
+        self._rebuild()
+
+    def remove(self, start: int, end: int):
+        del self.heights[start:end + 1]
+        self._rebuild()
+
+    def prefix(self, row: int) -> int:
+        """前row行的总高度（即第row行的顶部y坐标）"""
+        total = 0
+        i = row
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def total(self) -> int:
+        return self.prefix(len(self.heights))
+
+    def row_at(self, y: int) -> int:
+        """包含y坐标的行（超出范围时返回边界行）"""
+        n = len(self.heights)
+        pos = 0
+        remaining = y
+        step = 1 << n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= n and self._tree[nxt] <= remaining:
+                pos = nxt
+                remaining -= self._tree[nxt]
+            step >>= 1
+        return min(pos, n - 1)
+
+
+class ChatHistoryView(QAbstractItemView):
+    """
+    虚拟化聊天记录视图
+    只测量和绘制可见行；未显示过的行使用估算高度，显示时再精确测量并缓存；
+    位于底部时新内容自动跟随，滚动到顶部附近时向前加载更早的历史
+    """
+
+    LOAD_THRESHOLD = 200  # 距顶部多少像素时加载更早的历史
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._heights = _HeightIndex([])
+        self._measured: List[bool] = []  # 该行高度是否已按当前宽度精确测量
+        self._width = 0  # 测量时使用的行宽
+        self.setItemDelegate(ChatMessageDelegate(self))
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.verticalScrollBar().setSingleStep(30)
+        self.verticalScrollBar().valueChanged.connect(lambda _: self._maybe_load_older())
+
+    # ---------- 几何 ----------
+
+    def _row_width(self) -> int:
+        return max(100, self.viewport().width() - 2 * ROW_MARGIN)
+
+    def _row_rect(self, row: int) -> QRect:
+        top = self._heights.prefix(row) - self.verticalOffset()
+        return QRect(ROW_MARGIN, top, self._row_width(), self._heights.heights[row])
+
+    def _message(self, row: int) -> ChatMessage:
+        return self.model().message(row)
+
+    def _estimate(self, row: int) -> int:
+        return self.itemDelegate().estimate(self._message(row), self._row_width())
+
+    def _at_bottom(self) -> bool:
+        bar = self.verticalScrollBar()
+        return bar.value() >= bar.maximum() - 4
+
+    def updateGeometries(self):
+        bar = self.verticalScrollBar()
+        bar.setPageStep(self.viewport().height())
+        bar.setRange(0, max(0, self._heights.total() - self.viewport().height()))
+        super().updateGeometries()
+
+    def _set_height(self, row: int, height: int, keep_anchor: bool = True) -> int:
+        """更新行高；该行在视口上方时同步调整滚动位置，保持可见内容不跳动"""
+        delta = self._heights.set(row, height)
+        if delta and keep_anchor and self._heights.prefix(row) < self.verticalOffset():
+            bar = self.verticalScrollBar()
+            self.updateGeometries()
+            bar.setValue(bar.value() + delta)
+        return delta
+
+    def _measure_visible(self):
+        """精确测量可见行，直到可见范围不再变化"""
+        if not len(self._heights):
+            return
+        delegate = self.itemDelegate()
+        width = self._row_width()
+        stick = self._at_bottom()
+        changed = True
+        while changed:
+            changed = False
+            offset = self.verticalOffset()
+            row = self._heights.row_at(offset)
+            bottom = offset + self.viewport().height()
+            while row < len(self._heights) and self._heights.prefix(row) < bottom:
+                if not self._measured[row]:
+                    self._measured[row] = True
+                    if self._set_height(row, delegate.measure(self._message(row), width)):
+                        changed = True
+                row += 1
+            if changed:
+                self.updateGeometries()
+                if stick:
+                    self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+
+    # ---------- QAbstractItemView ----------
+
+    def setModel(self, model):
+        super().setModel(model)
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.itemDelegate().forget()
+        self._width = self._row_width()
+        rows = self.model().rowCount() if self.model() else 0
+        self._heights = _HeightIndex([self._estimate(row) for row in range(rows)])
+        self._measured = [False] * rows
+        self.updateGeometries()
+        self.viewport().update()
+        QTimer.singleShot(0, self._maybe_load_older)  # 内容不满一屏时没有滚动，主动加载历史
+
+    def rowsInserted(self, parent, start, end):
+        super().rowsInserted(parent, start, end)
+        stick = self._at_bottom()
+        heights = [self._estimate(row) for row in range(start, end + 1)]
+        if start == len(self._heights):
+            for height in heights:
+                self._heights.append(height)
+            self._measured.extend([False] * len(heights))
+            self.updateGeometries()
+            if stick:
+                self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        else:
+            # 在开头插入更早的历史：滚动位置下移同样的高度，可见内容保持不动
+            offset = self.verticalOffset()
+            self._heights.insert(start, heights)
+            self._measured[start:start] = [False] * len(heights)
+            self.updateGeometries()
+            if start == 0:
+                self.verticalScrollBar().setValue(offset + sum(heights))
+        self.viewport().update()
+        if start == 0:
+            QTimer.singleShot(0, self._maybe_load_older)  # 插入一页后仍不满一屏时继续加载
+
+    def rowsAboutToBeRemoved(self, parent, start, end):
+        super().rowsAboutToBeRemoved(parent, start, end)
+        self._heights.remove(start, end)
+        del self._measured[start:end + 1]
+        self.updateGeometries()
+        self.viewport().update()
+
+    def dataChanged(self, top_left, bottom_right, roles=()):
+        super().dataChanged(top_left, bottom_right, roles)
+        stick = self._at_bottom()
+        delegate = self.itemDelegate()
+        width = self._row_width()
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            # 流式行每帧都会变化，只重新测量这一行，树状数组更新代价O(log n)
+            self._measured[row] = True
+            self._set_height(row, delegate.measure(self._message(row), width))
+        self.updateGeometries()
+        if stick:
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        self.viewport().update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.model() and self._row_width() != self._width:
+            # 宽度变化后所有精确高度失效，重新估算，可见行在绘制前再精确测量
+            stick = self._at_bottom()
+            anchor = self._heights.row_at(self.verticalOffset()) if len(self._heights) else 0
+            self._width = self._row_width()
+            self._heights = _HeightIndex([self._estimate(row) for row in range(len(self._measured))])
+            self._measured = [False] * len(self._measured)
+            self.updateGeometries()
+            bar = self.verticalScrollBar()
+            bar.setValue(bar.maximum() if stick else self._heights.prefix(anchor))
+        self.updateGeometries()
+        self._maybe_load_older()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        QTimer.singleShot(0, self._maybe_load_older)
+
+    def wheelEvent(self, event):
+        # 已在顶部（或内容不满一屏）时滚轮向上不会改变滚动值，这里直接触发加载
+        if event.angleDelta().y() > 0 and self.verticalScrollBar().value() == 0:
+            self._maybe_load_older()
+        super().wheelEvent(event)
+
+    def paintEvent(self, event):
+        if not self.model() or not len(self._heights):
+            return
+        self._measure_visible()
+        painter = QPainter(self.viewport())
+        delegate = self.itemDelegate()
+        option = QStyleOptionViewItem(self.viewOptions())
+        option.widget = self
+        offset = self.verticalOffset()
+        bottom = offset + self.viewport().height()
+        row = self._heights.row_at(offset)
+        while row < len(self._heights) and self._heights.prefix(row) < bottom:
+            option.rect = self._row_rect(row)
+            if option.rect.intersects(event.rect()):
+                delegate.paint(painter, option, self.model().index(row))
+            row += 1
+        painter.end()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def verticalOffset(self):
+        return self.verticalScrollBar().value()
+
+    def horizontalOffset(self):
+        return 0
+
+    def visualRect(self, index):
+        if not index.isValid() or index.row() >= len(self._heights):
+            return QRect()
+        return self._row_rect(index.row())
+
+    def indexAt(self, point):
+        if not self.model() or not len(self._heights):
+            return QModelIndex()
+        y = point.y() + self.verticalOffset()
+        if y < 0 or y >= self._heights.total():
+            return QModelIndex()
+        return self.model().index(self._heights.row_at(y))
+
+    def scrollTo(self, index, hint=QAbstractItemView.EnsureVisible):
+        if not index.isValid():
+            return
+        top = self._heights.prefix(index.row())
+        height = self._heights.heights[index.row()]
+        bar = self.verticalScrollBar()
+        if hint == QAbstractItemView.PositionAtBottom or (hint == QAbstractItemView.EnsureVisible and top + height > bar.value() + self.viewport().height()):
+            bar.setValue(top + height - self.viewport().height())
+        elif hint == QAbstractItemView.PositionAtTop or top < bar.value():
+            bar.setValue(top)
+
+    def moveCursor(self, action, modifiers):
+        return QModelIndex()
+
+    def isIndexHidden(self, index):
+        return False
+
+    def setSelection(self, rect, flags):
+        pass
+
+    def visualRegionForSelection(self, selection):
+        return QRegion()
+
+    # ---------- 滚动 ----------
+
+    def scroll_to_bottom(self):
+        """滚动到底部（等布局完成后执行）"""
+        def jump():
+            self._measure_visible()
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        QTimer.singleShot(0, jump)
+
+    def _maybe_load_older(self):
+        """滚动到顶部附近或内容不满一屏时加载更早的历史（读取在后台进行）"""
+        if not self.model() or not self.isVisible():
+            return
+        if self.verticalScrollBar().value() > self.LOAD_THRESHOLD:
+            return  # 内容不满一屏时滚动值恒为0，同样会加载
+        self.model().load_older()
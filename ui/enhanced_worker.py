@@ -1,24 +1,91 @@
 """
 增强版Worker类
 支持进度更新、状态回调、错误处理和取消操作
+所有对话轮次都在常驻的ConversationRuntime线程中执行，共享同一个事件循环和NagaConversation
 """
 
 import asyncio
+import threading
 import time
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QObject, pyqtSignal
 from ui.response_utils import extract_message
 import config  # 导入配置模块
 from config import AI_NAME
 
-class EnhancedWorker(QThread):
-    """增强版工作线程"""
+
+class ConversationRuntime:
+    """
+    常驻对话运行时
+    一个后台线程持有一个事件循环和一个NagaConversation，跨消息复用，
+    HTTP连接池、客户端和各类缓存不会随每轮对话重建
+    """
     
-    # 信号定义
+    def __init__(self):
+        self.naga = None  # 共享的对话实例（在运行时线程中创建）
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+        self._lock = threading.Lock()
+        
+    def start(self):
+        """启动运行时线程，等待对话实例就绪"""
+        with self._lock:
+            if self._thread is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run, name="ConversationRuntime", daemon=True)
+                self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+        
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            from conversation_core import NagaConversation
+            self.naga = NagaConversation()
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        self._loop.run_forever()
+        
+    def submit(self, coro):
+        """提交协程，返回concurrent.futures.Future；future.cancel()会取消协程"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+        
+    def stop(self):
+        """停止运行时"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_conversation_runtime() -> ConversationRuntime:
+    """获取全局对话运行时（首次调用时启动）"""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = ConversationRuntime().start()
+    return _runtime
+
+
+class EnhancedWorker(QObject):
+    """增强版对话轮次，提交到常驻运行时执行"""
+    
+    # 信号定义（从运行时线程发出，Qt自动排队到界面线程）
     finished = pyqtSignal(str)  # 完成信号，返回最终结果
     progress_updated = pyqtSignal(int, str)  # 进度更新信号 (value, status)
     status_changed = pyqtSignal(str)  # 状态变化信号
     error_occurred = pyqtSignal(str)  # 错误发生信号
     partial_result = pyqtSignal(str)  # 部分结果信号（流式输出）
+    _released = pyqtSignal()  # 本轮任务结束，可以销毁
     
     def __init__(self, naga, user_input, parent=None):
         super().__init__(parent)
@@ -26,6 +93,7 @@ class EnhancedWorker(QThread):
         self.user_input = user_input
         self.is_cancelled = False
         self.result_buffer = []
+        self._future = None  # 运行时中的本轮任务
         
         # 初始化语音集成模块
         try:
@@ -35,19 +103,36 @@ class EnhancedWorker(QThread):
             print(f"语音集成初始化失败: {e}")
             self.voice_integration = None
         
+    def start(self):
+        """提交本轮对话到常驻运行时"""
+        self.is_cancelled = False
+        self._future = get_conversation_runtime().submit(self.run_turn())
+        
+    def isRunning(self):
+        """本轮对话是否仍在执行"""
+        return self._future is not None and not self._future.done()
+        
     def cancel(self):
         """取消当前操作"""
         self.is_cancelled = True
         self.status_changed.emit("正在取消...")
+        # 取消运行时中的任务，正在等待的网络请求会立即中断
+        if self._future is not None:
+            self._future.cancel()
         # 立即发出完成信号，避免UI等待
         self.finished.emit("操作已取消")
         
-    def run(self):
-        """主执行函数"""
+    def release(self):
+        """任务结束后再销毁对象，避免运行时线程向已销毁的对象发信号"""
+        self._released.connect(self.deleteLater)
+        if self._future is None or self._future.done():
+            self.deleteLater()
+        else:
+            self._future.add_done_callback(lambda _: self._released.emit())
+        
+    async def run_turn(self):
+        """主执行函数（在运行时事件循环中执行）"""
         try:
-            # 重置取消状态（确保新任务开始时状态正确）
-            self.is_cancelled = False
-            
             # 检查是否在开始前就被取消
             if self.is_cancelled:
                 return
@@ -58,21 +143,13 @@ class EnhancedWorker(QThread):
             if self.is_cancelled:
                 return
                 
-            # 设置事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            # 执行异步处理
+            result = await self.process_with_progress()
             
-            try:
-                # 执行异步处理
-                result = loop.run_until_complete(self.process_with_progress())
-                
-                if not self.is_cancelled and result:
-                    # 提取最终消息
-                    final_message = extract_message(result)
-                    self.finished.emit(final_message)
-                    
-            finally:
-                loop.close()
+            if not self.is_cancelled and result:
+                # 提取最终消息
+                final_message = extract_message(result)
+                self.finished.emit(final_message)
                 
         except Exception as e:
             if not self.is_cancelled:  # 只有在未取消时才报告错误
@@ -112,6 +189,9 @@ class EnhancedWorker(QThread):
                         result_chunks.append(content_str)
                         # 发送部分结果用于实时显示
                         self.partial_result.emit(content_str)
+                    elif isinstance(content, dict) and content.get("type") == "phase":
+                        # 深度思考的阶段事件，只显示进度
+                        self.status_changed.emit(content.get("message", ""))
                 else:
                     content_str = str(chunk)
                     result_chunks.append(content_str)
@@ -182,15 +262,10 @@ class StreamingWorker(EnhancedWorker):
             # 发送到前端显示
             self.stream_chunk.emit(text)
             
-            # 异步发送到语音集成
+            # 发送到语音集成（分发队列）
             if self.voice_integration:
                 try:
-                    import threading
-                    threading.Thread(
-                        target=self.voice_integration.receive_text_chunk,
-                        args=(text,),
-                        daemon=True
-                    ).start()
+                    self.voice_integration.receive_text_chunk(text)  # 只入队，不阻塞流式循环
                 except Exception as e:
                     print(f"语音集成错误: {e}")
     
@@ -200,15 +275,10 @@ class StreamingWorker(EnhancedWorker):
             # 发送到前端显示
             self.stream_chunk.emit(text)
             
-            # 异步发送到语音集成
+            # 发送到语音集成（分发队列）
             if self.voice_integration:
                 try:
-                    import threading
-                    threading.Thread(
-                        target=self.voice_integration.receive_text_chunk,
-                        args=(text,),
-                        daemon=True
-                    ).start()
+                    self.voice_integration.receive_text_chunk(text)  # 只入队，不阻塞流式循环
                 except Exception as e:
                     print(f"语音集成错误: {e}")
     
@@ -291,21 +361,19 @@ class StreamingWorker(EnhancedWorker):
                             # 回退到原始处理方式
                             self.stream_chunk.emit(content_str)
                             
-                            # 异步发送文本到语音集成模块
+                            # 发送文本到语音集成模块（分发队列）
                             if self.voice_integration:
                                 try:
-                                    import threading
-                                    threading.Thread(
-                                        target=self.voice_integration.receive_text_chunk,
-                                        args=(content_str,),
-                                        daemon=True
-                                    ).start()
+                                    self.voice_integration.receive_text_chunk(content_str)  # 只入队，不阻塞流式循环
                                 except Exception as e:
                                     print(f"语音集成错误: {e}")
                         
                         # 更新缓冲区用于实时显示
                         self.streaming_buffer += content_str
                         word_count += len(content_str)
+                    elif isinstance(content, dict) and content.get("type") == "phase":
+                        # 深度思考的阶段事件，只显示进度
+                        self.status_changed.emit(content.get("message", ""))
                 else:
                     content_str = str(chunk)
                     result_chunks.append(content_str)
@@ -324,15 +392,10 @@ class StreamingWorker(EnhancedWorker):
                         # 回退到原始处理方式
                         self.stream_chunk.emit(content_str)
                         
-                        # 异步发送文本到语音集成模块
+                        # 发送文本到语音集成模块（分发队列）
                         if self.voice_integration:
                             try:
-                                import threading
-                                threading.Thread(
-                                    target=self.voice_integration.receive_text_chunk,
-                                    args=(content_str,),
-                                    daemon=True
-                                ).start()
+                                self.voice_integration.receive_text_chunk(content_str)  # 只入队，不阻塞流式循环
                             except Exception as e:
                                 print(f"语音集成错误: {e}")
                     
@@ -354,9 +417,6 @@ class StreamingWorker(EnhancedWorker):
                     progress = 85
                     
                 self.progress_updated.emit(progress, f"{status} ({word_count}字)")
-                
-                # 减少休眠时间，提升响应速度
-                await asyncio.sleep(0.001)
             
             # 完成处理
             if self.tool_extractor:
@@ -370,11 +430,7 @@ class StreamingWorker(EnhancedWorker):
                 # 这里只需要完成处理信号
                 if self.voice_integration:
                     try:
-                        import threading
-                        threading.Thread(
-                            target=self.voice_integration.finish_processing,
-                            daemon=True
-                        ).start()
+                        self.voice_integration.finish_processing()  # 排在已提交片段之后执行
                     except Exception as e:
                         print(f"语音集成错误: {e}")
                 
@@ -433,19 +489,10 @@ class BatchWorker(EnhancedWorker):
                 if self.voice_integration:
                     try:
                         final_text = ''.join(result_chunks)
-                        # 模拟流式文本输入
-                        import threading
-                        def simulate_streaming():
-                            # 按句子分割发送
-                            sentences = final_text.split('。')
-                            for sentence in sentences:
-                                if sentence.strip():
-                                    self.voice_integration.receive_text_chunk(sentence.strip() + '。')
-                                    time.sleep(0.1)  # 模拟延迟
-                            # 完成处理
-                            self.voice_integration.finish_processing()
-                        
-                        threading.Thread(target=simulate_streaming, daemon=True).start()
+                        # 整段交给分发队列，由语音模块增量断句
+                        self.voice_integration.receive_text_chunk(final_text)
+                        # 完成处理
+                        self.voice_integration.finish_processing()
                     except Exception as e:
                         print(f"语音集成错误: {e}")
                 
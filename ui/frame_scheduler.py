@@ -0,0 +1,104 @@
+# frame_scheduler.py # 按帧预算合并流式界面更新
+import time
+from collections import deque
+from typing import Callable, Dict
+from PyQt5.QtCore import QObject, QTimer
+from latency_stats import summarize
+
+
+class FrameUpdateScheduler(QObject):
+    """
+    流式界面更新调度器
+    文本增量先进入缓冲区，由定时器按帧预算（默认16ms）合并后一次性交给界面；
+    进度、状态等只需最新值的更新按key覆盖。事件循环跟不上时自动拉长帧间隔，
+    给输入和重绘留出时间；追上后再回落到帧预算
+    """
+
+    def __init__(self, on_text: Callable[[str], None], frame_budget_ms: int = 16, max_interval_ms: int = 128, parent=None):
+        super().__init__(parent)
+        self.on_text = on_text  # 合并后的文本交给此回调
+        self.frame_budget_ms = frame_budget_ms  # 帧预算
+        self.max_interval_ms = max_interval_ms  # 落后时的最长帧间隔
+        self.interval_ms = frame_budget_ms  # 当前帧间隔
+        self._deltas = []  # 待刷新的文本增量
+        self._latest = {}  # key -> (回调, 参数)，只保留最新值
+        self._due = 0.0  # 本帧预期触发时间
+        self._cost_ema = 0.0  # 刷新耗时的滑动平均（毫秒）
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)  # 有数据才计时，空闲时不唤醒
+        self._timer.timeout.connect(self.flush)
+
+        # 统计
+        self.frames = 0  # 刷新帧数
+        self.chunks = 0  # 收到的文本片段数
+        self._costs = deque(maxlen=256)  # 每帧刷新耗时（毫秒）
+        self._lateness = deque(maxlen=256)  # 每帧触发延迟（毫秒）
+
+    def push_text(self, text: str):
+        """缓存文本增量，等待下一帧刷新"""
+        if not text:
+            return
+        self._deltas.append(text)
+        self.chunks += 1
+        self._schedule()
+
+    def post(self, key: str, callback: Callable, *args):
+        """缓存只需最新值的更新，同一key在一帧内只执行最后一次"""
+        self._latest[key] = (callback, args)
+        self._schedule()
+
+    def _schedule(self):
+        if not self._timer.isActive():
+            self._due = time.perf_counter() + self.interval_ms / 1000
+            self._timer.start(self.interval_ms)
+
+    def flush(self):
+        """立即刷新所有缓存的更新（流结束前也应调用）"""
+        self._timer.stop()
+        if not self._deltas and not self._latest:
+            return
+        start = time.perf_counter()
+        lateness = max(0.0, (start - self._due) * 1000) if self._due else 0.0
+        self._due = 0.0
+
+        if self._deltas:
+            text = ''.join(self._deltas)
+            self._deltas.clear()
+            self.on_text(text)
+        latest, self._latest = self._latest, {}
+        for callback, args in latest.values():
+            callback(*args)
+
+        cost = (time.perf_counter() - start) * 1000
+        self.frames += 1
+        self._costs.append(cost)
+        self._lateness.append(lateness)
+        self._adapt(cost, lateness)
+
+    def _adapt(self, cost: float, lateness: float):
+        """刷新耗时超过半帧或定时器明显迟到时拉长间隔，否则逐步回落"""
+        self._cost_ema = cost if self.frames == 1 else self._cost_ema * 0.8 + cost * 0.2
+        target = max(self.frame_budget_ms, self._cost_ema * 2, lateness)
+        if target > self.interval_ms:
+            self.interval_ms = min(self.max_interval_ms, max(int(target), self.interval_ms * 2))
+        else:
+            self.interval_ms = max(self.frame_budget_ms, int((self.interval_ms + target) / 2))
+
+    def clear(self):
+        """丢弃所有未刷新的更新"""
+        self._timer.stop()
+        self._deltas.clear()
+        self._latest.clear()
+        self._due = 0.0
+
+    def stats(self) -> Dict:
+        """帧耗时统计（毫秒）"""
+        return {
+            "frames": self.frames,
+            "chunks": self.chunks,
+            "chunks_per_frame": round(self.chunks / self.frames, 2) if self.frames else 0.0,
+            "interval_ms": self.interval_ms,
+            "frame_cost": summarize(self._costs),
+            "lateness": summarize(self._lateness),
+        }
@@ -4,14 +4,15 @@ import sys, datetime
 from PyQt5.QtWidgets import QApplication, QWidget, QTextEdit, QSizePolicy, QGraphicsBlurEffect, QHBoxLayout, QLabel, QVBoxLayout, QStackedLayout, QPushButton, QStackedWidget, QDesktopWidget, QScrollArea, QSplitter, QGraphicsDropShadowEffect, QFileDialog, QMessageBox, QFrame
 from PyQt5.QtCore import Qt, QRect, QThread, pyqtSignal, QParallelAnimationGroup, QPropertyAnimation, QEasingCurve, QTimer
 from PyQt5.QtGui import QColor, QPainter, QBrush, QFont, QPixmap, QPalette, QPen, QIcon
-from conversation_core import NagaConversation
 import os
 from config import config, AI_NAME # 导入统一配置
-from ui.response_utils import extract_message  # 新增：引入消息提取工具
+from ui.response_utils import extract_message, IncrementalMessageDecoder  # 新增：引入消息提取工具
 from ui.styles.progress_widget import EnhancedProgressWidget  # 导入进度组件
-from ui.enhanced_worker import StreamingWorker, BatchWorker  # 导入增强Worker
+from ui.enhanced_worker import StreamingWorker, BatchWorker, get_conversation_runtime  # 导入增强Worker
 from ui.elegant_settings_widget import ElegantSettingsWidget
-from ui.message_renderer import MessageRenderer  # 导入消息渲染器
+from ui.chat_history_view import ChatHistoryModel, ChatHistoryView, LogHistorySource, to_html  # 虚拟化聊天记录
+from ui.frame_scheduler import FrameUpdateScheduler  # 按帧合并流式更新
+from ui.background_jobs import BackgroundJobRunner  # 后台任务（心智云图等）
 import asyncio
 import json
 import threading
@@ -223,11 +224,17 @@ class ChatWindow(QWidget):
             }
         """)
         
-        # 创建滚动区域来容纳消息对话框
-        s.chat_scroll_area = QScrollArea(s.chat_page)
-        s.chat_scroll_area.setWidgetResizable(True)
-        s.chat_scroll_area.setStyleSheet("""
-            QScrollArea {
+        # 聊天记录：模型保存全部消息，视图只测量和绘制可见行
+        s.chat_model = ChatHistoryModel(s)
+        s.chat_model.history_names = lambda role: USER_NAME if role == "user" else AI_NAME
+        if config.api.persistent_context:
+            # 向上滚动到顶部附近时按页加载日志中更早的对话
+            from logs.log_context_parser import get_log_parser
+            s.chat_model.history_source = LogHistorySource(get_log_parser(), config.api.context_load_days)
+        s.chat_view = ChatHistoryView(s.chat_page)
+        s.chat_view.setModel(s.chat_model)
+        s.chat_view.setStyleSheet("""
+            QAbstractItemView {
                 background: transparent;
                 border: none;
                 outline: none;
@@ -246,28 +253,12 @@ class ChatWindow(QWidget):
                 background: rgba(255, 255, 255, 120);
             }
         """)
-        
-        # 创建滚动内容容器
-        s.chat_content = QWidget()
-        s.chat_content.setStyleSheet("""
-            QWidget {
-                background: transparent;
-                border: none;
-            }
-        """)
-        
-        # 创建垂直布局来排列消息对话框
-        s.chat_layout = QVBoxLayout(s.chat_content)
-        s.chat_layout.setContentsMargins(10, 10, 10, 10)
-        s.chat_layout.setSpacing(10)
-        s.chat_layout.addStretch()  # 添加弹性空间，让消息从顶部开始
-        
-        s.chat_scroll_area.setWidget(s.chat_content)
+        s.chat_view.viewport().setAutoFillBackground(False)
         
         # 创建聊天页面布局
         chat_page_layout = QVBoxLayout(s.chat_page)
         chat_page_layout.setContentsMargins(0, 0, 0, 0)
-        chat_page_layout.addWidget(s.chat_scroll_area)
+        chat_page_layout.addWidget(s.chat_view)
         
         s.chat_stack.addWidget(s.chat_page) # index 0 聊天页
         s.settings_page = s.create_settings_page() # index 1 设置页
@@ -372,11 +363,13 @@ class ChatWindow(QWidget):
         main.addWidget(s.main_splitter)
         
         s.nick=nick
-        s.naga=NagaConversation()  # 第三次初始化：ChatWindow构造函数中创建
+        s.naga=get_conversation_runtime().naga  # 第三次初始化：在常驻对话运行时中创建，跨消息复用
         s.worker=None
         s.full_img=0 # 立绘展开标志，0=收缩状态，1=展开状态
         s.streaming_mode = config.system.stream_mode  # 根据配置决定是否使用流式模式
         s.current_response = ""  # 当前响应缓冲
+        s.stream_scheduler = FrameUpdateScheduler(s.append_response_chunk, parent=s)  # 流式片段按帧合并后再刷新界面
+        s.jobs = BackgroundJobRunner(parent=s)  # 耗时任务放到后台执行，不阻塞界面
         s.animating = False  # 动画标志位，动画期间为True
         s._img_inited = False  # 标志变量，图片自适应只在初始化时触发一次
         
@@ -492,41 +485,10 @@ class ChatWindow(QWidget):
                 s.on_send();return True
         return False
     def add_user_message(s, name, content):
-        """添加用户消息"""
+        """添加用户消息，返回消息key"""
         from ui.response_utils import extract_message
         msg = extract_message(content)
-        content_html = str(msg).replace('\\n', '\n').replace('\n', '<br>')
-        
-        # 生成消息ID
-        if not hasattr(s, '_message_counter'):
-            s._message_counter = 0
-        s._message_counter += 1
-        message_id = f"msg_{s._message_counter}"
-        
-        # 初始化消息存储
-        if not hasattr(s, '_messages'):
-            s._messages = {}
-        
-        # 存储消息信息
-        s._messages[message_id] = {
-            'name': name,
-            'content': content_html,
-            'full_content': content,
-            'dialog_widget': None
-        }
-        
-        # 使用消息渲染器创建对话框
-        if name == "系统":
-            message_dialog = MessageRenderer.create_system_message(name, content_html, s.chat_content)
-        else:
-            message_dialog = MessageRenderer.create_user_message(name, content_html, s.chat_content)
-        
-        # 存储对话框引用
-        s._messages[message_id]['dialog_widget'] = message_dialog
-        
-        # 在弹性空间之前插入新的消息对话框
-        stretch_index = s.chat_layout.count() - 1
-        s.chat_layout.insertWidget(stretch_index, message_dialog)
+        message_id = s.chat_model.append_message(name, to_html(msg), content)
         
         # 滚动到底部
         s.scroll_to_bottom()
@@ -537,45 +499,21 @@ class ChatWindow(QWidget):
         """更新最后一条消息的内容"""
         from ui.response_utils import extract_message
         msg = extract_message(content)
-        content_html = str(msg).replace('\\n', '\n').replace('\n', '<br>')
         
         # 检查是否有当前消息ID
-        if hasattr(s, '_current_message_id') and s._current_message_id:
-            # 更新存储的消息信息
-            if hasattr(s, '_messages') and s._current_message_id in s._messages:
-                s._messages[s._current_message_id]['content'] = content_html
-                s._messages[s._current_message_id]['full_content'] = content
-                
-                # 使用消息渲染器更新对话框内容
-                dialog_widget = s._messages[s._current_message_id]['dialog_widget']
-                if dialog_widget:
-                    MessageRenderer.update_message_content(dialog_widget, content_html)
+        if getattr(s, '_current_message_id', None) is not None:
+            s.chat_model.set_html(s._current_message_id, to_html(msg), content)
         else:
             # 如果没有当前消息ID，直接添加新消息
             s.add_user_message(name, content)
     
     def scroll_to_bottom(s):
         """滚动到聊天区域底部"""
-        # 使用QTimer延迟滚动，确保布局完成
-        QTimer.singleShot(10, lambda: s.chat_scroll_area.verticalScrollBar().setValue(
-            s.chat_scroll_area.verticalScrollBar().maximum()
-        ))
+        s.chat_view.scroll_to_bottom()
         
     def clear_chat_history(s):
         """清除聊天历史记录"""
-        # 清除所有消息对话框
-        if hasattr(s, '_messages'):
-            for message_id, message_info in s._messages.items():
-                dialog_widget = message_info.get('dialog_widget')
-                if dialog_widget:
-                    dialog_widget.deleteLater()
-            s._messages.clear()
-        
-        # 清除布局中的所有widget（除了弹性空间）
-        while s.chat_layout.count() > 1:  # 保留最后的弹性空间
-            item = s.chat_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
+        s.chat_model.clear()
     def on_send(s):
         u = s.input.toPlainText().strip()
         if u:
@@ -592,7 +530,7 @@ class ChatWindow(QWidget):
             
             # 确保worker被清理
             if s.worker:
-                s.worker.deleteLater()
+                s.worker.release()
                 s.worker = None
             
             # 根据模式选择Worker类型，创建全新实例
@@ -611,12 +549,13 @@ class ChatWindow(QWidget):
     
     def setup_streaming_worker(s):
         """配置流式Worker的信号连接"""
-        s.worker.progress_updated.connect(s.progress_widget.update_progress)
-        s.worker.status_changed.connect(lambda status: s.progress_widget.status_label.setText(status))
+        # 进度和状态每个片段都会更新，一帧内只保留最新值
+        s.worker.progress_updated.connect(lambda progress, status: s.stream_scheduler.post('progress', s.progress_widget.update_progress, progress, status))
+        s.worker.status_changed.connect(lambda status: s.stream_scheduler.post('status', s.progress_widget.status_label.setText, status))
         s.worker.error_occurred.connect(s.handle_error)
         
-        # 流式专用信号
-        s.worker.stream_chunk.connect(s.append_response_chunk)
+        # 流式专用信号（片段先缓存，按帧预算合并刷新）
+        s.worker.stream_chunk.connect(s.stream_scheduler.push_text)
         s.worker.stream_complete.connect(s.finalize_streaming_response)
         s.worker.finished.connect(s.on_response_finished)
         
@@ -632,22 +571,27 @@ class ChatWindow(QWidget):
         s.worker.finished.connect(s.on_batch_response_finished)
     
     def append_response_chunk(s, chunk):
-        """追加响应片段（流式模式）- 实时显示"""
+        """追加响应片段（流式模式）- 实时显示，每个片段只处理增量"""
         # 实时更新显示 - 立即显示到UI
         if not hasattr(s, '_current_message_id'):
-            # 第一次收到chunk时，创建新消息
-            s._current_message_id = s.add_user_message(AI_NAME, chunk)
-            s.current_response = chunk
+            # 第一次收到chunk时，创建新消息和增量解码器
+            s._current_message_id = s.add_user_message(AI_NAME, "")
+            s._stream_decoder = IncrementalMessageDecoder()
+            s.current_response = ""
+        s.current_response += chunk
+        
+        text, replace = s._stream_decoder.feed(chunk)
+        if replace:
+            s.chat_model.set_text(s._current_message_id, text)
         else:
-            # 后续chunk，追加到当前消息
-            s.current_response += chunk
-            s.update_last_message(AI_NAME, s.current_response)
-            
-        # 强制UI更新
-        s.chat_scroll_area.viewport().update()
+            # 只把新增文本追加到文档末尾，不重新解析和排版整段回复
+            s.chat_model.append_text(s._current_message_id, text)
     
     def finalize_streaming_response(s):
         """完成流式响应 - 立即处理"""
+        s.stream_scheduler.flush()  # 先刷新尚未显示的片段
+        if config.system.debug:
+            print(f"流式刷新统计: {s.stream_scheduler.stats()}")
         if s.current_response:
             # 对累积的完整响应进行消息提取（多步自动\n分隔）
             from ui.response_utils import extract_message
@@ -668,6 +612,7 @@ class ChatWindow(QWidget):
         # 检查是否是取消操作的响应
         if response == "操作已取消":
             return  # 不显示，因为已经在cancel_current_task中显示了
+        s.stream_scheduler.flush()
         if not s.current_response:  # 如果流式没有收到数据，使用最终结果
             from ui.response_utils import extract_message
             final_message = extract_message(response)
@@ -686,44 +631,24 @@ class ChatWindow(QWidget):
     
     def handle_error(s, error_msg):
         """处理错误"""
+        s.stream_scheduler.flush()
         s.add_user_message("系统", f"❌ {error_msg}")
         s.progress_widget.stop_loading()
     
     def handle_tool_call(s, notification):
         """处理工具调用通知"""
-        # 创建专门的工具调用内容对话框（没有用户名）
-        tool_call_dialog = MessageRenderer.create_tool_call_content_message(notification, s.chat_content)
+        s.stream_scheduler.flush()  # 保证工具提示排在已收到的文本之后
+        # 工具调用行（没有用户名，可展开详情）
+        message_id = s.chat_model.append_message('工具调用', to_html(notification), notification, kind='tool')
         
-        # 设置嵌套对话框内容
+        # 设置嵌套详情内容
         nested_title = "工具调用详情"
         nested_content = f"""
 工具名称: {notification}
 状态: 正在执行...
 时间: {time.strftime('%H:%M:%S')}
         """.strip()
-        tool_call_dialog.set_nested_content(nested_title, nested_content)
-        
-        # 生成消息ID
-        if not hasattr(s, '_message_counter'):
-            s._message_counter = 0
-        s._message_counter += 1
-        message_id = f"tool_call_{s._message_counter}"
-        
-        # 初始化消息存储
-        if not hasattr(s, '_messages'):
-            s._messages = {}
-        
-        # 存储工具调用消息信息
-        s._messages[message_id] = {
-            'name': '工具调用',
-            'content': notification,
-            'full_content': notification,
-            'dialog_widget': tool_call_dialog
-        }
-        
-        # 在弹性空间之前插入工具调用对话框
-        stretch_index = s.chat_layout.count() - 1
-        s.chat_layout.insertWidget(stretch_index, tool_call_dialog)
+        s.chat_model.set_nested(message_id, nested_title, nested_content)
         
         # 滚动到底部
         s.scroll_to_bottom()
@@ -734,26 +659,21 @@ class ChatWindow(QWidget):
     
     def handle_tool_result(s, result):
         """处理工具执行结果"""
-        # 查找最近的工具调用对话框并更新
-        if hasattr(s, '_messages'):
-            for message_id, message_info in reversed(list(s._messages.items())):
-                if message_id.startswith('tool_call_'):
-                    dialog_widget = message_info.get('dialog_widget')
-                    if dialog_widget:
-                        # 更新工具调用对话框显示结果
-                        MessageRenderer.update_message_content(dialog_widget, f"✅ {result}")
-                        
-                        # 更新嵌套对话框内容
-                        if hasattr(dialog_widget, 'set_nested_content'):
-                            nested_title = "工具调用结果"
-                            nested_content = f"""
-工具名称: {message_info.get('content', '未知工具')}
+        s.stream_scheduler.flush()  # 保证工具提示排在已收到的文本之后
+        # 查找最近的工具调用并更新
+        message_id = s.chat_model.last_key('tool')
+        if message_id is not None:
+            row = s.chat_model.row_of(message_id)
+            tool_name = s.chat_model.message(row).full_content
+            s.chat_model.set_html(message_id, f"✅ {result}")
+            nested_title = "工具调用结果"
+            nested_content = f"""
+工具名称: {tool_name or '未知工具'}
 状态: 执行完成 ✅
 时间: {time.strftime('%H:%M:%S')}
 结果: {result[:200]}{'...' if len(result) > 200 else ''}
-                            """.strip()
-                            dialog_widget.set_nested_content(nested_title, nested_content)
-                        break
+            """.strip()
+            s.chat_model.set_nested(message_id, nested_title, nested_content)
         
         # 在状态栏也显示工具执行结果
         s.progress_widget.status_label.setText(f"✅ {result[:50]}...")
@@ -770,20 +690,12 @@ class ChatWindow(QWidget):
             s.add_user_message("系统", "🚫 操作已取消")
             
             # 清空当前响应缓冲，避免部分响应显示
+            s.stream_scheduler.clear()
             s.current_response = ""
             
-            # 使用QTimer延迟处理线程清理，避免UI卡顿
-            def cleanup_worker():
-                if s.worker:
-                    s.worker.quit()
-                    if not s.worker.wait(500):  # 只等待500ms
-                        s.worker.terminate()
-                        s.worker.wait(200)  # 再等待200ms
-                    s.worker.deleteLater()
-                    s.worker = None
-            
-            # 50ms后异步清理，避免阻塞UI
-            QTimer.singleShot(50, cleanup_worker)
+            # 任务已在运行时中取消，运行时线程常驻，无需等待线程退出
+            s.worker.release()
+            s.worker = None
         else:
             s.progress_widget.stop_loading()
 
@@ -992,13 +904,8 @@ class ChatWindow(QWidget):
         # 计算alpha #
         alpha_px = int(BG_ALPHA * 255)
 
-        # 更新聊天区域背景 - 现在使用透明背景，对话框有自己的背景
-        s.chat_content.setStyleSheet(f"""
-            QWidget {{
-                background: transparent;
-                border: none;
-            }}
-        """)
+        # 更新聊天区域 - 消息背景由委托按当前透明度绘制，重绘即可
+        s.chat_view.viewport().update()
 
         # 更新输入框背景 #
         fontfam, fontsize = 'Lucida Console', 16
@@ -1225,49 +1132,64 @@ class ChatWindow(QWidget):
             s.add_user_message("系统", f"❌ 文档处理失败: {str(e)}")
     
     def open_mind_map(s):
-        """打开心智云图"""
+        """打开心智云图（图谱未变化时直接打开，否则在后台生成，不阻塞界面）"""
         try:
-            # 检查是否存在知识图谱文件
-            graph_file = "logs/knowledge_graph/graph.html"
             quintuples_file = "logs/knowledge_graph/quintuples.json"
-            
-            # 如果quintuples.json存在，删除现有的graph.html并重新生成
-            if os.path.exists(quintuples_file):
-                # 如果graph.html存在，先删除它
-                if os.path.exists(graph_file):
-                    try:
-                        os.remove(graph_file)
-                        print(f"已删除旧的graph.html文件")
-                    except Exception as e:
-                        print(f"删除graph.html文件失败: {e}")
-                
-                # 生成新的HTML
-                s.add_user_message("系统", "🔄 正在生成心智云图...")
-                try:
-                    from summer_memory.quintuple_visualize_v2 import visualize_quintuples
-                    visualize_quintuples()
-                    if os.path.exists(graph_file):
-                        import webbrowser
-                        # 获取正确的绝对路径
-                        if os.path.isabs(graph_file):
-                            abs_graph_path = graph_file
-                        else:
-                            # 如果是相对路径，基于项目根目录构建绝对路径
-                            current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                            abs_graph_path = os.path.join(current_dir, graph_file)
-                        
-                        webbrowser.open("file:///" + abs_graph_path)
-                        s.add_user_message("系统", "🧠 心智云图已生成并打开")
-                    else:
-                        s.add_user_message("系统", "❌ 心智云图生成失败")
-                except Exception as e:
-                    s.add_user_message("系统", f"❌ 生成心智云图失败: {str(e)}")
-            else:
+
+            if not os.path.exists(quintuples_file):
                 # 没有五元组数据，提示用户
                 s.add_user_message("系统", "❌ 未找到五元组数据，请先进行对话以生成知识图谱")
+                return
+
+            # 图谱自上次导出后未变化，直接复用已生成的页面
+            from summer_memory.quintuple_visualize_v2 import current_view_file, visualize_quintuples
+            graph_file = current_view_file()
+            if graph_file:
+                s._show_mind_map(graph_file)
+                return
+
+            # 布局缓存只处理新增的节点和边；生成过程中重复点击合并到同一个任务
+            _, created = s.jobs.submit(
+                "mind_map",
+                lambda job: visualize_quintuples(open_browser=False, progress=job.report, cancelled=job.is_cancelled),
+                on_progress=lambda percent, stage: s.progress_widget.status_label.setText(f"🧠 心智云图：{stage} {percent}%"),
+                on_success=s._on_mind_map_ready,
+                on_failure=lambda error: s.add_user_message("系统", f"❌ 生成心智云图失败: {error}"),
+                on_cancel=lambda: s.progress_widget.status_label.setText("心智云图生成已取消")
+            )
+            if created:
+                s.add_user_message("系统", "🔄 正在更新心智云图...")
+            else:
+                s.progress_widget.status_label.setText("🔄 心智云图正在生成中...")
         except Exception as e:
             s.add_user_message("系统", f"❌ 打开心智云图失败: {str(e)}")
 
+    def _on_mind_map_ready(s, graph_file):
+        """后台生成完成"""
+        if graph_file and os.path.exists(graph_file):
+            s._show_mind_map(graph_file)
+        else:
+            s.add_user_message("系统", "❌ 心智云图生成失败")
+
+    def _show_mind_map(s, graph_file):
+        """在浏览器中打开心智云图页面"""
+        import webbrowser
+        # 获取正确的绝对路径
+        if os.path.isabs(graph_file):
+            abs_graph_path = graph_file
+        else:
+            # 如果是相对路径，基于项目根目录构建绝对路径
+            current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            abs_graph_path = os.path.join(current_dir, graph_file)
+
+        webbrowser.open("file:///" + abs_graph_path)
+        s.add_user_message("系统", "🧠 心智云图已打开")
+
+    def closeEvent(s, event):
+        """关闭窗口时取消后台任务"""
+        s.jobs.cancel_all()
+        super().closeEvent(event)
+
 if __name__=="__main__":
     app = QApplication(sys.argv)
     win = ChatWindow()
@@ -1,4 +1,5 @@
 import json
+import re
 
 def extract_message(response: str) -> str:
     """
@@ -73,3 +74,120 @@ def _recursive_extract(data) -> str:
         return data.strip()
     
     return ""
+
+
+class IncrementalMessageDecoder:
+    """
+    流式场景下的增量消息解码器，每个片段只扫描新增部分，代价与片段长度成正比
+    普通文本直接给出增量；首个'{'（或以'['开头的整段）视为结构化载荷，
+    只跟踪括号深度，闭合时解析一次，效果与对整段调用extract_message一致
+    """
+    _SCAN = re.compile(r'[{}\[\]"\\]')  # 只关心括号、引号和转义
+
+    def __init__(self):
+        self._parts = []  # 已收到的原始片段
+        self._blank = True  # 目前为止是否只有空白
+        self._start = None  # 结构化载荷起点（在_parts中的序号及片段内偏移）
+        self._depth = 0  # 括号深度
+        self._in_string = False  # 是否在JSON字符串内
+        self._escape = False  # 上一个字符是否为转义符
+        self._dead = False  # 载荷已确认不是JSON
+        self._structured = False  # 当前显示的是载荷提取结果
+        self._held = ""  # 末尾未配对的反斜杠，等下个片段再决定
+
+    @property
+    def text(self) -> str:
+        """已收到的原始文本"""
+        return ''.join(self._parts)
+
+    def feed(self, chunk: str):
+        """
+        输入一个片段
+        :return: (text, replace) replace为False时追加text，为True时用text替换全部显示内容
+        """
+        if not chunk:
+            return "", False
+        index = len(self._parts)
+        self._parts.append(chunk)
+        if self._structured:
+            if not chunk.strip():
+                return "", False
+            # 载荷后出现新内容，整段已不是JSON，回退为原文显示
+            self._structured = False
+            self._dead = True
+            self._held = ""
+            return self._plain(self.text), True
+        if not self._dead:
+            payload = self._scan(chunk, index)
+            if payload:
+                self._structured = True
+                self._held = ""
+                return payload.replace('\\n', '\n'), True
+        return self._plain(chunk), False
+
+    def finish(self) -> str:
+        """流结束，返回尚未输出的内容"""
+        held, self._held = self._held, ""
+        return held
+
+    def _plain(self, chunk: str) -> str:
+        """字面量\\n转换为换行；片段末尾的反斜杠可能与下个片段的n组成\\n，暂缓输出"""
+        text = self._held + chunk
+        self._held = ""
+        if text.endswith('\\'):
+            text, self._held = text[:-1], '\\'
+        return text.replace('\\n', '\n')
+
+    def _scan(self, chunk: str, index: int):
+        """推进括号状态机，载荷闭合时返回提取结果"""
+        offset = 0
+        if self._start is None:
+            head = chunk.lstrip()
+            if self._blank and head.startswith('['):
+                offset = len(chunk) - len(head)  # 整段以数组开头
+            else:
+                offset = chunk.find('{')
+            self._blank = self._blank and not head
+            if offset < 0:
+                return None
+            self._start = (index, offset)
+        escaped_at = offset if self._escape else -1  # 被转义字符的位置（转义只作用于紧随的一个字符）
+        for match in self._SCAN.finditer(chunk, offset):
+            ch = match.group()
+            if self._escape:
+                self._escape = False
+                if match.start() == escaped_at:
+                    continue
+            if self._in_string:
+                if ch == '\\':
+                    self._escape = True
+                    escaped_at = match.end()
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return self._close(index, match.end())
+        if self._escape and escaped_at < len(chunk):
+            self._escape = False  # 被转义的是普通字符，已经过去
+        return None
+
+    def _close(self, index: int, end: int):
+        """载荷闭合：只解析这一次，JSON是否合法由前缀决定，之后不再跟踪"""
+        self._dead = True
+        if self._parts[index][end:].strip():
+            return None  # 载荷后紧跟其他内容
+        start_index, start_offset = self._start
+        payload = ''.join(self._parts[start_index:index + 1])
+        payload = payload[start_offset:len(payload) - len(self._parts[index]) + end]
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return None
+        if isinstance(data, list):
+            return '\n'.join([_recursive_extract(item) for item in data if _recursive_extract(item)]) or None
+        return _recursive_extract(data) or None
@@ -0,0 +1,249 @@
+import asyncio  # 异步 #
+import os  # 系统 #
+import queue  # 队列 #
+import threading  # 线程 #
+import time  # 时间 #
+from collections import deque  # 定长队列 #
+from concurrent.futures import Future  # 结果句柄 #
+from io import BytesIO  # 内存流 #
+from typing import Dict, Optional, Union  # 类型 #
+
+import numpy as np  # 数值 #
+
+from config import config  # 统一配置 #
+from latency_stats import summarize  # 耗时摘要 #
+
+AudioInput = Union[bytes, np.ndarray]  # WAV字节或16kHz float32采样 #
+
+
+class ASRBusyError(RuntimeError):
+    """识别队列已满 # 背压 #"""
+
+
+class ASREngine:
+    """常驻 FunASR 识别引擎 # 一行说明 #
+
+    启动时每个worker线程加载并预热一份模型，之后所有请求经有界队列分发，
+    避免每句话重复加载模型；队列满时立即拒绝，由调用方决定丢弃或重试。
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None):
+        self.workers = workers or config.asr.engine_workers  # worker数 #
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size or config.asr.engine_queue_size)  # 请求队列 #
+        self._threads = []  # worker线程 #
+        self._lock = threading.Lock()  # 状态锁 #
+        self._started = False  # 是否已启动 #
+        self._ready = threading.Event()  # 至少一个模型可用 #
+        self._loaded = 0  # 已加载模型数 #
+        self._load_failed = 0  # 加载失败数 #
+        self._load_error: Optional[str] = None  # 最近一次加载错误 #
+
+        # 指标 #
+        self._queue_waits = deque(maxlen=500)  # 排队耗时 #
+        self._inference_times = deque(maxlen=500)  # 推理耗时 #
+        self._inflight = 0  # 正在识别 #
+        self.completed = 0  # 成功数 #
+        self.failed = 0  # 失败数 #
+        self.rejected = 0  # 背压拒绝数 #
+
+    # ---------- 生命周期 ---------- #
+
+    def start(self):
+        """启动worker线程（幂等），模型在各自线程中加载 # 一行说明 #"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker_loop, args=(i,), name=f"ASRWorker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        print(f"🎙️ ASR引擎启动中: {self.workers}个worker, 队列上限{self._queue.maxsize}")  # 提示 #
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待至少一个模型加载完成 # 一行说明 #"""
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        """停止所有worker # 一行说明 #"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._started = False
+        for t in threads:
+            if t.is_alive():
+                self._queue.put(None)  # 结束信号 #
+        for t in threads:
+            t.join(timeout=5)
+
+    @property
+    def available(self) -> bool:
+        """是否还有可能提供服务（已加载或仍在加载中） # 一行说明 #"""
+        return self._loaded > 0 or self._load_failed < self.workers
+
+    # ---------- 模型 ---------- #
+
+    def _load_model(self):
+        """加载一份 FunASR 模型 # 一行说明 #"""
+        if config.asr.engine != "local_funasr":
+            raise RuntimeError("本地 FunASR 未启用，请在配置中设置 engine: 'local_funasr'")
+        try:
+            from funasr import AutoModel  # 导入 #
+        except ImportError:
+            raise RuntimeError("未安装 FunASR，请运行: pip install funasr")
+        model_path = getattr(config.asr, 'local_model_path', None)  # 本地模型路径 #
+        if not model_path or not os.path.exists(model_path):
+            raise RuntimeError("本地 FunASR 模型路径不存在，请检查配置")
+        ncpu = max(1, (os.cpu_count() or 4) // self.workers)  # 各worker平分CPU线程 #
+        return AutoModel(model=model_path, disable_update=True, device="cpu", ncpu=ncpu)
+
+    @staticmethod
+    def _recognize(model, audio: AudioInput) -> Optional[str]:
+        """执行一次识别 # 一行说明 #"""
+        from funasr.utils.postprocess_utils import rich_transcription_postprocess  # 后处理 #
+        data = BytesIO(audio) if isinstance(audio, (bytes, bytearray)) else audio  # 字节转流 #
+        result = model.generate(
+            input=data,
+            cache={},
+            language="zh",  # 默认中文 #
+            ban_emo_unk=True,
+            use_itn=False,
+            disable_pbar=True
+        )
+        if result and len(result) > 0:
+            text = str(rich_transcription_postprocess(result[0]["text"])).replace(" ", "")  # 清理 #
+            return text if text else None
+        return None
+
+    def _warmup(self, model):
+        """用一段静音跑一次推理，避免首个请求承担初始化开销 # 一行说明 #"""
+        try:
+            self._recognize(model, np.zeros(8000, dtype=np.float32))
+        except Exception as e:
+            print(f"⚠️ ASR预热失败（不影响使用）: {e}")
+
+    # ---------- worker ---------- #
+
+    def _worker_loop(self, index: int):
+        started = time.time()
+        try:
+            model = self._load_model()
+            if config.asr.engine_warmup:
+                self._warmup(model)
+        except Exception as e:
+            with self._lock:
+                self._load_failed += 1
+                self._load_error = str(e)
+                dead = self._loaded == 0 and self._load_failed >= self.workers
+            print(f"❌ ASR worker {index} 加载模型失败: {e}")
+            if dead:
+                self._fail_pending(RuntimeError(self._load_error))
+            return
+
+        with self._lock:
+            self._loaded += 1
+        self._ready.set()
+        print(f"✅ ASR worker {index} 就绪，加载耗时 {time.time() - started:.1f}s")
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            audio, future, enqueued = item
+            if not future.set_running_or_notify_cancel():
+                continue  # 调用方已取消 #
+            begin = time.monotonic()
+            with self._lock:
+                self._inflight += 1
+            try:
+                text = self._recognize(model, audio)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                future.set_exception(e)
+            else:
+                with self._lock:
+                    self.completed += 1
+                future.set_result(text)
+            finally:
+                end = time.monotonic()
+                with self._lock:
+                    self._inflight -= 1
+                    self._queue_waits.append(begin - enqueued)
+                    self._inference_times.append(end - begin)
+
+    def _fail_pending(self, error: Exception):
+        """所有模型都不可用时，结束排队中的请求 # 一行说明 #"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(error)
+
+    # ---------- 请求接口 ---------- #
+
+    def submit(self, audio: AudioInput, block: bool = False, timeout: Optional[float] = None) -> Future:
+        """提交识别请求（线程安全），队列满时抛出 ASRBusyError # 一行说明 #"""
+        self.start()
+        if not self.available:
+            raise RuntimeError(self._load_error or "ASR模型不可用")
+        future: Future = Future()
+        try:
+            self._queue.put((audio, future, time.monotonic()), block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise ASRBusyError(f"ASR队列已满（{self._queue.maxsize}），请稍后重试")
+        return future
+
+    async def transcribe(self, audio: AudioInput, timeout: Optional[float] = None) -> Optional[str]:
+        """异步识别，不阻塞事件循环 # 一行说明 #"""
+        future = self.submit(audio)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or config.asr.engine_timeout)
+        except asyncio.TimeoutError:
+            future.cancel()  # 尚未开始则直接出队 #
+            raise
+
+    def transcribe_sync(self, audio: AudioInput, timeout: Optional[float] = None) -> Optional[str]:
+        """同步识别，队列满时最多阻塞等待timeout # 一行说明 #"""
+        timeout = timeout or config.asr.engine_timeout
+        future = self.submit(audio, block=True, timeout=timeout)
+        return future.result(timeout=timeout)
+
+    # ---------- 指标 ---------- #
+
+    def metrics(self) -> Dict:
+        """实时指标 # 一行说明 #"""
+        with self._lock:
+            waits = list(self._queue_waits)
+            inference = list(self._inference_times)
+            return {
+                "workers": self.workers,
+                "models_loaded": self._loaded,
+                "load_error": self._load_error,
+                "queued": self._queue.qsize(),
+                "queue_limit": self._queue.maxsize,
+                "inflight": self._inflight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "queue_wait": summarize(waits),
+                "inference": summarize(inference),
+            }
+
+
+# 全局实例 #
+_asr_engine: Optional[ASREngine] = None
+_asr_engine_lock = threading.Lock()
+
+
+def get_asr_engine() -> ASREngine:
+    """获取全局ASR引擎 # 一行说明 #"""
+    global _asr_engine
+    if _asr_engine is None:
+        with _asr_engine_lock:
+            if _asr_engine is None:
+                _asr_engine = ASREngine()
+    return _asr_engine
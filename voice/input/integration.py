@@ -5,7 +5,7 @@ from typing import AsyncGenerator, Optional  # 类型 #
 import aiohttp  # HTTP客户端 #
 
 from config import config  # 配置 #
-from .asr_client import transcribe_wav_bytes  # 转写 #
+from .asr_engine import get_asr_engine, ASRBusyError  # 常驻识别引擎 #
 from .vad_worker import VADWorker  # 采集线程 #
 
 
@@ -15,8 +15,9 @@ class VoiceInputIntegration:
     def __init__(self):
         self.vad_worker: Optional[VADWorker] = None  # VAD工作器 #
         self.is_listening = False  # 监听状态 #
-        self._audio_queue = asyncio.Queue()  # 音频队列 #
+        self._audio_queue = asyncio.Queue()  # 识别结果队列（按说话顺序） #
         self._stop_event = asyncio.Event()  # 停止事件 #
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # 监听所在事件循环 #
 
     async def stt_stream(self) -> AsyncGenerator[str, None]:
         """语音转文本流式接口，供对话核心调用 # 一行说明 #"""
@@ -26,14 +27,13 @@ class VoiceInputIntegration:
         try:
             while not self._stop_event.is_set():
                 try:
-                    # 等待音频数据 #
-                    wav_bytes, latency = await asyncio.wait_for(
+                    # 等待下一句的识别结果（采集线程已提交给引擎，多句可并行识别） #
+                    future, latency = await asyncio.wait_for(
                         self._audio_queue.get(), 
                         timeout=1.0  # 1秒超时 #
                     )
                     
-                    # 调用 ASR #
-                    text = transcribe_wav_bytes(wav_bytes)
+                    text = await asyncio.wait_for(asyncio.wrap_future(future), config.asr.engine_timeout)
                     if text and text.strip():
                         yield text.strip()  # 返回识别文本 #
                         
@@ -51,11 +51,24 @@ class VoiceInputIntegration:
         if self.is_listening:
             return  # 已启动 #
         
+        self._loop = asyncio.get_running_loop()  # 采集线程通过它回投结果 #
+        self._stop_event.clear()
+        engine = get_asr_engine()
+        engine.start()  # 提前加载模型 #
+        
         def on_utterance(wav_bytes: bytes, latency: float):
-            """音频片段回调 # 一行说明 #"""
-            if not self._stop_event.is_set():
-                # 异步添加到队列 #
-                asyncio.create_task(self._audio_queue.put((wav_bytes, latency)))
+            """音频片段回调（采集线程中执行） # 一行说明 #"""
+            if self._stop_event.is_set():
+                return
+            try:
+                future = engine.submit(wav_bytes)  # 立即提交识别 #
+            except ASRBusyError as e:
+                print(f"⚠️ 丢弃一句语音: {e}")  # 背压 #
+                return
+            except Exception as e:
+                print(f"语音识别提交失败: {e}")  # 异常处理 #
+                return
+            self._loop.call_soon_threadsafe(self._audio_queue.put_nowait, (future, latency))
         
         try:
             self.vad_worker = VADWorker(on_utterance)  # 创建工作器 #
@@ -96,7 +109,7 @@ class VoiceInputIntegration:
         try:
             with open(file_path, 'rb') as f:
                 audio_data = f.read()  # 读取文件 #
-            return transcribe_wav_bytes(audio_data)  # 转写 #
+            return await get_asr_engine().transcribe(audio_data)  # 转写 #
         except Exception as e:
             print(f"文件转写失败: {e}")  # 错误提示 #
             return None
@@ -105,7 +118,7 @@ class VoiceInputIntegration:
         """转写 Base64 音频 # 一行说明 #"""
         try:
             audio_data = base64.b64decode(audio_base64.encode("utf-8"))  # 解码 #
-            return transcribe_wav_bytes(audio_data)  # 转写 #
+            return await get_asr_engine().transcribe(audio_data)  # 转写 #
         except Exception as e:
             print(f"Base64转写失败: {e}")  # 错误提示 #
             return None
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, UploadFile, File, WebSocket  # Web框架 #
+from contextlib import asynccontextmanager  # 生命周期 #
+from fastapi import FastAPI, UploadFile, File, WebSocket, HTTPException  # Web框架 #
 from fastapi.responses import JSONResponse  # 响应 #
 import base64  # b64 #
 from typing import Optional  # 类型 #
@@ -6,12 +7,22 @@ import sounddevice as sd  # 音频设备 #
 
 from config import config  # 配置 #
 from .schemas import TranscriptionResult  # 数据模型 #
-from .asr_client import transcribe_wav_bytes  # 转写 #
+from .asr_engine import get_asr_engine, ASRBusyError  # 常驻识别引擎 #
 from .vad_worker import VADWorker  # 采集线程 #
 from .ws_server import websocket_endpoint  # WebSocket端点 #
+from .vad_utils import get_vad_scheduler  # 批量VAD #
 
 
-app = FastAPI(title="NagaAgent ASR Service")  # 应用 #
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时加载并预热识别模型 # 一行说明 #"""
+    engine = get_asr_engine()
+    engine.start()  # 后台线程加载，不阻塞服务启动 #
+    yield
+    engine.stop()  # 释放worker #
+
+
+app = FastAPI(title="NagaAgent ASR Service", lifespan=lifespan)  # 应用 #
 
 worker: Optional[VADWorker] = None  # 全局工作器 #
 
@@ -45,19 +56,37 @@ def list_devices():
         return {"error": f"获取设备列表失败: {str(e)}"}  # 错误处理 #
 
 
+async def _transcribe(data: bytes) -> str:
+    """经识别引擎转写，队列满时返回503 # 一行说明 #"""
+    try:
+        text = await get_asr_engine().transcribe(data)  # 转写 #
+    except ASRBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})  # 背压 #
+    except Exception as e:
+        print(f"❌ FunASR 转写失败: {e}")  # 异常处理 #
+        return ""
+    return text or ""
+
+
+@app.get("/asr/metrics")
+def asr_metrics():
+    """识别引擎与批量VAD指标（排队、推理延迟、拒绝数、batch大小） # 一行说明 #"""
+    metrics = get_asr_engine().metrics()
+    metrics["vad"] = get_vad_scheduler().metrics()
+    return metrics
+
+
 @app.post("/v1/audio/transcriptions", response_model=TranscriptionResult)
 async def transcriptions(file: UploadFile = File(...)):
     data = await file.read()  # 读取文件 #
-    text = transcribe_wav_bytes(data)  # 转写 #
-    return TranscriptionResult(text=text or "")  # 返回 #
+    return TranscriptionResult(text=await _transcribe(data))  # 返回 #
 
 
 @app.post("/v1/audio/transcriptions_b64", response_model=TranscriptionResult)
 async def transcriptions_b64(payload: dict):
     audio64 = payload.get("audio", "")  # 读取base64 #
     data = base64.b64decode(audio64.encode("utf-8")) if audio64 else b""  # 解码 #
-    text = transcribe_wav_bytes(data)  # 转写 #
-    return TranscriptionResult(text=text or "")  # 返回 #
+    return TranscriptionResult(text=await _transcribe(data))  # 返回 #
 
 
 @app.post("/control/listen/start")
@@ -67,7 +96,10 @@ def listen_start():
         return {"status": "already_running"}  # 已运行 #
 
     def on_utt(wav_bytes: bytes, latency: float):
-        transcribe_wav_bytes(wav_bytes)  # 识别 #
+        try:
+            get_asr_engine().submit(wav_bytes)  # 异步识别，不阻塞采集线程 #
+        except Exception as e:
+            print(f"⚠️ 识别提交失败: {e}")  # 背压或模型不可用 #
         # 可扩展：回调/WS广播 #
 
     worker = VADWorker(on_utt)  # 创建 #
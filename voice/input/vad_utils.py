@@ -1,63 +1,358 @@
+import asyncio  # 异步 #
+import threading  # 线程 #
+import time  # 时间 #
+from concurrent.futures import ThreadPoolExecutor  # 推理线程 #
+from math import gcd  # 最大公约数 #
+from typing import Dict, List, Optional, Tuple  # 类型 #
+
 import numpy as np  # 数值 #
 import onnxruntime as ort  # 推理 #
-from typing import Iterator, Dict, Tuple  # 类型 #
-
-
-class VADIterator:
-    """流式 VAD 迭代器，用于实时语音分段 # 一行说明 #"""
-
-    def __init__(self, speech_pad_ms: int = 300):
-        self.speech_pad_ms = speech_pad_ms  # 语音后填充 #
-        self.sample_rate = 16000  # 采样率 #
-        self.speech_pad_frames = int(speech_pad_ms * self.sample_rate / 1000)  # 填充帧数 #
-        self.silence_frames = 0  # 静音帧计数 #
-        self.speech_frames = 0  # 语音帧计数 #
-        self.current_speech = []  # 当前语音片段 #
-        self.is_speaking = False  # 是否在说话 #
-
-    def __call__(self, audio_chunk: np.ndarray) -> Iterator[Tuple[Dict[str, bool], np.ndarray]]:
-        """处理音频块，返回 VAD 事件和音频数据 # 一行说明 #"""
-        if not self.is_speaking:  # 未在说话 #
-            if self._detect_speech_start(audio_chunk):  # 检测开始 #
-                self.is_speaking = True
-                self.speech_frames = 0
-                self.silence_frames = 0
-                self.current_speech = []
-                yield {"start": True, "end": False}, audio_chunk  # 开始事件 #
-            else:
-                yield {"start": False, "end": False}, audio_chunk  # 静音 #
-        else:  # 正在说话 #
-            self.current_speech.append(audio_chunk)  # 累积音频 #
-            self.speech_frames += len(audio_chunk)
-            
-            if self._detect_speech_end(audio_chunk):  # 检测结束 #
-                self.is_speaking = False
-                # 添加后填充 #
-                if self.speech_pad_frames > 0:
-                    padding = np.zeros(self.speech_pad_frames, dtype=audio_chunk.dtype)
-                    self.current_speech.append(padding)
-                
-                combined = np.concatenate(self.current_speech)  # 拼接 #
-                yield {"start": False, "end": True}, combined  # 结束事件 #
-                self.current_speech = []
-            else:
-                yield {"start": False, "end": False}, audio_chunk  # 继续说话 #
-
-    def _detect_speech_start(self, audio_chunk: np.ndarray) -> bool:
-        """检测语音开始 # 一行说明 #"""
-        # 简单能量检测，可替换为 Silero VAD #
-        energy = np.mean(audio_chunk ** 2)
-        return energy > 0.01  # 能量阈值 #
-
-    def _detect_speech_end(self, audio_chunk: np.ndarray) -> bool:
-        """检测语音结束 # 一行说明 #"""
-        # 连续静音检测 #
-        energy = np.mean(audio_chunk ** 2)
-        if energy < 0.005:  # 静音阈值 #
-            self.silence_frames += len(audio_chunk)
+
+from config import config  # 配置 #
+
+VAD_SAMPLE_RATE = 16000  # Silero VAD 工作采样率 #
+VAD_WINDOW = 512  # Silero v5 在16kHz下要求的窗口长度 #
+VAD_CONTEXT = 64  # 每个窗口前拼接的上下文样本数 #
+
+
+class PolyphaseResampler:
+    """流式多相重采样器 # 一行说明 #
+
+    FIR滤波器按相位拆分，跨帧保留输入历史和输出相位，
+    帧与帧之间连续无接缝，代价只与输出点数×每相抽头数成正比。
+    """
+
+    def __init__(self, sr_in: int, sr_out: int, half_width: int = 10, beta: float = 5.0):
+        g = gcd(sr_in, sr_out)
+        self.up = sr_out // g  # 上采样倍数L #
+        self.down = sr_in // g  # 下采样倍数M #
+        self.passthrough = self.up == 1 and self.down == 1  # 采样率相同时直通 #
+        if self.passthrough:
+            return
+
+        # Kaiser窗低通原型（同 scipy.signal.resample_poly 的默认设计） #
+        factor = max(self.up, self.down)
+        num_taps = 2 * half_width * factor + 1
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        cutoff = 1.0 / factor
+        h = cutoff * np.sinc(cutoff * n) * np.kaiser(num_taps, beta) * self.up
+
+        # 拆成L个相位，每相T个抽头，不足补零 #
+        self.taps = -(-num_taps // self.up)
+        padded = np.zeros(self.taps * self.up)
+        padded[:num_taps] = h
+        self._phases = padded.reshape(self.taps, self.up).T.astype(np.float32)  # (L, T) #
+        self._offsets = np.arange(self.taps)  # 每相回看的输入偏移 #
+
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)  # 上一帧尾部输入 #
+        self._consumed = 0  # 已接收输入总数 #
+        self._produced = 0  # 已输出样本总数 #
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """重采样一帧，返回本帧可产出的所有输出样本 # 一行说明 #"""
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.passthrough:
+            return samples
+        buf = np.concatenate([self._history, samples])
+        base = self._consumed - len(self._history)  # buf[0]对应的全局输入下标 #
+        total = self._consumed + len(samples)
+
+        # 输出n对应上采样域位置n*M，即输入下标(n*M)//L、相位(n*M)%L #
+        last = (total * self.up - 1) // self.down  # 最后一个可计算的输出 #
+        n = np.arange(self._produced, last + 1)
+        if n.size:
+            pos = n * self.down
+            idx = pos // self.up - base
+            phase = pos % self.up
+            gathered = buf[idx[:, None] - self._offsets[None, :]]  # (N, T) #
+            out = np.einsum("nt,nt->n", gathered, self._phases[phase])
+            self._produced = int(last) + 1
+        else:
+            out = np.zeros(0, dtype=np.float32)
+
+        self._consumed = total
+        keep = self.taps - 1
+        self._history = buf[-keep:] if keep else buf[:0]
+        return out.astype(np.float32, copy=False)
+
+
+class SileroVAD:
+    """Silero VAD (v5 onnx) 推理封装，支持批量 # 一行说明 #"""
+
+    def __init__(self, model_path: Optional[str] = None):
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1  # 靠批量提升吞吐，单线程即可 #
+        opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            model_path or config.asr.vad_model_path, sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        self._sr = np.array(VAD_SAMPLE_RATE, dtype=np.int64)
+
+    def run_batch(self, inputs: np.ndarray, states: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """inputs: (B, 上下文+窗口)，states: (2, B, 128)；返回 (概率(B,), 新状态) # 一行说明 #"""
+        prob, state = self.session.run(None, {"input": inputs, "state": states, "sr": self._sr})
+        return prob.reshape(-1), state
+
+
+class VADStream:
+    """单路音频的流式VAD状态 # 一行说明 #
+
+    每条连接/每个麦克风独立持有重采样器、循环状态、上下文和分段状态，互不干扰。
+    """
+
+    def __init__(self, sample_rate_in: int = VAD_SAMPLE_RATE):
+        self.sample_rate_in = sample_rate_in
+        self.resampler = PolyphaseResampler(sample_rate_in, VAD_SAMPLE_RATE)
+        self.state = np.zeros((2, 1, 128), dtype=np.float32)  # Silero循环状态 #
+        self._context = np.zeros(VAD_CONTEXT, dtype=np.float32)
+        self._pending = np.zeros(0, dtype=np.float32)  # 未凑够一个窗口的样本 #
+
+        # 分段参数 #
+        self.threshold = config.asr.vad_threshold
+        self.neg_threshold = max(self.threshold - 0.15, 0.01)  # 滞回，避免在阈值附近抖动 #
+        self.min_silence = int(config.asr.silence_ms * VAD_SAMPLE_RATE / 1000)
+        self.speech_pad = int(config.asr.vad_speech_pad_ms * VAD_SAMPLE_RATE / 1000)
+        self.min_speech = int(config.asr.vad_min_speech_ms * VAD_SAMPLE_RATE / 1000)
+
+        # 分段状态 #
+        self.triggered = False  # 是否在说话 #
+        self._samples_seen = 0  # 已处理样本数 #
+        self._speech_start = 0  # 语音开始位置 #
+        self._temp_end = 0  # 疑似结束位置 #
+        self._speech: List[np.ndarray] = []  # 说话中的窗口 #
+        self._prepad: List[np.ndarray] = []  # 开始前的填充窗口 #
+
+    def push_audio(self, samples: np.ndarray):
+        """送入原始采样率的float32音频 # 一行说明 #"""
+        resampled = self.resampler.process(samples)
+        if resampled.size:
+            self._pending = np.concatenate([self._pending, resampled])
+
+    def next_window(self) -> Optional[np.ndarray]:
+        """取出一个待推理窗口，不足时返回None # 一行说明 #"""
+        if len(self._pending) < VAD_WINDOW:
+            return None
+        window, self._pending = self._pending[:VAD_WINDOW], self._pending[VAD_WINDOW:]
+        return window
+
+    def model_input(self, window: np.ndarray) -> np.ndarray:
+        """拼接上下文后的模型输入 # 一行说明 #"""
+        return np.concatenate([self._context, window])
+
+    def apply(self, window: np.ndarray, prob: float, state: np.ndarray) -> List[Dict]:
+        """写回推理结果并推进分段状态机，返回事件列表 # 一行说明 #"""
+        self.state = state
+        self._context = window[-VAD_CONTEXT:]
+        self._samples_seen += len(window)
+        events: List[Dict] = []
+
+        if self.triggered:
+            self._speech.append(window)
         else:
-            self.silence_frames = 0
-        
-        # 静音超过阈值认为结束 #
-        silence_threshold = 0.5 * self.sample_rate  # 0.5秒 #
-        return self.silence_frames > silence_threshold
+            self._prepad.append(window)
+            while sum(len(w) for w in self._prepad) > self.speech_pad + VAD_WINDOW:
+                self._prepad.pop(0)
+
+        if prob >= self.threshold:
+            self._temp_end = 0
+            if not self.triggered:
+                self.triggered = True
+                self._speech_start = self._samples_seen - len(window)
+                self._speech = list(self._prepad)
+                self._prepad = []
+                events.append({"type": "start"})
+        elif prob < self.neg_threshold and self.triggered:
+            if not self._temp_end:
+                self._temp_end = self._samples_seen
+            if self._samples_seen - self._temp_end >= self.min_silence:
+                events.append({"type": "end", "audio": self._finish_segment()})
+        return events
+
+    def _finish_segment(self) -> Optional[np.ndarray]:
+        """结束当前语音段，过短的段返回None # 一行说明 #"""
+        speech_len = self._temp_end - self._speech_start
+        audio = np.concatenate(self._speech) if self._speech else np.zeros(0, dtype=np.float32)
+        # 截到"疑似结束 + 尾部填充"，丢掉多余静音 #
+        tail = self._samples_seen - (self._temp_end + self.speech_pad)
+        if tail > 0:
+            audio = audio[:max(0, len(audio) - tail)]
+        self.triggered = False
+        self._temp_end = 0
+        self._speech = []
+        self._prepad = []
+        return audio if speech_len >= self.min_speech else None
+
+    def feed_sync(self, samples: np.ndarray, vad: "SileroVAD") -> List[Dict]:
+        """同步处理（单路采集线程使用） # 一行说明 #"""
+        self.push_audio(samples)
+        events: List[Dict] = []
+        while True:
+            window = self.next_window()
+            if window is None:
+                return events
+            probs, state = vad.run_batch(self.model_input(window)[None, :], self.state)
+            events.extend(self.apply(window, float(probs[0]), state))
+
+
+class VADBatchScheduler:
+    """跨连接批量VAD调度器 # 一行说明 #
+
+    各连接提交就绪窗口后挂起，调度协程在很短的收集窗口内把所有就绪窗口
+    叠成一个batch，在推理线程中一次 onnxruntime 调用完成，再把概率和状态分发回各连接。
+    """
+
+    def __init__(self, model: Optional[SileroVAD] = None,
+                 max_batch: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.model = model
+        self.max_batch = max_batch or config.asr.vad_batch_size
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else config.asr.vad_batch_wait_ms) / 1000
+        self._pending: List[Tuple[VADStream, np.ndarray, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="VADBatch")
+
+        # 指标 #
+        self.batches = 0
+        self.frames = 0
+        self.max_batch_seen = 0
+        self.infer_seconds = 0.0
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            if self.model is None:
+                self.model = get_vad_model()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def process(self, stream: VADStream, window: np.ndarray) -> List[Dict]:
+        """提交一个窗口，返回该窗口产生的分段事件 # 一行说明 #"""
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((stream, window, future))
+        self._wakeup.set()
+        return await future
+
+    async def feed(self, stream: VADStream, samples: np.ndarray) -> List[Dict]:
+        """送入一帧音频，处理其中所有完整窗口 # 一行说明 #"""
+        stream.push_audio(samples)
+        events: List[Dict] = []
+        while True:
+            window = stream.next_window()
+            if window is None:
+                return events
+            events.extend(await self.process(stream, window))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if len(self._pending) < self.max_batch and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)  # 收集其他连接的就绪窗口 #
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            if self._pending:
+                self._wakeup.set()
+            if not batch:
+                continue
+
+            try:
+                inputs = np.stack([stream.model_input(window) for stream, window, _ in batch])
+                states = np.concatenate([stream.state for stream, _, _ in batch], axis=1)
+                started = time.perf_counter()
+                probs, new_states = await loop.run_in_executor(self._executor, self.model.run_batch, inputs, states)
+                self.infer_seconds += time.perf_counter() - started
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.frames += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            for i, (stream, window, future) in enumerate(batch):
+                if future.done():
+                    continue  # 连接已断开 #
+                try:
+                    future.set_result(stream.apply(window, float(probs[i]), new_states[:, i:i + 1, :]))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def metrics(self) -> Dict:
+        """批处理指标 # 一行说明 #"""
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch_seen,
+            "avg_infer_ms": round(self.infer_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+            "queued": len(self._pending),
+        }
+
+
+# 全局实例 #
+_vad_model: Optional[SileroVAD] = None
+_vad_scheduler: Optional[VADBatchScheduler] = None
+_vad_lock = threading.Lock()
+
+
+def get_vad_model() -> SileroVAD:
+    """获取共享的VAD模型（无状态，状态由各VADStream持有） # 一行说明 #"""
+    global _vad_model
+    if _vad_model is None:
+        with _vad_lock:
+            if _vad_model is None:
+                _vad_model = SileroVAD()
+    return _vad_model
+
+
+def get_vad_scheduler() -> VADBatchScheduler:
+    """获取全局批量VAD调度器 # 一行说明 #"""
+    global _vad_scheduler
+    if _vad_scheduler is None:
+        with _vad_lock:
+            if _vad_scheduler is None:
+                _vad_scheduler = VADBatchScheduler()
+    return _vad_scheduler
+
+
+if __name__ == "__main__":
+    # 基准测试：N路并发麦克风，逐帧单独推理 vs 跨连接批量推理 # 用法: PYTHONPATH=. python voice/input/vad_utils.py [模型路径] [路数] #
+    import sys
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else config.asr.vad_model_path
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    seconds = 5
+    sr_in = 48000
+    chunk = int(sr_in * 0.03)  # 30ms一帧 #
+    rng = np.random.default_rng(0)
+    audio = [(rng.standard_normal(sr_in * seconds) * 0.05).astype(np.float32) for _ in range(connections)]
+    vad = SileroVAD(model_path)
+
+    # 逐帧单独推理 #
+    streams = [VADStream(sr_in) for _ in range(connections)]
+    started = time.perf_counter()
+    for offset in range(0, sr_in * seconds, chunk):
+        for stream, samples in zip(streams, audio):
+            stream.feed_sync(samples[offset:offset + chunk], vad)
+    single = time.perf_counter() - started
+
+    # 跨连接批量推理 #
+    async def run_batched():
+        scheduler = VADBatchScheduler(model=vad, max_batch=connections, max_wait_ms=0)
+        streams = [VADStream(sr_in) for _ in range(connections)]
+
+        async def connection(stream, samples):
+            for offset in range(0, sr_in * seconds, chunk):
+                await scheduler.feed(stream, samples[offset:offset + chunk])
+                await asyncio.sleep(0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connection(s, a) for s, a in zip(streams, audio)))
+        return time.perf_counter() - started, scheduler.metrics()
+
+    batched, metrics = asyncio.run(run_batched())
+    frames = connections * seconds * VAD_SAMPLE_RATE // VAD_WINDOW
+    print(f"{connections}路 × {seconds}s 音频（{frames}个VAD窗口）")
+    print(f"逐帧单独推理: {single:.2f}s  ({single / frames * 1e6:.0f} µs/窗口)")
+    print(f"批量推理:     {batched:.2f}s  ({batched / frames * 1e6:.0f} µs/窗口), 平均batch {metrics['avg_batch']}")
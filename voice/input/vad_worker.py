@@ -1,15 +1,14 @@
 import threading  # 线程 #
 import time  # 时间 #
-from typing import Callable, Optional, List  # 类型 #
+from typing import Callable, Optional  # 类型 #
 
 import numpy as np  # 数值 #
 import sounddevice as sd  # 录音 #
 import soundfile as sf  # 写wav #
-from scipy.signal import resample  # 重采样 #
-import onnxruntime as ort  # VAD推理 #
 import io  # 内存流 #
 
 from config import config  # 统一配置 #
+from .vad_utils import VADStream, VAD_SAMPLE_RATE, get_vad_model  # 流式VAD #
 
 try:
     import noisereduce as nr  # 降噪 #
@@ -24,16 +23,12 @@ class VADWorker(threading.Thread):
         super().__init__(daemon=True)  # 守护线程 #
         self.on_utterance = on_utterance  # 回调 #
         self._stop = threading.Event()  # 停止事件 #
-        self.session = ort.InferenceSession(config.asr.vad_model_path)  # 加载VAD #
+        self.vad = get_vad_model()  # 共享VAD模型 #
 
         self.sr_in = config.asr.sample_rate_in  # 输入采样率 #
         self.frame_ms = config.asr.frame_ms  # 帧长ms #
         self.frame_samples = int(self.sr_in * self.frame_ms / 1000)  # 帧样本数 #
-        self.resample_to = config.asr.resample_to  # 目标采样率 #
-        self.num_points = int(self.frame_samples * (self.resample_to / self.sr_in))  # 重采样点数 #
-
-        self.vad_threshold = config.asr.vad_threshold  # 阈值 #
-        self.max_silence_frames = int(config.asr.silence_ms / self.frame_ms)  # 静音帧阈值 #
+        self.stream = VADStream(self.sr_in)  # 本路独立的重采样/循环状态/分段状态 #
 
     def stop(self):
         self._stop.set()  # 置位停止 #
@@ -41,9 +36,6 @@ class VADWorker(threading.Thread):
     def run(self):
         devices = sd.query_devices()  # 设备查询 #
         stream = sd.InputStream(channels=1, dtype="float32", samplerate=self.sr_in, device=config.asr.device_index)  # 输入流 #
-        state = False  # 是否在说话 #
-        silence_cnt = 0  # 静音计数 #
-        current_speech: List[np.ndarray] = []  # 片段缓存 #
         start_t = 0.0  # 开始时间 #
 
         with stream as s:  # 打开流 #
@@ -56,32 +48,12 @@ class VADWorker(threading.Thread):
                     except Exception:
                         pass  # 忽略 #
 
-                resampled = resample(frame, self.num_points).astype(np.float32)  # 重采样 #
-
-                audio_data = np.expand_dims(resampled, axis=0)  # 扩维 #
-                state_in = np.zeros((2, 1, 128), dtype=np.float32)  # 状态 #
-                sr_in = np.array(self.resample_to, dtype=np.int64)  # 采样率 #
-                ort_inputs = {"input": audio_data, "state": state_in, "sr": sr_in}  # onnx输入 #
-                vad_prob = self.session.run(None, ort_inputs)[0]  # 推理 #
-                speaking = bool(vad_prob > self.vad_threshold)  # 判定 #
-
-                if speaking:  # 检测到语音 #
-                    if not state:
+                for event in self.stream.feed_sync(frame, self.vad):  # 流式重采样+VAD #
+                    if event["type"] == "start":
                         start_t = time.time()  # 起始时间 #
-                    state = True
-                    silence_cnt = 0
-                    current_speech.append(resampled)  # 累积 #
-                else:
-                    if state:
-                        silence_cnt += 1
-                        if silence_cnt > self.max_silence_frames:  # 结束 #
-                            state = False
-                            silence_cnt = 0
-                            if len(current_speech) > 0:
-                                utt = np.concatenate(current_speech)  # 拼接 #
-                                current_speech = []
-                                wav_bytes = self._to_wav_bytes(utt, self.resample_to)  # 转WAV #
-                                self.on_utterance(wav_bytes, time.time() - start_t)  # 回调 #
+                    elif event["type"] == "end" and event["audio"] is not None:  # 结束 #
+                        wav_bytes = self._to_wav_bytes(event["audio"], VAD_SAMPLE_RATE)  # 转WAV #
+                        self.on_utterance(wav_bytes, time.time() - start_t)  # 回调 #
 
     @staticmethod
     def _to_wav_bytes(samples: np.ndarray, sr: int) -> bytes:
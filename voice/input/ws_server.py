@@ -1,15 +1,13 @@
 import asyncio  # 异步 #
 import json  # JSON #
 import base64  # base64 #
-from typing import List  # 类型 #
+from typing import Dict, List  # 类型 #
 import numpy as np  # 数值 #
 from fastapi import WebSocket, WebSocketDisconnect  # WebSocket #
-from io import BytesIO  # 内存流 #
-import soundfile as sf  # 音频 #
 
 from config import config  # 配置 #
-from .asr_client import transcribe_wav_bytes  # 转写 #
-from .vad_utils import VADIterator  # VAD工具 #
+from .asr_engine import get_asr_engine, ASRBusyError  # 常驻识别引擎 #
+from .vad_utils import VADStream, VAD_SAMPLE_RATE, get_vad_scheduler  # VAD工具 #
 
 
 class WebSocketManager:
@@ -17,18 +15,19 @@ class WebSocketManager:
     
     def __init__(self):
         self.active_connections: List[WebSocket] = []  # 活跃连接 #
-        self.vad_iterator = VADIterator(speech_pad_ms=300)  # VAD迭代器 #
-        self.current_speech = []  # 当前语音片段 #
-        self.current_speech_tmp = []  # 临时缓存 #
-        self.status = False  # 说话状态 #
+        self.vad_streams: Dict[WebSocket, VADStream] = {}  # 每个连接独立的VAD状态 #
+        self.vad_scheduler = get_vad_scheduler()  # 跨连接批量推理 #
+        self._recognition_tasks = set()  # 进行中的识别任务 #
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()  # 接受连接 #
         self.active_connections.append(websocket)  # 添加到列表 #
+        self.vad_streams[websocket] = VADStream(VAD_SAMPLE_RATE)  # 默认客户端发送16kHz #
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)  # 移除连接 #
+        self.vad_streams.pop(websocket, None)  # 释放VAD状态 #
 
     async def broadcast(self, message: str):
         """广播消息给所有连接 # 一行说明 #"""
@@ -48,7 +47,7 @@ class WebSocketManager:
                 data = json.loads(data)  # 解析JSON #
                 
                 if data["type"] == "asr":  # ASR类型 #
-                    await self._process_asr_data(websocket, data["data"])  # 处理 #
+                    await self._process_asr_data(websocket, data["data"], data.get("sample_rate"))  # 处理 #
                 elif data["type"] == "ping":  # 心跳 #
                     await websocket.send_text(json.dumps({"type": "pong"}))  # 响应 #
                     
@@ -58,61 +57,29 @@ class WebSocketManager:
             print(f"WebSocket 处理异常: {e}")  # 异常处理 #
             self.disconnect(websocket)
 
-    async def _process_asr_data(self, websocket: WebSocket, audio_data: str):
+    async def _process_asr_data(self, websocket: WebSocket, audio_data: str, sample_rate: int = None):
         """处理 ASR 音频数据 # 一行说明 #"""
         try:
+            stream = self.vad_streams.get(websocket)
+            if stream is None:
+                return  # 连接已断开 #
+            if sample_rate and sample_rate != stream.sample_rate_in:
+                # 客户端声明了新的采样率，重建该连接的VAD状态 #
+                stream = self.vad_streams[websocket] = VADStream(int(sample_rate))
+
             # 解码音频 #
             audio_bytes = base64.urlsafe_b64decode(audio_data.encode("utf-8"))
-            samples = np.frombuffer(audio_bytes, dtype=np.int16)
-            
-            # 累积音频块 #
-            self.current_speech_tmp.append(samples)
-            if len(self.current_speech_tmp) < 4:  # 等待足够数据 #
-                return
-            
-            # 重采样到 16kHz #
-            resampled = np.concatenate(self.current_speech_tmp.copy())
-            resampled = (resampled / 32768.0).astype(np.float32)
-            self.current_speech_tmp = []
+            samples = (np.frombuffer(audio_bytes, dtype=np.int16) / 32768.0).astype(np.float32)
 
-            # VAD 处理 #
-            for speech_dict, speech_samples in self.vad_iterator(resampled):
-                if "start" in speech_dict:  # 开始说话 #
-                    self.current_speech = []
-                    self.status = True
+            # VAD 处理（流式重采样 + 批量推理） #
+            for event in await self.vad_scheduler.feed(stream, samples):
+                if event["type"] == "start":  # 开始说话 #
                     await websocket.send_text(json.dumps({"type": "vad_start"}))  # 通知 #
-                    
-                if self.status:  # 说话中 #
-                    self.current_speech.append(speech_samples)
-                    
-                is_last = "end" in speech_dict
-                if is_last:  # 结束说话 #
-                    self.status = False
-                    if len(self.current_speech) > 0:
-                        # 拼接完整语音 #
-                        combined = np.concatenate(self.current_speech)
-                        
-                        # 转换为 WAV #
-                        audio_bytes = self._to_wav_bytes(combined, 16000)
-                        
-                        # 调用 ASR #
-                        text = transcribe_wav_bytes(audio_bytes)
-                        if text:
-                            # 发送识别结果 #
-                            result = {
-                                "type": "transcription",
-                                "text": text,
-                                "status": "final"
-                            }
-                            await websocket.send_text(json.dumps(result))
-                            
-                            # 广播给其他连接 #
-                            await self.broadcast(json.dumps({
-                                "type": "transcription_broadcast",
-                                "text": text
-                            }))
-                        
-                        self.current_speech = []  # 清空缓存 #
+                elif event["type"] == "end" and event["audio"] is not None:  # 结束说话 #
+                    # 完整语音交给识别引擎，不阻塞VAD接收 #
+                    task = asyncio.create_task(self._recognize_and_send(websocket, event["audio"]))
+                    self._recognition_tasks.add(task)  # 保持引用 #
+                    task.add_done_callback(self._recognition_tasks.discard)
                         
         except Exception as e:
             print(f"ASR 处理异常: {e}")  # 异常处理 #
@@ -121,12 +88,37 @@ class WebSocketManager:
                 "message": f"ASR 处理失败: {str(e)}"
             }))
 
-    @staticmethod
-    def _to_wav_bytes(samples: np.ndarray, sr: int) -> bytes:
-        """转换音频为 WAV bytes # 一行说明 #"""
-        buf = BytesIO()  # 缓冲 #
-        sf.write(buf, samples, sr, format='WAV')  # 写WAV #
-        return buf.getvalue()  # 返回字节 #
+    async def _recognize_and_send(self, websocket: WebSocket, samples: np.ndarray):
+        """识别一段语音并推送结果 # 一行说明 #"""
+        try:
+            try:
+                text = await get_asr_engine().transcribe(samples)  # 16kHz采样直接送入模型 #
+            except ASRBusyError as e:
+                await websocket.send_text(json.dumps({"type": "busy", "message": str(e)}))  # 背压提示 #
+                return
+            if text:
+                # 发送识别结果 #
+                result = {
+                    "type": "transcription",
+                    "text": text,
+                    "status": "final"
+                }
+                await websocket.send_text(json.dumps(result))
+                
+                # 广播给其他连接 #
+                await self.broadcast(json.dumps({
+                    "type": "transcription_broadcast",
+                    "text": text
+                }))
+        except Exception as e:
+            print(f"ASR 识别异常: {e}")  # 异常处理 #
+            try:
+                await websocket.send_text(json.dumps({
+                    "type": "error",
+                    "message": f"ASR 识别失败: {str(e)}"
+                }))
+            except Exception:
+                pass  # 连接已断开 #
 
 
 # 全局管理器 #
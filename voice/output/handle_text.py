@@ -1,63 +1,158 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 加入项目根目录到模块查找路径
 import re
+from typing import List
 import emoji
 
+
+def _trie_pattern(words, group_size: int = 40) -> str:
+    """把一组字面串编译成前缀树形式的正则，避免在每个位置逐个尝试上千个分支"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node, top=False):
+        children = [(ch, child) for ch, child in node.items() if ch]
+        if not children:
+            return ""
+        if top:  # 顶层分支按首字符分组，先用字符类选组，避免逐个尝试上千个分支
+            children.sort()
+            groups = [children[i:i + group_size] for i in range(0, len(children), group_size)]
+            return "|".join(
+                f"(?=[{re.escape(group[0][0])}-{re.escape(group[-1][0])}])(?:"
+                + "|".join(re.escape(ch) + build(child) for ch, child in group) + ")"
+                for group in groups
+            )
+        leaves = [re.escape(ch) for ch, child in children if child == {"": True}]
+        branches = [re.escape(ch) + build(child) for ch, child in children if child != {"": True}]
+        if leaves:
+            branches.append(leaves[0] if len(leaves) == 1 else "[" + "".join(leaves) + "]")
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie, True)
+
+
+def _char_class(chars, gap: int = 32) -> str:
+    """把字符集合并成少量区间（间隔小于gap的合并），用作快速预筛"""
+    points = sorted(set(map(ord, chars)))
+    spans = [[points[0], points[0]]]
+    for point in points[1:]:
+        if point - spans[-1][1] <= gap:
+            spans[-1][1] = point
+        else:
+            spans.append([point, point])
+    return "".join(
+        re.escape(chr(a)) if a == b else f"{re.escape(chr(a))}-{re.escape(chr(b))}"
+        for a, b in spans
+    )
+
+
+# 预筛字符：只有以这些字符开头的位置才会尝试下面的分支，普通文字直接跳过
+_EMOJI_START = _char_class(sorted({e[0] for e in emoji.EMOJI_DATA}))
+_MARKUP_START = re.escape("`#![<*_")
+
+_INLINE_TOKENS = (
+    r"(?P<image>!\[(?P<alt>[^\]]*)\]\([^\)]+\))"  # 图片，保留alt文本
+    r"|(?P<link>\[(?P<label>[^\]]+)\]\([^\)]+\))"  # 链接，仅保留文本
+    r"|(?P<code>`(?P<snippet>[^`]+)`)"  # 行内代码
+    r"|(?P<tag></?[A-Za-z!][^<>]*>)"  # HTML标签
+    r"|(?P<emphasis>[*_]+(?![\ufe0f\u20e3]))"  # 粗体/斜体符号（排在表情前，"*️⃣"除外）
+    rf"|(?P<emoji>(?:{_trie_pattern(emoji.EMOJI_DATA)}|\u200d)+)"  # 表情符号（含ZWJ组合）
+)
+_BLOCK_TOKENS = (
+    r"(?P<fence>```[\s\S]+?```)"  # 多行代码块
+    r"|(?P<header>(?m:^)(?P<level>#{1,6})\s+(?P<title>.*))|"  # 标题
+    + _INLINE_TOKENS
+)
+_INLINE = re.compile(rf"(?=[{_MARKUP_START}{_EMOJI_START}])(?:{_INLINE_TOKENS})")
+_BLOCK = re.compile(rf"(?=[{_MARKUP_START}{_EMOJI_START}])(?:{_BLOCK_TOKENS})")
+_WHITESPACE_RUNS = re.compile(r"\n{2,}| {2,}")
+
+_HEADER_PREFIX = {1: "Title", 2: "Section"}  # 三级及以下为Subsection
+
+
+def _render(match) -> str:
+    """单个标记的朗读形式；标题、链接、代码等内部文本递归做行内清洗"""
+    kind = match.lastgroup
+    if kind == "fence":
+        return "(code block omitted)"
+    if kind == "header":
+        prefix = _HEADER_PREFIX.get(len(match.group("level")), "Subsection")
+        return f"{prefix} — {_INLINE.sub(_render, match.group('title')).strip()}\n"
+    if kind == "image":
+        return "Image: " + _INLINE.sub(_render, match.group("alt"))
+    if kind == "link":
+        return _INLINE.sub(_render, match.group("label"))
+    if kind == "code":
+        return "code snippet: " + _INLINE.sub(_render, match.group("snippet"))
+    return ""  # 标签、表情、强调符号直接移除
+
+
+def _collapse(match) -> str:
+    return "\n\n" if match.group()[0] == "\n" else " "
+
+
 def prepare_tts_input_with_context(text: str) -> str:
     """
     清洗Markdown文本并为部分元素添加上下文提示，适用于TTS输入，保留段落分隔。
 
+    所有标记（代码块、标题、链接、图片、行内代码、HTML标签、表情、强调符号）由一个
+    合并的正则一次扫描处理，再统一规范空白。
+
     参数：
         text (str): 原始Markdown或其他格式的文本。
 
     返回：
         str: 适合TTS输入的清洗后文本。
     """
+    text = _BLOCK.sub(_render, text)
+    return _WHITESPACE_RUNS.sub(_collapse, text).strip()
 
-    # 移除所有表情符号
-    text = emoji.replace_emoji(text, replace='')
-
-    # 为标题添加上下文提示
-    def header_replacer(match):
-        level = len(match.group(1))  # 统计#数量，判断标题级别
-        header_text = match.group(2).strip()
-        if level == 1:
-            return f"Title — {header_text}\n"  # 一级标题
-        elif level == 2:
-            return f"Section — {header_text}\n"  # 二级标题
-        else:
-            return f"Subsection — {header_text}\n"  # 三级及以下标题
-
-    text = re.sub(r"^(#{1,6})\s+(.*)", header_replacer, text, flags=re.MULTILINE)
 
-    # 链接提示（目前注释，后续可用）
-    # text = re.sub(r"\[([^\]]+)\]\((https?:\/\/[^\)]+)\)", r"\1 (link: \2)", text)
+# 断句：中英文句末标点；数字之间的"."（小数、版本号）不算句末
+_BOUNDARY = re.compile(r"[。？！；?!;]|\.(?!\d)|(?<!\d)\.")
+_SPEAKABLE = re.compile(r"\w")
 
-    # 移除链接，仅保留文本
-    text = re.sub(r"\[([^\]]+)\]\([^\)]+\)", r"\1", text)
 
-    # 移除多行代码块并加描述
-    text = re.sub(r"```([\s\S]+?)```", r"(code block omitted)", text)
-
-    # 行内代码加描述
-    text = re.sub(r"`([^`]+)`", r"code snippet: \1", text)
-
-    # 移除粗体/斜体符号，保留内容
-    text = re.sub(r"(\*\*|__|\*|_)", '', text)
-
-    # 移除图片语法，保留alt文本
-    text = re.sub(r"!\[([^\]]*)\]\([^\)]+\)", r"Image: \1", text)
-
-    # 移除HTML标签
-    text = re.sub(r"</?[^>]+(>|$)", '', text)
-
-    # 规范段落换行
-    text = re.sub(r"\n{2,}", '\n\n', text)  # 保证段落分隔一致
+class SpeechSegmenter:
+    """
+    流式断句器：随文本片段到达增量切出完整句子（含句末标点）。
 
-    # 行内多空格合并
-    text = re.sub(r" {2,}", ' ', text)
+    句末的"."若紧跟数字，需等下一个字符到达才能判断是否为小数点，会暂留在缓冲区。
+    speakable_only=True 时丢弃只有标点、没有可朗读文字的片段。
+    """
 
-    # 去除首尾空白
-    text = text.strip()
+    def __init__(self, speakable_only: bool = False):
+        self.speakable_only = speakable_only
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """追加文本，返回新形成的完整句子"""
+        if not text:
+            return []
+        buffer = self.buffer + text
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(buffer, max(len(self.buffer) - 1, 0)):
+            end = match.end()
+            if end == len(buffer) and match.group() == "." and end >= 2 and buffer[end - 2].isdigit():
+                break  # 数字后的"."在末尾：小数点还是句号取决于下一个字符
+            sentence = buffer[start:end]
+            if not self.speakable_only or _SPEAKABLE.search(sentence):
+                sentences.append(sentence)
+            start = end
+        self.buffer = buffer[start:]
+        return sentences
+
+    def flush(self) -> str:
+        """取出并清空剩余的不完整文本"""
+        rest, self.buffer = self.buffer, ""
+        return rest
+
+    def reset(self):
+        self.buffer = ""
 
-    return text
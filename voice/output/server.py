@@ -1,12 +1,32 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 加入项目根目录到模块查找路径
-from flask import Flask, request, send_file, jsonify
-from voice.output.tts_handler import generate_speech
+from flask import Flask, request, jsonify, Response
+from voice.output.tts_handler import generate_speech_stream
+from voice.output.tts_engine import get_tts_engine
+from voice.output.tts_cache import get_tts_cache
 from voice.output.utils import require_api_key, AUDIO_FORMAT_MIME_TYPES
 from config import config
 
 app = Flask(__name__)
 
+def _log_error(e):
+    with open('voice_server_error.log', 'a') as f:
+        f.write(f"Error at {__name__}: {str(e)}\n")
+        import traceback
+        traceback.print_exc(file=f)
+
+def _relay(first_chunk, chunks):
+    """Forward audio chunks to the client as they arrive (chunked transfer)."""
+    try:
+        if first_chunk:
+            yield first_chunk
+        for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        _log_error(e)  # Headers are already sent; the client sees a truncated stream
+    finally:
+        chunks.close()  # Cancels synthesis if the client disconnected
+
 @app.route('/v1/audio/speech', methods=['POST'])
 @require_api_key
 def text_to_speech():
@@ -17,20 +37,30 @@ def text_to_speech():
 
         text = data.get('input')
         voice = data.get('voice', config.tts.default_voice)
-        response_format = data.get('response_format', 'mp3')
         speed = float(data.get('speed', config.tts.default_speed))
-        
+        try:
+            response_format = get_tts_engine().output_format(data.get('response_format', 'mp3'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         mime_type = AUDIO_FORMAT_MIME_TYPES.get(response_format, "audio/mpeg")
-        output_file_path = generate_speech(text, voice, response_format, speed)
-        return send_file(output_file_path, mimetype=mime_type, as_attachment=True, download_name=f"speech.mp3")
+        chunks = generate_speech_stream(text, voice, response_format, speed)
+        first_chunk = next(chunks, b"")  # Wait for the first audio chunk so synthesis errors still map to a 500
+        response = Response(_relay(first_chunk, chunks), mimetype=mime_type, direct_passthrough=True)
+        response.headers["Content-Disposition"] = f"attachment; filename=speech.{response_format}"
+        return response
     except Exception as e:
-        with open('voice_server_error.log', 'a') as f:
-            f.write(f"Error at {__name__}: {str(e)}\n")
-            import traceback
-            traceback.print_exc(file=f)
+        _log_error(e)
         return jsonify({"error": "An internal server error occurred."}), 500
 
+@app.route('/tts/metrics', methods=['GET'])
+def tts_metrics():
+    metrics = get_tts_engine().metrics()
+    metrics["cache"] = get_tts_cache().metrics()
+    return jsonify(metrics)
+
 if __name__ == '__main__':
     from gevent.pywsgi import WSGIServer
+    get_tts_engine().start()
     http_server = WSGIServer(('0.0.0.0', config.tts.port), app)
     http_server.serve_forever()
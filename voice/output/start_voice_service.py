@@ -18,8 +18,11 @@ def start_http_server():
     """启动HTTP TTS服务器"""
     try:
         from voice.output.server import app
+        from voice.output.tts_engine import get_tts_engine
         from gevent.pywsgi import WSGIServer
-        
+
+        get_tts_engine().start()  # 常驻合成引擎（事件循环+预热转码器）
+
         print(f"🚀 启动HTTP TTS服务器...")
         print(f"📍 地址: http://127.0.0.1:{config.tts.port}")
         print(f"🔑 API密钥: {'已启用' if config.tts.require_api_key else '已禁用'}")
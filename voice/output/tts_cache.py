@@ -0,0 +1,221 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import config
+
+_WHITESPACE = re.compile(r"\s+")  # 连续空白
+
+
+def normalize_text(text: str) -> str:
+    """全角半角统一、合并空白，使只差排版的句子命中同一缓存"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def cache_key(text: str, voice: str, rate: str, pitch: str, fmt: str) -> str:
+    """由归一化文本、音色、语速、音高、格式生成内容地址"""
+    raw = "\x1f".join((normalize_text(text), voice, rate, pitch, fmt))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    """两级合成音频缓存：内存LRU（按字节限额）+ 磁盘存储（按总大小淘汰）"""
+
+    def __init__(self, memory_bytes: Optional[int] = None, disk_bytes: Optional[int] = None,
+                 directory: Optional[str] = None):
+        self.memory_limit = memory_bytes if memory_bytes is not None else config.tts.cache_memory_mb * 1024 * 1024  # 内存上限
+        self.disk_limit = disk_bytes if disk_bytes is not None else config.tts.cache_disk_mb * 1024 * 1024  # 磁盘上限
+        self.directory = Path(directory or config.tts.cache_dir)  # 磁盘目录
+        self._lock = threading.Lock()  # 状态锁
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()  # key -> 音频
+        self._memory_size = 0  # 内存占用
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # 文件名 -> 大小，按最近使用排序
+        self._disk_size = 0  # 磁盘占用
+        self._disk_loaded = False  # 是否已扫描磁盘
+
+        # 指标
+        self.memory_hits = 0  # 内存命中
+        self.disk_hits = 0  # 磁盘命中
+        self.misses = 0  # 未命中
+        self.bytes_saved = 0  # 命中省去的合成字节数
+        self.evictions = 0  # 磁盘淘汰数
+
+    # ---------- 磁盘 ----------
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name[:2] / name  # 两级目录，避免单目录文件过多
+
+    def _load_disk(self):
+        """首次使用时扫描已有缓存文件，按修改时间恢复LRU顺序"""
+        if self._disk_loaded:
+            return
+        self._disk_loaded = True
+        entries = []
+        if self.directory.exists():
+            for path in self.directory.glob("*/*"):
+                try:
+                    if path.suffix == ".tmp":
+                        path.unlink()  # 上次中断留下的半成品
+                        continue
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_size += size
+
+    def _read_disk(self, name: str) -> Optional[bytes]:
+        path = self._path(name)
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # 刷新最近使用时间，重启后仍按LRU淘汰
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, name: str, data: bytes):
+        """先写临时文件再原子替换，读者不会看到半个文件"""
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _evict_disk(self):
+        """超出磁盘上限时删除最久未用的文件（调用方持锁）"""
+        while self._disk_size > self.disk_limit and self._disk:
+            name, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            self.evictions += 1
+            try:
+                self._path(name).unlink()
+            except OSError:
+                pass  # 其他进程已删除
+
+    # ---------- 内存 ----------
+
+    def _remember(self, key: str, data: bytes):
+        """放入内存LRU（调用方持锁）"""
+        if len(data) > self.memory_limit:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    # ---------- 接口 ----------
+
+    def get(self, key: str, fmt: str) -> Optional[bytes]:
+        """查询缓存，先内存后磁盘，磁盘命中回填内存"""
+        name = f"{key}.{fmt}"
+        with self._lock:
+            data = self._memory.get(name)
+            if data is not None:
+                self._memory.move_to_end(name)
+                self.memory_hits += 1
+                self.bytes_saved += len(data)
+                return data
+            self._load_disk()
+            on_disk = name in self._disk
+        data = self._read_disk(name) if on_disk else None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                if on_disk:
+                    self._disk_size -= self._disk.pop(name, 0)  # 文件已被外部删除
+                return None
+            if name in self._disk:
+                self._disk.move_to_end(name)
+            self.disk_hits += 1
+            self.bytes_saved += len(data)
+            self._remember(name, data)
+            return data
+
+    def put(self, key: str, fmt: str, data: bytes):
+        """写入两级缓存"""
+        if not data:
+            return
+        name = f"{key}.{fmt}"
+        with self._lock:
+            self._remember(name, data)
+            self._load_disk()
+            if name in self._disk or len(data) > self.disk_limit:
+                return
+        try:
+            self._write_disk(name, data)
+        except OSError as e:
+            print(f"⚠️ TTS缓存写入失败: {e}")
+            return
+        with self._lock:
+            self._disk_size -= self._disk.pop(name, 0)
+            self._disk[name] = len(data)
+            self._disk_size += len(data)
+            self._evict_disk()
+
+    def clear(self):
+        """清空两级缓存"""
+        with self._lock:
+            self._load_disk()
+            names = list(self._disk)
+            self._memory.clear()
+            self._disk.clear()
+            self._memory_size = self._disk_size = 0
+        for name in names:
+            try:
+                self._path(name).unlink()
+            except OSError:
+                pass
+
+    def metrics(self) -> Dict:
+        """命中率、节省字节数与占用"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "memory_limit": self.memory_limit,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+                "disk_limit": self.disk_limit,
+                "evictions": self.evictions,
+            }
+
+
+# 全局实例
+_tts_cache: Optional[TTSAudioCache] = None
+_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSAudioCache:
+    """获取全局TTS音频缓存"""
+    global _tts_cache
+    if _tts_cache is None:
+        with _tts_cache_lock:
+            if _tts_cache is None:
+                _tts_cache = TTSAudioCache()
+    return _tts_cache
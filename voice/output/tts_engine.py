@@ -0,0 +1,326 @@
+import asyncio
+import queue
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import edge_tts
+
+from config import config
+from latency_stats import summarize
+
+NATIVE_FORMAT = "mp3"  # edge-tts原生输出（24kHz单声道mp3），无需转码
+READ_CHUNK = 4096  # 转码输出读取块大小
+
+# 目标格式 -> ffmpeg输出参数（全部走管道，容器需支持流式写出）
+TRANSCODE_ARGS = {
+    "aac": ["-c:a", "aac", "-b:a", "192k", "-f", "adts"],  # mp4无法写入管道，改用ADTS
+    "opus": ["-c:a", "libopus", "-b:a", "192k", "-f", "ogg"],
+    "flac": ["-c:a", "flac", "-f", "flac"],
+    "wav": ["-c:a", "pcm_s16le", "-f", "wav"],
+    "pcm": ["-c:a", "pcm_s16le", "-f", "s16le"],  # 裸PCM，24kHz单声道
+}
+
+_ffmpeg_available: Optional[bool] = None
+
+
+def ffmpeg_available() -> bool:
+    """ffmpeg是否可用（进程内只检查一次）"""
+    global _ffmpeg_available
+    if _ffmpeg_available is None:
+        _ffmpeg_available = shutil.which("ffmpeg") is not None
+    return _ffmpeg_available
+
+
+def _wait(fn, *args):
+    """执行阻塞等待
+
+    gevent WSGIServer未打猴子补丁时，请求运行在greenlet中，直接阻塞线程队列会卡住整个hub；
+    此时交给hub线程池等待，当前greenlet让出执行权。
+    """
+    gevent = sys.modules.get("gevent")
+    if gevent is not None and isinstance(gevent.getcurrent(), gevent.Greenlet):
+        monkey = sys.modules.get("gevent.monkey")
+        if monkey is None or not monkey.is_module_patched("threading"):
+            return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+
+class Transcoder:
+    """常驻ffmpeg转码器
+
+    每种目标格式保留一个已启动、等待输入的备用ffmpeg进程；请求到来时直接取用，
+    并在后台补充下一个，进程启动不再落在首字节延迟上。只能在引擎事件循环中使用。
+    """
+
+    def __init__(self):
+        self._spares: Dict[str, asyncio.subprocess.Process] = {}  # 备用进程
+        self._pending = set()  # 正在补充的格式
+
+    async def _spawn(self, fmt: str) -> asyncio.subprocess.Process:
+        return await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+            "-f", NATIVE_FORMAT, "-i", "pipe:0", *TRANSCODE_ARGS[fmt], "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+    async def prewarm(self, fmt: str):
+        """为格式准备一个备用进程"""
+        if fmt in self._spares or fmt in self._pending:
+            return
+        self._pending.add(fmt)
+        try:
+            self._spares[fmt] = await self._spawn(fmt)
+        except Exception as e:
+            print(f"⚠️ ffmpeg备用进程启动失败({fmt}): {e}")
+        finally:
+            self._pending.discard(fmt)
+
+    async def _acquire(self, fmt: str) -> asyncio.subprocess.Process:
+        proc = self._spares.pop(fmt, None)
+        if proc is None or proc.returncode is not None:
+            proc = await self._spawn(fmt)
+        asyncio.get_running_loop().create_task(self.prewarm(fmt))  # 后台补充
+        return proc
+
+    async def transcode(self, source: AsyncIterator[bytes], fmt: str) -> AsyncIterator[bytes]:
+        """边写入mp3边读出目标格式"""
+        proc = await self._acquire(fmt)
+
+        async def feed():
+            try:
+                async for data in source:
+                    proc.stdin.write(data)
+                    await proc.stdin.drain()
+            finally:
+                if not proc.stdin.is_closing():
+                    proc.stdin.close()  # EOF，ffmpeg写完尾部后退出
+
+        feeder = asyncio.ensure_future(feed())
+        try:
+            while True:
+                data = await proc.stdout.read(READ_CHUNK)
+                if not data:
+                    break
+                yield data
+            try:
+                await feeder  # 合成端异常在此抛出
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # ffmpeg提前退出，由下方返回码报告
+            code = await proc.wait()
+            if code != 0:
+                stderr = (await proc.stderr.read()).decode("utf-8", "ignore").strip()
+                raise RuntimeError(f"FFmpeg error during audio conversion ({fmt}, exit {code}): {stderr}")
+        finally:
+            if not feeder.done():
+                feeder.cancel()
+            if proc.returncode is None:
+                proc.kill()  # 客户端断开或出错
+
+    def close(self):
+        for proc in self._spares.values():
+            if proc.returncode is None:
+                proc.kill()
+        self._spares.clear()
+
+
+class TTSEngine:
+    """常驻语音合成引擎
+
+    在独立线程中运行一个长期事件循环，edge-tts音频块产生即交给调用方，
+    不再每个请求 asyncio.run、写临时文件、启动ffmpeg。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # 状态锁
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # 引擎事件循环
+        self._thread: Optional[threading.Thread] = None  # 循环线程
+        self.transcoder = Transcoder()  # 转码器
+
+        # 指标
+        self._first_chunk = deque(maxlen=500)  # 首块延迟
+        self._durations = deque(maxlen=500)  # 整体耗时
+        self._active = 0  # 正在合成
+        self.completed = 0  # 成功数
+        self.failed = 0  # 失败数
+        self.cancelled = 0  # 客户端中途断开
+        self.transcoded = 0  # 经过转码的请求数
+        self.bytes_out = 0  # 输出字节数
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动事件循环线程（幂等）"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            thread = threading.Thread(target=self._run_loop, args=(loop, ready), name="TTSEngineLoop", daemon=True)
+            thread.start()
+            ready.wait()
+            self._loop, self._thread = loop, thread
+        fmt = config.tts.default_format
+        if config.tts.transcoder_prewarm and fmt in TRANSCODE_ARGS and ffmpeg_available():
+            asyncio.run_coroutine_threadsafe(self.transcoder.prewarm(fmt), loop)  # 预热默认格式
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def stop(self):
+        """停止事件循环并回收备用进程"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(self.transcoder.close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在引擎循环中执行协程并同步等待结果"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return _wait(future.result, timeout or config.tts.engine_timeout)
+        finally:
+            future.cancel()
+
+    # ---------- 合成 ----------
+
+    @staticmethod
+    def output_format(response_format: Optional[str]) -> str:
+        """实际输出格式：ffmpeg不可用时退回mp3，不支持的格式抛出ValueError"""
+        fmt = (response_format or NATIVE_FORMAT).lower()
+        if fmt == NATIVE_FORMAT:
+            return fmt
+        if fmt not in TRANSCODE_ARGS:
+            raise ValueError(f"Unsupported response_format: {response_format}")
+        if not ffmpeg_available():
+            print("FFmpeg is not available. Returning unmodified mp3 stream.")
+            return NATIVE_FORMAT
+        return fmt
+
+    @staticmethod
+    async def _edge_stream(text: str, voice: str, rate: str, pitch: str) -> AsyncIterator[bytes]:
+        communicator = edge_tts.Communicate(text=text, voice=voice, rate=rate, pitch=pitch)
+        async for chunk in communicator.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+    async def astream(self, text: str, voice: str, rate: str = "+0%", response_format: str = NATIVE_FORMAT,
+                      pitch: str = "+0Hz") -> AsyncIterator[bytes]:
+        """异步流式合成（须在引擎事件循环中迭代）"""
+        fmt = self.output_format(response_format)
+        source = self._edge_stream(text, voice, rate, pitch)
+        if fmt != NATIVE_FORMAT:
+            source = self.transcoder.transcode(source, fmt)
+        started = time.monotonic()
+        first = None
+        size = 0
+        status = "failed"
+        with self._lock:
+            self._active += 1
+            if fmt != NATIVE_FORMAT:
+                self.transcoded += 1
+        try:
+            async for data in source:
+                if first is None:
+                    first = time.monotonic() - started
+                size += len(data)
+                yield data
+            status = "completed"
+        except (asyncio.CancelledError, GeneratorExit):
+            status = "cancelled"
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+                self.bytes_out += size
+                if status == "completed":
+                    self.completed += 1
+                    self._durations.append(time.monotonic() - started)
+                elif status == "cancelled":
+                    self.cancelled += 1
+                else:
+                    self.failed += 1
+                if first is not None:
+                    self._first_chunk.append(first)
+
+    def stream(self, text: str, voice: str, rate: str = "+0%", response_format: str = NATIVE_FORMAT,
+               pitch: str = "+0Hz") -> Iterator[bytes]:
+        """同步流式合成，供Flask等线程环境逐块转发；提前关闭迭代器即取消合成"""
+        self.start()
+        chunks: "queue.Queue" = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for data in self.astream(text, voice, rate, response_format, pitch):
+                    chunks.put(data)
+            except Exception as e:
+                chunks.put(e)
+            else:
+                chunks.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        try:
+            while True:
+                try:
+                    item = _wait(chunks.get, True, config.tts.engine_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"TTS synthesis stalled for {config.tts.engine_timeout}s")
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()  # 客户端断开时取消edge-tts与ffmpeg
+
+    def synthesize(self, text: str, voice: str, rate: str = "+0%", response_format: str = NATIVE_FORMAT,
+                   pitch: str = "+0Hz") -> bytes:
+        """合成完整音频"""
+        return b"".join(self.stream(text, voice, rate, response_format, pitch))
+
+    # ---------- 指标 ----------
+
+    def metrics(self) -> Dict:
+        """实时指标"""
+        with self._lock:
+            return {
+                "running": self._loop is not None,
+                "ffmpeg": ffmpeg_available(),
+                "active": self._active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "transcoded": self.transcoded,
+                "bytes_out": self.bytes_out,
+                "first_chunk": summarize(list(self._first_chunk)),
+                "duration": summarize(list(self._durations)),
+            }
+
+
+# 全局实例
+_tts_engine: Optional[TTSEngine] = None
+_tts_engine_lock = threading.Lock()
+
+
+def get_tts_engine() -> TTSEngine:
+    """获取全局TTS引擎"""
+    global _tts_engine
+    if _tts_engine is None:
+        with _tts_engine_lock:
+            if _tts_engine is None:
+                _tts_engine = TTSEngine()
+    return _tts_engine
@@ -1,17 +1,12 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 加入项目根目录到模块查找路径
 import edge_tts
-from edge_tts import Communicate
-import asyncio
-import tempfile
-import subprocess
-import os
-from pathlib import Path
 from config import config # 顶部引入
+from voice.output.tts_engine import get_tts_engine, ffmpeg_available
+from voice.output.tts_cache import cache_key, get_tts_cache
 
 # 语言默认值（环境变量）
 DEFAULT_LANGUAGE = config.tts.default_language # 统一配置
-from voice.output.utils import DETAILED_ERROR_LOGGING
 # from config import DEFAULT_CONFIGS
 
 
@@ -37,124 +32,89 @@ model_data = [
     ]
 
 def is_ffmpeg_installed():
-    """Check if FFmpeg is installed and accessible."""
-    try:
-        subprocess.run(['ffmpeg', '-version'], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
-
-async def _generate_audio_stream(text, voice, speed):
-    """Generate streaming TTS audio using edge-tts."""
-    # Determine if the voice is an OpenAI-compatible voice or a direct edge-tts voice
-    edge_tts_voice = voice_mapping.get(voice, voice)  # Use mapping if in OpenAI names, otherwise use as-is
-    
-    # Convert speed to SSML rate format
-    try:
-        speed_rate = speed_to_rate(speed)  # Convert speed value to "+X%" or "-X%"
-    except Exception as e:
-        print(f"Error converting speed: {e}. Defaulting to +0%.")
-        speed_rate = "+0%"
-    
-    # Create the communicator for streaming
-    communicator = edge_tts.Communicate(text=text, voice=edge_tts_voice, rate=speed_rate)
-    
-    # Stream the audio data
-    async for chunk in communicator.stream():
-        if chunk["type"] == "audio":
-            yield chunk["data"]
+    """Check if FFmpeg is installed and accessible (checked once per process)."""
+    return ffmpeg_available()
 
-def generate_speech_stream(text, voice, speed=1.0):
-    """Generate streaming speech audio (synchronous wrapper)."""
-    return asyncio.run(_generate_audio_stream(text, voice, speed))
-
-async def _generate_audio(text, voice, response_format, speed):
-    """Generate TTS audio and optionally convert to a different format."""
+def _resolve_voice(voice, speed):
+    """Map an OpenAI voice name and speed to edge-tts voice and rate."""
     # Determine if the voice is an OpenAI-compatible voice or a direct edge-tts voice
     edge_tts_voice = voice_mapping.get(voice, voice)  # Use mapping if in OpenAI names, otherwise use as-is
 
-    # Generate the TTS output in mp3 format first
-    temp_mp3_file_obj = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-    temp_mp3_path = temp_mp3_file_obj.name
-
     # Convert speed to SSML rate format
     try:
         speed_rate = speed_to_rate(speed)  # Convert speed value to "+X%" or "-X%"
     except Exception as e:
         print(f"Error converting speed: {e}. Defaulting to +0%.")
         speed_rate = "+0%"
+    return edge_tts_voice, speed_rate
+
+async def _generate_audio_stream(text, voice, speed, response_format="mp3", pitch="+0Hz"):
+    """Generate streaming TTS audio using edge-tts (must run on the engine loop)."""
+    edge_tts_voice, speed_rate = _resolve_voice(voice, speed)
+    async for data in get_tts_engine().astream(text, edge_tts_voice, speed_rate, response_format, pitch):
+        yield data
+
+def _speech_cache_key(text, voice, response_format, speed, pitch):
+    """Content address of a request: normalized text, edge-tts voice, rate, pitch and actual output format."""
+    edge_tts_voice, speed_rate = _resolve_voice(voice, speed)
+    output_format = get_tts_engine().output_format(response_format)
+    return cache_key(text, edge_tts_voice, speed_rate, pitch, output_format), output_format
+
+def lookup_cached_speech(text, voice, response_format="mp3", speed=1.0, pitch="+0Hz"):
+    """Return previously synthesized audio for this request, or None on a miss."""
+    if not config.tts.cache_enabled:
+        return None
+    try:
+        key, output_format = _speech_cache_key(text, voice, response_format, speed, pitch)
+    except ValueError:
+        return None
+    return get_tts_cache().get(key, output_format)
+
+def store_cached_speech(text, voice, response_format, speed, audio, pitch="+0Hz"):
+    """Store synthesized audio obtained elsewhere (e.g. over HTTP) in the cache."""
+    if not config.tts.cache_enabled or not audio:
+        return
+    try:
+        key, output_format = _speech_cache_key(text, voice, response_format, speed, pitch)
+    except ValueError:
+        return
+    get_tts_cache().put(key, output_format, audio)
 
-    # Generate the MP3 file
-    communicator = edge_tts.Communicate(text=text, voice=edge_tts_voice, rate=speed_rate)
-    await communicator.save(temp_mp3_path)
-    temp_mp3_file_obj.close() # Explicitly close our file object for the initial mp3
-
-    # If the requested format is mp3, return the generated file directly
-    if response_format == "mp3":
-        return temp_mp3_path
-
-    # Check if FFmpeg is installed
-    if not is_ffmpeg_installed():
-        print("FFmpeg is not available. Returning unmodified mp3 file.")
-        return temp_mp3_path # Return the original mp3 path, it won't be cleaned by this function
-
-    # Create a new temporary file for the converted output
-    converted_file_obj = tempfile.NamedTemporaryFile(delete=False, suffix=f".{response_format}")
-    converted_path = converted_file_obj.name
-    converted_file_obj.close() # Close file object, ffmpeg will write to the path
-
-    # Build the FFmpeg command
-    ffmpeg_command = [
-        "ffmpeg",
-        "-i", temp_mp3_path,  # Input file path
-        "-c:a", {
-            "aac": "aac",
-            "mp3": "libmp3lame",
-            "wav": "pcm_s16le",
-            "opus": "libopus",
-            "flac": "flac"
-        }.get(response_format, "aac"),  # Default to AAC if unknown
-    ]
-
-    if response_format != "wav":
-        ffmpeg_command.extend(["-b:a", "192k"])
-
-    ffmpeg_command.extend([
-        "-f", {
-            "aac": "mp4",  # AAC in MP4 container
-            "mp3": "mp3",
-            "wav": "wav",
-            "opus": "ogg",
-            "flac": "flac"
-        }.get(response_format, response_format),  # Default to matching format
-        "-y",  # Overwrite without prompt
-        converted_path  # Output file path
-    ])
+def _replay(audio):
+    yield audio
 
+def _fill_cache(chunks, key, output_format):
+    """Pass chunks through and store the complete audio once the stream finishes normally."""
+    parts = []
     try:
-        # Run FFmpeg command and ensure no errors occur
-        subprocess.run(ffmpeg_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except subprocess.CalledProcessError as e:
-        # Clean up potentially created (but incomplete) converted file
-        Path(converted_path).unlink(missing_ok=True)
-        # Clean up the original mp3 file as well, since conversion failed
-        Path(temp_mp3_path).unlink(missing_ok=True)
-        
-        if DETAILED_ERROR_LOGGING:
-            error_message = f"FFmpeg error during audio conversion. Command: '{' '.join(e.cmd)}'. Stderr: {e.stderr.decode('utf-8', 'ignore')}"
-            print(error_message) # Log for server-side diagnosis
-        else:
-            error_message = f"FFmpeg error during audio conversion: {e}"
-            print(error_message) # Log a simpler message
-        raise RuntimeError(f"FFmpeg error during audio conversion: {e}") # The raised error will still have details via e
-
-    # Clean up the original temporary file (original mp3) as it's now converted
-    Path(temp_mp3_path).unlink(missing_ok=True)
-
-    return converted_path
-
-def generate_speech(text, voice, response_format, speed=1.0):
-    return asyncio.run(_generate_audio(text, voice, response_format, speed))
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    finally:
+        chunks.close()
+    get_tts_cache().put(key, output_format, b"".join(parts))
+
+def generate_speech_stream(text, voice, response_format="mp3", speed=1.0, pitch="+0Hz"):
+    """Generate streaming speech audio (synchronous iterator over audio chunks).
+
+    Repeated requests are answered from the audio cache. Otherwise chunks are
+    produced by the resident engine as edge-tts delivers them; formats other than
+    mp3 are piped through a pre-started FFmpeg transcoder.
+    Closing the iterator early cancels the synthesis.
+    """
+    edge_tts_voice, speed_rate = _resolve_voice(voice, speed)
+    engine = get_tts_engine()
+    if not config.tts.cache_enabled:
+        return engine.stream(text, edge_tts_voice, speed_rate, response_format, pitch)
+    key, output_format = _speech_cache_key(text, voice, response_format, speed, pitch)
+    cached = get_tts_cache().get(key, output_format)
+    if cached is not None:
+        return _replay(cached)
+    return _fill_cache(engine.stream(text, edge_tts_voice, speed_rate, output_format, pitch), key, output_format)
+
+def generate_speech(text, voice, response_format, speed=1.0, pitch="+0Hz"):
+    """Generate the complete speech audio and return it as bytes."""
+    return b"".join(generate_speech_stream(text, voice, response_format, speed, pitch))
 
 def get_models():
     return model_data
@@ -176,7 +136,7 @@ async def _get_voices(language=None):
     return filtered_voices
 
 def get_voices(language=None):
-    return asyncio.run(_get_voices(language))
+    return get_tts_engine().run(_get_voices(language))
 
 def speed_to_rate(speed: float) -> str:
     """
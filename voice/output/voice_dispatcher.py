@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger("VoiceDispatcher")
+
+_FINISH = object()  # 本轮回复结束标记
+
+
+class VoiceDispatcher:
+    """语音文本分发器
+
+    生产者（流式提取器、UI worker）在任意线程调用 submit/finish，只做一次加锁入队，
+    不再为每个句子新建线程；唯一的消费协程运行在语音流水线的事件循环中，
+    按提交顺序把文本交给 on_text。队列有界：小片段并入队尾，队列满时合并，
+    积压文字超出上限时丢弃最旧的文本。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, on_text: Callable[[str], None],
+                 on_finish: Callable[[], None], max_items: int = 32, max_chars: int = 2000,
+                 min_fragment_chars: int = 8):
+        self._loop = loop  # 消费者所在事件循环
+        self._on_text = on_text  # 文本处理
+        self._on_finish = on_finish  # 结束处理
+        self.max_items = max_items  # 队列项上限
+        self.max_chars = max_chars  # 积压文字上限
+        self.min_fragment_chars = min_fragment_chars  # 短于此长度的片段并入队尾
+        self._lock = threading.Lock()  # 队列锁
+        self._pending: deque = deque()  # 文本或结束标记
+        self._pending_chars = 0  # 积压文字数
+        self._wakeup_scheduled = False  # 是否已通知消费者
+        self._event: Optional[asyncio.Event] = None  # 消费者唤醒事件
+
+        # 指标
+        self.submitted = 0  # 提交次数
+        self.delivered = 0  # 实际交付次数
+        self.merged = 0  # 并入队尾的片段数
+        self.dropped_chars = 0  # 背压丢弃的文字数
+        self.peak_depth = 0  # 队列峰值
+
+    def start(self):
+        """在事件循环中启动消费协程（线程安全）"""
+        asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+
+    # ---------- 生产者 ----------
+
+    def submit(self, text: str):
+        """提交文本片段，立即返回"""
+        if not text:
+            return
+        with self._lock:
+            self.submitted += 1
+            tail = self._pending[-1] if self._pending else None
+            if isinstance(tail, str) and (len(tail) < self.min_fragment_chars or len(self._pending) >= self.max_items):
+                self._pending[-1] = tail + text  # 合并，保持顺序
+                self.merged += 1
+            else:
+                self._pending.append(text)
+            self._pending_chars += len(text)
+            self._enforce_budget()
+            self.peak_depth = max(self.peak_depth, len(self._pending))
+        self._wake()
+
+    def finish(self):
+        """标记本轮回复结束，在之前提交的文本之后执行"""
+        with self._lock:
+            self._pending.append(_FINISH)
+        self._wake()
+
+    def clear(self):
+        """丢弃尚未分发的内容"""
+        with self._lock:
+            self._pending.clear()
+            self._pending_chars = 0
+
+    def _enforce_budget(self):
+        """积压超限时丢弃最旧的文本（调用方持锁）"""
+        dropped = 0
+        while self._pending_chars > self.max_chars and len(self._pending) > 1:
+            for i, item in enumerate(self._pending):
+                if isinstance(item, str):
+                    del self._pending[i]
+                    self._pending_chars -= len(item)
+                    dropped += len(item)
+                    break
+            else:
+                break
+        if dropped:
+            self.dropped_chars += dropped
+            logger.warning(f"语音分发积压，丢弃最旧文本 {dropped} 字")
+
+    def _wake(self):
+        with self._lock:
+            if self._wakeup_scheduled:
+                return
+            self._wakeup_scheduled = True
+        self._loop.call_soon_threadsafe(self._set_event)
+
+    def _set_event(self):
+        if self._event is not None:
+            self._event.set()
+
+    # ---------- 消费者 ----------
+
+    async def _run(self):
+        self._event = asyncio.Event()
+        self._event.set()  # 处理启动前已入队的内容
+        while True:
+            await self._event.wait()
+            self._event.clear()
+            with self._lock:
+                self._wakeup_scheduled = False
+                items = list(self._pending)
+                self._pending.clear()
+                self._pending_chars = 0
+            text = ""
+            for item in items:
+                if item is _FINISH:
+                    self._deliver(text)
+                    text = ""
+                    self._call(self._on_finish)
+                else:
+                    text += item  # 消费者落后时，连续片段合并为一次交付
+            self._deliver(text)
+
+    def _deliver(self, text: str):
+        if text:
+            self.delivered += 1
+            self._call(self._on_text, text)
+
+    @staticmethod
+    def _call(fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"语音分发回调错误: {e}")
+
+    def metrics(self) -> Dict:
+        """实时指标"""
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "pending_chars": self._pending_chars,
+                "submitted": self.submitted,
+                "delivered": self.delivered,
+                "merged": self.merged,
+                "dropped_chars": self.dropped_chars,
+                "peak_depth": self.peak_depth,
+            }
@@ -23,12 +23,11 @@ from queue import Queue, Empty
 # 添加项目根目录到Python路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import config, AI_NAME
+from voice.output.handle_text import SpeechSegmenter
+from voice.output.voice_dispatcher import VoiceDispatcher
 
 logger = logging.getLogger("VoiceIntegration")
 
-# 简化的句子结束标点（依赖apiserver的预处理）
-SENTENCE_ENDINGS = ["。", "！", "？", "；", ".", "!", "?", ";"]
-
 class VoiceIntegration:
     """语音集成模块 - 重构版本：依赖apiserver的流式TTS实现"""
     
@@ -38,20 +37,23 @@ class VoiceIntegration:
         
         # 音频播放配置
         self.min_sentence_length = 5  # 最小句子长度（硬编码默认值）
-        self.max_concurrent_tasks = 3  # 最大并发任务数（硬编码默认值）
-        
-        # 并发控制
-        self.tts_semaphore = threading.Semaphore(2)  # 限制TTS请求并发数为2
+        self.max_concurrent_tasks = 3  # 最大并发合成数K（硬编码默认值）
         
         # 音频文件存储目录
         self.audio_temp_dir = Path("logs/audio_temp")
         self.audio_temp_dir.mkdir(parents=True, exist_ok=True)
         
         # 流式处理状态
-        self.text_buffer = ""  # 文本缓冲区
+        self.segmenter = SpeechSegmenter(speakable_only=True)  # 增量断句（文本缓冲区，仅在流水线事件循环中读写）
         self.is_processing = False  # 是否正在处理
-        self.sentence_queue = Queue()  # 句子队列
-        self.audio_queue = Queue()  # 音频队列
+        self.audio_queue = Queue()  # 音频队列（已按句子顺序排好）
+        
+        # 合成流水线状态（仅在流水线事件循环中读写）
+        self._next_seq = 0  # 下一个句子序号
+        self._next_play_seq = 0  # 下一个应交给播放的序号
+        self._generation = 0  # 对话代次，重置后旧结果作废
+        self._ready: Dict[int, Optional[bytes]] = {}  # 已完成但尚未轮到的音频
+        self._inflight: set = set()  # 正在合成的任务
         
         # 播放状态控制
         self.is_playing = False
@@ -64,9 +66,16 @@ class VoiceIntegration:
         self.audio_thread = threading.Thread(target=self._audio_player_worker, daemon=True)
         self.audio_thread.start()
         
-        # 启动音频处理工作线程（持续运行）
-        self.processing_thread = threading.Thread(target=self._audio_processing_worker, daemon=True)
+        # 启动合成流水线（独立事件循环 + 连接池HTTP客户端，持续运行）
+        self._loop = asyncio.new_event_loop()
+        self._loop_ready = threading.Event()
+        self.processing_thread = threading.Thread(target=self._pipeline_worker, name="TTSPipeline", daemon=True)
         self.processing_thread.start()
+        self._loop_ready.wait()
+        
+        # 文本分发器：生产者线程只入队，断句与提交在流水线事件循环中按序执行
+        self.dispatcher = VoiceDispatcher(self._loop, self._process_text_stream, self._flush_remaining_text)
+        self.dispatcher.start()
         
         # 启动音频文件清理线程
         self.cleanup_thread = threading.Thread(target=self._audio_cleanup_worker, daemon=True)
@@ -108,7 +117,7 @@ class VoiceIntegration:
             # 重置状态，为新的对话做准备
             self.reset_processing_state()
             # 流式处理最终文本
-            self._process_text_stream(final_text)
+            self.dispatcher.submit(final_text)
 
     def receive_text_chunk(self, text: str):
         """接收文本片段 - 流式处理"""
@@ -116,46 +125,20 @@ class VoiceIntegration:
             return
             
         if text and text.strip():
-            # 流式文本直接处理，不累积
+            # 只入队即返回，不阻塞调用方的流式循环
             logger.debug(f"接收文本片段: {text[:50]}...")
-            self._process_text_stream(text.strip())
+            self.dispatcher.submit(text.strip())
 
     def _process_text_stream(self, text: str):
         """处理文本流 - 直接接收apiserver处理好的普通文本"""
         if not text:
             return
             
-        # 将文本添加到缓冲区
-        self.text_buffer += text
-        
-        # 检查是否形成完整句子（简单的标点检测）
-        self._check_and_queue_sentences()
-        
-    def _check_and_queue_sentences(self):
-        """检查并加入句子队列 - 简化版本，依赖apiserver的预处理"""
-        if not self.text_buffer:
-            return
-            
-        # 简单的句子结束检测（apiserver已经处理过复杂的标点分割）
-        sentence_endings = SENTENCE_ENDINGS
-        
-        for ending in sentence_endings:
-            if ending in self.text_buffer:
-                # 找到句子结束位置
-                end_pos = self.text_buffer.find(ending) + 1
-                sentence = self.text_buffer[:end_pos]
-                
-                # 检查句子是否有效
-                if sentence.strip():
-                    # 加入句子队列
-                    self.sentence_queue.put(sentence)
-                    logger.info(f"加入句子队列: {sentence[:50]}...")
-                    
-                    # 音频处理线程始终在运行，无需检查启动状态
-                
-                # 更新缓冲区
-                self.text_buffer = self.text_buffer[end_pos:]
-                break
+        # 加入缓冲区并切出所有已完整的句子（只含标点的片段不朗读）
+        for sentence in self.segmenter.feed(text):
+            # 加入合成流水线（已在流水线事件循环中）
+            self._enqueue_sentence(sentence)
+            logger.info(f"加入句子队列: {sentence[:50]}...")
         
     def _start_audio_processing(self):
         """启动音频处理线程"""
@@ -166,113 +149,155 @@ class VoiceIntegration:
         
     def reset_processing_state(self):
         """重置处理状态，为新的对话做准备"""
-        # 清空队列
-        while not self.sentence_queue.empty():
-            try:
-                self.sentence_queue.get_nowait()
-            except Empty:
-                break
-                
-        while not self.audio_queue.empty():
-            try:
-                self.audio_queue.get_nowait()
-            except Empty:
-                break
-                
-        # 重置状态（不重置is_processing，因为线程是持续运行的）
-        self.text_buffer = ""
+        # 丢弃尚未分发的文本片段
+        self.dispatcher.clear()
+        # 作废未完成的合成、清空断句缓冲与待播放音频（在流水线循环中执行，保证与句子提交的先后顺序）
+        # 不重置is_processing，因为流水线是持续运行的
+        self._loop.call_soon_threadsafe(self._reset_pipeline)
         
         logger.debug("语音处理状态已重置")
         
-    def _audio_processing_worker(self):
-        """音频处理工作线程 - 持续运行"""
+    def _pipeline_worker(self):
+        """合成流水线线程 - 持续运行"""
         logger.info("音频处理工作线程启动")
-        
+        asyncio.set_event_loop(self._loop)
         try:
-            while True:
-                try:
-                    # 从句子队列获取句子，增加超时时间
-                    sentence = self.sentence_queue.get(timeout=10)
-                        
-                    # 设置处理状态
-                    self.is_processing = True
-                    
-                    # 生成音频
-                    audio_data = self._generate_audio_sync(sentence)
-                    if audio_data:
-                        self.audio_queue.put(audio_data)
-                        logger.debug(f"音频生成完成: {sentence[:30]}...")
-                    else:
-                        logger.warning(f"音频生成失败: {sentence[:30]}...")
-                        
-                except Empty:
-                    # 队列为空，检查是否还有待处理的文本
-                    if self.text_buffer.strip():
-                        # 还有未处理的文本，继续等待
-                        continue
-                    else:
-                        # 没有更多文本，继续等待新的句子
-                        logger.debug("音频处理线程等待新的句子...")
-                        self.is_processing = False
-                        continue
-                        
+            self._loop.run_until_complete(self._pipeline_main())
         except Exception as e:
             logger.error(f"音频处理工作线程错误: {e}")
-            self.is_processing = False
         finally:
             self.is_processing = False
             logger.info("音频处理工作线程结束")
 
-    def _generate_audio_sync(self, text: str) -> Optional[bytes]:
-        """同步生成音频数据"""
-        # 使用信号量控制并发
-        if not self.tts_semaphore.acquire(timeout=10):  # 10秒超时
-            logger.warning("TTS请求超时，跳过音频生成")
-            return None
-            
+    async def _pipeline_main(self):
+        """最多K个句子并发合成，复用同一个连接池"""
+        self._sentence_queue: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_tasks)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrent_tasks, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=30)  # 硬编码超时时间（秒）
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            self._session = session
+            self._loop_ready.set()
+            while True:
+                seq, generation, sentence = await self._sentence_queue.get()
+                await self._slots.acquire()  # 按句子顺序派发，占满K个名额时等待
+                if generation != self._generation:
+                    self._slots.release()
+                    continue
+                task = asyncio.ensure_future(self._synthesize_sentence(seq, generation, sentence))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                task.add_done_callback(self._release_slot)  # 任务开始前就被取消时也会归还名额
+
+    def _release_slot(self, task: asyncio.Task):
+        """归还合成名额"""
+        self._slots.release()
+
+    def _enqueue_sentence(self, sentence: str):
+        """分配序号并入队（流水线循环内）"""
+        seq = self._next_seq
+        self._next_seq += 1
+        self.is_processing = True
+        self._sentence_queue.put_nowait((seq, self._generation, sentence))
+
+    def _reset_pipeline(self):
+        """作废当前对话的合成任务（流水线循环内）"""
+        self._generation += 1
+        self.segmenter.reset()
+        for task in list(self._inflight):
+            task.cancel()
+        self._ready.clear()
+        self._next_play_seq = self._next_seq
+        while not self.audio_queue.empty():
+            try:
+                self.audio_queue.get_nowait()
+            except Empty:
+                break
+        self.is_processing = False
+
+    async def _synthesize_sentence(self, seq: int, generation: int, sentence: str):
+        """合成单个句子，完成后按序号交付"""
+        audio_data = None
         try:
-            # 文本预处理
-            if not getattr(config.tts, 'remove_filter', False):
-                from voice.output.handle_text import prepare_tts_input_with_context
-                text = prepare_tts_input_with_context(text)
-            
-            if not text.strip():
-                return None
-                
-            headers = {}
-            if config.tts.require_api_key:
-                headers["Authorization"] = f"Bearer {config.tts.api_key}"
-            
-            payload = {
-                "input": text,
-                "voice": config.tts.default_voice,
-                "response_format": config.tts.default_format,
-                "speed": config.tts.default_speed
-            }
-            
-            # 使用requests进行同步调用
-            import requests
-            response = requests.post(
-                self.tts_url,
-                json=payload,
-                headers=headers,
-                timeout=30  # 硬编码超时时间（秒）
-            )
-            
-            if response.status_code == 200:
-                audio_data = response.content
+            audio_data = await self._generate_audio(sentence)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.error(f"生成音频数据异常: {e}")
+        finally:
+            self._inflight.discard(asyncio.current_task())
+        if generation != self._generation:
+            return  # 对话已重置
+        if audio_data:
+            logger.debug(f"音频生成完成: {sentence[:30]}...")
+        else:
+            logger.warning(f"音频生成失败: {sentence[:30]}...")
+        self._deliver(seq, audio_data)
+
+    def _deliver(self, seq: int, audio_data: Optional[bytes]):
+        """按序号重排：只有轮到的句子及其后连续已完成的句子才进入播放队列"""
+        self._ready[seq] = audio_data
+        while self._next_play_seq in self._ready:
+            audio = self._ready.pop(self._next_play_seq)
+            self._next_play_seq += 1
+            if audio:
+                self.audio_queue.put(audio)  # 失败的句子跳过，不阻塞后续播放
+        self.is_processing = bool(self._inflight) or not self._sentence_queue.empty() or bool(self._ready)
+
+    async def _generate_audio(self, text: str) -> Optional[bytes]:
+        """异步生成音频数据"""
+        # 文本预处理
+        if not getattr(config.tts, 'remove_filter', False):
+            from voice.output.handle_text import prepare_tts_input_with_context
+            text = prepare_tts_input_with_context(text)
+
+        if not text.strip():
+            return None
+
+        cache_args = (text, config.tts.default_voice, config.tts.default_format, config.tts.default_speed)
+
+        # 重复的问候、确认语直接命中音频缓存，无需请求TTS服务
+        cached = self._lookup_cached_audio(cache_args)
+        if cached:
+            logger.debug(f"音频缓存命中: {len(cached)} bytes")
+            return cached
+
+        headers = {}
+        if config.tts.require_api_key:
+            headers["Authorization"] = f"Bearer {config.tts.api_key}"
+
+        payload = {
+            "input": text,
+            "voice": config.tts.default_voice,
+            "response_format": config.tts.default_format,
+            "speed": config.tts.default_speed
+        }
+
+        async with self._session.post(self.tts_url, json=payload, headers=headers) as response:
+            if response.status == 200:
+                audio_data = await response.read()
                 logger.debug(f"音频生成成功: {len(audio_data)} bytes")
+                self._store_cached_audio(cache_args, audio_data)
                 return audio_data
-            else:
-                logger.error(f"TTS API调用失败: {response.status_code} - {response.text}")
-                return None
-                
+            logger.error(f"TTS API调用失败: {response.status} - {await response.text()}")
+            return None
+
+    def _lookup_cached_audio(self, cache_args) -> Optional[bytes]:
+        """查询合成音频缓存（与TTS服务共用同一缓存）"""
+        try:
+            from voice.output.tts_handler import lookup_cached_speech
+            return lookup_cached_speech(*cache_args)
         except Exception as e:
-            logger.error(f"生成音频数据异常: {e}")
+            logger.debug(f"查询音频缓存失败: {e}")
             return None
-        finally:
-            # 释放信号量
-            self.tts_semaphore.release()
+
+    def _store_cached_audio(self, cache_args, audio_data: bytes):
+        """将TTS服务返回的音频写入缓存（服务在同一进程时已写入，此处自动跳过磁盘）"""
+        try:
+            from voice.output.tts_handler import store_cached_speech
+            store_cached_speech(*cache_args, audio_data)
+        except Exception as e:
+            logger.debug(f"写入音频缓存失败: {e}")
 
     def _audio_player_worker(self):
         """音频播放工作线程"""
@@ -289,6 +314,10 @@ class VoiceIntegration:
             logger.error(f"音频播放工作线程中pygame初始化失败: {e}")
             return
         
+        # 专用播放通道：SDL在当前片段结束的同一帧切到已排队的下一段，句间无空隙
+        pygame.mixer.set_reserved(1)
+        channel = pygame.mixer.Channel(0)
+        
         try:
             while True:
                 try:
@@ -296,11 +325,18 @@ class VoiceIntegration:
                     audio_data = self.audio_queue.get(timeout=30)  # 增加到30秒超时
                         
                     if audio_data:
-                        # 播放音频数据
-                        self._play_audio_data_sync(audio_data)
+                        # 在上一段播放期间提前解码
+                        sound = self._decode_sound(audio_data)
+                        if sound is not None:
+                            self._queue_sound(channel, sound)
+                        else:
+                            # 解码失败时回退到music流式播放
+                            self._wait_channel_idle(channel)
+                            self._play_audio_data_sync(audio_data)
                         
                 except Empty:
                     # 队列为空，继续等待
+                    self.is_playing = channel.get_busy()
                     logger.debug("音频队列为空，继续等待...")
                     continue
                 except Exception as e:
@@ -316,6 +352,28 @@ class VoiceIntegration:
             except:
                 pass
 
+    def _decode_sound(self, audio_data: bytes):
+        """把音频数据解码为pygame.Sound，失败返回None"""
+        try:
+            import pygame
+            return pygame.mixer.Sound(file=io.BytesIO(audio_data))
+        except Exception as e:
+            logger.debug(f"Sound解码失败，改用music播放: {e}")
+            return None
+
+    def _queue_sound(self, channel, sound):
+        """排入播放通道：空闲时立即播放，否则在当前片段结束时无缝接上"""
+        # 通道只能排队一段，等上一段排队的音频开始播放后再放入
+        while channel.get_queue() is not None:
+            time.sleep(0.02)
+        channel.queue(sound)
+        self.is_playing = True
+
+    def _wait_channel_idle(self, channel):
+        """等待播放通道空闲"""
+        while channel.get_busy() or channel.get_queue() is not None:
+            time.sleep(0.02)
+
     def _play_audio_data_sync(self, audio_data: bytes):
         """同步播放音频数据"""
         try:
@@ -395,30 +453,42 @@ class VoiceIntegration:
                 time.sleep(5)
 
     def finish_processing(self):
-        """完成处理，清理剩余内容"""
-        # 处理剩余的文本
-        if self.text_buffer.strip():
+        """完成处理，清理剩余内容（排在已提交的文本片段之后执行）"""
+        self.dispatcher.finish()
+
+    def _flush_remaining_text(self):
+        """处理剩余的文本（同时清空文本缓冲区），在流水线事件循环中执行"""
+        remaining_text = self.segmenter.flush().strip()
+        if remaining_text:
             # 将剩余文本作为最后一个句子处理
-            remaining_text = self.text_buffer.strip()
-            if remaining_text:
-                self.sentence_queue.put(remaining_text)
-                logger.debug(f"处理剩余文本: {remaining_text[:50]}...")
+            self._enqueue_sentence(remaining_text)
+            logger.debug(f"处理剩余文本: {remaining_text[:50]}...")
         
         # 不再发送完成信号，因为线程是持续运行的
-        # 只需要清空文本缓冲区
-        self.text_buffer = ""
 
     def get_debug_info(self) -> Dict[str, Any]:
         """获取调试信息"""
         return {
-            "text_buffer_length": len(self.text_buffer),
-            "sentence_queue_size": self.sentence_queue.qsize(),
+            "text_buffer_length": len(self.segmenter.buffer),
+            "sentence_queue_size": self._sentence_queue.qsize(),
+            "synthesizing": len(self._inflight),
+            "reorder_buffer_size": len(self._ready),
+            "dispatcher": self.dispatcher.metrics(),
             "audio_queue_size": self.audio_queue.qsize(),
             "is_processing": self.is_processing,
             "is_playing": self.is_playing,
-            "temp_files": len(list(self.audio_temp_dir.glob(f"*.{config.tts.default_format}")))
+            "temp_files": len(list(self.audio_temp_dir.glob(f"*.{config.tts.default_format}"))),
+            "tts_cache": self._cache_metrics()
         }
 
+    def _cache_metrics(self) -> Dict[str, Any]:
+        """音频缓存命中率与节省字节数"""
+        try:
+            from voice.output.tts_cache import get_tts_cache
+            return get_tts_cache().metrics()
+        except Exception:
+            return {}
+
 def get_voice_integration() -> VoiceIntegration:
     """获取语音集成实例"""
     if not hasattr(get_voice_integration, '_instance'):